@@ -1,63 +1,107 @@
 #!/usr/bin/env python3
 """
 file: 1_web_log_parser.py
-Web日志解析器 - 解析通用日志格式(CLF)和组合日志格式
-输入: 日志文件
-输出: JSON行格式的结构化日志数据
+Web日志解析器 - 解析通用日志格式(CLF)和组合日志格式，或通过 --log-format 指定的自定义格式
+输入: 标准输入，或日志文件路径/通配符（支持logrotate轮转产生的gzip/bzip2/xz/zstd压缩文件，见archive_reader.py）
+输出: JSON行（默认）或列式批次格式的结构化日志数据
 """
+import os
 import re
-import json
 import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import record_codec
+import stage_stats
+import archive_reader
+from log_format import LOG_FORMAT_PRESETS, LogFormat
+
+# 通用日志格式 + 可选的组合日志格式尾部字段（Referer、User-Agent），一次匹配同时支持两种格式
+LOG_PATTERN = re.compile(r'(\S+) (\S+) (\S+) \[([^\]]+)\] "([^"]*)" (\d+) (\d+|-)(?: "([^"]*)"(?: "([^"]*)")?)?')
 
 def parse_log_line(line):
     """
     自动识别并解析日志行
     支持通用日志格式和组合日志格式
     """
-    # 尝试匹配组合日志格式
-    combined_pattern = re.compile(r'(\S+) (\S+) (\S+) \[([^\]]+)\] "([^"]*)" (\d+) (\d+|-) "([^"]*)"')
-    match = combined_pattern.match(line)
-    if match:
-        return {
-            'remote_host': match.group(1),
-            'remote_logname': match.group(2),
-            'remote_user': match.group(3),
-            'timestamp': match.group(4),
-            'request_line': match.group(5),
-            'status_code': match.group(6),
-            'response_size': match.group(7),
-            'user_agent': match.group(8)
-        }
-    
-    # 尝试匹配通用日志格式
-    common_pattern = re.compile(r'(\S+) (\S+) (\S+) \[([^\]]+)\] "([^"]*)" (\d+) (\d+|-)')
-    match = common_pattern.match(line)
-    if match:
-        return {
-            'remote_host': match.group(1),
-            'remote_logname': match.group(2),
-            'remote_user': match.group(3),
-            'timestamp': match.group(4),
-            'request_line': match.group(5),
-            'status_code': match.group(6),
-            'response_size': match.group(7)
-        }
-    
-    return None
+    match = LOG_PATTERN.match(line)
+    if not match:
+        return None
 
-def main():
+    # 一次取出全部分组，避免逐个调用group()
+    host, logname, user, timestamp, request_line, status_code, response_size, referer, user_agent = match.groups()
+    log_data = {
+        'remote_host': host,
+        'remote_logname': logname,
+        'remote_user': user,
+        'timestamp': timestamp,
+        'request_line': request_line,
+        'status_code': status_code,
+        'response_size': response_size
+    }
+
+    # 组合日志格式
+    if referer is not None:
+        log_data['referer'] = referer
+    if user_agent is not None:
+        log_data['user_agent'] = user_agent
+
+    return log_data
+
+def parse_lines(lines, log_format=None):
     """
-    主函数：从标准输入读取日志，解析后输出JSON
+    逐行解析日志，产出结构化日志字典
+    log_format: 自定义日志格式（LogFormat），为None时自动识别通用/组合日志格式
+    跳过空行和无法解析的行
     """
-    for line in sys.stdin:
+    parse_line = log_format.parse_line if log_format is not None else parse_log_line
+    for line in lines:
         line = line.strip()
         if not line:
             continue
         
         # 解析日志行
-        log_data = parse_log_line(line)
+        log_data = parse_line(line)
         if log_data:
-            print(json.dumps(log_data))
+            yield log_data
+
+def main():
+    """
+    主函数：从标准输入或日志文件读取日志，解析后输出JSON
+    """
+    parser = argparse.ArgumentParser(description='Web日志解析器')
+    parser.add_argument('inputs', nargs='*',
+                        help='日志文件路径或通配符，可为压缩的轮转文件，按第一条时间戳排序后依次解析（默认读取标准输入）')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='并行解压日志文件的进程数 (默认: 1)')
+    parser.add_argument('--log-format',
+                        help=f"Apache LogFormat或nginx log_format格式字符串，或预设名称 ({', '.join(LOG_FORMAT_PRESETS)})；"
+                             "默认自动识别通用/组合日志格式")
+    record_codec.add_format_argument(parser)
+    stage_stats.add_stats_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        log_format = LogFormat(args.log_format) if args.log_format else None
+    except ValueError as e:
+        print(f"Error compiling log format: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        lines = archive_reader.read_inputs(args.inputs, args.workers) if args.inputs else sys.stdin
+    except (OSError, ValueError) as e:
+        print(f"Error reading log files: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    stats = stage_stats.from_args(args, 'parse')
+    try:
+        with stage_stats.profiled(args.profile), record_codec.RecordWriter(args.format) as writer:
+            writer.write_all(parse_lines(stats.count_in(lines), log_format))
+    except (OSError, ValueError) as e:
+        print(f"Error reading log files: {e}", file=sys.stderr)
+        sys.exit(1)
+    stats.finish(writer.count)
+    stage_stats.report(args, [stats])
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -2,63 +2,188 @@
 """
 file: 2_param_extractor.py
 参数提取器 - 从结构化日志中提取特定参数
-输入: JSON行格式的日志数据
-输出: JSON行格式的提取结果
+输入: JSON行或列式批次格式的日志数据（自动识别）
+输出: JSON行（默认）或列式批次格式的提取结果
 """
+import os
 import re
 import json
 import sys
 import argparse
+import functools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import record_codec
+import stage_stats
+
+# 从请求行中提取查询字符串
+QUERY_PATTERN = re.compile(r'GET\s+[^\s]*\?([^\s]*)\s+HTTP')
+
+# 从请求行中提取请求路径（不含查询字符串）
+PATH_PATTERN = re.compile(r'\S+\s+([^\s?]*)')
+
+# 会话划分使用的日志字段
+SESSION_FIELDS = ('remote_host', 'user_agent')
+
+@functools.lru_cache(maxsize=None)
+def param_pattern(key_params):
+    """
+    编译一次扫描即可提取所有参数的正则
+    单个参数时直接匹配 "参数名=值"；多个参数时使用零宽前瞻，
+    参数名可以相互重叠，与逐个参数search的行为一致
+    """
+    names = '|'.join(re.escape(name) for name in key_params)
+    if len(key_params) == 1:
+        return re.compile(rf'({names})=([^&\s]+)')
+    return re.compile(rf'(?=({names})=([^&\s]+))')
+
+def parse_query_params(query_string, key_params):
+    """
+    一次扫描查询字符串，返回每个参数首次出现的值
+    """
+    pattern = param_pattern(key_params)
+    if len(key_params) == 1:
+        match = pattern.search(query_string)
+        return {match.group(1): match.group(2)} if match else {}
+
+    values = {}
+    for match in pattern.finditer(query_string):
+        name = match.group(1)
+        if name not in values:
+            values[name] = match.group(2)
+            if len(values) == len(key_params):
+                break
+    return values
+
+def build_request(log_data, payload):
+    """
+    构建请求数据
+    日志格式包含请求耗时时附带request_time字段（秒）
+    """
+    request = {
+        'status_code': int(log_data.get('status_code', 200)),
+        'response_size': int(log_data.get('response_size', 0)) if log_data.get('response_size', '-') != '-' else 0,
+        'timestamp': log_data.get('timestamp', ''),
+        'payload': payload
+    }
+    if 'request_time' in log_data:
+        request['request_time'] = log_data['request_time']
+    return request
+
+def session_fields(log_data):
+    """
+    会话字段：来源地址、User-Agent和请求路径
+    供4_data_reconstructor/session_reconstructor.py按攻击会话划分分析结果
+    """
+    fields = {field: log_data.get(field) or '' for field in SESSION_FIELDS}
+    path_match = PATH_PATTERN.match(log_data.get('request_line', ''))
+    fields['path'] = path_match.group(1) if path_match else ''
+    return fields
+
+def extract_parameters(log_data, key_params):
+    """
+    从日志数据中一次提取多个参数，返回 {参数名: 请求数据}
+    """
+    # 从请求行中提取查询字符串
+    request_line = log_data.get('request_line', '')
+    query_match = QUERY_PATTERN.search(request_line)
+    if not query_match:
+        return {}
+
+    values = parse_query_params(query_match.group(1), tuple(key_params))
+    return {name: build_request(log_data, value) for name, value in values.items()}
 
 def extract_parameter(log_data, key_param):
     """
     从日志数据中提取特定参数
     """
-    # 编译参数提取正则表达式
-    param_pattern = re.compile(rf'{re.escape(key_param)}=([^&\s]+)')
-    
-    # 从请求行中提取查询字符串
     request_line = log_data.get('request_line', '')
-    query_match = re.search(r'GET\s+[^\s]*\?([^\s]*)\s+HTTP', request_line)
+    query_match = QUERY_PATTERN.search(request_line)
     if not query_match:
         return None
-    
-    query_string = query_match.group(1)
-    
-    # 提取关键参数值
-    param_match = param_pattern.search(query_string)
+
+    param_match = param_pattern((key_param,)).search(query_match.group(1))
     if not param_match:
         return None
-    
-    # 构建请求数据
-    return {
-        'status_code': int(log_data.get('status_code', 200)),
-        'response_size': int(log_data.get('response_size', 0)) if log_data.get('response_size', '-') != '-' else 0,
-        'timestamp': log_data.get('timestamp', ''),
-        'payload': param_match.group(1)
-    }
 
-def main():
-    parser = argparse.ArgumentParser(description='参数提取器', add_help=False)
-    parser.add_argument('-p', '--param', required=True, help='关键参数名')
-    parser.add_argument('-k', '--key', help='关键词过滤（可选）')
-    parser.add_argument('-h', '--help', action='help', help='显示帮助信息')
-    
-    args = parser.parse_args()
-    
-    for line in sys.stdin:
+    return build_request(log_data, param_match.group(2))
+
+def extract_records(records, key_params, session=False):
+    """
+    从结构化日志流中提取参数，产出请求数据
+    key_params为单个参数名或参数名列表；提取多个参数时，请求数据中附带param字段
+    session为True时请求数据中附带会话字段（remote_host、user_agent、path）
+    """
+    if isinstance(key_params, str):
+        key_params = (key_params,)
+    key_params = tuple(key_params)
+
+    if len(key_params) == 1:
+        for log_data in records:
+            result = extract_parameter(log_data, key_params[0])
+            if result:
+                if session:
+                    result.update(session_fields(log_data))
+                yield result
+        return
+
+    for log_data in records:
+        results = extract_parameters(log_data, key_params)
+        for name in key_params:
+            result = results.get(name)
+            if result:
+                if len(key_params) > 1:
+                    result['param'] = name
+                if session:
+                    result.update(session_fields(log_data))
+                yield result
+
+def load_records(lines, key=None):
+    """
+    逐行解析JSON日志数据，跳过无法解析或不含关键词的行
+    """
+    for line in lines:
 
         # 关键词过滤：如果提供了-k参数且关键词不在行中，则跳过
-        if args.key and args.key not in line:
+        if key and key not in line:
             continue
 
         try:
-            log_data = json.loads(line)
-            result = extract_parameter(log_data, args.param)
-            if result:
-                print(json.dumps(result))
+            yield json.loads(line)
         except json.JSONDecodeError:
             continue
 
+def read_records(key=None):
+    """
+    从标准输入读取日志数据，自动识别JSON行或列式批次格式
+    列式批次格式没有原始文本行，关键词过滤作用于记录的JSON文本
+    """
+    reader = record_codec.RecordReader()
+    if reader.format == record_codec.JSONL:
+        return load_records(reader.lines(), key)
+    records = reader.records()
+    if key:
+        return (record for record in records if key in json.dumps(record))
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description='参数提取器', add_help=False)
+    parser.add_argument('-p', '--param', required=True, action='append',
+                        help='关键参数名（可重复指定，一次扫描提取多个参数）')
+    parser.add_argument('-k', '--key', help='关键词过滤（可选）')
+    parser.add_argument('--session', action='store_true',
+                        help='附带会话字段remote_host/user_agent/path，供session_reconstructor.py按会话划分')
+    record_codec.add_format_argument(parser)
+    stage_stats.add_stats_arguments(parser)
+    parser.add_argument('-h', '--help', action='help', help='显示帮助信息')
+    
+    args = parser.parse_args()
+    
+    stats = stage_stats.from_args(args, 'extract')
+    with stage_stats.profiled(args.profile), record_codec.RecordWriter(args.format) as writer:
+        writer.write_all(extract_records(stats.count_in(read_records(args.key)), args.param, args.session))
+    stats.finish(writer.count)
+    stage_stats.report(args, [stats])
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
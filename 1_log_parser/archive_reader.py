@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+file: archive_reader.py
+归档日志读取器 - 直接读取logrotate轮转产生的压缩日志，多个文件由工作进程并行解压
+输入: 日志文件路径或通配符（access.log、access.log.1、access.log.2.gz ...）
+输出: 按时间顺序排列的原始日志行
+
+压缩格式根据文件开头的魔数识别（与扩展名无关）：
+  - gzip (.gz)、bzip2 (.bz2)、xz (.xz): 标准库
+  - zstd (.zst): 优先使用标准库 compression.zstd（Python 3.14+）或 zstandard 模块，
+    都不可用时通过 zstd -dc 子进程解压
+  - 其余视为未压缩的文本日志
+各文件按第一条日志的时间戳排序，没有可识别时间戳的文件按轮转序号（数字越大越旧）排在最后。
+解压后的数据只在内存中流动，不会写入磁盘：并行模式下每个文件由一个工作进程解压，
+按行边界切成数据块经有界队列传回，主进程按时间顺序依次读取各文件的队列。
+"""
+import io
+import os
+import re
+import sys
+import bz2
+import glob
+import gzip
+import lzma
+import shutil
+import argparse
+import subprocess
+import multiprocessing
+from datetime import datetime
+
+# 压缩格式的魔数
+MAGIC_NUMBERS = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bzip2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+]
+
+# 工作进程每次传回的解压数据块大小
+BLOCK_SIZE = 1024 * 1024
+
+# 每个文件的队列中最多缓存的数据块数，限制提前解压占用的内存
+QUEUE_BLOCKS = 8
+
+# 查找第一条时间戳时最多读取的行数
+TIMESTAMP_SCAN_LINES = 100
+
+# 通用/组合日志格式的时间戳，以及nginx $time_iso8601
+BRACKET_TIMESTAMP = re.compile(r'\[(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2} [+-]\d{4})\]')
+ISO_TIMESTAMP = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?')
+TIMESTAMP_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+# logrotate的轮转序号：access.log.3.gz -> 3
+ROTATION_NUMBER = re.compile(r'\.(\d+)(?:\.\w+)?$')
+
+# 通配符字符
+GLOB_CHARS = re.compile(r'[*?\[]')
+
+def detect_compression(path):
+    """根据文件开头的魔数返回压缩格式，未压缩时返回None"""
+    with open(path, 'rb') as f:
+        head = f.read(8)
+    for magic, name in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return name
+    return None
+
+class _ProcessStream(io.RawIOBase):
+    """读取解压子进程的标准输出，关闭时结束子进程"""
+    def __init__(self, process):
+        self.process = process
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self.process.stdout.readinto(buffer)
+
+    def close(self):
+        if not self.closed:
+            self.process.stdout.close()
+            if self.process.poll() is None:
+                self.process.terminate()
+            self.process.wait()
+        super().close()
+
+def _open_zstd(path):
+    try:
+        from compression import zstd
+        return zstd.open(path, 'rb')
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    except ImportError:
+        pass
+    if shutil.which('zstd') is None:
+        raise ValueError(f"无法解压zstd文件 {path}: 需要Python 3.14+、zstandard模块或zstd命令")
+    process = subprocess.Popen(['zstd', '-dc', '--', path], stdout=subprocess.PIPE)
+    return io.BufferedReader(_ProcessStream(process))
+
+def open_binary(path):
+    """以二进制方式打开日志文件，压缩文件返回解压流"""
+    compression = detect_compression(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'bzip2':
+        return bz2.open(path, 'rb')
+    if compression == 'xz':
+        return lzma.open(path, 'rb')
+    if compression == 'zstd':
+        return _open_zstd(path)
+    return open(path, 'rb')
+
+def open_log(path):
+    """以文本方式打开日志文件（自动解压），逐行读取"""
+    return io.TextIOWrapper(open_binary(path), encoding='utf-8', errors='replace')
+
+def has_glob(pattern):
+    return bool(GLOB_CHARS.search(pattern))
+
+def expand_inputs(patterns):
+    """展开路径和通配符，去除重复文件，没有匹配的文件时抛出ValueError"""
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if has_glob(pattern) else [pattern]
+        if not matches:
+            raise ValueError(f"没有匹配的日志文件: {pattern}")
+        for path in matches:
+            if not os.path.isfile(path):
+                raise ValueError(f"日志文件不存在: {path}")
+            real = os.path.realpath(path)
+            if real not in seen:
+                seen.add(real)
+                paths.append(path)
+    return paths
+
+def parse_timestamp(line):
+    """返回日志行中第一个时间戳的Unix时间，找不到时返回None"""
+    match = BRACKET_TIMESTAMP.search(line)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), TIMESTAMP_FORMAT).timestamp()
+        except ValueError:
+            pass
+    match = ISO_TIMESTAMP.search(line)
+    if match:
+        try:
+            return datetime.fromisoformat(match.group(0).replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+    return None
+
+def first_timestamp(path):
+    """日志文件中第一条可识别的时间戳（只解压文件开头）"""
+    with open_log(path) as f:
+        for _, line in zip(range(TIMESTAMP_SCAN_LINES), f):
+            moment = parse_timestamp(line)
+            if moment is not None:
+                return moment
+    return None
+
+def rotation_number(path):
+    match = ROTATION_NUMBER.search(os.path.basename(path))
+    return int(match.group(1)) if match else 0
+
+def sort_chronologically(paths):
+    """按第一条时间戳排序，没有时间戳的文件按轮转序号从旧到新排在最后"""
+    def key(path):
+        moment = first_timestamp(path)
+        return (moment is None, moment or 0, -rotation_number(path), path)
+    return sorted(paths, key=key)
+
+# ---- 并行解压 ----
+
+def _decompress_worker(path, queue):
+    """工作进程：解压一个文件，按行边界切块放入队列，结束时放入None"""
+    try:
+        with open_binary(path) as f:
+            pending = b''
+            while True:
+                data = f.read(BLOCK_SIZE)
+                if not data:
+                    break
+                data = pending + data
+                cut = data.rfind(b'\n') + 1
+                if cut:
+                    queue.put(data[:cut])
+                pending = data[cut:]
+            if pending:
+                queue.put(pending + b'\n')
+        queue.put(None)
+    except (OSError, EOFError, ValueError, lzma.LZMAError) as e:
+        queue.put(ValueError(f"{path}: {e}"))
+
+def _block_lines(block):
+    # 只按换行符切分（str.splitlines还会在\x0b、\x1c、\u2028等字符处切分），与逐行读取文件的结果一致
+    lines = block.decode('utf-8', 'replace').split('\n')
+    return [line + '\n' for line in lines[:-1]]
+
+def read_lines(paths, workers=1):
+    """
+    依次产出各日志文件的行（paths需已按时间排序）
+    workers大于1时同时最多由workers个工作进程提前解压后续文件
+    """
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            with open_log(path) as f:
+                yield from f
+        return
+
+    context = multiprocessing.get_context()
+    running = []
+    next_index = 0
+    try:
+        for _ in paths:
+            while next_index < len(paths) and len(running) < workers:
+                queue = context.Queue(QUEUE_BLOCKS)
+                process = context.Process(target=_decompress_worker, args=(paths[next_index], queue),
+                                          daemon=True)
+                process.start()
+                running.append((process, queue))
+                next_index += 1
+
+            process, queue = running.pop(0)
+            while True:
+                block = queue.get()
+                if block is None:
+                    break
+                if isinstance(block, Exception):
+                    raise block
+                yield from _block_lines(block)
+            process.join()
+    finally:
+        for process, _ in running:
+            process.terminate()
+            process.join()
+
+def read_inputs(patterns, workers=1):
+    """展开路径/通配符，按时间排序后读取全部日志行"""
+    return read_lines(sort_chronologically(expand_inputs(patterns)), workers)
+
+def main():
+    parser = argparse.ArgumentParser(description='归档日志读取器')
+    parser.add_argument('inputs', nargs='+', help='日志文件路径或通配符，支持gzip/bzip2/xz/zstd压缩')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='并行解压的进程数 (默认: 1)')
+    parser.add_argument('-l', '--list', action='store_true', help='只列出排序后的文件及其压缩格式')
+    args = parser.parse_args()
+
+    try:
+        paths = sort_chronologically(expand_inputs(args.inputs))
+        if args.list:
+            for path in paths:
+                print(f"{path}\t{detect_compression(path) or 'plain'}")
+            return
+        for line in read_lines(paths, args.workers):
+            sys.stdout.write(line)
+    except (OSError, ValueError) as e:
+        print(f"Error reading log archive: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+file: line_prefilter.py
+日志行预过滤器 - 在结构化解析之前丢弃与注入无关的日志行
+输入: 原始日志行
+输出: 通过过滤的原始日志行，统计信息输出到标准错误流
+
+过滤条件根据参数名和分析器配置中的trigger_pattern构建：
+  - 日志行必须包含 "参数名="
+  - 日志行必须包含trigger_pattern的原文、URL编码或Base64编码形式之一
+    （--config为配置目录时，包含任一配置的trigger_pattern即可）
+"""
+import os
+import re
+import sys
+import glob
+import json
+import base64
+import argparse
+import urllib.parse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import stage_stats
+
+# URL编码时不会被转义的字符
+URL_UNRESERVED = set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_.~')
+
+def _url_char_pattern(char):
+    """匹配单个字符的原文或其URL编码形式"""
+    options = [re.escape(char)]
+    if char == ' ':
+        options.append(r'\+')
+    if char not in URL_UNRESERVED:
+        options.append(re.escape(urllib.parse.quote(char, safe='')))
+    if len(options) == 1:
+        return options[0]
+    return '(?:' + '|'.join(options) + ')'
+
+def _url_variant_pattern(text):
+    """匹配文本的原文、URL编码以及两者混合的形式"""
+    return ''.join(_url_char_pattern(char) for char in text)
+
+def base64_fragments(text):
+    """
+    返回文本在Base64编码串中可能出现的片段
+    文本在原始数据中的起始偏移决定了编码结果，分别计算偏移0/1/2三种情况，
+    并去掉受相邻未知字节影响的首尾字符
+    """
+    data = text.encode('utf-8')
+    fragments = []
+    for offset in range(3):
+        encoded = base64.b64encode(b'\x00' * offset + data).decode('ascii')
+        start = -(-8 * offset // 6)
+        end = 8 * (offset + len(data)) // 6
+        fragment = encoded[start:end]
+        if fragment and fragment not in fragments:
+            fragments.append(fragment)
+    return fragments
+
+def build_trigger_regex(trigger_patterns):
+    """
+    构建匹配trigger_pattern各种编码形式的组合正则，trigger_patterns中任一匹配即可
+    原文/URL编码形式不区分大小写（分析器对payload.upper()匹配），
+    Base64形式区分大小写，分别按原文、大写、小写计算
+    """
+    alternatives = [f'(?i:{_url_variant_pattern(trigger_pattern)})' for trigger_pattern in trigger_patterns]
+
+    fragments = []
+    for trigger_pattern in trigger_patterns:
+        for text in (trigger_pattern, trigger_pattern.upper(), trigger_pattern.lower()):
+            for fragment in base64_fragments(text):
+                if fragment not in fragments:
+                    fragments.append(fragment)
+    alternatives.extend(_url_variant_pattern(fragment) for fragment in fragments)
+
+    return re.compile('|'.join(alternatives))
+
+def load_trigger_patterns(config_path):
+    """
+    从分析器配置文件读取trigger_pattern，返回列表
+    config_path为目录时读取其中全部 .json 配置（与sqlmap_analyzer.py的配置目录一致），跳过空的trigger_pattern
+    """
+    if os.path.isdir(config_path):
+        paths = sorted(glob.glob(os.path.join(config_path, '*.json')))
+    else:
+        paths = [config_path]
+    patterns = []
+    for path in paths:
+        with open(path, 'r') as f:
+            pattern = json.load(f).get('trigger_pattern', '')
+        if pattern and pattern not in patterns:
+            patterns.append(pattern)
+    return patterns
+
+class LinePrefilter:
+    def __init__(self, param=None, trigger_patterns=None):
+        self.param_literal = f'{param}=' if param else None
+        self.trigger_regex = build_trigger_regex(trigger_patterns) if trigger_patterns else None
+        self.kept = 0
+        self.dropped = 0
+
+    def accepts(self, line):
+        """判断日志行是否可能包含注入载荷"""
+        if self.param_literal and self.param_literal not in line:
+            return False
+        if self.trigger_regex and not self.trigger_regex.search(line):
+            return False
+        return True
+
+    def filter_lines(self, lines):
+        """产出通过过滤的日志行，并累计保留/丢弃的行数"""
+        for line in lines:
+            if self.accepts(line):
+                self.kept += 1
+                yield line
+            else:
+                self.dropped += 1
+
+    def summary(self):
+        """过滤统计信息"""
+        return f"[+] 预过滤: 保留 {self.kept} 行, 丢弃 {self.dropped} 行"
+
+def main():
+    parser = argparse.ArgumentParser(description='日志行预过滤器', add_help=False)
+    parser.add_argument('-p', '--param', help='关键参数名')
+    parser.add_argument('--config', help='分析器配置文件或配置目录路径，用于读取trigger_pattern')
+    stage_stats.add_stats_arguments(parser)
+    parser.add_argument('-h', '--help', action='help', help='显示帮助信息')
+
+    args = parser.parse_args()
+
+    trigger_patterns = None
+    if args.config:
+        try:
+            trigger_patterns = load_trigger_patterns(args.config)
+        except Exception as e:
+            print(f"Error loading config from {args.config}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    prefilter = LinePrefilter(args.param, trigger_patterns)
+    stats = stage_stats.from_args(args, 'prefilter')
+    with stage_stats.profiled(args.profile):
+        for line in prefilter.filter_lines(stats.count_in(sys.stdin)):
+            sys.stdout.write(line)
+    stats.finish(prefilter.kept)
+
+    print(prefilter.summary(), file=sys.stderr)
+    stage_stats.report(args, [stats])
+
+if __name__ == '__main__':
+    main()
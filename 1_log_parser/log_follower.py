@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+file: log_follower.py
+日志跟踪读取器 - 持续读取不断增长的访问日志，支持logrotate轮转
+输入: 日志文件路径
+输出: 新增的原始日志行
+
+只有以换行符结尾的完整行才会被产出，offset始终指向下一个未处理行的起始字节，
+可以与inode一起保存为检查点，重启后从断点继续读取。
+支持的轮转方式：
+  - 重命名后新建（logrotate默认）：读完旧文件剩余内容后切换到新文件
+  - copytruncate：文件变短时从头读取
+  - 停止期间发生轮转：在 <文件名>.1 中找到检查点对应的旧文件，读完剩余内容后再读新文件
+"""
+import os
+import sys
+import time
+import argparse
+
+# 每次读取的字节数
+READ_SIZE = 1024 * 1024
+
+class LogFollower:
+    def __init__(self, path, offset=0, inode=None, poll_interval=1.0):
+        self.path = path
+        self.offset = offset
+        self.inode = inode
+        self.poll_interval = poll_interval
+        self.rotations = 0
+        self.stopped = False
+
+    def stop(self):
+        """在当前行处理完后结束follow()"""
+        self.stopped = True
+
+    def _open_resume(self):
+        """
+        打开检查点对应的文件
+        当前路径的inode与检查点不一致时，尝试在 <文件名>.1 中找到轮转前的旧文件
+        返回 (文件对象, 是否为轮转前的旧文件)
+        """
+        f = open(self.path, 'rb')
+        st = os.fstat(f.fileno())
+        if self.inode is None or st.st_ino == self.inode:
+            if st.st_size < self.offset:
+                # 停止期间文件被截断
+                self.offset = 0
+            self.inode = st.st_ino
+            return f, False
+
+        rotated_path = f"{self.path}.1"
+        try:
+            rotated = open(rotated_path, 'rb')
+        except OSError:
+            rotated = None
+        if rotated is not None and os.fstat(rotated.fileno()).st_ino == self.inode:
+            f.close()
+            return rotated, True
+
+        if rotated is not None:
+            rotated.close()
+        print(f"[+] 未找到检查点对应的日志文件，从 {self.path} 开头读取", file=sys.stderr)
+        self.offset = 0
+        self.inode = st.st_ino
+        return f, False
+
+    def _path_inode(self):
+        """当前路径对应文件的inode，文件不存在（轮转进行中）时返回None"""
+        try:
+            return os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+
+    def follow(self, on_idle=None):
+        """
+        产出新增的完整日志行（保留换行符）
+        没有新数据时每隔poll_interval秒轮询一次，并调用on_idle()
+        """
+        f, draining = self._open_resume()
+        f.seek(self.offset)
+        buffer = b''
+        try:
+            while True:
+                chunk = f.read(READ_SIZE)
+                if chunk:
+                    buffer += chunk
+                    lines = buffer.split(b'\n')
+                    buffer = lines.pop()
+                    for line in lines:
+                        self.offset += len(line) + 1
+                        yield line.decode('utf-8', errors='replace') + '\n'
+                        # 下游请求下一行时上一行已处理完，在行边界停止保证offset与已处理的数据一致
+                        if self.stopped:
+                            return
+                    continue
+
+                # 已读到文件末尾：检查轮转和截断
+                path_inode = self._path_inode()
+                if draining or (path_inode is not None and path_inode != self.inode):
+                    # 旧文件已读完，未以换行符结尾的最后一行不会再被补全
+                    if buffer:
+                        self.offset += len(buffer)
+                        yield buffer.decode('utf-8', errors='replace') + '\n'
+                        buffer = b''
+                    f.close()
+                    f = open(self.path, 'rb')
+                    self.inode = os.fstat(f.fileno()).st_ino
+                    self.offset = 0
+                    self.rotations += 1
+                    draining = False
+                    continue
+
+                if path_inode == self.inode and os.fstat(f.fileno()).st_size < self.offset:
+                    # copytruncate
+                    f.seek(0)
+                    self.offset = 0
+                    buffer = b''
+                    self.rotations += 1
+                    continue
+
+                if on_idle is not None:
+                    on_idle()
+                if self.stopped:
+                    return
+                time.sleep(self.poll_interval)
+        finally:
+            f.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='日志跟踪读取器', add_help=False)
+    parser.add_argument('-f', '--file', required=True, help='日志文件路径')
+    parser.add_argument('--offset', type=int, default=0, help='起始字节偏移量 (默认: 0)')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='没有新数据时的轮询间隔，单位秒 (默认: 1.0)')
+    parser.add_argument('-h', '--help', action='help', help='显示帮助信息')
+
+    args = parser.parse_args()
+    follower = LogFollower(args.file, args.offset, poll_interval=args.poll_interval)
+
+    try:
+        for line in follower.follow(on_idle=sys.stdout.flush):
+            sys.stdout.write(line)
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error reading log file: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+file: log_format.py
+自定义日志格式 - 将Apache LogFormat或nginx log_format字符串编译为解析正则
+输入: 日志格式字符串或预设名称
+输出: 与1_web_log_parser.py字段一致的结构化日志字典
+
+除通用日志格式和组合日志格式的字段外，还能解析请求耗时：
+  - Apache: %D（微秒）、%T（秒）、%{ms}T、%{us}T、%{s}T
+  - nginx:  $request_time（秒，毫秒精度）
+请求耗时统一换算为秒（浮点数），保存在request_time字段中，供基于耗时的判断函数使用。
+"""
+import re
+import argparse
+
+# 预设格式
+LOG_FORMAT_PRESETS = {
+    'common': '%h %l %u %t "%r" %>s %b',
+    'combined': '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-Agent}i"',
+    'nginx': '$remote_addr - $remote_user [$time_local] "$request" $status $body_bytes_sent '
+             '"$http_referer" "$http_user_agent"',
+}
+
+# Apache格式指令: %[条件/重定向修饰][{参数}]指令字符
+APACHE_DIRECTIVE = re.compile(r'%[<>!\d,]*(?:\{([^}]*)\})?([a-zA-Z%])')
+
+# nginx变量: $name 或 ${name}
+NGINX_VARIABLE = re.compile(r'\$(?:\{(\w+)\}|(\w+))')
+
+# 请求耗时的单位换算（乘以该系数得到秒）
+TIME_UNITS = {'us': 1e-6, 'ms': 1e-3, 's': 1.0}
+
+# 各字段的取值正则，未列出的字段根据上下文使用通用正则
+FIELD_PATTERNS = {
+    'status_code': r'\d{3}',
+    'response_size': r'\d+|-',
+    'request_time': r'\d+(?:\.\d+)?|-',
+}
+
+# Apache的%t自带方括号，方括号不属于timestamp字段
+APACHE_TIME_PATTERN = (r'\[', r'[^\]]+', r'\]')
+
+def apache_field(argument, directive):
+    """
+    返回Apache格式指令对应的 (字段名, 请求耗时单位)
+    不需要的指令返回 (None, None)，只匹配不输出
+    """
+    if directive in 'ha':
+        return 'remote_host', None
+    if directive == 'l':
+        return 'remote_logname', None
+    if directive == 'u':
+        return 'remote_user', None
+    if directive == 't' and not argument:
+        return 'timestamp', None
+    if directive == 'r':
+        return 'request_line', None
+    if directive == 's':
+        return 'status_code', None
+    if directive in 'bB':
+        return 'response_size', None
+    if directive == 'D':
+        return 'request_time', 'us'
+    if directive == 'T':
+        unit = (argument or 's').lower()
+        if unit not in TIME_UNITS:
+            raise ValueError(f"不支持的耗时单位: %{{{argument}}}T")
+        return 'request_time', unit
+    if directive == 'i' and argument:
+        header = argument.lower()
+        if header == 'referer':
+            return 'referer', None
+        if header == 'user-agent':
+            return 'user_agent', None
+    return None, None
+
+def nginx_field(name):
+    """返回nginx变量对应的 (字段名, 请求耗时单位)"""
+    fields = {
+        'remote_addr': ('remote_host', None),
+        'remote_user': ('remote_user', None),
+        'time_local': ('timestamp', None),
+        'time_iso8601': ('timestamp', None),
+        'request': ('request_line', None),
+        'status': ('status_code', None),
+        'body_bytes_sent': ('response_size', None),
+        'bytes_sent': ('response_size', None),
+        'request_time': ('request_time', 's'),
+        'http_referer': ('referer', None),
+        'http_user_agent': ('user_agent', None),
+    }
+    return fields.get(name, (None, None))
+
+def context_pattern(fmt, start, end):
+    """根据字段两侧的字符选择通用的取值正则"""
+    before = fmt[start - 1] if start > 0 else ''
+    after = fmt[end] if end < len(fmt) else ''
+    if before == '"' and after == '"':
+        return r'[^"]*'
+    if before == '[' and after == ']':
+        return r'[^\]]*'
+    return r'\S*'
+
+class LogFormat:
+    """编译后的日志格式"""
+    def __init__(self, log_format):
+        self.source = LOG_FORMAT_PRESETS.get(log_format, log_format)
+        # Apache配置文件中的 \" 转义
+        fmt = self.source.replace('\\"', '"')
+        if '%' in fmt and APACHE_DIRECTIVE.search(fmt):
+            tokens = self._apache_tokens(fmt)
+        elif NGINX_VARIABLE.search(fmt):
+            tokens = self._nginx_tokens(fmt)
+        else:
+            raise ValueError(f"日志格式中没有可识别的字段: {log_format}")
+
+        parts = []
+        # 输出字段: [(字段名, 耗时单位)]，与捕获组一一对应
+        self.fields = []
+        seen = set()
+        pos = 0
+        for start, end, field, unit, wrapper in tokens:
+            parts.append(re.escape(fmt[pos:start]))
+            prefix, value_pattern, suffix = wrapper or ('', None, '')
+            if value_pattern is None:
+                value_pattern = FIELD_PATTERNS.get(field) or context_pattern(fmt, start, end)
+            if field is None or field in seen:
+                parts.append(f'{prefix}(?:{value_pattern}){suffix}')
+            else:
+                seen.add(field)
+                parts.append(f'{prefix}({value_pattern}){suffix}')
+                self.fields.append((field, unit))
+            pos = end
+        parts.append(re.escape(fmt[pos:]))
+
+        if 'request_line' not in seen:
+            raise ValueError("日志格式中缺少请求行字段（%r 或 $request）")
+
+        self.pattern_text = ''.join(parts)
+        self.pattern = re.compile(self.pattern_text)
+        self.has_request_time = 'request_time' in seen
+
+    @staticmethod
+    def _apache_tokens(fmt):
+        tokens = []
+        for match in APACHE_DIRECTIVE.finditer(fmt):
+            if match.group(2) == '%':
+                continue
+            field, unit = apache_field(match.group(1), match.group(2))
+            wrapper = APACHE_TIME_PATTERN if match.group(2) == 't' and not match.group(1) else None
+            tokens.append((match.start(), match.end(), field, unit, wrapper))
+        return tokens
+
+    @staticmethod
+    def _nginx_tokens(fmt):
+        tokens = []
+        for match in NGINX_VARIABLE.finditer(fmt):
+            field, unit = nginx_field(match.group(1) or match.group(2))
+            tokens.append((match.start(), match.end(), field, unit, None))
+        return tokens
+
+    def bytes_pattern(self):
+        """编译为bytes正则，供mmap_log_reader.py直接匹配映射缓冲区"""
+        return re.compile(rb'\s*' + self.pattern_text.encode('utf-8'))
+
+    def build_record(self, values):
+        """
+        将捕获组的值转换为结构化日志字典
+        请求耗时换算为秒，缺失时（-）为None
+        """
+        log_data = {}
+        for (field, unit), value in zip(self.fields, values):
+            if unit is not None:
+                value = float(value) * TIME_UNITS[unit] if value != '-' else None
+            log_data[field] = value
+        return log_data
+
+    def parse_line(self, line):
+        """解析一行日志，无法匹配时返回None"""
+        match = self.pattern.match(line)
+        if not match:
+            return None
+        return self.build_record(match.groups())
+
+def main():
+    parser = argparse.ArgumentParser(description='日志格式编译器')
+    parser.add_argument('log_format', help=f"日志格式字符串或预设名称 ({', '.join(LOG_FORMAT_PRESETS)})")
+    args = parser.parse_args()
+
+    log_format = LogFormat(args.log_format)
+    print(f"格式: {log_format.source}")
+    print(f"正则: {log_format.pattern_text}")
+    print(f"字段: {', '.join(field for field, _ in log_format.fields)}")
+
+if __name__ == '__main__':
+    main()
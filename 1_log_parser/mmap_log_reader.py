@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+file: mmap_log_reader.py
+内存映射日志读取器 - 直接在映射缓冲区上执行bytes正则匹配
+输入: 日志文件路径
+输出: JSON行（默认）或列式批次格式的结构化日志数据（与1_web_log_parser.py一致）
+
+只有通过预过滤的日志行才会被匹配，且只解码捕获组，
+未命中的行不会被解码为文本，也不会产生额外的内存分配
+"""
+import os
+import sys
+import mmap
+import re
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import record_codec
+import stage_stats
+from log_format import LOG_FORMAT_PRESETS, LogFormat
+
+# 通用日志格式 + 可选的组合日志格式尾部字段
+# 行首的空白与parse_lines中的strip()行为保持一致
+LOG_PATTERN = re.compile(
+    rb'\s*(\S+) (\S+) (\S+) \[([^\]]+)\] "([^"]*)" (\d+) (\d+|-)(?: "([^"]*)"(?: "([^"]*)")?)?'
+)
+
+LOG_FIELDS = ('remote_host', 'remote_logname', 'remote_user', 'timestamp',
+              'request_line', 'status_code', 'response_size')
+
+def _decode(value):
+    """解码单个捕获组"""
+    return value.decode('utf-8', errors='replace')
+
+def match_log_line(buf, start, end, log_format=None, pattern=None):
+    """
+    在缓冲区的[start, end)范围内匹配一行日志
+    直接对缓冲区匹配，不复制整行数据
+    log_format/pattern: 自定义日志格式及其bytes正则
+    """
+    if log_format is not None:
+        match = pattern.match(buf, start, end)
+        if not match:
+            return None
+        return log_format.build_record([_decode(value) for value in match.groups()])
+
+    match = LOG_PATTERN.match(buf, start, end)
+    if not match:
+        return None
+
+    log_data = {field: _decode(match.group(i + 1)) for i, field in enumerate(LOG_FIELDS)}
+    referer, user_agent = match.group(8, 9)
+    if referer is not None:
+        log_data['referer'] = _decode(referer)
+    if user_agent is not None:
+        log_data['user_agent'] = _decode(user_agent)
+    return log_data
+
+def iter_line_spans(buf, start, end):
+    """逐行产出[start, end)范围内每一行的字节范围"""
+    pos = start
+    while pos < end:
+        line_end = buf.find(b'\n', pos, end)
+        if line_end == -1:
+            line_end = end
+        yield pos, line_end
+        pos = line_end + 1
+
+def iter_candidate_spans(buf, start, end, literals):
+    """
+    产出包含任意一个字面量的行的字节范围
+    使用缓冲区的find在C层面跳过不相关的数据
+    """
+    # 记录每个字面量下一次出现的位置，避免重复扫描
+    next_hits = {literal: buf.find(literal, start, end) for literal in literals}
+    pos = start
+    while pos < end:
+        hits = [hit for hit in next_hits.values() if hit != -1]
+        if not hits:
+            return
+        hit = min(hits)
+
+        line_start = buf.rfind(b'\n', pos, hit)
+        line_start = line_start + 1 if line_start != -1 else pos
+        line_end = buf.find(b'\n', hit, end)
+        if line_end == -1:
+            line_end = end
+        yield line_start, line_end
+
+        pos = line_end + 1
+        for literal, literal_hit in next_hits.items():
+            if literal_hit != -1 and literal_hit < pos:
+                next_hits[literal] = buf.find(literal, pos, end)
+
+def read_log_records(path, literals=None, start=0, end=None, log_format=None):
+    """
+    内存映射日志文件并产出结构化日志字典
+    literals: 预过滤字面量（bytes），只解析包含其中任意一个的行
+    start/end: 处理的字节范围，需对齐到行首
+    log_format: 自定义日志格式（LogFormat），为None时自动识别通用/组合日志格式
+    """
+    if os.path.getsize(path) == 0:
+        return
+    pattern = log_format.bytes_pattern() if log_format is not None else None
+
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if end is None:
+                end = len(buf)
+            if literals:
+                spans = iter_candidate_spans(buf, start, end, literals)
+            else:
+                spans = iter_line_spans(buf, start, end)
+
+            for line_start, line_end in spans:
+                log_data = match_log_line(buf, line_start, line_end, log_format, pattern)
+                if log_data:
+                    yield log_data
+
+def main():
+    parser = argparse.ArgumentParser(description='内存映射日志读取器', add_help=False)
+    parser.add_argument('-f', '--file', required=True, help='日志文件路径')
+    parser.add_argument('-k', '--key', action='append', default=[],
+                        help='预过滤关键词，只解析包含该关键词的行（可重复指定）')
+    parser.add_argument('--log-format',
+                        help=f"Apache LogFormat或nginx log_format格式字符串，或预设名称 ({', '.join(LOG_FORMAT_PRESETS)})")
+    record_codec.add_format_argument(parser)
+    stage_stats.add_stats_arguments(parser)
+    parser.add_argument('-h', '--help', action='help', help='显示帮助信息')
+
+    args = parser.parse_args()
+    literals = [key.encode('utf-8') for key in args.key]
+
+    try:
+        log_format = LogFormat(args.log_format) if args.log_format else None
+    except ValueError as e:
+        print(f"Error compiling log format: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    # 输入记录为通过关键词预过滤并成功解析的行
+    stats = stage_stats.from_args(args, 'parse')
+    try:
+        with stage_stats.profiled(args.profile), record_codec.RecordWriter(args.format) as writer:
+            writer.write_all(stats.count_in(read_log_records(args.file, literals, log_format=log_format)))
+    except OSError as e:
+        print(f"Error reading log file: {e}", file=sys.stderr)
+        sys.exit(1)
+    stats.finish(writer.count)
+    stage_stats.report(args, [stats])
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,18 @@
 """
 file: base64_decoder.py
 Payload解码器 - 处理URL和Base64编码
-输入: JSON行格式的请求数据
-输出: JSON行格式的请求数据（含解码后的payload）
+输入: JSON行或列式批次格式的请求数据（自动识别）
+输出: JSON行（默认）或列式批次格式的请求数据（含解码后的payload）
 """
+import os
 import sys
-import json
+import argparse
 import base64
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import record_codec
+import stage_stats
+
 
 def decode(encoded_str):
     """执行Base64解码并尝试转为UTF-8字符串"""
@@ -17,15 +22,36 @@ def decode(encoded_str):
     except Exception:
         return None
 
+def decode_request(req):
+    """对单条请求数据的payload执行Base64解码"""
+    req['payload'] = decode(req['payload'])
+    return req
+
+def decode_records(records):
+    """对请求数据流逐条执行Base64解码"""
+    for req in records:
+        yield decode_request(req)
+
+def report_error(e):
+    print(f"Error processing line: {e}", file=sys.stderr)
+
 def main():
-    for line in sys.stdin:
-        try:
-            req = json.loads(line.strip())
-            req['payload'] = decode(req['payload'])
-            print(json.dumps(req))
-
-        except Exception as e:
-            print(f"Error processing line: {e}", file=sys.stderr)
+    parser = argparse.ArgumentParser(description='Base64解码器')
+    record_codec.add_format_argument(parser)
+    stage_stats.add_stats_arguments(parser)
+    args = parser.parse_args()
+
+    stats = stage_stats.from_args(args, 'base64')
+    on_error = stats.count_errors(report_error)
+    with stage_stats.profiled(args.profile), record_codec.RecordWriter(args.format) as writer:
+        for req in stats.count_in(record_codec.read_records(on_error=on_error)):
+            try:
+                writer.write(decode_request(req))
+
+            except Exception as e:
+                on_error(e)
+    stats.finish(writer.count)
+    stage_stats.report(args, [stats])
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+file: chain_decoder.py
+Payload解码器 - 在一个进程内按解码链批量解码，替代串联多个解码器进程
+输入: JSON行或列式批次格式的请求数据（自动识别）
+输出: JSON行（默认）或列式批次格式的请求数据（含解码后的payload）
+
+解码链由逗号分隔的步骤组成，例如 url,base64 或 url,base64,hex,double-url。
+每个步骤先用廉价的检查判断payload是否为该编码，不是则原样传给下一步，
+不依赖捕获异常判断编码。相同payload的解码结果会被缓存。
+"""
+import os
+import re
+import sys
+import argparse
+import binascii
+import functools
+import urllib.parse
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import record_codec
+import stage_stats
+
+# 默认解码链，与 url_decoder.py | base64_decoder.py 的管道一致
+DEFAULT_CHAIN = ['url', 'base64']
+
+# 解码缓存的默认容量（不同payload的数量）
+DEFAULT_CACHE_SIZE = 65536
+
+# 命令行模式下每批解码的记录数
+DEFAULT_BATCH_SIZE = 1024
+
+# 标准Base64字母表（不含填充字符），用bytes.translate删除后应为空
+BASE64_ALPHABET = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+
+# 十六进制字符
+HEX_DIGITS = b'0123456789abcdefABCDEF'
+
+# 可打印ASCII字符及制表符和换行，用bytes.translate删除后应为空
+TEXT_ASCII = bytes(range(0x20, 0x7f)) + b'\t\r\n'
+
+# 除制表符和换行外的控制字符，解码结果中出现时说明原文并非该编码
+CONTROL_PATTERN = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]')
+
+# UTF-8编码的替换字符
+REPLACEMENT_BYTES = '\ufffd'.encode('utf-8')
+
+def bytes_to_text(raw):
+    """
+    将解码得到的字节串转为文本
+    不是有效UTF-8或包含控制字符（通常说明原文并非该编码）时返回None
+    """
+    if raw.isascii():
+        if raw.translate(None, TEXT_ASCII):
+            return None
+        return raw.decode('ascii')
+
+    text = raw.decode('utf-8', 'replace')
+    if '\ufffd' in text and REPLACEMENT_BYTES not in raw:
+        return None
+    if CONTROL_PATTERN.search(text):
+        return None
+    return text
+
+def decode_url(text):
+    """URL解码一次，不含%编码时返回None"""
+    if '%' not in text:
+        return None
+    decoded = urllib.parse.unquote(text)
+    return decoded if decoded != text else None
+
+def decode_double_url(text):
+    """连续URL解码两次，处理双重URL编码的payload"""
+    decoded = decode_url(text)
+    if decoded is None:
+        return None
+    return decode_url(decoded) or decoded
+
+def decode_base64(text):
+    """Base64解码，不符合Base64字母表和长度要求或结果不是文本时返回None"""
+    if not text or len(text) % 4 or not text.isascii():
+        return None
+    raw = text.encode('ascii')
+    data = raw.rstrip(b'=')
+    if len(raw) - len(data) > 2 or data.translate(None, BASE64_ALPHABET):
+        return None
+    return bytes_to_text(binascii.a2b_base64(raw))
+
+def decode_hex(text):
+    """十六进制解码，不是偶数个十六进制字符（允许0x前缀）或结果不是文本时返回None"""
+    if text[:2] in ('0x', '0X'):
+        text = text[2:]
+    if not text or len(text) % 2 or not text.isascii():
+        return None
+    raw = text.encode('ascii')
+    if raw.translate(None, HEX_DIGITS):
+        return None
+    return bytes_to_text(binascii.unhexlify(raw))
+
+# 解码步骤名称 -> 解码函数，函数在输入不是该编码时返回None
+DECODE_STEPS = {
+    'url': decode_url,
+    'double-url': decode_double_url,
+    'base64': decode_base64,
+    'hex': decode_hex,
+}
+
+def parse_chain(chain):
+    """解析逗号分隔的解码链"""
+    steps = [name.strip() for name in chain.split(',') if name.strip()]
+    unknown = [name for name in steps if name not in DECODE_STEPS]
+    if unknown:
+        raise ValueError(f"未知的解码步骤: {', '.join(unknown)}")
+    if not steps:
+        raise ValueError("解码链不能为空")
+    return steps
+
+class DecodeChain:
+    """按顺序执行解码步骤，并以LRU缓存相同payload的解码结果"""
+    def __init__(self, steps=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.steps = list(steps or DEFAULT_CHAIN)
+        self.functions = [DECODE_STEPS[name] for name in self.steps]
+        self.cache_size = cache_size
+        if cache_size > 0:
+            self.decode = functools.lru_cache(maxsize=cache_size)(self.decode_uncached)
+        else:
+            self.decode = self.decode_uncached
+        # take_counts() 上次调用时的缓存计数
+        self._taken = (0, 0)
+
+    def decode_uncached(self, payload):
+        """依次执行各解码步骤，不是对应编码的步骤跳过"""
+        if not isinstance(payload, str):
+            return payload
+        for function in self.functions:
+            decoded = function(payload)
+            if decoded is not None:
+                payload = decoded
+        return payload
+
+    def decode_batch(self, payloads):
+        """解码一批payload，返回结果列表"""
+        return list(map(self.decode, payloads))
+
+    def decode_records(self, records, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        按批解码请求数据流中的payload
+        batch_size为1时逐条处理，不会为凑满批次而延迟记录（跟踪模式）
+        """
+        records = iter(records)
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                return
+            for req, payload in zip(batch, self.decode_batch([req['payload'] for req in batch])):
+                req['payload'] = payload
+            yield from batch
+
+    def cache_counts(self):
+        """返回缓存的 (命中次数, 未命中次数)，未启用缓存时返回None"""
+        if self.cache_size <= 0:
+            return None
+        info = self.decode.cache_info()
+        return info.hits, info.misses
+
+    def take_counts(self):
+        """返回自上次调用以来的 (命中次数, 未命中次数)，用于并行模式汇总"""
+        counts = self.cache_counts()
+        if counts is None:
+            return None
+        taken = (counts[0] - self._taken[0], counts[1] - self._taken[1])
+        self._taken = counts
+        return taken
+
+    def summary(self, counts=None):
+        """缓存命中统计的单行摘要"""
+        hits, misses = counts if counts is not None else self.cache_counts()
+        total = hits + misses
+        hit_rate = hits / total * 100 if total else 0.0
+        return (f"[+] 解码缓存: 命中 {hits} 次, 未命中 {misses} 次, "
+                f"命中率 {hit_rate:.1f}% (容量 {self.cache_size}, 解码链 {','.join(self.steps)})")
+
+def report_error(e):
+    print(f"Error processing line: {e}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description='批量解码链')
+    parser.add_argument('-c', '--chain', default=','.join(DEFAULT_CHAIN),
+                        help=f"逗号分隔的解码步骤，可选 {', '.join(DECODE_STEPS)} (默认: {','.join(DEFAULT_CHAIN)})")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f'解码缓存容量，0表示禁用 (默认: {DEFAULT_CACHE_SIZE})')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'每批解码的记录数，实时处理时可设为1 (默认: {DEFAULT_BATCH_SIZE})')
+    record_codec.add_format_argument(parser)
+    stage_stats.add_stats_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        chain = DecodeChain(parse_chain(args.chain), args.cache_size)
+    except ValueError as e:
+        print(f"Error building decode chain: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    stats = stage_stats.from_args(args, 'decode')
+    on_error = stats.count_errors(report_error)
+
+    def valid_records():
+        for req in stats.count_in(record_codec.read_records(on_error=on_error)):
+            if 'payload' in req:
+                yield req
+            else:
+                on_error(KeyError('payload'))
+
+    with stage_stats.profiled(args.profile), record_codec.RecordWriter(args.format) as writer:
+        writer.write_all(chain.decode_records(valid_records(), max(args.batch_size, 1)))
+    stats.finish(writer.count)
+
+    if chain.cache_size > 0:
+        print(chain.summary(), file=sys.stderr)
+    stage_stats.report(args, [stats])
+
+if __name__ == '__main__':
+    main()
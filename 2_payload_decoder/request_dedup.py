@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+file: request_dedup.py
+请求去重器 - 在解码之后、分析之前丢弃重复的请求
+输入: JSON行或列式批次格式的请求数据（自动识别，payload已解码）
+输出: JSON行（默认）或列式批次格式的去重后请求数据，统计信息输出到标准错误流
+
+sqlmap超时重试、负载均衡器重复记录日志都会产生重复请求，重复的 (payload, judge) 会使
+每个字符的比较列表和各阶段之间传递的数据成倍增加。
+以 来源地址 + payload 和响应特征（默认为状态码、响应大小和请求耗时）的哈希为键：
+  - 来源地址、payload和响应特征都相同：重复请求，直接丢弃
+  - 来源地址和payload相同但响应特征不同（如超时重试后得到了不同的响应）：冲突请求，
+    保留并在请求数据中标记 "duplicate_conflict": true，不会被合并掉
+内存占用有上限，两种模式：
+  - window（默认）: 只在时间窗口内去重，记录每个请求键的首次出现时间和响应特征，
+    超出窗口或条目数上限时淘汰最早的条目；结果精确
+  - bloom: 布隆过滤器，按容量和误判率计算位数组大小，写满容量后换新的过滤器并保留上一代；
+    内存固定，但会以约为误判率的概率把不重复的请求误判为重复（丢弃）或冲突
+"""
+import os
+import sys
+import math
+import hashlib
+import argparse
+from datetime import datetime
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import record_codec
+import stage_stats
+
+WINDOW = 'window'
+BLOOM = 'bloom'
+MODES = (WINDOW, BLOOM)
+
+# 时间窗口（秒），sqlmap的重试和负载均衡器的重复记录都在几秒之内
+DEFAULT_WINDOW = 60.0
+
+# 时间窗口模式最多保存的请求键数
+DEFAULT_MAX_ENTRIES = 1000000
+
+# 布隆过滤器每一代的容量和误判率
+DEFAULT_CAPACITY = 1000000
+DEFAULT_ERROR_RATE = 0.001
+
+# 默认的响应特征字段，包含两种判断函数读取的字段（response_size、request_time），
+# 判断结果可能不同的超时重试不会被当作重复请求丢弃；日志中没有耗时字段时该项恒为None
+DEFAULT_SIGNATURE = ('status_code', 'response_size', 'request_time')
+
+# 日志时间戳格式
+TIMESTAMP_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+# 请求状态
+NEW = 'new'
+DUPLICATE = 'duplicate'
+CONFLICT = 'conflict'
+
+def digest(data):
+    """128位哈希值"""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+class WindowedSeen:
+    """
+    时间窗口内的请求键集合：请求键 -> [首次出现时间, 出现过的响应特征]
+    条目按首次出现的顺序排列，淘汰时从最早的条目开始
+    """
+    def __init__(self, window=DEFAULT_WINDOW, max_entries=DEFAULT_MAX_ENTRIES):
+        self.window = window
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.evicted = 0
+
+    def _evict(self, epoch):
+        entries = self.entries
+        while entries:
+            first = next(iter(entries.values()))
+            expired = epoch is not None and first[0] is not None and first[0] < epoch - self.window
+            if not expired and len(entries) < self.max_entries:
+                break
+            entries.popitem(last=False)
+            self.evicted += 1
+
+    def check(self, request_key, signature_key, epoch):
+        """返回请求状态并记录本次出现"""
+        self._evict(epoch)
+        entry = self.entries.get(request_key)
+        if entry is None:
+            self.entries[request_key] = [epoch, {signature_key}]
+            return NEW
+        if signature_key in entry[1]:
+            return DUPLICATE
+        entry[1].add(signature_key)
+        return CONFLICT
+
+class BloomFilter:
+    """
+    按容量和误判率确定大小的布隆过滤器，使用128位哈希值的两半做双重哈希
+    写满容量后换新的一代并保留上一代，查询时两代都检查
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("布隆过滤器的容量必须大于0，误判率必须在0到1之间")
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.current = bytearray((self.size + 7) // 8)
+        self.previous = None
+        self.count = 0
+
+    def _positions(self, key):
+        value = int.from_bytes(key, 'little')
+        h1 = value & 0xFFFFFFFFFFFFFFFF
+        h2 = (value >> 64) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    @staticmethod
+    def _contains(bits, positions):
+        for position in positions:
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, key):
+        """加入键，返回加入前是否（可能）已存在"""
+        positions = self._positions(key)
+        if self._contains(self.current, positions):
+            return True
+        present = self.previous is not None and self._contains(self.previous, positions)
+        if self.count >= self.capacity:
+            self.previous = self.current
+            self.current = bytearray(len(self.current))
+            self.count = 0
+        bits = self.current
+        for position in positions:
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+        return present
+
+    @property
+    def memory(self):
+        """两代位数组占用的字节数"""
+        return len(self.current) * (1 if self.previous is None else 2)
+
+class BloomSeen:
+    """用两个布隆过滤器分别记录 请求键+响应特征 和 请求键"""
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.exact = BloomFilter(capacity, error_rate)
+        self.requests = BloomFilter(capacity, error_rate)
+
+    def check(self, request_key, signature_key, epoch):
+        if self.exact.add(digest(request_key + b'\x00' + signature_key)):
+            return DUPLICATE
+        if self.requests.add(digest(request_key)):
+            return CONFLICT
+        return NEW
+
+class RequestDeduplicator:
+    def __init__(self, mode=WINDOW, window=DEFAULT_WINDOW, max_entries=DEFAULT_MAX_ENTRIES,
+                 capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE, signature=DEFAULT_SIGNATURE):
+        if mode == BLOOM:
+            self.seen = BloomSeen(capacity, error_rate)
+        else:
+            self.seen = WindowedSeen(window, max_entries)
+        self.mode = mode
+        self.signature = tuple(signature)
+        self.kept = 0
+        self.dropped = 0
+        self.conflicts = 0
+        # 日志按时间排序，相邻请求的时间戳往往相同
+        self._last_timestamp = None
+        self._last_epoch = None
+
+    def epoch(self, timestamp):
+        """时间戳转换为Unix时间，无法解析时返回None"""
+        if timestamp != self._last_timestamp:
+            self._last_timestamp = timestamp
+            try:
+                self._last_epoch = datetime.strptime(timestamp, TIMESTAMP_FORMAT).timestamp()
+            except (TypeError, ValueError):
+                self._last_epoch = None
+        return self._last_epoch
+
+    def check(self, req):
+        """返回请求状态（NEW/DUPLICATE/CONFLICT）"""
+        request_key = f"{req.get('remote_host', '')}\x00{req['payload']}".encode('utf-8', 'surrogatepass')
+        signature_key = '\x00'.join(str(req.get(field)) for field in self.signature).encode('utf-8')
+        epoch = self.epoch(req.get('timestamp')) if self.mode == WINDOW else None
+        return self.seen.check(request_key, signature_key, epoch)
+
+    def dedup_records(self, records):
+        """丢弃重复请求，冲突请求标记后保留，没有payload的记录原样产出"""
+        for req in records:
+            if 'payload' not in req:
+                yield req
+                continue
+            state = self.check(req)
+            if state == DUPLICATE:
+                self.dropped += 1
+                continue
+            if state == CONFLICT:
+                self.conflicts += 1
+                req['duplicate_conflict'] = True
+            self.kept += 1
+            yield req
+
+    def take_counts(self):
+        """返回 (保留数, 丢弃数, 冲突数, 淘汰数) 并清零，用于并行模式汇总"""
+        evicted = getattr(self.seen, 'evicted', 0)
+        counts = (self.kept, self.dropped, self.conflicts, evicted)
+        self.kept = self.dropped = self.conflicts = 0
+        if self.mode == WINDOW:
+            self.seen.evicted = 0
+        return counts
+
+    def add_counts(self, counts):
+        """累加工作进程回传的计数"""
+        kept, dropped, conflicts, evicted = counts
+        self.kept += kept
+        self.dropped += dropped
+        self.conflicts += conflicts
+        if self.mode == WINDOW:
+            self.seen.evicted += evicted
+
+    def summary(self):
+        """去重统计信息"""
+        text = (f"[+] 请求去重: 保留 {self.kept} 条, 丢弃重复 {self.dropped} 条, "
+                f"标记冲突 {self.conflicts} 条")
+        if self.mode == BLOOM:
+            exact = self.seen.exact
+            text += (f" (布隆过滤器 {exact.size} 位 x {exact.hashes} 个哈希, "
+                     f"{(exact.memory + self.seen.requests.memory) / 1024 / 1024:.1f}MB)")
+        else:
+            text += f" (时间窗口 {self.seen.window:g}s, 淘汰 {self.seen.evicted} 条)"
+        return text
+
+def parse_signature(text):
+    """逗号分隔的响应特征字段"""
+    fields = [field.strip() for field in text.split(',') if field.strip()]
+    if not fields:
+        raise ValueError("响应特征字段不能为空")
+    return fields
+
+def main():
+    parser = argparse.ArgumentParser(description='请求去重器')
+    parser.add_argument('-m', '--mode', choices=MODES, default=WINDOW,
+                        help='去重结构：window为时间窗口内的哈希集合（精确），bloom为布隆过滤器（内存固定） (默认: window)')
+    parser.add_argument('-w', '--window', type=float, default=DEFAULT_WINDOW,
+                        help=f'window模式的时间窗口，单位秒 (默认: {DEFAULT_WINDOW:g})')
+    parser.add_argument('--max-entries', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f'window模式最多保存的请求数 (默认: {DEFAULT_MAX_ENTRIES})')
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY,
+                        help=f'bloom模式每一代过滤器的容量 (默认: {DEFAULT_CAPACITY})')
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_ERROR_RATE,
+                        help=f'bloom模式的误判率 (默认: {DEFAULT_ERROR_RATE})')
+    parser.add_argument('--signature', default=','.join(DEFAULT_SIGNATURE),
+                        help=f"逗号分隔的响应特征字段 (默认: {','.join(DEFAULT_SIGNATURE)})")
+    record_codec.add_format_argument(parser)
+    stage_stats.add_stats_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        deduplicator = RequestDeduplicator(args.mode, args.window, args.max_entries, args.capacity,
+                                           args.error_rate, parse_signature(args.signature))
+    except ValueError as e:
+        print(f"Error creating deduplicator: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    stats = stage_stats.from_args(args, 'dedup')
+
+    @stats.count_errors
+    def report_error(e):
+        print(f"Error processing line: {e}", file=sys.stderr)
+
+    with stage_stats.profiled(args.profile), record_codec.RecordWriter(args.format) as writer:
+        records = stats.count_in(record_codec.read_records(on_error=report_error))
+        writer.write_all(deduplicator.dedup_records(records))
+    stats.finish(writer.count)
+
+    print(deduplicator.summary(), file=sys.stderr)
+    stage_stats.report(args, [stats])
+
+if __name__ == '__main__':
+    main()
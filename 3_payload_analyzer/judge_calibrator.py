@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+file: judge_calibrator.py
+判断函数校准器 - 根据盲注请求的响应大小/请求耗时分布自动选择judge_function并写回配置文件
+输入: JSON行或列式批次格式的请求数据（解码后、分析前，自动识别）
+输出: 更新了judge_function的配置文件，校准结果输出到标准错误流
+
+只统计包含trigger_pattern的盲注请求，一次流式读取，内存占用有上限：
+  - 每种判断依据（response_size、request_time）维护一个直方图，箱数超过上限时箱宽加倍合并
+  - sqlmap对同一字符位置按二分查找依次发送 '>' 比较，下一次的比较值大于本次说明本次比较为真，
+    由此无需判断函数即可推出本次请求的judge（比较为假时为True）；'!=' 确认请求的judge视为True。
+    只需保存每个字符位置最近一次请求（LRU，数量有上限），推出的judge按请求的响应大小/耗时计入直方图
+  - 在直方图的各箱之间选择与推出的judge一致数最多的分界和方向；
+    推不出judge时（缺少二分查找序列）退化为按类间方差最大的两簇划分
+"""
+import os
+import sys
+import json
+import argparse
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import record_codec
+import stage_stats
+from sqlmap_analyzer import BlindAnalysisConfig, SQLMapBlindAnalyzer, JUDGE_METRICS
+
+# 各判断依据的初始箱宽：响应大小按字节精确统计，请求耗时按毫秒统计
+INITIAL_BIN_WIDTHS = {
+    'response_size': 1,
+    'request_time': 0.001
+}
+
+# 直方图的默认最大箱数
+DEFAULT_MAX_BINS = 4096
+
+# 同时跟踪的字符位置的默认上限
+DEFAULT_MAX_KEYS = 65536
+
+# 写入配置前要求的最低一致率
+DEFAULT_MIN_ACCURACY = 0.9
+
+# 推出的judge少于该数量时不按一致率选择分界
+MIN_LABELS = 10
+
+# 区分一个字符位置的分析字段，probe区分同一记录的LENGTH枚举查询和数据字符
+POSITION_KEY_FIELDS = ('database', 'table', 'column', 'record_id', 'position', 'probe')
+
+class MetricHistogram:
+    """
+    有界直方图，每箱记录 [最小值, 最大值, 请求数, judge为True的数量, judge为False的数量]
+    箱数超过max_bins时箱宽加倍，相邻两箱合并
+    """
+    def __init__(self, metric: str, max_bins: int = DEFAULT_MAX_BINS):
+        self.metric = metric
+        self.base_width = INITIAL_BIN_WIDTHS[metric]
+        # 箱宽为 base_width * 2**shift，箱号由初始箱号右移得到，合并前后保持一致
+        self.shift = 0
+        self.max_bins = max_bins
+        self.bins = {}
+
+    def _bin(self, value: float) -> list:
+        key = int(value // self.base_width) >> self.shift
+        entry = self.bins.get(key)
+        if entry is None:
+            entry = self.bins[key] = [value, value, 0, 0, 0]
+            if len(self.bins) > self.max_bins:
+                self._coarsen()
+                entry = self.bins[key >> 1]
+        return entry
+
+    def _coarsen(self) -> None:
+        self.shift += 1
+        merged = {}
+        for key, (low, high, count, true_count, false_count) in self.bins.items():
+            entry = merged.get(key // 2)
+            if entry is None:
+                merged[key // 2] = [low, high, count, true_count, false_count]
+            else:
+                entry[0] = min(entry[0], low)
+                entry[1] = max(entry[1], high)
+                entry[2] += count
+                entry[3] += true_count
+                entry[4] += false_count
+        self.bins = merged
+
+    def add(self, value: float) -> None:
+        entry = self._bin(value)
+        if value < entry[0]:
+            entry[0] = value
+        elif value > entry[1]:
+            entry[1] = value
+        entry[2] += 1
+
+    def add_label(self, value: float, judge: bool) -> None:
+        """记录一次推出的judge（请求本身已由add计入）"""
+        self._bin(value)[3 if judge else 4] += 1
+
+    def total(self) -> int:
+        return sum(entry[2] for entry in self.bins.values())
+
+    def labels(self) -> int:
+        return sum(entry[3] + entry[4] for entry in self.bins.values())
+
+    def best_split(self) -> Optional[Dict[str, Any]]:
+        """
+        选择分界和方向，返回 {'index', 'lower_true', 'agree', 'labels', 'low', 'high'}
+        index为上侧第一个箱的下标，low/high为分界两侧相邻的取值；只有一个箱时返回None
+        """
+        entries = [self.bins[key] for key in sorted(self.bins)]
+        if len(entries) < 2:
+            return None
+
+        labels = sum(entry[3] + entry[4] for entry in entries)
+        best = None
+        if labels >= MIN_LABELS:
+            # 下侧为True时的一致数 = 下侧的True + 上侧的False
+            lower_true = 0
+            lower_false = 0
+            upper_false = sum(entry[4] for entry in entries)
+            upper_true = labels - upper_false
+            for index in range(1, len(entries)):
+                lower_true += entries[index - 1][3]
+                lower_false += entries[index - 1][4]
+                upper_true -= entries[index - 1][3]
+                upper_false -= entries[index - 1][4]
+                gap = entries[index][0] - entries[index - 1][1]
+                for agree, is_lower_true in ((lower_true + upper_false, True),
+                                             (lower_false + upper_true, False)):
+                    if best is None or (agree, gap) > (best[0], best[1]):
+                        best = (agree, gap, index, is_lower_true)
+            agree, _, index, is_lower_true = best
+        else:
+            index = self._otsu_split(entries)
+            agree = 0
+            is_lower_true = None
+
+        return {
+            'index': index,
+            'lower_true': is_lower_true,
+            'agree': agree,
+            'labels': labels,
+            'low': entries[index - 1][1],
+            'high': entries[index][0],
+            'lower_count': sum(entry[2] for entry in entries[:index]),
+            'upper_count': sum(entry[2] for entry in entries[index:])
+        }
+
+    @staticmethod
+    def _otsu_split(entries) -> int:
+        """类间方差最大的两簇划分，返回上侧第一个箱的下标"""
+        centers = [(entry[0] + entry[1]) / 2 for entry in entries]
+        counts = [entry[2] for entry in entries]
+        total = sum(counts)
+        total_sum = sum(center * count for center, count in zip(centers, counts))
+        best_index, best_variance = 1, -1.0
+        lower_count = 0
+        lower_sum = 0.0
+        for index in range(1, len(entries)):
+            lower_count += counts[index - 1]
+            lower_sum += centers[index - 1] * counts[index - 1]
+            upper_count = total - lower_count
+            if not lower_count or not upper_count:
+                continue
+            diff = lower_sum / lower_count - (total_sum - lower_sum) / upper_count
+            variance = lower_count * upper_count * diff * diff
+            if variance > best_variance:
+                best_index, best_variance = index, variance
+        return best_index
+
+class JudgeCalibrator:
+    """一次流式读取盲注请求，为每种判断依据选择judge_function"""
+    def __init__(self, config_data: Dict[str, Any], max_bins: int = DEFAULT_MAX_BINS,
+                 max_keys: int = DEFAULT_MAX_KEYS):
+        # 只借用分析器的字段提取，判断函数不参与校准
+        config = BlindAnalysisConfig(
+            injection_type=config_data.get('injection_type', 'boolean'),
+            trigger_pattern=config_data.get('trigger_pattern', ''),
+            judge_function=lambda value: False,
+            patterns=config_data.get('patterns', {}),
+            engine=config_data.get('engine', 'patterns'),
+            fused_order=config_data.get('fused_order'),
+            cache_size=config_data.get('cache_size', 0)
+        )
+        self.analyzer = SQLMapBlindAnalyzer(config)
+        self.slow_judge = config_data.get('judge_function', {}).get('slow_judge', False)
+        self.histograms = {metric: MetricHistogram(metric, max_bins) for metric in INITIAL_BIN_WIDTHS}
+        self.max_keys = max_keys
+        # 字符位置 -> (比较运算符, 比较值, {判断依据: 取值})
+        self.last_requests = OrderedDict()
+        self.requests = 0
+        self.injections = 0
+
+    def add(self, req: Dict[str, Any]) -> None:
+        """统计一条请求，不是盲注请求时忽略"""
+        self.requests += 1
+        analysis = self.analyzer.analyze_payload(req.get('payload'), None)
+        if analysis['type'] == 'unknown' or not analysis['position']:
+            return
+        self.injections += 1
+
+        values = {}
+        for metric, histogram in self.histograms.items():
+            value = req.get(metric)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                histogram.add(value)
+                values[metric] = value
+
+        operator = analysis['comparison_operator']
+        ascii_value = analysis['ascii_value']
+        key = tuple(analysis.get(field) for field in POSITION_KEY_FIELDS)
+        previous = self.last_requests.pop(key, None)
+        if previous is not None and previous[0] == '>':
+            # 二分查找的下一次比较值更大，说明上一次比较为真（judge为False）
+            self._label(previous[2], ascii_value <= previous[1])
+        if operator == '!=':
+            self._label(values, True)
+
+        self.last_requests[key] = (operator, ascii_value, values)
+        if len(self.last_requests) > self.max_keys:
+            self.last_requests.popitem(last=False)
+
+    def _label(self, values: Dict[str, float], judge: bool) -> None:
+        for metric, value in values.items():
+            self.histograms[metric].add_label(value, judge)
+
+    def feed(self, records: Iterable[Dict[str, Any]]) -> None:
+        for req in records:
+            if 'payload' in req:
+                self.add(req)
+
+    def judge_for(self, metric: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """返回 (judge_function配置, 分界信息)，该判断依据没有可划分的数据时返回None"""
+        histogram = self.histograms[metric]
+        split = histogram.best_split()
+        if split is None:
+            return None
+
+        prefix = metric_prefix(metric)
+        lower_true = split['lower_true']
+        if lower_true is None:
+            # 没有推出的judge：时间盲注慢请求为slow_judge，响应大小取请求数较多的一侧为True
+            if metric == 'request_time':
+                lower_true = not self.slow_judge
+            else:
+                lower_true = split['lower_count'] >= split['upper_count']
+
+        low, high = split['low'], split['high']
+        entries = [histogram.bins[key] for key in sorted(histogram.bins)]
+        true_side = entries[:split['index']] if lower_true else entries[split['index']:]
+        if (metric == 'response_size' and histogram.shift == 0
+                and len(true_side) == 1 and true_side[0][0] == true_side[0][1]):
+            judge = {'type': 'size_equal', 'value': true_side[0][0]}
+        elif metric == 'response_size':
+            # size_less t: low < t <= high；size_greater t: low <= t < high
+            threshold = (low + high + 1) // 2 if lower_true else (low + high) // 2
+            judge = {'type': f"{prefix}_{'less' if lower_true else 'greater'}", 'value': int(threshold)}
+        else:
+            judge = {'type': f"{prefix}_{'less' if lower_true else 'greater'}",
+                     'value': round((low + high) / 2, 3)}
+        return judge, split
+
+    def calibrate(self, metric: str = 'auto') -> Optional[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+        """
+        选择判断依据和judge_function，返回 (判断依据, judge_function配置, 分界信息)
+        auto时在有数据的判断依据中选择一致率最高的一个（都推不出judge时选响应大小）
+        """
+        metrics = list(INITIAL_BIN_WIDTHS) if metric == 'auto' else [JUDGE_METRICS.get(metric, metric)]
+        best = None
+        for name in metrics:
+            result = self.judge_for(name)
+            if result is None:
+                continue
+            score = accuracy(result[1])
+            if best is None or (score or 0.0) > (accuracy(best[2]) or 0.0):
+                best = (name, result[0], result[1])
+        return best
+
+    def summary(self, metric: str, judge: Dict[str, Any], split: Dict[str, Any]) -> str:
+        """校准结果的单行摘要"""
+        score = accuracy(split)
+        agreement = (f"与二分查找推出的judge一致率 {score:.1%} ({split['agree']}/{split['labels']})"
+                     if score is not None else "未能推出judge，按两簇划分")
+        return (f"[+] 判断函数校准: {self.injections}/{self.requests} 条盲注请求, 依据 {metric}, "
+                f"分界 {split['low']:g} | {split['high']:g} ({split['lower_count']} | {split['upper_count']} 次), "
+                f"{agreement}, 结果 {json.dumps(judge, ensure_ascii=False)}")
+
+def metric_prefix(metric: str) -> str:
+    """判断依据对应的判断函数类型前缀"""
+    for prefix, name in JUDGE_METRICS.items():
+        if name == metric:
+            return prefix
+    raise ValueError(f"未知的判断依据: {metric}")
+
+def accuracy(split: Dict[str, Any]) -> Optional[float]:
+    """分界与推出的judge的一致率，没有推出的judge时返回None"""
+    if split['lower_true'] is None or not split['labels']:
+        return None
+    return split['agree'] / split['labels']
+
+def write_config(config_data: Dict[str, Any], judge: Dict[str, Any], path: str) -> None:
+    """将judge_function写入配置，保留其他字段"""
+    config_data = dict(config_data)
+    config_data['judge_function'] = judge
+    with open(path, 'w') as f:
+        json.dump(config_data, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+def apply_calibration(calibrator: JudgeCalibrator, config_data: Dict[str, Any], metric: str = 'auto',
+                      path: Optional[str] = None, min_accuracy: float = DEFAULT_MIN_ACCURACY,
+                      force: bool = False) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    完成校准并在标准错误流输出结果，path不为None时写入配置文件
+    一致率低于min_accuracy或未能推出judge时不写入（force时仍写入）
+    返回 (选择的judge_function配置, 是否已写入)，没有可划分的数据时judge_function配置为None
+    """
+    result = calibrator.calibrate(metric)
+    if result is None:
+        print("Error calibrating judge: 没有可用于划分的盲注请求（判断依据缺失或只有一种取值）", file=sys.stderr)
+        return None, False
+    metric, judge, split = result
+    print(calibrator.summary(metric, judge, split), file=sys.stderr)
+
+    if path is None:
+        return judge, False
+    score = accuracy(split)
+    if not force and (score is None or score < min_accuracy):
+        print(f"Error calibrating judge: 一致率不足 {min_accuracy:.0%}，未写入配置（可使用 --force 强制写入）",
+              file=sys.stderr)
+        return judge, False
+    write_config(config_data, judge, path)
+    print(f"[+] 已写入 {path}", file=sys.stderr)
+    return judge, True
+
+def main():
+    parser = argparse.ArgumentParser(description='判断函数校准器')
+    parser.add_argument('--config', required=True, help='分析器配置文件路径(JSON格式)，读取trigger_pattern和patterns')
+    parser.add_argument('-w', '--write', nargs='?', const='', metavar='PATH',
+                        help='将校准结果写入配置文件，不指定路径时覆盖 --config（默认只输出校准结果）')
+    parser.add_argument('-m', '--metric', choices=['auto', 'size', 'time'], default='auto',
+                        help='判断依据：响应大小、请求耗时或自动选择 (默认: auto)')
+    parser.add_argument('--min-accuracy', type=float, default=DEFAULT_MIN_ACCURACY,
+                        help=f'写入配置前要求的最低一致率 (默认: {DEFAULT_MIN_ACCURACY})')
+    parser.add_argument('--force', action='store_true', help='一致率不足或未能推出judge时仍写入配置')
+    parser.add_argument('--max-bins', type=int, default=DEFAULT_MAX_BINS,
+                        help=f'直方图最大箱数 (默认: {DEFAULT_MAX_BINS})')
+    parser.add_argument('--max-keys', type=int, default=DEFAULT_MAX_KEYS,
+                        help=f'同时跟踪的字符位置上限 (默认: {DEFAULT_MAX_KEYS})')
+    stage_stats.add_stats_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        with open(args.config, 'r') as f:
+            config_data = json.load(f)
+    except Exception as e:
+        print(f"Error loading config from {args.config}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    stats = stage_stats.from_args(args, 'calibrate', aggregate=True)
+    on_error = stats.count_errors(lambda e: print(f"Error processing line: {e}", file=sys.stderr))
+    calibrator = JudgeCalibrator(config_data, args.max_bins, args.max_keys)
+    path = (args.write or args.config) if args.write is not None else None
+    with stage_stats.profiled(args.profile):
+        calibrator.feed(stats.count_in(record_codec.read_records(on_error=on_error)))
+        judge, written = apply_calibration(calibrator, config_data, args.metric, path,
+                                           args.min_accuracy, args.force)
+    stats.finish(int(judge is not None))
+    stage_stats.report(args, [stats])
+    if judge is None:
+        sys.exit(1)
+    print(json.dumps({'judge_function': judge}, ensure_ascii=False))
+    if path is not None and not written:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
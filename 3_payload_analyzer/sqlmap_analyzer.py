@@ -3,14 +3,71 @@
 file: sqlmap_analyzer.py
 SQLMap盲注分析器 - 统一版本
 支持布尔盲注和时间盲注分析
-输入: JSON行格式的请求数据
-输出: JSON行格式的分析结果
+输入: JSON行或列式批次格式的请求数据（自动识别）
+输出: JSON行（默认）或列式批次格式的分析结果
 """
+import os
 import sys
 import json
 import re
+import glob
 import argparse
-from typing import Dict, Any, Callable, Optional
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Pattern, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import record_codec
+import stage_stats
+
+# 提取模式名称
+PATTERN_NAMES = ['from_pattern', 'cast_pattern', 'limit_pattern', 'position_pattern', 'comparison_pattern']
+
+# 各提取模式的捕获组对应的分析字段: 模式名 -> [(字段名, 捕获组序号)]
+PATTERN_FIELDS = {
+    'from_pattern': [('database', 1), ('table', 2)],
+    'cast_pattern': [('column', 1)],
+    'limit_pattern': [('limit_offset', 1)],
+    'position_pattern': [('position', 1)],
+    'comparison_pattern': [('comparison_operator', 1), ('ascii_value', 2)]
+}
+
+# 逐条请求变化的数值字段，模板缓存命中时只解析这些字段
+NUMERIC_FIELDS = {'limit_offset', 'position', 'ascii_value'}
+
+# 载荷骨架：所有数字替换为#，其余字符保持不变
+# 在UTF-8字节上转换（比str.translate快一个数量级），UTF-8中数字字节只会以ASCII数字出现，
+# 因此骨架相同等价于载荷除数字外完全一致
+SKELETON_TABLE = bytes.maketrans(b'0123456789', b'#' * 10)
+
+# 判断函数类型前缀 -> 判断函数读取的请求字段
+JUDGE_METRICS = {
+    'size': 'response_size',
+    'time': 'request_time'
+}
+
+# sqlmap在提取数据前发送的枚举查询，数字同样以 ORD(MID(...)) 逐字符提取：
+#   ORD(MID((SELECT IFNULL(CAST(COUNT(*) AS NCHAR),0x20) FROM 库.表),p,1))>v        表的行数
+#   ORD(MID((SELECT IFNULL(CAST(CHAR_LENGTH(列) AS NCHAR),0x20) FROM 库.表 ... LIMIT n,1),p,1))>v
+#                                                                                 记录的长度（--threads）
+# 捕获函数名和参数（列名或*），配置的patterns中可用probe_pattern替换，为空字符串时不识别
+DEFAULT_PROBE_PATTERN = r'\b(COUNT|CHAR_LENGTH|LENGTH)\(\s*(?:DISTINCT\(\s*|IFNULL\(\s*CAST\(\s*)?([\w*]+)'
+
+# 默认枚举查询模式必须包含的子串，载荷中都不出现时跳过正则搜索
+PROBE_LITERALS = ('COUNT(', 'LENGTH(')
+
+# 枚举查询函数 -> 分析结果的probe字段
+PROBE_FUNCTIONS = {
+    'COUNT': 'count',
+    'CHAR_LENGTH': 'length',
+    'LENGTH': 'length'
+}
+
+# 自动分簇判断函数的默认最小簇间距（秒），取sqlmap --time-sec最小值1秒的一半
+DEFAULT_MIN_GAP = 0.5
+
+# 融合引擎中各提取模式的默认出现顺序，对应sqlmap载荷的结构：
+# ORD(MID((SELECT IFNULL(CAST(列 AS NCHAR),0x20) FROM 库.表 ... LIMIT n,1),p,1))>v
+DEFAULT_FUSED_ORDER = ['cast_pattern', 'from_pattern', 'limit_pattern', 'position_pattern', 'comparison_pattern']
 
 # 配置类 - 存储分析器的配置
 class BlindAnalysisConfig:
@@ -18,11 +75,137 @@ class BlindAnalysisConfig:
                  injection_type: str,
                  trigger_pattern: str,
                  judge_function: Callable[[int], bool],
-                 patterns: Dict[str, str]):
+                 patterns: Dict[str, str],
+                 engine: str = 'patterns',
+                 fused_order: Optional[List[str]] = None,
+                 cache_size: int = 0,
+                 name: str = ''):
+        self.name = name
         self.injection_type = injection_type
-        self.trigger_pattern = trigger_pattern
+        # 载荷统一转为大写后匹配，trigger_pattern在此转换一次，单配置和多配置分析共用
+        self.trigger_pattern = trigger_pattern.upper()
         self.judge_function = judge_function
         self.patterns = patterns
+        self.engine = engine
+        self.fused_order = fused_order or DEFAULT_FUSED_ORDER
+        self.cache_size = cache_size
+
+def build_fused_pattern(patterns: Dict[str, str], order: List[str]) -> Tuple[Pattern, Dict[str, int]]:
+    """
+    按出现顺序将各提取模式拼接为一个正则，一次从左到右扫描提取全部字段
+    每个模式都是可选的前瞻分组，只推进到模式的起始位置，
+    相邻模式可以共用字符（如position_pattern结尾与comparison_pattern开头的"))"）
+    返回编译后的正则和 {模式名: 首个捕获组在groups()中的下标}
+    """
+    parts = []
+    group_offsets = {}
+    group_index = 0
+    for name in order:
+        pattern = patterns.get(name)
+        if not pattern:
+            continue
+        group_offsets[name] = group_index
+        parts.append(f'(?:(?s:.*?)(?={pattern}))?')
+        group_index += re.compile(pattern).groups
+    return re.compile(''.join(parts), re.IGNORECASE), group_offsets
+
+def new_analysis(judge: bool) -> Dict[str, Any]:
+    """未识别出注入时的分析结果"""
+    return {
+        'type': 'unknown',
+        'database': '',
+        'table': '',
+        'column': '',
+        'position': 0,
+        'ascii_value': 0,
+        'limit_offset': 0,
+        'judge': judge,
+        'comparison_operator': '>',
+        'record_id': 0
+    }
+
+def apply_probe(analysis: Dict[str, Any], probe: Tuple[str, str]) -> None:
+    """
+    将枚举查询写入分析结果：probe为count（表的行数）或length（记录的长度）
+    行数属于整张表，column为空；长度属于被测长度的列
+    """
+    kind, argument = probe
+    analysis['probe'] = kind
+    analysis['column'] = argument if kind == 'length' else ''
+
+class PayloadTemplate:
+    """
+    载荷模板：记录同一骨架的载荷中各字段捕获组的位置
+    骨架相同的载荷只有数字不同、长度一致，字段可以直接按位置切片取出
+    """
+    __slots__ = ('fields', 'numeric_spans', 'literal', 'has_limit', 'probe')
+
+    def __init__(self, payload_upper: str, spans: Dict[str, Tuple[int, int]],
+                 probe: Optional[Tuple[str, str]] = None):
+        self.fields = [(field, start, end, field in NUMERIC_FIELDS)
+                       for field, (start, end) in spans.items()]
+        self.numeric_spans = sorted(span for field, span in spans.items() if field in NUMERIC_FIELDS)
+        self.has_limit = 'limit_offset' in spans
+        # 枚举查询的类型和参数不含逐条变化的数字，同一模板的载荷相同
+        self.probe = probe
+        # 数值字段以外的原文，其中的数字（如 LIMIT n,1 中的1、表名中的数字）必须完全一致
+        self.literal = self.mask(payload_upper)
+
+    def mask(self, payload_upper: str) -> str:
+        """去掉数值字段后的载荷原文"""
+        pieces = []
+        pos = 0
+        for start, end in self.numeric_spans:
+            pieces.append(payload_upper[pos:start])
+            pos = end
+        pieces.append(payload_upper[pos:])
+        return ''.join(pieces)
+
+    def fill(self, analysis: Dict[str, Any], payload_upper: str) -> None:
+        """按模板位置将字段写入分析结果，只有数值字段需要解析"""
+        for field, start, end, numeric in self.fields:
+            value = payload_upper[start:end]
+            analysis[field] = int(value) if numeric else value
+        if self.has_limit:
+            analysis['record_id'] = analysis['limit_offset']
+        if self.probe is not None:
+            apply_probe(analysis, self.probe)
+
+class TemplateCache:
+    """按载荷骨架索引的LRU模板缓存"""
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.templates = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, skeleton: bytes, payload_upper: str) -> Optional[PayloadTemplate]:
+        """查找与载荷匹配的模板，未命中时返回None"""
+        template = self.templates.get(skeleton)
+        if template is not None and template.mask(payload_upper) == template.literal:
+            self.templates.move_to_end(skeleton)
+            self.hits += 1
+            return template
+        self.misses += 1
+        return None
+
+    def put(self, skeleton: bytes, template: PayloadTemplate) -> None:
+        """写入模板，超出容量时淘汰最久未使用的模板"""
+        self.templates[skeleton] = template
+        self.templates.move_to_end(skeleton)
+        if len(self.templates) > self.max_size:
+            self.templates.popitem(last=False)
+            self.evictions += 1
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        """缓存统计信息"""
+        return (f"[+] 模板缓存: 命中 {self.hits} 次, 未命中 {self.misses} 次, "
+                f"命中率 {self.hit_rate():.1%}, 淘汰 {self.evictions} 次 (容量 {self.max_size})")
 
 # 分析器核心类
 class SQLMapBlindAnalyzer:
@@ -30,97 +213,373 @@ class SQLMapBlindAnalyzer:
         self.config = config
         self.compiled_patterns = {name: re.compile(pattern, re.IGNORECASE) 
                                  for name, pattern in config.patterns.items()}
+        # 预先取出各提取模式，配置中未提供的模式不参与提取
+        self.pattern_list = [(name, self.compiled_patterns[name])
+                             for name in PATTERN_NAMES if self.compiled_patterns.get(name)]
+
+        self.fused_pattern = None
+        if config.engine == 'fused':
+            self.fused_pattern, self.fused_offsets = build_fused_pattern(config.patterns, config.fused_order)
+            # 融合引擎只在能提取字符位置和比较值时使用
+            if 'position_pattern' not in self.fused_offsets or 'comparison_pattern' not in self.fused_offsets:
+                self.fused_pattern = None
+
+        probe_pattern = config.patterns.get('probe_pattern', DEFAULT_PROBE_PATTERN)
+        self.probe_pattern = re.compile(probe_pattern, re.IGNORECASE) if probe_pattern else None
+        # 配置了自定义的probe_pattern时无法预先确定必须出现的子串，总是执行正则搜索
+        self.probe_literals = PROBE_LITERALS if probe_pattern == DEFAULT_PROBE_PATTERN else ()
+
+        # 判断函数读取的请求字段，未标注时为响应大小
+        self.judge_metric = getattr(config.judge_function, 'metric', 'response_size')
+        self.judge_metrics = {self.judge_metric}
+        self.template_cache = TemplateCache(config.cache_size) if config.cache_size > 0 else None
+        # 缺少判断依据字段（如日志中耗时为 - ）的请求数，这些请求作为未识别请求输出
+        self.missing_metric = 0
     
-    def analyze_payload(self, payload: str, response_size: int) -> Dict[str, Any]:
-        analysis = {
-            'type': 'unknown',
-            'database': '',
-            'table': '',
-            'column': '',
-            'position': 0,
-            'ascii_value': 0,
-            'limit_offset': 0,
-            'judge': self.config.judge_function(response_size),
-            'comparison_operator': '>',
-            'record_id': 0
-        }
+    def analyze_payload(self, payload: str, judge_value: Any) -> Dict[str, Any]:
+        """
+        分析单个payload
+        judge_value: 判断函数的输入，即请求数据中的response_size或request_time
+        """
+        analysis = new_analysis(self.config.judge_function(judge_value))
+
+        if not payload:
+            return analysis
 
         # 检测特定的盲注模式
-        if payload and self.config.trigger_pattern in payload.upper():
-            analysis['type'] = f'{self.config.injection_type}_injection'
-            payload_upper = payload.upper()
-            
-            # 统一处理逻辑：布尔盲注和时间盲注都使用相同的模式提取方法
-            # 提取数据库和表名
-            from_match = self.compiled_patterns.get('from_pattern', re.compile('')).search(payload_upper)
-            if from_match:
-                analysis['database'] = from_match.group(1)
-                analysis['table'] = from_match.group(2)
-            
-            # 提取列名
-            cast_match = self.compiled_patterns.get('cast_pattern', re.compile('')).search(payload_upper)
-            if cast_match:
-                analysis['column'] = cast_match.group(1)
-            
-            # 提取LIMIT偏移量
-            limit_match = self.compiled_patterns.get('limit_pattern', re.compile('')).search(payload_upper)
-            if limit_match:
-                analysis['limit_offset'] = int(limit_match.group(1))
-                analysis['record_id'] = analysis['limit_offset']
-            
-            # 提取字符位置
-            position_match = self.compiled_patterns.get('position_pattern', re.compile('')).search(payload_upper)
-            if position_match:
-                analysis['position'] = int(position_match.group(1))
-            
-            # 提取比较运算符和值
-            comparison_match = self.compiled_patterns.get('comparison_pattern', re.compile('')).search(payload_upper)
-            if comparison_match:
-                analysis['comparison_operator'] = comparison_match.group(1)
-                analysis['ascii_value'] = int(comparison_match.group(2))
+        payload_upper = payload.upper()
+        trigger_index = payload_upper.find(self.config.trigger_pattern)
+        if trigger_index != -1:
+            self.extract_fields(analysis, payload_upper, trigger_index)
 
         return analysis
 
+    def extract_fields(self, analysis: Dict[str, Any], payload_upper: str, trigger_index: int) -> None:
+        """从trigger_pattern所在位置起提取注入字段，写入分析结果"""
+        analysis['type'] = f'{self.config.injection_type}_injection'
+
+        # 统一处理逻辑：布尔盲注和时间盲注都使用相同的模式提取方法
+        if self.template_cache is not None:
+            self.analyze_cached(analysis, payload_upper, trigger_index)
+        else:
+            if self.fused_pattern is None or not self.extract_fused(analysis, payload_upper, trigger_index):
+                self.fill_analysis(analysis, self.extract_patterns(payload_upper))
+            probe = self.match_probe(payload_upper, trigger_index)
+            if probe is not None:
+                apply_probe(analysis, probe)
+
+    def match_probe(self, payload_upper: str, trigger_index: int) -> Optional[Tuple[str, str]]:
+        """识别COUNT/LENGTH枚举查询，返回 (probe类型, 参数)，不是枚举查询时返回None"""
+        if self.probe_pattern is None:
+            return None
+        # 绝大多数载荷是逐字符提取而非枚举查询，先用子串检查排除，避免每条载荷都执行一次正则搜索
+        if self.probe_literals and not any(literal in payload_upper for literal in self.probe_literals):
+            return None
+        match = self.probe_pattern.search(payload_upper, trigger_index)
+        if match is None or match.group(1).upper() not in PROBE_FUNCTIONS:
+            return None
+        return PROBE_FUNCTIONS[match.group(1).upper()], match.group(2)
+
+    def analyze_cached(self, analysis: Dict[str, Any], payload_upper: str, trigger_index: int) -> None:
+        """通过模板缓存提取字段，同一骨架的载荷只完整匹配一次"""
+        skeleton = payload_upper.encode('utf-8', 'surrogatepass').translate(SKELETON_TABLE)
+        template = self.template_cache.get(skeleton, payload_upper)
+        if template is None:
+            template = PayloadTemplate(payload_upper, self.extract_spans(payload_upper, trigger_index),
+                                       self.match_probe(payload_upper, trigger_index))
+            self.template_cache.put(skeleton, template)
+        template.fill(analysis, payload_upper)
+
+    def extract_spans(self, payload_upper: str, trigger_index: int) -> Dict[str, Tuple[int, int]]:
+        """提取各字段捕获组在载荷中的位置，返回 {字段名: (start, end)}"""
+        spans = {}
+        if self.fused_pattern is not None:
+            match = self.fused_pattern.match(payload_upper, trigger_index)
+            offsets = self.fused_offsets
+            if (match.start(offsets['position_pattern'] + 1) != -1
+                    and match.start(offsets['comparison_pattern'] + 1) != -1):
+                for name, fields in PATTERN_FIELDS.items():
+                    at = offsets.get(name)
+                    if at is None or match.start(at + 1) == -1:
+                        continue
+                    for field, index in fields:
+                        spans[field] = match.span(at + index)
+                return spans
+
+        for name, pattern in self.pattern_list:
+            match = pattern.search(payload_upper)
+            if match:
+                for field, index in PATTERN_FIELDS[name]:
+                    spans[field] = match.span(index)
+        return spans
+
+    def extract_patterns(self, payload_upper: str) -> Dict[str, Tuple]:
+        """逐个模式搜索载荷，返回 {模式名: 捕获组元组}"""
+        field_groups = {}
+        for name, pattern in self.pattern_list:
+            match = pattern.search(payload_upper)
+            if match:
+                field_groups[name] = match.groups()
+        return field_groups
+
+    def extract_fused(self, analysis: Dict[str, Any], payload_upper: str, start: int = 0) -> bool:
+        """
+        使用融合正则从start处一次扫描载荷，直接将捕获组写入分析结果
+        载荷结构不符合预期（缺少字符位置或比较值）时不修改分析结果并返回False，由逐模式搜索兜底
+        """
+        groups = self.fused_pattern.match(payload_upper, start).groups()
+        offsets = self.fused_offsets
+
+        position_at = offsets['position_pattern']
+        comparison_at = offsets['comparison_pattern']
+        if groups[position_at] is None or groups[comparison_at] is None:
+            return False
+
+        analysis['position'] = int(groups[position_at])
+        analysis['comparison_operator'] = groups[comparison_at]
+        analysis['ascii_value'] = int(groups[comparison_at + 1])
+
+        at = offsets.get('from_pattern')
+        if at is not None and groups[at] is not None:
+            analysis['database'] = groups[at]
+            analysis['table'] = groups[at + 1]
+
+        at = offsets.get('cast_pattern')
+        if at is not None and groups[at] is not None:
+            analysis['column'] = groups[at]
+
+        at = offsets.get('limit_pattern')
+        if at is not None and groups[at] is not None:
+            analysis['limit_offset'] = int(groups[at])
+            analysis['record_id'] = analysis['limit_offset']
+
+        return True
+
+    def fill_analysis(self, analysis: Dict[str, Any], field_groups: Dict[str, Tuple]) -> None:
+        """将各模式的捕获组写入分析结果"""
+        # 提取数据库和表名
+        groups = field_groups.get('from_pattern')
+        if groups:
+            analysis['database'] = groups[0]
+            analysis['table'] = groups[1]
+
+        # 提取列名
+        groups = field_groups.get('cast_pattern')
+        if groups:
+            analysis['column'] = groups[0]
+
+        # 提取LIMIT偏移量
+        groups = field_groups.get('limit_pattern')
+        if groups:
+            analysis['limit_offset'] = int(groups[0])
+            analysis['record_id'] = analysis['limit_offset']
+
+        # 提取字符位置
+        groups = field_groups.get('position_pattern')
+        if groups:
+            analysis['position'] = int(groups[0])
+
+        # 提取比较运算符和值
+        groups = field_groups.get('comparison_pattern')
+        if groups:
+            analysis['comparison_operator'] = groups[0]
+            analysis['ascii_value'] = int(groups[1])
+
+    def analyze_request(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        分析单条请求数据，返回包含原始请求和分析结果的字典
+        缺少判断函数所需字段的请求无法判断，作为未识别请求输出，含有trigger_pattern的计入missing_metric
+        """
+        judge_value = req.get(self.judge_metric)
+        if judge_value is None:
+            payload = req['payload']
+            if payload and self.config.trigger_pattern in payload.upper():
+                self.missing_metric += 1
+            return {'request': req, 'analysis': new_analysis(False)}
+        analysis = self.analyze_payload(req['payload'], judge_value)
+        
+        return {
+            'request': req,
+            'analysis': analysis
+        }
+
+    def analyze_records(self, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """分析请求数据流，跳过不含payload的请求"""
+        for req in records:
+            if 'payload' in req:
+                yield self.analyze_request(req)
+
     def process_line(self, line: str) -> str:
         """处理单行输入并返回分析结果"""
         try:
             req = json.loads(line.strip())
             if 'payload' in req:
-                analysis = self.analyze_payload(
-                    req['payload'], 
-                    req['response_size']
-                )
-                
-                result = {
-                    'request': req,
-                    'analysis': analysis
-                }
-                return json.dumps(result)
+                return json.dumps(self.analyze_request(req))
             return line  # 如果没有payload，原样返回
         except Exception as e:
             return f"Error analyzing payload: {e}"
 
-def create_judge_function(judge_config: Dict[str, Any]) -> Callable[[int], bool]:
-    """根据配置创建判断函数"""
+class MultiConfigAnalyzer:
+    """
+    多配置分析器：一次扫描中将每个载荷分派给trigger_pattern匹配的配置
+    所有配置的trigger_pattern合并为一个正则，每个载荷只搜索一次；
+    载荷中最先出现的trigger_pattern决定所用配置，同一位置较长（更具体）的优先。
+    分析结果的technique字段为所用配置的名称，未识别出注入的请求为空字符串。
+    各配置的分析器共用一个模板缓存：骨架相同的载荷总是分派给同一配置
+    """
+    def __init__(self, configs: List[BlindAnalysisConfig]):
+        self.analyzers = []
+        triggers = []
+        for config in configs:
+            trigger = config.trigger_pattern
+            if not trigger:
+                print(f"[+] 配置 {config.name} 没有trigger_pattern，已跳过", file=sys.stderr)
+                continue
+            if trigger in triggers:
+                other = self.analyzers[triggers.index(trigger)].config.name
+                print(f"[+] 配置 {config.name} 的trigger_pattern与 {other} 相同，已跳过", file=sys.stderr)
+                continue
+            triggers.append(trigger)
+            self.analyzers.append(SQLMapBlindAnalyzer(config))
+        if not self.analyzers:
+            raise ValueError("没有可用的配置（trigger_pattern均为空）")
+
+        order = sorted(range(len(triggers)), key=lambda index: -len(triggers[index]))
+        self.trigger_regex = re.compile('|'.join(f'(?P<c{index}>{re.escape(triggers[index])})'
+                                                 for index in order))
+
+        cache_size = max(analyzer.config.cache_size for analyzer in self.analyzers)
+        self.template_cache = TemplateCache(cache_size) if cache_size > 0 else None
+        for analyzer in self.analyzers:
+            analyzer.template_cache = self.template_cache
+        self.judge_metrics = {analyzer.judge_metric for analyzer in self.analyzers}
+        self.judge_functions = [analyzer.config.judge_function for analyzer in self.analyzers]
+        self.missing_metric = 0
+
+    def analyze_request(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        分析单条请求数据，只有识别出注入时才需要对应配置的判断函数所读取的字段，
+        缺少该字段的请求作为未识别请求输出并计入missing_metric
+        """
+        payload = req['payload']
+        match = self.trigger_regex.search(payload.upper()) if payload else None
+        if match is None:
+            analysis = new_analysis(False)
+            analysis['technique'] = ''
+            return {'request': req, 'analysis': analysis}
+
+        analyzer = self.analyzers[int(match.lastgroup[1:])]
+        judge_value = req.get(analyzer.judge_metric)
+        if judge_value is None:
+            self.missing_metric += 1
+            analysis = new_analysis(False)
+            analysis['technique'] = analyzer.config.name
+            return {'request': req, 'analysis': analysis}
+        analysis = new_analysis(analyzer.config.judge_function(judge_value))
+        analyzer.extract_fields(analysis, match.string, match.start())
+        analysis['technique'] = analyzer.config.name
+        return {'request': req, 'analysis': analysis}
+
+    def analyze_records(self, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """分析请求数据流，跳过不含payload的请求"""
+        for req in records:
+            if 'payload' in req:
+                yield self.analyze_request(req)
+
+    def summary(self) -> str:
+        """各配置的trigger_pattern"""
+        return "[+] 多配置分析: " + ', '.join(f"{analyzer.config.name} ({analyzer.config.trigger_pattern})"
+                                            for analyzer in self.analyzers)
+
+class LatencySplitJudge:
+    """
+    基于请求耗时自动分簇的判断函数
+    在线维护快、慢两簇的平均耗时，请求按更接近的一簇归类；
+    尚未出现慢簇时，比快簇平均耗时多出min_gap秒以上的请求归为慢簇。
+    慢请求的判断结果为slow_judge：sqlmap的 SLEEP(n-(IF(条件,0,n))) 在条件为真时IF返回0，
+    即 SLEEP(n) 延迟，而judge为True表示比较条件为假，因此默认为False
+    """
+    metric = 'request_time'
+
+    def __init__(self, min_gap: float = DEFAULT_MIN_GAP, slow_judge: bool = False):
+        self.min_gap = min_gap
+        self.slow_judge = slow_judge
+        self.fast_total = 0.0
+        self.fast_count = 0
+        self.slow_total = 0.0
+        self.slow_count = 0
+
+    def is_slow(self, latency: float) -> bool:
+        """按当前两簇的平均耗时判断请求是否属于慢簇"""
+        if self.fast_count == 0:
+            return False
+        fast = self.fast_total / self.fast_count
+        if self.slow_count == 0:
+            return latency >= fast + self.min_gap
+        slow = self.slow_total / self.slow_count
+        return latency - fast > slow - latency
+
+    def __call__(self, latency: float) -> bool:
+        if self.slow_count == 0 and self.fast_count and latency <= self.fast_total / self.fast_count - self.min_gap:
+            # 最先出现的是慢请求：已有样本整体移入慢簇
+            self.slow_total, self.slow_count = self.fast_total, self.fast_count
+            self.fast_total, self.fast_count = 0.0, 0
+
+        slow = self.is_slow(latency)
+        if slow:
+            self.slow_total += latency
+            self.slow_count += 1
+        else:
+            self.fast_total += latency
+            self.fast_count += 1
+        return self.slow_judge if slow else not self.slow_judge
+
+    def threshold(self) -> Optional[float]:
+        """当前的快慢分界耗时，尚未出现慢簇时返回None"""
+        if not self.fast_count or not self.slow_count:
+            return None
+        return (self.fast_total / self.fast_count + self.slow_total / self.slow_count) / 2
+
+    def summary(self) -> str:
+        """分簇结果的单行摘要"""
+        fast = self.fast_total / self.fast_count if self.fast_count else 0.0
+        if not self.slow_count:
+            return f"[+] 耗时自动分簇: 快簇 {fast:.3f}s ({self.fast_count} 次), 未发现慢簇"
+        slow = self.slow_total / self.slow_count
+        return (f"[+] 耗时自动分簇: 快簇 {fast:.3f}s ({self.fast_count} 次), "
+                f"慢簇 {slow:.3f}s ({self.slow_count} 次), 阈值 {self.threshold():.3f}s")
+
+def create_judge_function(judge_config: Dict[str, Any]) -> Callable[[Any], bool]:
+    """
+    根据配置创建判断函数
+    size_*类型读取响应大小，time_*类型读取请求耗时（秒，需要日志格式包含耗时字段），
+    判断函数的metric属性标明读取的请求字段
+    """
     judge_type = judge_config.get('type', 'size_equal')
     value = judge_config.get('value', 0)
     
     if judge_type == 'size_equal':
-        return lambda size: size == value
-    elif judge_type == 'size_less':
-        return lambda size: size < value
-    elif judge_type == 'size_greater':
-        return lambda size: size > value
-    elif judge_type == 'size_range':
+        judge = lambda size: size == value
+    elif judge_type in ('size_less', 'time_less'):
+        judge = lambda measured: measured < value
+    elif judge_type in ('size_greater', 'time_greater'):
+        judge = lambda measured: measured > value
+    elif judge_type in ('size_range', 'time_range'):
         min_val = judge_config.get('min', -1)
         max_val = judge_config.get('max', -1)
         # 确保配置中确实提供了min和max值
         if min_val == -1 or max_val == -1:
-            raise ValueError("size_range类型需要提供min和max参数")
-        return lambda size: min_val <= size <= max_val
+            raise ValueError(f"{judge_type}类型需要提供min和max参数")
+        judge = lambda measured: min_val <= measured <= max_val
+    elif judge_type == 'time_auto':
+        return LatencySplitJudge(judge_config.get('min_gap', DEFAULT_MIN_GAP),
+                                 judge_config.get('slow_judge', False))
     else:
         # 默认返回False
-        return lambda size: False
+        judge = lambda size: False
+
+    judge.metric = JUDGE_METRICS.get(judge_type.split('_', 1)[0], 'response_size')
+    return judge
 
 def load_config(config_path: str) -> BlindAnalysisConfig:
     """从外部配置文件加载配置"""
@@ -136,7 +595,11 @@ def load_config(config_path: str) -> BlindAnalysisConfig:
             injection_type=config_data.get('injection_type', 'boolean'),
             trigger_pattern=config_data.get('trigger_pattern', ''),
             judge_function=judge_function,
-            patterns=config_data.get('patterns', {})
+            patterns=config_data.get('patterns', {}),
+            engine=config_data.get('engine', 'patterns'),
+            fused_order=config_data.get('fused_order'),
+            cache_size=config_data.get('cache_size', 0),
+            name=config_data.get('name') or os.path.splitext(os.path.basename(config_path))[0]
         )
         
         return config
@@ -145,22 +608,79 @@ def load_config(config_path: str) -> BlindAnalysisConfig:
         print(f"Error loading config from {config_path}: {e}", file=sys.stderr)
         sys.exit(1)
 
+def config_paths(path: str) -> List[str]:
+    """--config为目录时返回其中全部 .json 配置文件（按文件名排序），否则返回该文件"""
+    if not os.path.isdir(path):
+        return [path]
+    paths = sorted(glob.glob(os.path.join(path, '*.json')))
+    if not paths:
+        raise ValueError(f"配置目录 {path} 中没有 .json 配置文件")
+    return paths
+
+def load_analyzer(path: str, cache_size: Optional[int] = None):
+    """
+    按 --config 创建分析器：配置文件返回SQLMapBlindAnalyzer，配置目录返回MultiConfigAnalyzer
+    cache_size不为None时覆盖配置中的模板缓存容量
+    """
+    configs = [load_config(config_path) for config_path in config_paths(path)]
+    if cache_size is not None:
+        for config in configs:
+            config.cache_size = cache_size
+    if os.path.isdir(path):
+        return MultiConfigAnalyzer(configs)
+    return SQLMapBlindAnalyzer(configs[0])
+
+def judge_functions(analyzer) -> List[Callable]:
+    """分析器使用的全部判断函数"""
+    return getattr(analyzer, 'judge_functions', None) or [analyzer.config.judge_function]
+
+def missing_metric_summary(count: int) -> str:
+    """缺少判断依据字段的请求数的单行摘要"""
+    return f"[+] 分析器: {count} 条请求缺少判断函数所需的字段（如日志中耗时为 - ），已作为未识别请求输出并计为错误"
+
 def main():
     parser = argparse.ArgumentParser(description='SQLMap盲注分析器')
     parser.add_argument('--config', required=True, type=str, 
-                       help='外部配置文件路径(JSON格式)')
+                       help='外部配置文件路径(JSON格式)；为目录时加载其中全部配置，按trigger_pattern一次分派')
+    parser.add_argument('--cache-size', type=int,
+                       help='模板缓存容量，覆盖配置文件中的cache_size（0表示禁用）')
+    record_codec.add_format_argument(parser)
+    stage_stats.add_stats_arguments(parser)
     args = parser.parse_args()
     
-    # 从外部配置文件加载配置
-    config = load_config(args.config)
-    
-    # 创建分析器实例
-    analyzer = SQLMapBlindAnalyzer(config)
+    # 从外部配置文件（或配置目录）加载配置，创建分析器实例
+    try:
+        analyzer = load_analyzer(args.config, args.cache_size)
+    except ValueError as e:
+        print(f"Error loading config from {args.config}: {e}", file=sys.stderr)
+        sys.exit(1)
+    if isinstance(analyzer, MultiConfigAnalyzer):
+        print(analyzer.summary(), file=sys.stderr)
     
-    # 处理输入
-    for line in sys.stdin:
-        result = analyzer.process_line(line)
-        print(result)
+    # 处理输入，没有payload的记录原样输出
+    stats = stage_stats.from_args(args, 'analyze')
+
+    @stats.count_errors
+    def report_error(e):
+        print(f"Error analyzing payload: {e}", file=sys.stderr)
+
+    with stage_stats.profiled(args.profile), record_codec.RecordWriter(args.format) as writer:
+        for req in stats.count_in(record_codec.read_records(on_error=report_error)):
+            try:
+                writer.write(analyzer.analyze_request(req) if 'payload' in req else req)
+            except Exception as e:
+                report_error(e)
+    stats.finish(writer.count)
+    if analyzer.missing_metric:
+        stats.errors += analyzer.missing_metric
+        print(missing_metric_summary(analyzer.missing_metric), file=sys.stderr)
+
+    if analyzer.template_cache is not None and args.stats:
+        print(analyzer.template_cache.summary(), file=sys.stderr)
+    for judge_function in judge_functions(analyzer):
+        if hasattr(judge_function, 'summary'):
+            print(judge_function.summary(), file=sys.stderr)
+    stage_stats.report(args, [stats])
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+file: bisection_data_reconstructor.py
+二分查找感知的数据重构器 - 按sqlmap的二分查找过程检查每个字符位置，报告缺口而不是截断字符串
+输入: JSON行或列式批次格式的分析结果（自动识别）
+输出: 结构化JSON数据（在default_data_reconstructor.py的输出基础上增加positions和summary）
+
+每个字符位置以完整字节范围0-255建模sqlmap的二分查找，并归为以下状态之一：
+  - confirmed:     收到判断为真的 != 确认比较
+  - resolved:      二分区间收敛为单个值（或字符范围内只剩一个候选值）
+  - terminator:    区间落在[0, 1]内，sqlmap以此判断字符串结束
+  - candidates:    区间未收敛，仍有多个候选值（例如丢失了二分查找的最后几步）
+  - contradictory: 比较结果互相矛盾，区间为空或收到多个不同的确认值
+  - missing:       该位置没有任何比较记录，但之后的位置有
+  - out_of_range:  字符范围内没有可能的取值
+无法确定的位置在字符串中以占位符代替并继续拼接，单条日志丢失不会截断整个字符串。
+"""
+import sys
+import json
+import argparse
+from array import array
+from collections import Counter
+
+from default_data_reconstructor import MIN_ASCII, MAX_ASCII, fold_analyses, add_store_arguments, input_analyses
+from interval_state import BYTE_MIN, BYTE_MAX, NO_VALUE, IntervalStore, RecordIntervals
+from enumeration_state import EnumerationState
+import stage_stats
+
+# sqlmap在字符串末尾得到的字符编码不超过此值
+TERMINATOR_MAX = 1
+
+# 无法确定的字符在字符串中的默认占位符
+DEFAULT_PLACEHOLDER = '?'
+
+# 可以拼接进字符串的状态
+DETERMINED_STATUSES = ('confirmed', 'resolved')
+
+class BisectionIntervals(RecordIntervals):
+    """在区间状态之外记录每个位置的探测次数、冗余探测、排除值和冲突的确认值"""
+    __slots__ = ('probes', 'redundant', 'excluded', 'conflicts')
+
+    def __init__(self, initial_low=BYTE_MIN, initial_high=BYTE_MAX):
+        super().__init__(initial_low, initial_high)
+        self.probes = array('I')
+        self.redundant = array('I')
+        # position -> 判断为假的 != 比较排除的值
+        self.excluded = {}
+        # 收到多个不同确认值的位置
+        self.conflicts = set()
+
+    def fold(self, position, ascii_val, judge, operator='>'):
+        """折叠比较结果，并检查它是否符合二分查找的过程"""
+        index = position - 1
+        self._touch(index)
+        missing = index + 1 - len(self.probes)
+        if missing > 0:
+            self.probes.extend([0] * missing)
+            self.redundant.extend([0] * missing)
+        self.probes[index] += 1
+
+        if operator == '!=':
+            if not judge:
+                self.excluded.setdefault(position, set()).add(ascii_val)
+            elif self.confirmed[index] not in (NO_VALUE, ascii_val):
+                self.conflicts.add(position)
+        elif not self.is_informative(index, ascii_val, operator):
+            # 二分查找的每次探测都应落在当前区间内，否则结果已被之前的探测决定
+            self.redundant[index] += 1
+
+        super().fold(position, ascii_val, judge, operator)
+
+    def is_informative(self, index, ascii_val, operator):
+        """比较结果能否进一步收窄当前区间"""
+        low, high = self.low[index], self.high[index]
+        if operator == '>':
+            return low <= ascii_val < high
+        if operator == '<':
+            return low < ascii_val <= high
+        return True
+
+    def classify(self, position, min_val=MIN_ASCII, max_val=MAX_ASCII):
+        """
+        返回该位置的 (状态, 字符编码, 候选值列表)
+        字符编码只在状态为confirmed/resolved时有效
+        """
+        if not self.has(position):
+            return 'missing', None, None
+        if position in self.conflicts:
+            return 'contradictory', None, None
+
+        confirmed = self.confirmed[position - 1]
+        low, high = self.bounds(position)
+        if confirmed != NO_VALUE:
+            low = high = confirmed
+        elif low > high:
+            return 'contradictory', None, None
+
+        if high <= TERMINATOR_MAX:
+            return 'terminator', None, None
+
+        excluded = self.excluded.get(position, ())
+        candidates = [code for code in range(max(low, min_val), min(high, max_val) + 1)
+                      if code not in excluded]
+        if not candidates:
+            return 'out_of_range', None, None
+        if len(candidates) == 1:
+            return ('confirmed' if confirmed != NO_VALUE else 'resolved'), candidates[0], None
+        return 'candidates', None, candidates
+
+    def bisection_conflict(self, position):
+        """确认值是否落在二分区间之外（通常说明判断函数不可靠）"""
+        confirmed = self.confirmed[position - 1]
+        if confirmed == NO_VALUE:
+            return False
+        low, high = self.bounds(position)
+        return not low <= confirmed <= high
+
+class BisectionStore(IntervalStore):
+    """以BisectionIntervals保存每条记录的区间状态"""
+    __slots__ = ()
+    record_class = BisectionIntervals
+
+def position_entry(state, record_id, position, status, candidates):
+    """生成一个未确定位置的报告条目"""
+    entry = {
+        'record_id': record_id,
+        'position': position,
+        'status': status
+    }
+    if status != 'missing':
+        entry['range'] = list(state.bounds(position))
+        entry['probes'] = state.probes[position - 1]
+        entry['redundant_probes'] = state.redundant[position - 1]
+    if candidates is not None:
+        entry['candidates'] = candidates
+    return entry
+
+def assemble_record(state, record_id, min_val, max_val, placeholder, summary):
+    """
+    按位置顺序拼接一条记录，返回 (字符串, 未确定位置的报告条目列表)
+    未确定的位置以占位符代替，遇到字符串结束标记时停止
+    """
+    chars = []
+    entries = []
+    for position in range(1, len(state) + 1):
+        status, char_code, candidates = state.classify(position, min_val, max_val)
+        summary[status] += 1
+        if status != 'missing':
+            summary['redundant_probes'] += state.redundant[position - 1]
+            if state.bisection_conflict(position):
+                summary['bisection_conflicts'] += 1
+
+        if status == 'terminator':
+            break
+        if status in DETERMINED_STATUSES:
+            chars.append(chr(char_code))
+        else:
+            chars.append(placeholder)
+            entries.append(position_entry(state, record_id, position, status, candidates))
+    return ''.join(chars), entries
+
+def reconstruct_data(payload_analyses, min_val=MIN_ASCII, max_val=MAX_ASCII, placeholder=DEFAULT_PLACEHOLDER):
+    """
+    根据分析结果流重构被盗数据，返回结构化结果
+    除default_data_reconstructor.py的字段外，positions列出所有未确定的字符位置，
+    summary统计各状态的位置数、冗余探测次数和确认值与二分区间冲突的位置数
+    """
+    results = {
+        'database': '',
+        'tables': [],
+        'columns': {},
+        'data': {},
+        'positions': {},
+        'summary': {}
+    }
+
+    enumeration = EnumerationState()
+    data_extractions = fold_analyses(payload_analyses, results, BisectionStore, enumeration)
+
+    summary = Counter()
+    for table_key, columns in data_extractions.items():
+        results['data'][table_key] = {}
+
+        for column, store in columns.items():
+            values = []
+            column_entries = []
+            for record_id in sorted(store.records.keys()):
+                value, entries = assemble_record(store.records[record_id], record_id,
+                                                 min_val, max_val, placeholder, summary)
+                if value:
+                    values.append(value)
+                column_entries.extend(entries)
+
+            if values:
+                results['data'][table_key][column] = values
+            if column_entries:
+                results['positions'].setdefault(table_key, {})[column] = column_entries
+
+    results['summary'] = dict(summary)
+    if enumeration:
+        results['completeness'] = enumeration.completeness(data_extractions)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='二分查找感知的数据重构器')
+    parser.add_argument('--full-range', action='store_true',
+                        help='以完整字节范围0-255作为字符取值范围（默认为可打印字符32-126）')
+    parser.add_argument('--placeholder', default=DEFAULT_PLACEHOLDER,
+                        help=f'无法确定的字符在字符串中的占位符 (默认: {DEFAULT_PLACEHOLDER})')
+    add_store_arguments(parser)
+    stage_stats.add_stats_arguments(parser)
+    args = parser.parse_args()
+
+    analyses = input_analyses(args)
+    stats = stage_stats.from_args(args, 'reconstruct', aggregate=True)
+    with stage_stats.profiled(args.profile):
+        if args.full_range:
+            results = reconstruct_data(stats.count_in(analyses), BYTE_MIN, BYTE_MAX, args.placeholder)
+        else:
+            results = reconstruct_data(stats.count_in(analyses), placeholder=args.placeholder)
+    print(json.dumps(results, indent=2))
+    stats.finish(1)
+    stage_stats.report(args, [stats])
+
+if __name__ == '__main__':
+    main()
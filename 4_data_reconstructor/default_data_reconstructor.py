@@ -2,64 +2,95 @@
 """
 file: default_data_reconstructor.py
 数据重构器 - 组合分析结果重构被盗数据
-输入: JSON行格式的分析结果
+输入: JSON行或列式批次格式的分析结果（自动识别）
 输出: 结构化JSON数据
 """
+import os
 import sys
 import json
+import sqlite3
+import argparse
 from collections import defaultdict
 
-def reconstruct_character(comparisons):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import record_codec
+import stage_stats
+import forensic_store
+
+from interval_state import BYTE_MIN, BYTE_MAX, IntervalStore, RecordIntervals
+from enumeration_state import EnumerationState
+
+# 可打印字符范围
+MIN_ASCII = 32
+MAX_ASCII = 126
+
+def reconstruct_character(comparisons, min_val=MIN_ASCII, max_val=MAX_ASCII):
     if not comparisons:
         return None
 
-    min_val = 32
-    max_val = 126
+    state = RecordIntervals(min_val, max_val)
+    for comp in comparisons:
+        state.fold(1, comp['ascii_value'], comp['judge'], comp.get('comparison_operator', '>'))
 
-    for comp in sorted(comparisons, key=lambda x: x['ascii_value']):
-        ascii_val = comp['ascii_value']
-        judge = comp['judge']
-        operator = comp.get('comparison_operator', '>')
+    return state.value(1)
 
-        if operator == '!=':
-            if judge:
-                return ascii_val
-            continue
-            
-        if operator == '>':
-            if judge:
-                max_val = min(max_val, ascii_val)
-            else:
-                min_val = max(min_val, ascii_val + 1)
-        elif operator == '<':
-            if judge:
-                min_val = max(min_val, ascii_val)
-            else:
-                max_val = min(max_val, ascii_val - 1)
-
-    return min_val if min_val == max_val else None
-
-def main():
-    payload_analyses = []
-    for line in sys.stdin:
+def load_analyses(lines):
+    """逐行解析分析结果，跳过无法解析的行"""
+    for line in lines:
         try:
             data = json.loads(line.strip())
-            payload_analyses.append(data['analysis'])
+            yield data['analysis']
         except Exception as e:
             print(f"Error loading analysis: {e}", file=sys.stderr)
             continue
 
-    results = {
-        'database': '',
-        'tables': [],
-        'columns': {},
-        'data': {}
-    }
-
-    # 收集数据提取信息
-    data_extractions = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(list))))
+def read_analyses(stream=None):
+    """
+    读取分析结果流，自动识别JSON行或列式批次格式
+    列式批次格式只解码analysis字段对应的列
+    """
+    reader = record_codec.RecordReader(stream)
+    if reader.format == record_codec.JSONL:
+        return load_analyses(reader.lines())
+    return reader.records(select='analysis')
+
+def add_store_arguments(parser):
+    """添加从取证数据库读取分析结果的参数"""
+    parser.add_argument('--store', metavar='DB',
+                        help='从取证数据库（forensic_store.py写入）读取分析结果而非标准输入，可配合过滤参数使用')
+    forensic_store.add_filter_arguments(parser)
+
+def input_analyses(args):
+    """
+    指定 --store 时按过滤参数从取证数据库读取分析结果，否则读取标准输入
+    数据库无法读取或过滤参数无效时输出错误并退出
+    """
+    if not args.store:
+        if forensic_store.has_filters(args):
+            print("Error reading analyses: 过滤参数需要配合 --store 使用", file=sys.stderr)
+            sys.exit(1)
+        return read_analyses()
+    try:
+        return forensic_store.read_store_analyses(args.store, args)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error reading forensic store: {e}", file=sys.stderr)
+        sys.exit(1)
+
+def fold_analyses(payload_analyses, results, create_store, enumeration=None):
+    """
+    将分析结果流折叠进各列的区间状态，同时填充results中的database/tables/columns
+    create_store: 创建一列区间状态的函数
+    enumeration: 收集COUNT/LENGTH枚举查询的EnumerationState，已知长度的记录按长度预先分配
+    返回 table_key -> column -> 区间状态
+    """
+    data_extractions = defaultdict(dict)
 
     for analysis in payload_analyses:
+        if analysis.get('probe'):
+            # 枚举查询的数字不是被盗数据
+            if enumeration is not None and "inject" in analysis['type'] and analysis['table']:
+                enumeration.fold(analysis)
+            continue
         if "inject" in analysis['type'] and analysis['table'] and analysis['column']:
             if not results['database'] and analysis['database']:
                 results['database'] = analysis['database']
@@ -76,51 +107,100 @@ def main():
             if column and column not in results['columns'][table_key]:
                 results['columns'][table_key].append(column)
 
-            # 收集字符比较数据
+            # 将字符比较折叠进区间状态
             if analysis['position'] > 0:
-                record_id = analysis['record_id']
-                position = analysis['position']
+                store = data_extractions[table_key].get(column)
+                if store is None:
+                    store = data_extractions[table_key][column] = create_store()
+                if enumeration is not None and analysis['record_id'] not in store.records:
+                    length = enumeration.length(table_key, column, analysis['record_id'])
+                    if length:
+                        store.record(analysis['record_id']).reserve(length)
+                store.fold(analysis['record_id'], analysis['position'],
+                           analysis['ascii_value'], analysis['judge'],
+                           analysis['comparison_operator'])
+
+    return data_extractions
+
+def reconstruct_data(payload_analyses, min_val=MIN_ASCII, max_val=MAX_ASCII):
+    """
+    根据分析结果流重构被盗数据，返回结构化结果
+    min_val/max_val: 字符的初始取值区间，默认为可打印字符范围
+    """
+    results = {
+        'database': '',
+        'tables': [],
+        'columns': {},
+        'data': {}
+    }
 
-                data_extractions[table_key][column][record_id][position].append({
-                    'ascii_value': analysis['ascii_value'],
-                    'judge': analysis['judge'],
-                    'comparison_operator': analysis['comparison_operator']
-                })
+    # 收集数据提取信息：table_key -> column -> 区间状态
+    enumeration = EnumerationState()
+    data_extractions = fold_analyses(payload_analyses, results,
+                                     lambda: IntervalStore(min_val, max_val), enumeration)
 
     # 重构字符串数据
     for table_key, columns in data_extractions.items():
         results['data'][table_key] = {}
 
-        for column, records in columns.items():
-            reconstructed_records = []
-
-            for record_id in sorted(records.keys()):
-                positions = records[record_id]
-                max_pos = max(positions.keys()) if positions else 0
-                chars = []
-
-                for pos in range(1, max_pos + 1):
-                    if pos in positions:
-                        char_code = reconstruct_character(positions[pos])
-                        if char_code and 32 <= char_code <= 126:
-                            chars.append(chr(char_code))
-                        elif char_code == 0:
-                            break
-                    else:
-                        break
-
-                reconstructed_value = ''.join(chars)
-                if reconstructed_value:
-                    reconstructed_records.append({
-                        'record_id': record_id,
-                        'value': reconstructed_value
-                    })
-
-            if reconstructed_records:
-                reconstructed_records.sort(key=lambda x: x['record_id'])
-                results['data'][table_key][column] = [r['value'] for r in reconstructed_records]
-
-    print(json.dumps(results, indent=2))
+        for column, store in columns.items():
+            values = [value for _, value in store.values() if value]
+            if values:
+                results['data'][table_key][column] = values
+
+    # 收到sqlmap的COUNT/LENGTH查询时报告每列的提取完整度
+    if enumeration:
+        results['completeness'] = enumeration.completeness(data_extractions)
+
+    return results
+
+def value_rows(results):
+    """
+    将重构结果转换为报告生成器的JSON行输入：第一行为除data以外的字段，
+    之后每行一个取值 {"table", "column", "record", "value"}，record从1开始；
+    不同数据库中的同名表在报告中合并为一张表，这些表的行相邻输出
+    """
+    yield {key: value for key, value in results.items() if key != 'data'}
+    groups = {}
+    for table_key, columns in results['data'].items():
+        groups.setdefault(table_key.split('.')[-1], []).append((table_key, columns))
+    for tables in groups.values():
+        for table_key, columns in tables:
+            for column, values in columns.items():
+                for record, value in enumerate(values, 1):
+                    yield {'table': table_key, 'column': column, 'record': record, 'value': value}
+
+def print_results(results, rows=False):
+    """输出重构结果：JSON文档，或 rows 为True时输出JSON行取值流"""
+    if not rows:
+        print(json.dumps(results, indent=2))
+        return
+    sys.stdout.writelines(json.dumps(row) + '\n' for row in value_rows(results))
+
+def add_rows_argument(parser):
+    """添加 --rows 参数"""
+    parser.add_argument('--rows', action='store_true',
+                        help='以JSON行取值流输出（每行一个取值），报告生成器逐表读取，不必载入完整的JSON文档')
+
+def main():
+    parser = argparse.ArgumentParser(description='数据重构器')
+    parser.add_argument('--full-range', action='store_true',
+                        help='使用完整字节范围0-255作为字符初始区间（默认为可打印字符32-126）')
+    add_rows_argument(parser)
+    add_store_arguments(parser)
+    stage_stats.add_stats_arguments(parser)
+    args = parser.parse_args()
+
+    analyses = input_analyses(args)
+    stats = stage_stats.from_args(args, 'reconstruct', aggregate=True)
+    with stage_stats.profiled(args.profile):
+        if args.full_range:
+            results = reconstruct_data(stats.count_in(analyses), BYTE_MIN, BYTE_MAX)
+        else:
+            results = reconstruct_data(stats.count_in(analyses))
+    print_results(results, args.rows)
+    stats.finish(1)
+    stage_stats.report(args, [stats])
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+file: enumeration_state.py
+枚举查询状态 - 解码sqlmap在提取数据前发送的 COUNT/LENGTH 查询
+
+sqlmap提取数据前先用 COUNT(*) 等查询表的行数，--threads 大于1时还会用 CHAR_LENGTH
+查询每条记录的长度。这些数字同样以 ORD(MID(...)) 逐字符二分提取，分析器将其标记为
+probe=count/length（见sqlmap_analyzer.py）。每个数字按字符位置折叠进区间状态，
+区间上界小于'0'的位置表示数字结束（sqlmap在该位置的比较全部为假）。
+
+解码出的行数和长度用于：
+  - 按长度预先分配记录的区间数组
+  - 记录的全部字符确定后立即定稿，不必等到输入结束（streaming_data_reconstructor.py）
+  - 计算每列的提取完整度
+"""
+from interval_state import BYTE_MIN, BYTE_MAX, RecordIntervals
+
+COUNT = 'count'
+LENGTH = 'length'
+
+ORD_ZERO = ord('0')
+ORD_NINE = ord('9')
+
+def decode_number(state):
+    """
+    从区间状态解码十进制数字
+    所有位都已确定且收到结束位置时返回整数，否则返回None
+    """
+    digits = []
+    for position in range(1, len(state) + 1):
+        if not state.has(position):
+            return None
+        value = state.value(position)
+        upper = value if value is not None else state.bounds(position)[1]
+        if upper < ORD_ZERO:
+            # 结束位置
+            return int(''.join(digits)) if digits else None
+        if value is None or value > ORD_NINE:
+            return None
+        digits.append(chr(value))
+    return None
+
+class ProbeValue:
+    """
+    同一目标的枚举查询：数字解码完成后保留结果并释放区间状态，
+    之后从第1位重新开始的比较属于新的一次查询（如对另一个库的同名查询）
+    """
+    __slots__ = ('state', 'value')
+
+    def __init__(self):
+        self.state = RecordIntervals(BYTE_MIN, BYTE_MAX)
+        self.value = None
+
+    def fold(self, position, ascii_val, judge, operator='>'):
+        """折叠一次比较，本次比较使数字解码完成时返回该数字，否则返回None"""
+        if self.state is None:
+            if position != 1 or operator == '!=':
+                return None
+            self.state = RecordIntervals(BYTE_MIN, BYTE_MAX)
+        self.state.fold(position, ascii_val, judge, operator)
+        number = decode_number(self.state)
+        if number is not None:
+            self.value = number
+            self.state = None
+        return number
+
+class EnumerationState:
+    """
+    收集一次攻击中全部枚举查询的结果
+    counts: table_key -> 行数；lengths: (table_key, column, record_id) -> 长度
+    """
+    def __init__(self):
+        self.probes = {}
+        self.counts = {}
+        self.lengths = {}
+
+    def fold(self, analysis):
+        """
+        折叠一条枚举查询的分析结果
+        解码出新的数字时返回 (probe类型, 目标, 数字)，目标为table_key或 (table_key, column, record_id)
+        """
+        position = analysis['position']
+        if position <= 0:
+            return None
+        kind = analysis['probe']
+        table_key = f"{analysis['database']}.{analysis['table']}"
+        target = table_key if kind == COUNT else (table_key, analysis['column'], analysis['record_id'])
+        probe = self.probes.get((kind, target))
+        if probe is None:
+            probe = self.probes[(kind, target)] = ProbeValue()
+        number = probe.fold(position, analysis['ascii_value'], analysis['judge'],
+                            analysis.get('comparison_operator', '>'))
+        if number is None:
+            return None
+        if kind == COUNT:
+            # 同一张表可能被不同条件查询多次（如INFORMATION_SCHEMA.COLUMNS按表查询列数），
+            # 这些查询提取的记录共用同一组记录编号，取最大值
+            self.counts[table_key] = max(number, self.counts.get(table_key, 0))
+        else:
+            self.lengths[target] = number
+        return kind, target, number
+
+    def length(self, table_key, column, record_id):
+        """记录的长度，未知时返回None"""
+        return self.lengths.get((table_key, column, record_id))
+
+    def __bool__(self):
+        return bool(self.counts or self.lengths)
+
+    def completeness(self, extractions):
+        """
+        计算每列的提取完整度
+        extractions: table_key -> column -> 区间状态（IntervalStore）
+        每条记录已知长度时按已确定的字符数计入；长度未知的记录无法判断是否完整，
+        计入unknown且不参与百分比计算（不会因为重构出部分字符串就计为完整）。
+        表的行数已知时以行数为分母（未提取的记录计为0），否则以出现过的记录数为分母，
+        两种情况都减去长度未知的记录数；没有可计算的记录时percent为None
+        """
+        report = {}
+        for table_key in list(extractions) + [key for key in self.counts if key not in extractions]:
+            rows = self.counts.get(table_key)
+            columns = {}
+            for column, store in extractions.get(table_key, {}).items():
+                expected = rows if rows is not None else len(store.records)
+                score = 0.0
+                complete = 0
+                unknown = 0
+                for record_id, state in store.records.items():
+                    if rows is not None and not 0 <= record_id < rows:
+                        continue
+                    length = self.lengths.get((table_key, column, record_id))
+                    if length is None:
+                        unknown += 1
+                        continue
+                    if length == 0:
+                        fraction = 1.0
+                    else:
+                        resolved = sum(1 for position in range(1, min(length, len(state)) + 1)
+                                       if state.has(position) and state.value(position) is not None)
+                        fraction = resolved / length
+                    score += fraction
+                    complete += fraction == 1.0
+                measured = expected - unknown
+                columns[column] = {
+                    'expected': expected,
+                    'complete': complete,
+                    'unknown': unknown,
+                    'percent': round(100 * score / measured, 1) if measured > 0 else None
+                }
+            percents = [entry['percent'] for entry in columns.values() if entry['percent'] is not None]
+            report[table_key] = {
+                'rows': rows,
+                # 没有提取任何列的表计为0，有列但全部长度未知时为None
+                'percent': round(sum(percents) / len(percents), 1) if percents else (None if columns else 0.0),
+                'columns': columns
+            }
+        return report
+
+    def to_dict(self):
+        """导出为可JSON序列化的字典，用于检查点"""
+        return {
+            'counts': self.counts,
+            'lengths': [[table_key, column, record_id, length]
+                        for (table_key, column, record_id), length in self.lengths.items()],
+            'probes': [[kind, target, probe.value, probe.state.to_dict() if probe.state is not None else None]
+                       for (kind, target), probe in self.probes.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """从to_dict()的结果恢复状态"""
+        state = cls()
+        state.counts = dict(data['counts'])
+        state.lengths = {(table_key, column, record_id): length
+                         for table_key, column, record_id, length in data['lengths']}
+        for kind, target, value, intervals in data['probes']:
+            probe = ProbeValue()
+            probe.value = value
+            probe.state = RecordIntervals.from_dict(intervals) if intervals is not None else None
+            state.probes[(kind, target if kind == COUNT else tuple(target))] = probe
+        return state
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+file: interval_state.py
+字符区间状态 - 以类型化数组紧凑保存每个字符位置的推断状态
+
+每个位置只保存 [low, high] 取值区间和一个可选的 != 确认值，
+每次比较结果以O(1)折叠进状态，不再保存和排序比较列表。
+区间支持完整的字节范围 0-255，每个位置占用6个字节。
+"""
+from array import array
+
+BYTE_MIN = 0
+BYTE_MAX = 255
+
+# 无确认值
+NO_VALUE = -1
+# 尚未收到任何比较的位置
+UNSEEN = 0x7FFF
+
+def _clamp(value):
+    """将比较值限制在字节范围两侧各留一个值，越界的比较会表现为区间矛盾"""
+    return min(max(value, BYTE_MIN - 1), BYTE_MAX + 1)
+
+def fold_interval(interval, ascii_val, judge, operator='>'):
+    """
+    将一次比较结果折叠进单个位置的 [low, high, confirmed] 列表，规则与RecordIntervals.fold相同
+    用于只为尚未定稿的位置保存区间的场景（见streaming_data_reconstructor.py）
+    """
+    value = _clamp(ascii_val)
+    if operator == '!=':
+        if judge and (interval[2] == NO_VALUE or value < interval[2]):
+            interval[2] = value
+    elif operator == '>':
+        if judge:
+            if value < interval[1]:
+                interval[1] = value
+        elif value + 1 > interval[0]:
+            interval[0] = value + 1
+    elif operator == '<':
+        if judge:
+            if value > interval[0]:
+                interval[0] = value
+        elif value - 1 < interval[1]:
+            interval[1] = value - 1
+
+class RecordIntervals:
+    """一条记录所有字符位置的区间状态，位置p存放在各数组的下标p-1处"""
+    __slots__ = ('low', 'high', 'confirmed', 'initial_low', 'initial_high')
+
+    def __init__(self, initial_low=BYTE_MIN, initial_high=BYTE_MAX):
+        self.low = array('h')
+        self.high = array('h')
+        self.confirmed = array('h')
+        self.initial_low = initial_low
+        self.initial_high = initial_high
+
+    def __len__(self):
+        """已出现（或按已知长度预先分配）的最大位置"""
+        return len(self.low)
+
+    def _touch(self, index):
+        """确保下标存在，并将首次出现的位置初始化为完整区间"""
+        missing = index + 1 - len(self.low)
+        if missing > 0:
+            self.low.extend([UNSEEN] * missing)
+            self.high.extend([UNSEEN] * missing)
+            self.confirmed.extend([NO_VALUE] * missing)
+        if self.low[index] == UNSEEN:
+            self.low[index] = self.initial_low
+            self.high[index] = self.initial_high
+
+    def reserve(self, length):
+        """按已知的记录长度一次分配全部位置（尚未收到比较），避免逐位置扩展数组"""
+        missing = length - len(self.low)
+        if missing > 0:
+            self.low.extend([UNSEEN] * missing)
+            self.high.extend([UNSEEN] * missing)
+            self.confirmed.extend([NO_VALUE] * missing)
+
+    def fold(self, position, ascii_val, judge, operator='>'):
+        """将一次比较结果折叠进指定位置的状态"""
+        index = position - 1
+        self._touch(index)
+        value = _clamp(ascii_val)
+
+        if operator == '!=':
+            # 多个确认值时取最小值，与按比较值排序后首个命中的行为一致
+            if judge and (self.confirmed[index] == NO_VALUE or value < self.confirmed[index]):
+                self.confirmed[index] = value
+        elif operator == '>':
+            if judge:
+                if value < self.high[index]:
+                    self.high[index] = value
+            elif value + 1 > self.low[index]:
+                self.low[index] = value + 1
+        elif operator == '<':
+            if judge:
+                if value > self.low[index]:
+                    self.low[index] = value
+            elif value - 1 < self.high[index]:
+                self.high[index] = value - 1
+
+    def has(self, position):
+        """该位置是否收到过比较"""
+        index = position - 1
+        return 0 <= index < len(self.low) and self.low[index] != UNSEEN
+
+    def bounds(self, position):
+        """返回该位置当前的 (low, high) 区间"""
+        index = position - 1
+        return self.low[index], self.high[index]
+
+    def is_confirmed(self, position):
+        """该位置是否已有确认值"""
+        return self.confirmed[position - 1] != NO_VALUE
+
+    def confirm(self, position, value):
+        """直接写入确认值"""
+        index = position - 1
+        self._touch(index)
+        self.confirmed[index] = _clamp(value)
+
+    def value(self, position):
+        """
+        返回该位置的字符编码
+        优先使用确认值，其次使用收敛的区间，无法确定时返回None
+        """
+        index = position - 1
+        confirmed = self.confirmed[index]
+        if confirmed != NO_VALUE:
+            return confirmed
+        low = self.low[index]
+        return low if low == self.high[index] else None
+
+    def to_string(self):
+        """
+        按位置顺序拼接字符串
+        无法确定的位置被跳过，缺失的位置或值为0的字符表示字符串结束
+        """
+        chars = []
+        for position in range(1, len(self.low) + 1):
+            if not self.has(position):
+                break
+            char_code = self.value(position)
+            if char_code == 0:
+                break
+            if char_code is not None and self.initial_low <= char_code <= self.initial_high:
+                chars.append(chr(char_code))
+        return ''.join(chars)
+
+    def to_dict(self):
+        """导出为可JSON序列化的字典，用于检查点"""
+        return {
+            'low': self.low.tolist(),
+            'high': self.high.tolist(),
+            'confirmed': self.confirmed.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data, initial_low=BYTE_MIN, initial_high=BYTE_MAX):
+        """从to_dict()的结果恢复状态"""
+        state = cls(initial_low, initial_high)
+        state.low.extend(data['low'])
+        state.high.extend(data['high'])
+        state.confirmed.extend(data['confirmed'])
+        return state
+
+class IntervalStore:
+    """一列数据的区间状态，按record_id索引每条记录的类型化数组"""
+    __slots__ = ('records', 'initial_low', 'initial_high')
+
+    # 每条记录的状态类型，子类可替换为记录更多信息的实现
+    record_class = RecordIntervals
+
+    def __init__(self, initial_low=BYTE_MIN, initial_high=BYTE_MAX):
+        self.records = {}
+        self.initial_low = initial_low
+        self.initial_high = initial_high
+
+    def record(self, record_id):
+        """返回记录的区间状态，不存在时创建"""
+        state = self.records.get(record_id)
+        if state is None:
+            state = self.records[record_id] = self.record_class(self.initial_low, self.initial_high)
+        return state
+
+    def fold(self, record_id, position, ascii_val, judge, operator='>'):
+        """将一次比较结果折叠进 (record_id, position) 的状态"""
+        self.record(record_id).fold(position, ascii_val, judge, operator)
+
+    def values(self):
+        """按record_id顺序产出 (record_id, 重构的字符串)"""
+        for record_id in sorted(self.records.keys()):
+            yield record_id, self.records[record_id].to_string()
+
+    def to_dict(self):
+        """导出为可JSON序列化的字典，用于检查点"""
+        return {
+            'initial_low': self.initial_low,
+            'initial_high': self.initial_high,
+            'records': {str(record_id): state.to_dict() for record_id, state in self.records.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """从to_dict()的结果恢复状态"""
+        store = cls(data['initial_low'], data['initial_high'])
+        for record_id, state in data['records'].items():
+            store.records[int(record_id)] = store.record_class.from_dict(
+                state, store.initial_low, store.initial_high)
+        return store
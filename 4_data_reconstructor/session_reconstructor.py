@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+file: session_reconstructor.py
+会话划分重构器 - 按攻击会话划分分析结果，各会话独立重构，可用进程池并行
+输入: JSON行或列式批次格式的分析结果（自动识别，请求数据需包含会话字段，见2_param_extractor.py --session）
+输出: 结构化JSON数据，每个会话一份重构结果
+
+默认重构器按 库.表 合并全部分析结果，多个攻击者同时攻击同一张表、或对同一张表重复运行sqlmap时，
+不同会话的比较结果会混在同一个字符位置上互相干扰。本重构器按以下会话键划分：
+  - host:  来源地址 remote_host
+  - agent: User-Agent
+  - path:  请求路径（不含查询字符串）
+  - 时间窗口: 同一会话键的相邻两次请求间隔超过 --session-gap 秒时开始新会话
+各会话的分析结果交给default/streaming/bisection重构器独立重构，互不影响。
+"""
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import functools
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import record_codec
+import stage_stats
+import forensic_store
+
+import default_data_reconstructor
+import bisection_data_reconstructor
+import streaming_data_reconstructor
+from default_data_reconstructor import MIN_ASCII, MAX_ASCII, add_store_arguments
+from interval_state import BYTE_MIN, BYTE_MAX
+
+# 会话键名称 -> 请求数据中的字段
+SESSION_KEYS = {
+    'host': 'remote_host',
+    'agent': 'user_agent',
+    'path': 'path'
+}
+
+DEFAULT_SESSION_KEYS = ['host', 'agent', 'path']
+
+# 同一会话键的相邻请求间隔超过该值（秒）时开始新会话
+DEFAULT_SESSION_GAP = 1800
+
+# 通用/组合日志格式和nginx $time_local的时间戳格式
+TIMESTAMP_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+# 传给重构进程的分析字段，以元组传递减少序列化开销
+PARTITION_FIELDS = ('type', 'database', 'table', 'column', 'position',
+                    'ascii_value', 'judge', 'comparison_operator', 'record_id', 'probe')
+
+@functools.lru_cache(maxsize=4096)
+def parse_timestamp(text):
+    """将日志时间戳解析为Unix时间（秒），无法解析时返回None"""
+    if not text:
+        return None
+    try:
+        return datetime.strptime(text, TIMESTAMP_FORMAT).timestamp()
+    except ValueError:
+        pass
+    try:
+        # nginx $time_iso8601
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return None
+
+def parse_session_keys(keys):
+    """解析逗号分隔的会话键"""
+    names = [name.strip() for name in keys.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SESSION_KEYS]
+    if unknown:
+        raise ValueError(f"未知的会话键: {', '.join(unknown)}")
+    return names
+
+class SessionPartitioner:
+    """按会话键和时间窗口为请求分配会话，同时收集每个会话的分析结果"""
+    def __init__(self, keys=None, gap=DEFAULT_SESSION_GAP):
+        self.fields = [SESSION_KEYS[name] for name in (keys or DEFAULT_SESSION_KEYS)]
+        self.gap = gap
+        # 会话信息列表，下标即会话序号
+        self.sessions = []
+        # 会话序号 -> 注入分析结果的字段元组列表
+        self.partitions = {}
+        # 会话键 -> (当前会话序号, 最近一次请求的时间)
+        self.open_sessions = {}
+        self.keyed_requests = 0
+
+    def session_of(self, request):
+        """返回请求所属的会话序号，必要时开始新会话"""
+        key = tuple(request.get(field) or '' for field in self.fields)
+        if any(key):
+            self.keyed_requests += 1
+        timestamp = request.get('timestamp', '')
+        moment = parse_timestamp(timestamp)
+
+        current = self.open_sessions.get(key)
+        if current is not None:
+            index, last = current
+            if moment is None or last is None or self.gap <= 0 or moment - last <= self.gap:
+                session = self.sessions[index]
+                session['end'] = timestamp or session['end']
+                self.open_sessions[key] = (index, moment if moment is not None else last)
+                return index
+
+        index = len(self.sessions)
+        session = {'session': index + 1}
+        for field, value in zip(self.fields, key):
+            session[field] = value
+        session.update({'start': timestamp, 'end': timestamp, 'requests': 0, 'injections': 0})
+        self.sessions.append(session)
+        self.open_sessions[key] = (index, moment)
+        return index
+
+    def add(self, result):
+        """按会话收集一条分析结果（{'request', 'analysis'}）"""
+        index = self.session_of(result.get('request', {}))
+        session = self.sessions[index]
+        session['requests'] += 1
+        analysis = result['analysis']
+        if "inject" in analysis['type'] and analysis['table'] and (analysis['column'] or analysis.get('probe')):
+            session['injections'] += 1
+            self.partitions.setdefault(index, []).append(
+                tuple(analysis.get(field, '') for field in PARTITION_FIELDS))
+
+    def feed(self, results):
+        for result in results:
+            self.add(result)
+
+    def tasks(self, reconstructor='default', min_val=MIN_ASCII, max_val=MAX_ASCII):
+        """各会话的重构任务，按会话开始的顺序排列"""
+        return [(reconstructor, self.partitions[index], min_val, max_val)
+                for index in sorted(self.partitions)]
+
+def reconstruct_partition(task):
+    """重构一个会话的分析结果（可在工作进程中执行）"""
+    reconstructor, rows, min_val, max_val = task
+    analyses = (dict(zip(PARTITION_FIELDS, row)) for row in rows)
+    if reconstructor == 'streaming':
+        state = streaming_data_reconstructor.StreamingReconstructor(min_val, max_val)
+        for _ in state.fold(analyses):
+            pass
+        return state.flush()
+    if reconstructor == 'bisection':
+        return bisection_data_reconstructor.reconstruct_data(analyses, min_val, max_val)
+    return default_data_reconstructor.reconstruct_data(analyses, min_val, max_val)
+
+def reconstruct_sessions(results, keys=None, gap=DEFAULT_SESSION_GAP, reconstructor='default',
+                         workers=1, min_val=MIN_ASCII, max_val=MAX_ASCII):
+    """
+    按会话划分分析结果流并逐个会话重构
+    workers大于1时由进程池并行重构各会话
+    返回 {'sessions': [会话信息 + 'result': 重构结果]}，只包含有注入分析结果的会话，按开始顺序从1编号
+    """
+    partitioner = SessionPartitioner(keys, gap)
+    partitioner.feed(results)
+    if partitioner.sessions and not partitioner.keyed_requests:
+        print("[+] 请求数据中没有会话字段，全部请求视为同一会话（参数提取时需要使用 --session）",
+              file=sys.stderr)
+
+    tasks = partitioner.tasks(reconstructor, min_val, max_val)
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            reconstructed = list(executor.map(reconstruct_partition, tasks))
+    else:
+        reconstructed = [reconstruct_partition(task) for task in tasks]
+
+    sessions = []
+    for number, (index, result) in enumerate(zip(sorted(partitioner.partitions), reconstructed), 1):
+        session = dict(partitioner.sessions[index])
+        session['session'] = number
+        session['result'] = result
+        sessions.append(session)
+    return {'sessions': sessions}
+
+def session_summary(data):
+    """会话划分结果的单行摘要"""
+    sessions = data['sessions']
+    requests = sum(session['requests'] for session in sessions)
+    return f"[+] 会话划分: {len(sessions)} 个会话包含注入请求, 共 {requests} 条请求"
+
+def main():
+    parser = argparse.ArgumentParser(description='会话划分重构器')
+    parser.add_argument('-k', '--session-keys', default=','.join(DEFAULT_SESSION_KEYS),
+                        help=f"逗号分隔的会话键，可选 {', '.join(SESSION_KEYS)} (默认: {','.join(DEFAULT_SESSION_KEYS)})")
+    parser.add_argument('--session-gap', type=float, default=DEFAULT_SESSION_GAP,
+                        help=f'同一会话键的请求间隔超过该值（秒）时开始新会话，0表示不按时间划分 (默认: {DEFAULT_SESSION_GAP})')
+    parser.add_argument('-r', '--reconstructor', choices=['default', 'streaming', 'bisection'], default='default',
+                        help='各会话使用的重构器 (默认: default)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='并行重构的进程数 (默认: 1)')
+    parser.add_argument('--full-range', action='store_true',
+                        help='使用完整字节范围0-255作为字符初始区间（默认为可打印字符32-126）')
+    add_store_arguments(parser)
+    stage_stats.add_stats_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        keys = parse_session_keys(args.session_keys)
+    except ValueError as e:
+        print(f"Error parsing session keys: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    stats = stage_stats.from_args(args, 'reconstruct', aggregate=True)
+
+    @stats.count_errors
+    def report_error(e):
+        print(f"Error loading analysis: {e}", file=sys.stderr)
+
+    if args.store:
+        # 取证数据库保存了请求中的会话字段，可直接按会话划分
+        try:
+            records = forensic_store.read_store(args.store, args)
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error reading forensic store: {e}", file=sys.stderr)
+            sys.exit(1)
+    elif forensic_store.has_filters(args):
+        print("Error reading analyses: 过滤参数需要配合 --store 使用", file=sys.stderr)
+        sys.exit(1)
+    else:
+        records = record_codec.read_records(on_error=report_error)
+
+    min_val, max_val = (BYTE_MIN, BYTE_MAX) if args.full_range else (MIN_ASCII, MAX_ASCII)
+    results = (result for result in stats.count_in(records) if 'analysis' in result)
+    with stage_stats.profiled(args.profile):
+        data = reconstruct_sessions(results, keys, args.session_gap, args.reconstructor,
+                                    args.workers, min_val, max_val)
+    print(session_summary(data), file=sys.stderr)
+    print(json.dumps(data, indent=2))
+    stats.finish(len(data['sessions']))
+    stage_stats.report(args, [stats])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+file: streaming_data_reconstructor.py
+流式数据重构器 - 逐条折叠分析结果，区间状态只为尚未定稿的字符位置保存
+输入: JSON行或列式批次格式的分析结果（自动识别）
+输出: 结构化JSON数据（与default_data_reconstructor.py的结构一致）
+
+每个尚未定稿的 (表, 列, 记录, 位置) 保存一个取值区间，比较结果到达时立即收窄。
+以下情况该位置定稿，之后的比较不再影响它：
+  - 收到判断为真的 != 确认比较
+  - sqlmap的二分查找转向同一记录的其他位置，且该位置的区间已收敛为单个值
+  - 已通过sqlmap的LENGTH查询得知记录长度（见enumeration_state.py），且该位置的区间已收敛为单个值
+定稿的位置释放区间，只保留2字节的字符编码用于最终输出；已知长度的记录全部位置定稿后
+立即输出整条记录（record事件）并释放该记录的全部区间状态，之后该记录的比较直接忽略。
+区间状态的内存占用与未定稿的字符数成正比，已定稿的字符只占最终结果本身的大小。
+
+与default_data_reconstructor.py的区别：定稿后到达的比较被忽略。sqlmap因超时等原因重新提取
+已定稿的位置时，默认重构器会继续收窄区间（多个确认值取最小值），两者的结果可能不同
+（如示例时间盲注日志中 COLUMN_NAME 第5个字符先后被确认为 o 和 e，流式重构器输出 eiployee_id，
+默认重构器输出 eipleyee_id）。需要与默认重构器完全一致时使用 --exact：不提前定稿，
+不输出字符和record事件，全部区间状态保留到输入结束，内存占用与默认重构器相同。
+"""
+import os
+import sys
+import json
+import signal
+import argparse
+from array import array
+
+from default_data_reconstructor import (MIN_ASCII, MAX_ASCII, add_rows_argument, add_store_arguments,
+                                        input_analyses, print_results)
+from interval_state import BYTE_MIN, BYTE_MAX, NO_VALUE, UNSEEN, IntervalStore, fold_interval
+from enumeration_state import LENGTH, EnumerationState
+import stage_stats
+
+class StreamingRecord:
+    """
+    一条记录的流式状态，接口与RecordIntervals相同（供flush和提取完整度计算使用）
+    chars: 位置p的定稿字符编码存放在下标p-1处，未定稿为NO_VALUE；
+    pending: 未定稿位置 -> [low, high, confirmed]，记录全部定稿后为None
+    """
+    __slots__ = ('chars', 'pending', 'active', 'resolved', 'initial_low', 'initial_high')
+
+    def __init__(self, initial_low=BYTE_MIN, initial_high=BYTE_MAX):
+        self.chars = array('h')
+        self.pending = {}
+        # 正在二分查找的位置
+        self.active = None
+        # 已定稿的位置数
+        self.resolved = 0
+        self.initial_low = initial_low
+        self.initial_high = initial_high
+
+    def __len__(self):
+        """已出现（或按已知长度预先分配）的最大位置"""
+        return len(self.chars)
+
+    @property
+    def finished(self):
+        """已知长度且全部位置定稿"""
+        return self.pending is None
+
+    def reserve(self, length):
+        """按已知的记录长度分配全部位置"""
+        missing = length - len(self.chars)
+        if missing > 0:
+            self.chars.extend([NO_VALUE] * missing)
+
+    def fold(self, position, ascii_val, judge, operator='>'):
+        """将一次比较结果折叠进未定稿位置的区间"""
+        self.reserve(position)
+        interval = self.pending.get(position)
+        if interval is None:
+            interval = self.pending[position] = [self.initial_low, self.initial_high, NO_VALUE]
+        fold_interval(interval, ascii_val, judge, operator)
+
+    def has(self, position):
+        """该位置是否收到过比较"""
+        if not 0 < position <= len(self.chars):
+            return False
+        return self.chars[position - 1] != NO_VALUE or (self.pending is not None and position in self.pending)
+
+    def is_final(self, position):
+        """该位置是否已定稿"""
+        return 0 < position <= len(self.chars) and self.chars[position - 1] != NO_VALUE
+
+    def bounds(self, position):
+        """返回该位置当前的 (low, high) 区间"""
+        if self.is_final(position):
+            char_code = self.chars[position - 1]
+            return char_code, char_code
+        low, high, _ = self.pending[position]
+        return low, high
+
+    def value(self, position):
+        """返回该位置的字符编码，无法确定时返回None"""
+        if self.is_final(position):
+            return self.chars[position - 1]
+        low, high, confirmed = self.pending[position]
+        if confirmed != NO_VALUE:
+            return confirmed
+        return low if low == high else None
+
+    def finalize(self, position, char_code):
+        """定稿一个位置：保存字符编码并释放区间"""
+        self.reserve(position)
+        self.chars[position - 1] = char_code
+        self.pending.pop(position, None)
+        self.resolved += 1
+
+    def close(self):
+        """记录全部定稿：剩余位置中已收敛的保存字符编码，释放区间状态"""
+        for position in self.pending:
+            char_code = self.value(position)
+            if char_code is not None:
+                self.chars[position - 1] = char_code
+        self.pending = None
+        self.active = None
+
+    def to_string(self):
+        """按位置顺序拼接字符串，规则与RecordIntervals.to_string相同"""
+        chars = []
+        for position in range(1, len(self.chars) + 1):
+            if not self.has(position):
+                break
+            char_code = self.value(position)
+            if char_code == 0:
+                break
+            if char_code is not None and self.initial_low <= char_code <= self.initial_high:
+                chars.append(chr(char_code))
+        return ''.join(chars)
+
+    def to_dict(self):
+        """导出为可JSON序列化的字典，用于检查点"""
+        return {
+            'chars': self.chars.tolist(),
+            'pending': None if self.pending is None else
+                       [[position] + interval for position, interval in self.pending.items()],
+            'active': self.active
+        }
+
+    @classmethod
+    def from_dict(cls, data, initial_low=BYTE_MIN, initial_high=BYTE_MAX):
+        """从to_dict()的结果恢复状态，也接受旧版本检查点中RecordIntervals的状态"""
+        state = cls(initial_low, initial_high)
+        if 'low' in data:
+            # 旧版本每个位置都保存区间，定稿的位置以确认值保存
+            for position, (low, high, confirmed) in enumerate(
+                    zip(data['low'], data['high'], data['confirmed']), 1):
+                state.chars.append(NO_VALUE)
+                if confirmed != NO_VALUE:
+                    state.finalize(position, confirmed)
+                elif low != UNSEEN:
+                    state.pending[position] = [low, high, NO_VALUE]
+            return state
+        state.chars.extend(data['chars'])
+        state.resolved = sum(1 for char_code in state.chars if char_code != NO_VALUE)
+        if data['pending'] is None:
+            state.close()
+        else:
+            state.pending = {position: [low, high, confirmed] for position, low, high, confirmed in data['pending']}
+            state.active = data['active']
+        return state
+
+class StreamingStore(IntervalStore):
+    """一列数据的流式状态"""
+    __slots__ = ()
+    record_class = StreamingRecord
+
+class StreamingReconstructor:
+    def __init__(self, min_val=MIN_ASCII, max_val=MAX_ASCII, early_finalize=True):
+        self.database = ''
+        self.tables = []
+        self.columns = {}
+        self.min_val = min_val
+        self.max_val = max_val
+        # 是否提前定稿位置（为False时所有比较都折叠进区间，结果与默认重构器一致）
+        self.early_finalize = early_finalize
+        # table_key -> column -> StreamingStore
+        self.records = {}
+        # 未定稿的位置数
+        self.pending_count = 0
+        self.analysis_count = 0
+        # COUNT/LENGTH枚举查询的结果
+        self.enumeration = EnumerationState()
+
+    def feed(self, analysis):
+        """
+        折叠一条分析结果
+        返回本次定稿的字符事件列表，记录全部定稿时追加 {'event': 'record', ...} 事件
+        """
+        self.analysis_count += 1
+        if analysis.get('probe'):
+            if "inject" in analysis['type'] and analysis['table']:
+                return self.feed_probe(analysis)
+            return []
+        if not ("inject" in analysis['type'] and analysis['table'] and analysis['column']):
+            return []
+
+        if not self.database and analysis['database']:
+            self.database = analysis['database']
+
+        table_name = analysis['table']
+        if table_name not in self.tables:
+            self.tables.append(table_name)
+
+        table_key = f"{analysis['database']}.{analysis['table']}"
+        column = analysis['column']
+        table_columns = self.columns.setdefault(table_key, [])
+        if column not in table_columns:
+            table_columns.append(column)
+
+        position = analysis['position']
+        if position <= 0:
+            return []
+
+        record_id = analysis['record_id']
+        store = self.records.setdefault(table_key, {}).get(column)
+        if store is None:
+            store = self.records[table_key][column] = StreamingStore(self.min_val, self.max_val)
+        record = store.record(record_id)
+        if record.finished:
+            return []
+        length = self.enumeration.length(table_key, column, record_id)
+        if length is not None:
+            if position > length:
+                # 超出已知长度的位置是sqlmap在探测字符串结束，不属于记录
+                return []
+            record.reserve(length)
+        if not self.early_finalize:
+            if not record.has(position):
+                self.pending_count += 1
+            record.fold(position, analysis['ascii_value'], analysis['judge'],
+                        analysis.get('comparison_operator', '>'))
+            return []
+        record_key = (table_key, column, record_id)
+        events = []
+
+        # 二分查找转向新位置：上一个位置如已收敛则定稿
+        previous = record.active
+        if previous is not None and previous != position and previous in record.pending:
+            low, high = record.bounds(previous)
+            if low == high:
+                events.append(self.finalize(record_key, record, previous, low))
+        record.active = position
+
+        if not record.is_final(position):
+            if not record.has(position):
+                self.pending_count += 1
+
+            operator = analysis.get('comparison_operator', '>')
+            record.fold(position, analysis['ascii_value'], analysis['judge'], operator)
+            if operator == '!=' and analysis['judge']:
+                events.append(self.finalize(record_key, record, position, analysis['ascii_value']))
+            elif length is not None:
+                # 已知长度时区间收敛即定稿，不必等二分查找转向其他位置
+                low, high = record.bounds(position)
+                if low == high:
+                    events.append(self.finalize(record_key, record, position, low))
+
+        if length is not None and record.resolved >= length:
+            events.append(self.complete_record(record_key, record))
+        return events
+
+    def feed_probe(self, analysis):
+        """折叠一条枚举查询，解码出记录长度时预先分配该记录，记录已全部定稿时输出record事件"""
+        decoded = self.enumeration.fold(analysis)
+        if decoded is None or decoded[0] != LENGTH:
+            return []
+        _, record_key, length = decoded
+        table_key, column, record_id = record_key
+        store = self.records.get(table_key, {}).get(column)
+        record = store.records.get(record_id) if store is not None else None
+        if record is None or record.finished or not self.early_finalize:
+            return []
+        record.reserve(length)
+        if record.resolved < length:
+            return []
+        return [self.complete_record(record_key, record)]
+
+    def finalize(self, record_key, record, position, char_code):
+        """定稿一个位置：保存字符编码并释放区间，之后的比较不再影响该位置"""
+        table_key, column, record_id = record_key
+        record.finalize(position, char_code)
+        self.pending_count -= 1
+        return {
+            'table': table_key,
+            'column': column,
+            'record_id': record_id,
+            'position': position,
+            'ascii_value': char_code
+        }
+
+    def complete_record(self, record_key, record):
+        """已知长度的记录全部定稿：释放区间状态，之后该记录的比较不再处理"""
+        table_key, column, record_id = record_key
+        self.pending_count -= len(record.pending)
+        record.close()
+        return {
+            'event': 'record',
+            'table': table_key,
+            'column': column,
+            'record_id': record_id,
+            'value': record.to_string()
+        }
+
+    def fold(self, analyses):
+        """折叠分析结果流，逐个产出定稿的字符事件"""
+        for analysis in analyses:
+            yield from self.feed(analysis)
+
+    def flush(self):
+        """返回当前的部分重构结果，结构与default_data_reconstructor.py的输出一致"""
+        results = {
+            'database': self.database,
+            'tables': list(self.tables),
+            'columns': {table_key: list(columns) for table_key, columns in self.columns.items()},
+            'data': {}
+        }
+
+        for table_key, columns in self.records.items():
+            results['data'][table_key] = {}
+
+            for column, store in columns.items():
+                values = [value for _, value in store.values() if value]
+                if values:
+                    results['data'][table_key][column] = values
+
+        if self.enumeration:
+            results['completeness'] = self.enumeration.completeness(self.records)
+        return results
+
+    def to_checkpoint(self):
+        """导出完整的重构状态（可JSON序列化），用于检查点"""
+        return {
+            'database': self.database,
+            'tables': list(self.tables),
+            'columns': {table_key: list(columns) for table_key, columns in self.columns.items()},
+            'min_val': self.min_val,
+            'max_val': self.max_val,
+            'early_finalize': self.early_finalize,
+            'records': {table_key: {column: store.to_dict() for column, store in columns.items()}
+                        for table_key, columns in self.records.items()},
+            'pending_count': self.pending_count,
+            'analysis_count': self.analysis_count,
+            'enumeration': self.enumeration.to_dict()
+        }
+
+    @classmethod
+    def from_checkpoint(cls, state):
+        """从to_checkpoint()的结果恢复重构器，也接受旧版本的检查点"""
+        reconstructor = cls(state['min_val'], state['max_val'], state.get('early_finalize', True))
+        reconstructor.database = state['database']
+        reconstructor.tables = list(state['tables'])
+        reconstructor.columns = {table_key: list(columns) for table_key, columns in state['columns'].items()}
+        reconstructor.records = {table_key: {column: StreamingStore.from_dict(store)
+                                             for column, store in columns.items()}
+                                 for table_key, columns in state['records'].items()}
+        reconstructor.pending_count = state['pending_count']
+        reconstructor.analysis_count = state['analysis_count']
+        # 旧版本的检查点在重构器上保存二分查找位置和已完成的记录
+        for table_key, column, record_id, position in state.get('active_positions', ()):
+            reconstructor.records[table_key][column].record(record_id).active = position
+        for table_key, column, record_id in state.get('finished', ()):
+            reconstructor.records[table_key][column].record(record_id).close()
+        # 更早版本的检查点没有枚举查询状态
+        if 'enumeration' in state:
+            reconstructor.enumeration = EnumerationState.from_dict(state['enumeration'])
+        return reconstructor
+
+def write_partial(results, path):
+    """原子地写入部分重构结果"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp_path, path)
+
+def main():
+    parser = argparse.ArgumentParser(description='流式数据重构器')
+    parser.add_argument('--full-range', action='store_true',
+                        help='使用完整字节范围0-255作为字符初始区间（默认为可打印字符32-126）')
+    parser.add_argument('--exact', action='store_true',
+                        help='不提前定稿，结果与default_data_reconstructor.py完全一致；'
+                             '不输出字符事件，全部区间状态保留到输入结束')
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--stream', action='store_true',
+                        help='字符定稿后立即以JSON行输出事件，结束时输出完整结果')
+    add_rows_argument(output)
+    parser.add_argument('--partial-output', help='部分重构结果的输出文件')
+    parser.add_argument('--flush-every', type=int, default=0,
+                        help='每处理N条分析结果写入一次部分结果（需要 --partial-output）')
+    add_store_arguments(parser)
+    stage_stats.add_stats_arguments(parser)
+    args = parser.parse_args()
+
+    analyses = input_analyses(args)
+    min_val, max_val = (BYTE_MIN, BYTE_MAX) if args.full_range else (MIN_ASCII, MAX_ASCII)
+    reconstructor = StreamingReconstructor(min_val, max_val, early_finalize=not args.exact)
+
+    # 收到SIGUSR1时在下一条分析结果后写入部分结果
+    flush_requested = []
+    if args.partial_output and hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: flush_requested.append(signum))
+
+    stats = stage_stats.from_args(args, 'reconstruct', aggregate=True)
+    events_out = 0
+    with stage_stats.profiled(args.profile):
+        for analysis in stats.count_in(analyses):
+            events = reconstructor.feed(analysis)
+            if args.stream:
+                for event in events:
+                    events_out += 1
+                    print(json.dumps({'event': 'char', **event}), flush=True)
+
+            if args.partial_output:
+                periodic = args.flush_every and reconstructor.analysis_count % args.flush_every == 0
+                if periodic or flush_requested:
+                    flush_requested.clear()
+                    write_partial(reconstructor.flush(), args.partial_output)
+
+        results = reconstructor.flush()
+    if args.partial_output:
+        write_partial(results, args.partial_output)
+
+    if args.stream:
+        print(json.dumps({'event': 'result', 'result': results}))
+    else:
+        print_results(results, args.rows)
+    stats.finish(events_out + 1)
+    stage_stats.report(args, [stats])
+
+if __name__ == '__main__':
+    main()
@@ -2,202 +2,651 @@
 """
 file: default_report_generator.py
 报告生成器 - 创建最终报告
-输入: 结构化JSON数据
-输出: 控制台报告和多种格式文件
+输入: 结构化JSON数据（或session_reconstructor.py按会话划分的结果），
+      或重构器 --rows 输出的JSON行取值流（第一行为元数据，之后每行一个取值，同一张表的行相邻），
+      或 --store 指定的取证数据库（按过滤参数读取分析结果后直接重构）；
+      --timeline 指定的攻击时间线（timeline.py的输出）
+输出: 控制台报告和多种格式文件，按会话划分时每个会话一份报告
+
+重构数据按表逐个分发给控制台和所有文件格式的写入器，只遍历一次：
+不复制取值列表，也不为CSV的每一行构建字典，各写入器通过缓冲区增量写入文件。
+JSON行取值流逐行读取，每读完一张表就分发给写入器，内存中只保留当前这张表的取值。
 """
 import os
 import sys
-import json
 import csv
+import gzip
+import json
 import argparse
+import importlib.util
+from itertools import chain, islice, zip_longest
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '4_data_reconstructor'))
+import stage_stats
+import forensic_store
+import default_data_reconstructor
+
+# 文件报告格式，all 为 json,csv,txt
+REPORT_FORMATS = ('json', 'csv', 'txt', 'jsonl', 'parquet', 'arrow')
+ALL_FORMATS = ('json', 'csv', 'txt')
+
+# 需要pyarrow模块的报告格式
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+# 控制台报告中每列最多显示的记录数
+DEFAULT_CONSOLE_ROWS = 20
+
+# 报告文件的写缓冲区大小
+BUFFER_SIZE = 1 << 20
+
+# 增量写入时每批处理的取值数
+BATCH_SIZE = 65536
+
+def parse_output_formats(text):
+    """
+    逗号分隔的报告格式列表，all 展开为 json,csv,txt
+    列式格式在这里检查pyarrow模块，缺少依赖时在创建任何报告文件之前报错
+    """
+    formats = []
+    for name in text.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name != 'all' and name not in REPORT_FORMATS:
+            raise ValueError(f"未知的报告格式 {name}，可选 {','.join(REPORT_FORMATS)},all")
+        if name in COLUMNAR_FORMATS and importlib.util.find_spec('pyarrow') is None:
+            raise ValueError(f"{name}格式报告需要pyarrow模块")
+        for fmt in ALL_FORMATS if name == 'all' else (name,):
+            if fmt not in formats:
+                formats.append(fmt)
+    if not formats:
+        raise ValueError("报告格式不能为空")
+    return formats
+
 def parse_arguments():
     """解析命令行参数"""
     parser = argparse.ArgumentParser(description='SQL注入攻击报告生成器')
-    parser.add_argument('-o', '--output', choices=['json', 'csv', 'txt', 'all'], 
-                        default='json', help='输出格式 (默认: json)')
-    return parser.parse_args()
+    parser.add_argument('-o', '--output', default='json',
+                        help=f"逗号分隔的输出格式，可选 {','.join(REPORT_FORMATS)}，"
+                             f"all 等于 {','.join(ALL_FORMATS)} (默认: json)")
+    parser.add_argument('--console-rows', type=int, default=DEFAULT_CONSOLE_ROWS,
+                        help=f'控制台报告中每列最多显示的记录数，0表示全部显示 (默认: {DEFAULT_CONSOLE_ROWS})')
+    parser.add_argument('--timeline', metavar='FILE',
+                        help='攻击时间线文件（timeline.py的输出），写入报告')
+    default_data_reconstructor.add_store_arguments(parser)
+    stage_stats.add_stats_arguments(parser)
+    args = parser.parse_args()
+    try:
+        parse_output_formats(args.output)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+class ColumnValues:
+    """
+    一列被盗数据：不同数据库中的同名表合并为一张表，
+    该列的取值按顺序拼接各个表的取值列表，不复制列表本身，可以重复遍历
+    """
+    def __init__(self):
+        self.segments = []
+
+    def __len__(self):
+        return sum(len(values) for values in self.segments)
+
+    def __iter__(self):
+        return chain.from_iterable(self.segments)
 
 def create_report_structure(data):
     """创建报告基本结构"""
-    return {
+    report = {
         'database': data.get('database', ''),
         'compromised_tables': data.get('tables', []),
         'columns_info': data.get('columns', {}),
         'stolen_data': extract_stolen_data(data),
         'analysis_time': datetime.now().isoformat()
     }
+    # 重构器从COUNT/LENGTH枚举查询计算出的提取完整度
+    if data.get('completeness'):
+        report['completeness'] = data['completeness']
+    # 攻击时间线（timeline.py）：请求速率、攻击起止时间和每条数据的提取完成时间
+    if data.get('timeline'):
+        report['timeline'] = data['timeline']
+    return report
 
 def extract_stolen_data(data):
-    """从输入数据中提取被盗数据"""
+    """从输入数据中提取被盗数据，按表名分组：表名 -> 列名 -> ColumnValues"""
     stolen_data = {}
-    
+
     for table_key, columns in data.get('data', {}).items():
-        table_name = table_key.split('.')[-1]
-        if table_name not in stolen_data:
-            stolen_data[table_name] = {}
-        
+        table = stolen_data.setdefault(table_key.split('.')[-1], {})
         for column, values in columns.items():
-            if column not in stolen_data[table_name]:
-                stolen_data[table_name][column] = []
-            
-            stolen_data[table_name][column].extend(values)
-    
+            table.setdefault(column, ColumnValues()).segments.append(values)
+
     return stolen_data
 
-def print_console_report(report):
-    """在控制台输出报告"""
-    print("\n" + "="*60)
-    print("SQL盲注攻击分析报告")
-    print("="*60)
+def group_value_rows(rows):
+    """
+    将JSON行取值 {"table", "column", "value"} 按表名分组，产出 (表名, 列名 -> 取值列表)
+    与extract_stolen_data相同，不同数据库中的同名表合并为一张表；同一张表的行必须相邻
+    """
+    finished = set()
+    current = None
+    columns = {}
+    for row in rows:
+        table_name = row['table'].split('.')[-1]
+        if table_name != current:
+            if current is not None:
+                yield current, columns
+                finished.add(current)
+            if table_name in finished:
+                raise ValueError(f"JSON行输入中表 {table_name} 的行不相邻")
+            current = table_name
+            columns = {}
+        columns.setdefault(row['column'], []).append(row['value'])
+    if current is not None:
+        yield current, columns
 
-    if report['database']:
-        print(f"\n[+] 目标数据库: {report['database']}")
+def read_input(stream):
+    """
+    读取标准输入，返回 (重构数据, 按表产出被盗数据的迭代器)
+    第一行是完整的JSON对象且不是重构结果（没有data/sessions字段）时按JSON行取值流读取：
+    该行不含value字段时作为元数据（database、tables、columns等），之后的行逐行解析；
+    否则整个输入作为一个JSON文档读取，迭代器为None
+    """
+    first = stream.readline()
+    try:
+        head = json.loads(first)
+    except ValueError:
+        return json.loads(first + stream.read()), None
+    if not isinstance(head, dict) or 'data' in head or 'sessions' in head:
+        return head, None
 
-    if report['compromised_tables']:
-        print(f"\n[+] 被攻击的表:")
-        for table in report['compromised_tables']:
-            print(f"    - {table}")
+    lines = (json.loads(line) for line in stream if line.strip())
+    if 'value' in head:
+        return {}, group_value_rows(chain([head], lines))
+    return head, group_value_rows(lines)
 
-    if report['columns_info']:
-        print(f"\n[+] 发现的列结构:")
-        for table_key, columns in report['columns_info'].items():
-            print(f"    {table_key}:")
-            for column in columns:
-                print(f"      - {column}")
+def batched(iterable, size=BATCH_SIZE):
+    """按批产出列表"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
 
-    # 输出被盗数据
-    for table_name, columns in report['stolen_data'].items():
+def format_percent(percent):
+    """百分比，无法计算时显示为未知"""
+    return f"{percent}%" if percent is not None else '未知'
+
+def completeness_lines(completeness):
+    """
+    提取完整度的文本行：表名 行数 百分比，其下每列的完整记录数和百分比
+    长度未知（没有LENGTH查询）的记录单独列出，不计入百分比
+    """
+    for table_key, entry in completeness.items():
+        rows = entry['rows'] if entry['rows'] is not None else '未知'
+        yield f"    {table_key}: 行数 {rows}，完整度 {format_percent(entry['percent'])}"
+        for column, stats in entry['columns'].items():
+            line = f"      - {column}: {stats['complete']}/{stats['expected']} 条完整，{format_percent(stats['percent'])}"
+            if stats.get('unknown'):
+                line += f"（{stats['unknown']} 条长度未知）"
+            yield line
+
+def timeline_lines(timeline, max_secrets=0):
+    """攻击时间线的文本行，max_secrets大于0时最多列出该数量的数据提取完成时间"""
+    rates = timeline['rates']
+    yield f"    攻击时间: {timeline['start']} ~ {timeline['end']}（持续 {timeline['duration']} 秒，UTC）"
+    yield f"    请求数: {timeline['requests']}，其中盲注提取请求 {timeline['extractions']}"
+    for name, unit in (('per_second', '秒'), ('per_minute', '分钟')):
+        stats = rates[name]['extractions']
+        if stats['peak_at'] is not None:
+            yield f"    提取速率: 峰值 {stats['peak']} 次/{unit}（{stats['peak_at']}），平均 {stats['mean']} 次/{unit}"
+    secrets = timeline['secrets']
+    if secrets:
+        yield "    数据提取完成时间:"
+    shown = secrets if max_secrets <= 0 else secrets[:max_secrets]
+    for secret in shown:
+        yield (f"      - {secret['table']}.{secret['column']} 记录 {secret['record_id'] + 1}: {secret['extracted_at']}"
+               f"（用时 {secret['duration']} 秒，{secret['requests']} 次请求）")
+    if len(secrets) > len(shown):
+        yield f"      ... 省略其余 {len(secrets) - len(shown)} 条数据（完整时间线见报告文件）"
+
+def report_header(report):
+    """报告中除被盗数据以外的字段"""
+    return {key: value for key, value in report.items() if key != 'stolen_data'}
+
+class ReportWriter:
+    """
+    报告写入器：begin 写入报告头，write_table 按表增量写入被盗数据，
+    close 完成写入并返回报告文件路径，abort 在出错时关闭并删除写了一半的报告文件
+    """
+    def begin(self, report):
+        pass
+
+    def write_table(self, table_name, columns):
+        pass
+
+    def close(self):
+        return None
+
+    def abort(self):
+        pass
+
+def remove_file(path):
+    """删除文件，文件不存在时忽略"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+class ConsoleWriter(ReportWriter):
+    """在控制台输出报告，大表只显示每列的前 max_rows 条记录"""
+    def __init__(self, max_rows=DEFAULT_CONSOLE_ROWS):
+        self.max_rows = max_rows
+
+    def begin(self, report):
+        print("\n" + "="*60)
+        print("SQL盲注攻击分析报告")
+        print("="*60)
+
+        if report['database']:
+            print(f"\n[+] 目标数据库: {report['database']}")
+
+        if report['compromised_tables']:
+            print(f"\n[+] 被攻击的表:")
+            for table in report['compromised_tables']:
+                print(f"    - {table}")
+
+        if report['columns_info']:
+            print(f"\n[+] 发现的列结构:")
+            for table_key, columns in report['columns_info'].items():
+                print(f"    {table_key}:")
+                for column in columns:
+                    print(f"      - {column}")
+
+        if report.get('completeness'):
+            print(f"\n[+] 提取完整度:")
+            for line in completeness_lines(report['completeness']):
+                print(line)
+
+        if report.get('timeline'):
+            print(f"\n[+] 攻击时间线:")
+            for line in timeline_lines(report['timeline'], self.max_rows):
+                print(line)
+
+    def write_table(self, table_name, columns):
         for column, values in columns.items():
             print(f"\n[+] 表 {table_name}.{column} 中被盗数据:")
-            for i, value in enumerate(values):
+            shown = values if self.max_rows <= 0 else islice(values, self.max_rows)
+            for i, value in enumerate(shown):
                 print(f"    记录 {i+1}: {value}")
+            if self.max_rows > 0:
+                hidden = len(values) - self.max_rows
+                if hidden > 0:
+                    print(f"    ... 省略其余 {hidden} 条记录（完整数据见报告文件）")
 
-def ensure_output_directory():
-    """确保输出目录存在"""
-    os.makedirs("./result", exist_ok=True)
-    return datetime.now().strftime("%Y%m%d_%H%M%S")
-
-def save_json_report(report, timestamp):
-    """保存JSON格式报告"""
-    filename = f"./result/sql_injection_report_{timestamp}.json"
-    with open(filename, 'w') as f:
-        json.dump(report, f, indent=2)
-    print(f"\n[+] JSON报告已保存到 {filename}")
-    return filename
-
-def save_csv_report(report, timestamp):
-    """保存CSV格式报告"""
-    csv_dir = f"./result/csv_report_{timestamp}"
-    os.makedirs(csv_dir, exist_ok=True)
-    
-    # 创建元数据文件
-    metadata_file = f"{csv_dir}/metadata.csv"
-    with open(metadata_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Database', report['database']])
-        writer.writerow(['Analysis Time', report['analysis_time']])
-        writer.writerow([])
-        writer.writerow(['Compromised Tables'])
-        for table in report['compromised_tables']:
-            writer.writerow([table])
-    
-    # 为每个表创建CSV文件
+def print_console_report(report, max_rows=DEFAULT_CONSOLE_ROWS):
+    """在控制台输出报告"""
+    writer = ConsoleWriter(max_rows)
+    writer.begin(report)
     for table_name, columns in report['stolen_data'].items():
-        csv_file = f"{csv_dir}/{table_name}.csv"
-        
-        # 获取所有列名
-        all_columns = list(columns.keys())
-        
-        # 确定最大行数
-        max_rows = max(len(values) for values in columns.values())
-        
-        with open(csv_file, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=all_columns)
-            writer.writeheader()
-            
-            # 逐行写入数据
-            for i in range(max_rows):
-                row = {}
-                for col in all_columns:
-                    values = columns[col]
-                    row[col] = values[i] if i < len(values) else ""
-                writer.writerow(row)
-    
-    print(f"\n[+] CSV报告已保存到目录 {csv_dir}")
-    return csv_dir
-
-def save_txt_report(report, timestamp):
-    """保存文本格式报告"""
-    filename = f"./result/sql_injection_report_{timestamp}.txt"
-    with open(filename, 'w') as f:
+        writer.write_table(table_name, columns)
+
+def _indented_json(value, indent):
+    """与 json.dump(indent=2) 相同格式的嵌套值，续行缩进 indent 个空格"""
+    return json.dumps(value, indent=2).replace('\n', '\n' + ' ' * indent)
+
+class JsonReportWriter(ReportWriter):
+    """
+    JSON格式报告，输出与 json.dump(report, indent=2) 相同，
+    被盗数据按表、按列增量写入
+    """
+    def __init__(self, timestamp):
+        self.filename = f"./result/sql_injection_report_{timestamp}.json"
+        self.file = open(self.filename, 'w', buffering=BUFFER_SIZE)
+        self.tail = []
+        self.tables = 0
+
+    def begin(self, report):
+        keys = list(report)
+        split = keys.index('stolen_data')
+        self.file.write('{\n  ' + ''.join(f"{json.dumps(key)}: {_indented_json(report[key], 2)},\n  "
+                                          for key in keys[:split]) + '"stolen_data": {')
+        self.tail = [(key, report[key]) for key in keys[split + 1:]]
+
+    def write_table(self, table_name, columns):
+        f = self.file
+        f.write((',' if self.tables else '') + f"\n    {json.dumps(table_name)}: ")
+        self.tables += 1
+        if not columns:
+            f.write('{}')
+            return
+        for i, (column, values) in enumerate(columns.items()):
+            f.write(('{' if i == 0 else ',') + f"\n      {json.dumps(column)}: ")
+            if not len(values):
+                f.write('[]')
+                continue
+            separator = '['
+            for batch in batched(values):
+                f.write(separator + '\n        ' + ',\n        '.join(map(json.dumps, batch)))
+                separator = ','
+            f.write('\n      ]')
+        f.write('\n    }')
+
+    def close(self):
+        self.file.write(('\n  }' if self.tables else '}') +
+                        ''.join(f",\n  {json.dumps(key)}: {_indented_json(value, 2)}" for key, value in self.tail) +
+                        '\n}')
+        self.file.close()
+        print(f"\n[+] JSON报告已保存到 {self.filename}")
+        return self.filename
+
+    def abort(self):
+        self.file.close()
+        remove_file(self.filename)
+
+class CsvReportWriter(ReportWriter):
+    """CSV格式报告，每个表一个CSV文件，按行增量写入"""
+    def __init__(self, timestamp):
+        self.csv_dir = f"./result/csv_report_{timestamp}"
+        os.makedirs(self.csv_dir, exist_ok=True)
+        # 已写入的文件，出错时只删除这些文件
+        self.files = []
+
+    def _open(self, name, **kwargs):
+        path = f"{self.csv_dir}/{name}.csv"
+        self.files.append(path)
+        return open(path, 'w', newline='', **kwargs)
+
+    def begin(self, report):
+        # 创建元数据文件
+        with self._open('metadata') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Database', report['database']])
+            writer.writerow(['Analysis Time', report['analysis_time']])
+            writer.writerow([])
+            writer.writerow(['Compromised Tables'])
+            for table in report['compromised_tables']:
+                writer.writerow([table])
+
+        # 攻击时间线：每条数据的提取完成时间和每分钟的请求数
+        timeline = report.get('timeline')
+        if timeline:
+            with self._open('timeline') as f:
+                writer = csv.writer(f)
+                writer.writerow(['table', 'column', 'record_id', 'started', 'extracted_at', 'duration', 'requests'])
+                writer.writerows([secret['table'], secret['column'], secret['record_id'], secret['started'],
+                                  secret['extracted_at'], secret['duration'], secret['requests']]
+                                 for secret in timeline['secrets'])
+            with self._open('timeline_minutes') as f:
+                writer = csv.writer(f)
+                writer.writerow(['minute', 'requests', 'extractions'])
+                writer.writerows(timeline['minutes'])
+
+    def write_table(self, table_name, columns):
+        # 没有重构出数据的表不生成CSV文件
+        if not columns:
+            return
+        with self._open(table_name, buffering=BUFFER_SIZE) as f:
+            writer = csv.writer(f)
+            writer.writerow(list(columns))
+            # 各列行数不一致时用空字符串填充
+            writer.writerows(zip_longest(*columns.values(), fillvalue=''))
+
+    def close(self):
+        print(f"\n[+] CSV报告已保存到目录 {self.csv_dir}")
+        return self.csv_dir
+
+    def abort(self):
+        for path in self.files:
+            remove_file(path)
+        try:
+            os.rmdir(self.csv_dir)
+        except OSError:
+            pass
+
+class TxtReportWriter(ReportWriter):
+    """文本格式报告"""
+    def __init__(self, timestamp):
+        self.filename = f"./result/sql_injection_report_{timestamp}.txt"
+        self.file = open(self.filename, 'w', buffering=BUFFER_SIZE)
+
+    def begin(self, report):
+        f = self.file
         f.write("="*60 + "\n")
         f.write("SQL盲注攻击分析报告\n")
         f.write("="*60 + "\n\n")
-        
+
         f.write(f"[+] 目标数据库: {report['database']}\n\n")
-        
+
         f.write("[+] 被攻击的表:\n")
         for table in report['compromised_tables']:
             f.write(f"    - {table}\n")
-        
+
         f.write("\n[+] 发现的列结构:\n")
         for table_key, columns in report['columns_info'].items():
             f.write(f"    {table_key}:\n")
             for column in columns:
                 f.write(f"      - {column}\n")
-        
+
+        if report.get('completeness'):
+            f.write("\n[+] 提取完整度:\n")
+            f.writelines(line + "\n" for line in completeness_lines(report['completeness']))
+
+        if report.get('timeline'):
+            f.write("\n[+] 攻击时间线:\n")
+            f.writelines(line + "\n" for line in timeline_lines(report['timeline']))
+
         f.write("\n[+] 被盗数据:\n")
-        for table_name, columns in report['stolen_data'].items():
-            for column, values in columns.items():
-                f.write(f"\n表 {table_name}.{column}:\n")
-                for i, value in enumerate(values):
-                    f.write(f"  记录 {i+1}: {value}\n")
-    
-    print(f"\n[+] TXT报告已保存到 {filename}")
-    return filename
-
-def generate_report(data, output_format='json'):
-    """生成报告主函数"""
+
+    def write_table(self, table_name, columns):
+        f = self.file
+        for column, values in columns.items():
+            f.write(f"\n表 {table_name}.{column}:\n")
+            f.writelines(f"  记录 {i+1}: {value}\n" for i, value in enumerate(values))
+
+    def close(self):
+        self.file.close()
+        print(f"\n[+] TXT报告已保存到 {self.filename}")
+        return self.filename
+
+    def abort(self):
+        self.file.close()
+        remove_file(self.filename)
+
+class JsonlReportWriter(ReportWriter):
+    """
+    gzip压缩的JSON行报告：第一行为报告头（除被盗数据以外的字段），
+    之后每行一个取值 {"table", "column", "record", "value"}，record从1开始
+    """
+    def __init__(self, timestamp):
+        self.filename = f"./result/sql_injection_report_{timestamp}.jsonl.gz"
+        self.file = gzip.open(self.filename, 'wt', compresslevel=6)
+
+    def begin(self, report):
+        self.file.write(json.dumps(report_header(report)) + '\n')
+
+    def write_table(self, table_name, columns):
+        table = json.dumps(table_name)
+        for column, values in columns.items():
+            prefix = f'{{"table": {table}, "column": {json.dumps(column)}, "record": '
+            record = 0
+            for batch in batched(values):
+                self.file.write(''.join(f'{prefix}{record + i}, "value": {json.dumps(value)}}}\n'
+                                        for i, value in enumerate(batch, 1)))
+                record += len(batch)
+
+    def close(self):
+        self.file.close()
+        print(f"\n[+] JSONL报告已保存到 {self.filename}")
+        return self.filename
+
+    def abort(self):
+        self.file.close()
+        remove_file(self.filename)
+
+class ColumnarReportWriter(ReportWriter):
+    """
+    Parquet或Arrow IPC格式报告（需要pyarrow模块），
+    与JSONL报告相同的长表结构：table、column、record、value 四列，按批写入；
+    报告头以JSON保存在schema元数据的 report 键中
+    """
+    def __init__(self, timestamp, fmt):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ValueError(f"{fmt}格式报告需要pyarrow模块") from None
+        self.pa = pyarrow
+        self.fmt = fmt
+        self.filename = f"./result/sql_injection_report_{timestamp}.{fmt}"
+        self.writer = None
+
+    def begin(self, report):
+        pa = self.pa
+        schema = pa.schema([('table', pa.string()), ('column', pa.string()),
+                            ('record', pa.int64()), ('value', pa.string())],
+                           metadata={'report': json.dumps(report_header(report))})
+        if self.fmt == 'parquet':
+            import pyarrow.parquet
+            self.writer = pyarrow.parquet.ParquetWriter(self.filename, schema)
+        else:
+            self.writer = pa.ipc.new_file(self.filename, schema)
+        self.schema = schema
+
+    def write_table(self, table_name, columns):
+        pa = self.pa
+        for column, values in columns.items():
+            record = 0
+            for batch in batched(values):
+                count = len(batch)
+                self.writer.write_batch(pa.record_batch([
+                    pa.array([table_name] * count, pa.string()),
+                    pa.array([column] * count, pa.string()),
+                    pa.array(range(record + 1, record + count + 1), pa.int64()),
+                    pa.array(batch, pa.string()),
+                ], schema=self.schema))
+                record += count
+
+    def close(self):
+        self.writer.close()
+        print(f"\n[+] {self.fmt.capitalize()}报告已保存到 {self.filename}")
+        return self.filename
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+        remove_file(self.filename)
+
+def create_writer(fmt, timestamp):
+    """创建指定格式的文件报告写入器"""
+    if fmt == 'json':
+        return JsonReportWriter(timestamp)
+    if fmt == 'csv':
+        return CsvReportWriter(timestamp)
+    if fmt == 'txt':
+        return TxtReportWriter(timestamp)
+    if fmt == 'jsonl':
+        return JsonlReportWriter(timestamp)
+    return ColumnarReportWriter(timestamp, fmt)
+
+def ensure_output_directory(suffix=''):
+    """确保输出目录存在，返回报告文件名中的时间戳（可附加后缀区分会话）"""
+    os.makedirs("./result", exist_ok=True)
+    return datetime.now().strftime("%Y%m%d_%H%M%S") + suffix
+
+def print_session_header(session):
+    """在控制台输出会话信息"""
+    print("\n" + "#"*60)
+    print(f"会话 {session['session']}")
+    for field, label in (('remote_host', '来源地址'), ('user_agent', 'User-Agent'), ('path', '请求路径')):
+        if session.get(field):
+            print(f"[+] {label}: {session[field]}")
+    print(f"[+] 时间范围: {session['start']} - {session['end']}")
+    print(f"[+] 请求数: {session['requests']} (注入请求 {session['injections']})")
+
+def generate_session_reports(data, output_format='json', console_rows=DEFAULT_CONSOLE_ROWS):
+    """按会话分别生成报告，文件名以 _session<序号> 区分"""
+    output_files = []
+    for session in data['sessions']:
+        print_session_header(session)
+        output_files.extend(generate_report(session['result'], output_format,
+                                            f"_session{session['session']}", session, console_rows))
+    return output_files
+
+def generate_report(data, output_format='json', suffix='', session=None, console_rows=DEFAULT_CONSOLE_ROWS,
+                    tables=None):
+    """
+    生成报告主函数
+    output_format: 逗号分隔的报告格式；suffix: 报告文件名的后缀；
+    session: 会话信息，写入报告的session字段；console_rows: 控制台每列最多显示的记录数；
+    tables: 按表产出 (表名, 列名 -> 取值) 的迭代器（JSON行取值流），为None时取data中的被盗数据
+    """
+    if 'sessions' in data:
+        return generate_session_reports(data, output_format, console_rows)
+
     # 创建报告结构
     report = create_report_structure(data)
-    
-    # 输出控制台报告
-    print_console_report(report)
-    
+    if session is not None:
+        report['session'] = {key: value for key, value in session.items() if key != 'result'}
+
     # 确保输出目录存在并获取时间戳
-    timestamp = ensure_output_directory()
-    
-    # 根据输出格式保存报告
+    timestamp = ensure_output_directory(suffix)
+
+    # 控制台和各文件格式的写入器，按表逐个分发被盗数据
+    # 任何一步出错时删除已创建的报告文件，不留下写了一半的报告
+    formats = parse_output_formats(output_format)
+    writers = [ConsoleWriter(console_rows)]
     output_files = []
-    
-    if output_format in ['json', 'all']:
-        output_files.append(save_json_report(report, timestamp))
-    
-    if output_format in ['csv', 'all']:
-        output_files.append(save_csv_report(report, timestamp))
-    
-    if output_format in ['txt', 'all']:
-        output_files.append(save_txt_report(report, timestamp))
-    
+    try:
+        for fmt in formats:
+            writers.append(create_writer(fmt, timestamp))
+        for writer in writers:
+            writer.begin(report)
+        if tables is None:
+            tables = report['stolen_data'].items()
+        for table_name, columns in tables:
+            for writer in writers:
+                writer.write_table(table_name, columns)
+        for writer in writers[1:]:
+            output_files.append(writer.close())
+    except BaseException:
+        for writer in writers[len(output_files) + 1:]:
+            writer.abort()
+        raise
     return output_files
 
 def main():
     """主函数"""
     args = parse_arguments()
-    
+    stats = stage_stats.from_args(args, 'report', aggregate=True)
+
     try:
-        # 从标准输入读取JSON数据
-        data = json.load(sys.stdin)
-        # 生成报告
-        generate_report(data, args.output)
+        with stage_stats.profiled(args.profile):
+            if args.store or forensic_store.has_filters(args):
+                # 从取证数据库读取符合过滤条件的分析结果，重构后生成报告
+                analyses = default_data_reconstructor.input_analyses(args)
+                data = default_data_reconstructor.reconstruct_data(analyses)
+                tables = None
+            else:
+                # 从标准输入读取JSON文档或JSON行取值流，生成报告
+                data, tables = read_input(sys.stdin)
+            if args.timeline:
+                with open(args.timeline, 'r') as f:
+                    data['timeline'] = json.load(f)
+            for data in stats.count_in([data]):
+                output_files = generate_report(data, args.output, console_rows=args.console_rows, tables=tables)
     except json.JSONDecodeError as e:
         print(f"JSON解析错误: {e}", file=sys.stderr)
         sys.exit(1)
     except Exception as e:
         print(f"生成报告时出错: {e}", file=sys.stderr)
         sys.exit(1)
+    # 报告阶段只有一份输入数据，输出记录数为写入的报告文件数
+    stats.finish(len(output_files))
+    stage_stats.report(args, [stats])
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
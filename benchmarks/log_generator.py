@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+file: log_generator.py
+合成日志生成器 - 生成指定大小的sqlmap风格布尔盲注/时间盲注访问日志及已知的被盗数据
+输入: 日志大小、盲注类型、噪声比例、攻击者数量等参数
+输出: 访问日志文件、清单文件（<日志>.manifest.json）、真实数据文件（<日志>.truth.json）
+      和分析器配置文件（<日志>.config.json）
+
+每个攻击者使用独立的来源地址和User-Agent，按 记录 -> 列 -> 字符位置 的顺序
+以sqlmap的二分查找（'>' 比较，取值区间0-127）逐字符提取自己的目标表，
+字符串末尾以取值为0的位置结束；时间盲注在每个字符的二分查找结束后发送 '!=' 确认请求。
+多个攻击者的请求与正常访问（噪声）随机交错，写满指定大小后在当前字段值结束处停止，
+真实数据中只记录完整提取的字段值，作为重构准确率的基准。
+"""
+import os
+import re
+import sys
+import json
+import random
+import string
+import argparse
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+
+# 大小单位
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+# 盲注类型
+BOOLEAN = 'boolean'
+TIME = 'time'
+MODES = (BOOLEAN, TIME)
+
+# 被攻击的数据库、表名前缀和列
+DATABASE = 'bench_db'
+TABLE_PREFIX = 'users_'
+COLUMNS = ('username', 'password', 'email')
+
+# 注入参数名和请求路径
+PARAM = 'id'
+TARGET_PATH = '/item.php'
+
+# 布尔盲注：比较为假（judge为True）和为真时的响应大小
+FALSE_PAGE_SIZE = 1843
+TRUE_PAGE_SIZE = 2291
+
+# 时间盲注：sqlmap载荷中的延迟秒数，以及正常请求的耗时范围（秒）
+SLEEP_SECONDS = 1
+FAST_LATENCY = (0.005, 0.12)
+SLOW_JITTER = 0.25
+
+# 时间盲注使用的日志格式（组合日志格式 + 微秒耗时）
+TIME_LOG_FORMAT = '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-Agent}i" %D'
+
+# 日志起始时间
+START_TIME = datetime(2025, 9, 17, 13, 0, 0, tzinfo=timezone(timedelta(hours=8)))
+
+# 每次写入文件的行数
+WRITE_BATCH = 4096
+
+# 正常访问的请求路径
+NOISE_PATHS = ['/', '/index.php', '/login.php', '/static/app.js', '/static/style.css',
+               '/images/logo.png', '/news.php?page={n}', f'{TARGET_PATH}?{PARAM}={{n}}',
+               '/search.php?q={word}', '/favicon.ico']
+
+NOISE_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0',
+    'curl/8.5.0'
+]
+
+def parse_size(text):
+    """解析 1MB、512K、50GB 形式的大小，返回字节数"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*', text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"无法解析的大小: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+def random_value(rng, column, record_id):
+    """生成一个字段值"""
+    if column == 'username':
+        return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 10))) + str(record_id)
+    if column == 'password':
+        return ''.join(rng.choice('0123456789abcdef') for _ in range(32))
+    name = ''.join(rng.choice(string.ascii_lowercase + '._') for _ in range(rng.randint(4, 12)))
+    return f"{name}@example.com"
+
+def bisection_probes(char_code):
+    """sqlmap在0-127区间内二分查找一个字符时依次比较的值"""
+    low, high = 0, 127
+    probes = []
+    while low < high:
+        mid = (low + high) // 2
+        probes.append(mid)
+        if char_code > mid:
+            low = mid + 1
+        else:
+            high = mid
+    return probes
+
+class Attacker:
+    """一个攻击者：按顺序产出提取目标表的请求 (载荷, 比较是否为真)"""
+    def __init__(self, index, mode, rng):
+        self.index = index
+        self.mode = mode
+        self.rng = rng
+        self.host = f"10.{index // 250}.{index % 250}.{rng.randint(2, 250)}"
+        self.user_agent = f"sqlmap/1.9.{index % 10}#stable (https://sqlmap.org)"
+        self.table = f"{TABLE_PREFIX}{index}"
+        self.tag = ''.join(rng.choice(string.ascii_letters) for _ in range(4))
+        # 已完整提取的字段值: 列 -> [值]
+        self.extracted = {column: [] for column in COLUMNS}
+        self.stopping = False
+        self.requests = self._requests()
+
+    def _requests(self):
+        record_id = 0
+        while True:
+            for column in COLUMNS:
+                value = random_value(self.rng, column, record_id)
+                select = (f"SELECT IFNULL(CAST({column} AS NCHAR),0x20) "
+                          f"FROM {DATABASE}.{self.table} ORDER BY id LIMIT {record_id},1")
+                # 字符串末尾追加一个取值为0的位置
+                for position, char_code in enumerate([ord(c) for c in value] + [0], 1):
+                    prefix = f"ORD(MID(({select}),{position},1))"
+                    for probe in bisection_probes(char_code):
+                        yield self._payload(prefix, '>', probe), char_code > probe
+                    if self.mode == TIME and char_code:
+                        yield self._payload(prefix, '!=', char_code), False
+                self.extracted[column].append(value)
+                if self.stopping:
+                    return
+            record_id += 1
+
+    def _payload(self, condition_prefix, operator, value):
+        condition = f"{condition_prefix}{operator}{value}"
+        if self.mode == BOOLEAN:
+            return f"1' AND {condition} AND '{self.tag}'='{self.tag}"
+        return (f"1' AND (SELECT {1000 + self.index} FROM (SELECT(SLEEP({SLEEP_SECONDS}-"
+                f"(IF({condition},0,{SLEEP_SECONDS})))))x) AND '{self.tag}'='{self.tag}")
+
+class LogGenerator:
+    """交错生成攻击请求和正常访问的日志行"""
+    def __init__(self, mode=BOOLEAN, attackers=1, noise=0.5, seed=0):
+        if mode not in MODES:
+            raise ValueError(f"未知的盲注类型: {mode}")
+        if not 0 <= noise < 1:
+            raise ValueError("噪声比例需要在 [0, 1) 范围内")
+        if attackers < 1:
+            raise ValueError("攻击者数量至少为1")
+        self.mode = mode
+        self.noise = noise
+        self.rng = random.Random(seed)
+        self.attackers = [Attacker(index, mode, random.Random(seed * 1000003 + index))
+                          for index in range(attackers)]
+        self.moment = START_TIME
+        self._second = None
+        self._timestamp = ''
+        self.lines = 0
+        self.attack_lines = 0
+
+    def timestamp(self):
+        """当前时间的日志时间戳（同一秒内复用格式化结果）"""
+        second = int(self.moment.timestamp())
+        if second != self._second:
+            self._second = second
+            self._timestamp = self.moment.strftime('%d/%b/%Y:%H:%M:%S %z')
+        return self._timestamp
+
+    def format_line(self, host, request, status, size, user_agent, latency):
+        line = (f'{host} - - [{self.timestamp()}] "{request}" {status} {size} '
+                f'"-" "{user_agent}"')
+        if self.mode == TIME:
+            line += f' {int(latency * 1_000_000)}'
+        return line + '\n'
+
+    def attack_line(self, attacker, payload, comparison):
+        request = f"GET {TARGET_PATH}?{PARAM}={urllib.parse.quote(payload, safe='')} HTTP/1.1"
+        if self.mode == BOOLEAN:
+            size = TRUE_PAGE_SIZE if comparison else FALSE_PAGE_SIZE
+            latency = 0.0
+        else:
+            size = self.rng.randint(1400, 1430)
+            # SLEEP(n-(IF(条件,0,n))) 在比较条件为真时执行 SLEEP(n)
+            latency = (SLEEP_SECONDS + self.rng.uniform(0, SLOW_JITTER) if comparison
+                       else self.rng.uniform(*FAST_LATENCY))
+        return self.format_line(attacker.host, request, 200, size, attacker.user_agent, latency)
+
+    def noise_line(self):
+        rng = self.rng
+        path = rng.choice(NOISE_PATHS).format(n=rng.randint(1, 500), word=rng.choice(['bus', 'news', 'route']))
+        status = 404 if path == '/favicon.ico' else 200
+        host = f"192.168.{rng.randint(0, 9)}.{rng.randint(2, 250)}"
+        return self.format_line(host, f"GET {path} HTTP/1.1", status, rng.randint(200, 40000),
+                                rng.choice(NOISE_AGENTS), rng.uniform(*FAST_LATENCY))
+
+    def generate(self, target_size):
+        """产出日志行，写满target_size字节后各攻击者在当前字段值结束处停止"""
+        written = 0
+        active = list(self.attackers)
+        rng = self.rng
+        while active:
+            if written >= target_size:
+                for attacker in active:
+                    attacker.stopping = True
+            self.moment += timedelta(milliseconds=rng.randint(1, 40))
+
+            if rng.random() < self.noise and written < target_size:
+                line = self.noise_line()
+            else:
+                attacker = rng.choice(active)
+                try:
+                    payload, comparison = next(attacker.requests)
+                except StopIteration:
+                    active.remove(attacker)
+                    continue
+                line = self.attack_line(attacker, payload, comparison)
+                self.attack_lines += 1
+            self.lines += 1
+            written += len(line)
+            yield line
+
+    def truth(self):
+        """完整提取的真实数据: 库.表 -> 列 -> [值]"""
+        return {f"{DATABASE}.{attacker.table}".upper(): {column.upper(): values
+                                                          for column, values in attacker.extracted.items()}
+                for attacker in self.attackers}
+
+    def sessions(self):
+        return [{'remote_host': attacker.host, 'user_agent': attacker.user_agent, 'table': attacker.table}
+                for attacker in self.attackers]
+
+def analyzer_config(mode):
+    """与生成的载荷对应的分析器配置"""
+    if mode == BOOLEAN:
+        trigger = 'ORD(MID('
+        judge = {'type': 'size_equal', 'value': FALSE_PAGE_SIZE}
+    else:
+        trigger = f'SLEEP({SLEEP_SECONDS}-(IF('
+        # judge为True表示比较条件为假，即未延迟的快请求
+        judge = {'type': 'time_less', 'value': SLEEP_SECONDS / 2}
+    return {
+        'injection_type': mode,
+        'trigger_pattern': trigger,
+        'judge_function': judge,
+        'patterns': {
+            'from_pattern': 'FROM\\s+([\\w_]+)\\.([\\w_]+)',
+            'cast_pattern': 'CAST\\(([\\w_]+)\\s+AS',
+            'limit_pattern': 'LIMIT\\s+(\\d+),1',
+            'position_pattern': ',(\\d+),1\\)\\)',
+            'comparison_pattern': '\\)\\)\\s*([<>!]=?)\\s*(\\d+)'
+        },
+        'cache_size': 4096
+    }
+
+def generate_log(path, size, mode=BOOLEAN, attackers=1, noise=0.5, seed=0):
+    """
+    生成日志文件、清单文件、真实数据文件和分析器配置文件
+    返回清单字典（包含日志行数、参数名、日志格式、配置文件和真实数据文件路径）
+    真实数据与清单分开保存，使用方可以只读取清单而不必加载全部数据
+    """
+    generator = LogGenerator(mode, attackers, noise, seed)
+    with open(path, 'w') as f:
+        batch = []
+        for line in generator.generate(size):
+            batch.append(line)
+            if len(batch) >= WRITE_BATCH:
+                f.write(''.join(batch))
+                batch = []
+        f.write(''.join(batch))
+
+    config_path = f"{path}.config.json"
+    with open(config_path, 'w') as f:
+        json.dump(analyzer_config(mode), f, indent=2)
+        f.write('\n')
+
+    manifest = {
+        'log': os.path.abspath(path),
+        'bytes': os.path.getsize(path),
+        'lines': generator.lines,
+        'attack_lines': generator.attack_lines,
+        'mode': mode,
+        'attackers': attackers,
+        'noise': noise,
+        'seed': seed,
+        'param': PARAM,
+        'log_format': TIME_LOG_FORMAT if mode == TIME else None,
+        'config': os.path.abspath(config_path),
+        'truth': os.path.abspath(f"{path}.truth.json"),
+        'sessions': generator.sessions()
+    }
+    with open(manifest['truth'], 'w') as f:
+        json.dump({'data': generator.truth()}, f)
+        f.write('\n')
+    with open(f"{path}.manifest.json", 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='合成日志生成器')
+    parser.add_argument('-o', '--output', required=True, help='生成的日志文件路径')
+    parser.add_argument('-s', '--size', default='1MB', help='日志大小，例如 1MB、512MB、50GB (默认: 1MB)')
+    parser.add_argument('-m', '--mode', choices=MODES, default=BOOLEAN, help='盲注类型 (默认: boolean)')
+    parser.add_argument('-a', '--attackers', type=int, default=1, help='同时进行的攻击者数量 (默认: 1)')
+    parser.add_argument('-n', '--noise', type=float, default=0.5,
+                        help='正常访问（噪声）行所占比例，0表示只有攻击请求 (默认: 0.5)')
+    parser.add_argument('--seed', type=int, default=0, help='随机数种子 (默认: 0)')
+    args = parser.parse_args()
+
+    try:
+        size = parse_size(args.size)
+        manifest = generate_log(args.output, size, args.mode, args.attackers, args.noise, args.seed)
+    except (ValueError, OSError) as e:
+        print(f"Error generating log: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"[+] 已生成 {args.output}: {manifest['bytes']:,} 字节, {manifest['lines']:,} 行 "
+          f"(攻击请求 {manifest['attack_lines']:,} 行)", file=sys.stderr)
+    print(f"[+] 清单: {args.output}.manifest.json, 真实数据: {manifest['truth']}, "
+          f"分析器配置: {manifest['config']}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+file: parser_microbench.py
+解析器微基准测试 - 对比预编译正则前后的日志解析、参数提取和载荷分析吞吐量
+输入: 日志文件
+输出: 各阶段改动前后的每秒处理行数
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pipeline import STAGE_MODULES, load_stage_module
+
+# ---- 改动前的实现（每次调用都重新编译/查找正则），仅作为对照 ----
+
+def legacy_parse_log_line(line):
+    combined_pattern = re.compile(r'(\S+) (\S+) (\S+) \[([^\]]+)\] "([^"]*)" (\d+) (\d+|-) "([^"]*)"')
+    match = combined_pattern.match(line)
+    if match:
+        return {
+            'remote_host': match.group(1),
+            'remote_logname': match.group(2),
+            'remote_user': match.group(3),
+            'timestamp': match.group(4),
+            'request_line': match.group(5),
+            'status_code': match.group(6),
+            'response_size': match.group(7),
+            'user_agent': match.group(8)
+        }
+
+    common_pattern = re.compile(r'(\S+) (\S+) (\S+) \[([^\]]+)\] "([^"]*)" (\d+) (\d+|-)')
+    match = common_pattern.match(line)
+    if match:
+        return {
+            'remote_host': match.group(1),
+            'remote_logname': match.group(2),
+            'remote_user': match.group(3),
+            'timestamp': match.group(4),
+            'request_line': match.group(5),
+            'status_code': match.group(6),
+            'response_size': match.group(7)
+        }
+
+    return None
+
+def legacy_extract_parameter(log_data, key_param):
+    param_pattern = re.compile(rf'{re.escape(key_param)}=([^&\s]+)')
+    request_line = log_data.get('request_line', '')
+    query_match = re.search(r'GET\s+[^\s]*\?([^\s]*)\s+HTTP', request_line)
+    if not query_match:
+        return None
+    param_match = param_pattern.search(query_match.group(1))
+    if not param_match:
+        return None
+    return {
+        'status_code': int(log_data.get('status_code', 200)),
+        'response_size': int(log_data.get('response_size', 0)) if log_data.get('response_size', '-') != '-' else 0,
+        'timestamp': log_data.get('timestamp', ''),
+        'payload': param_match.group(1)
+    }
+
+def legacy_analyze_payload(analyzer, payload, response_size):
+    config = analyzer.config
+    analysis = {
+        'type': 'unknown', 'database': '', 'table': '', 'column': '', 'position': 0,
+        'ascii_value': 0, 'limit_offset': 0, 'judge': config.judge_function(response_size),
+        'comparison_operator': '>', 'record_id': 0
+    }
+    if payload and config.trigger_pattern in payload.upper():
+        analysis['type'] = f'{config.injection_type}_injection'
+        payload_upper = payload.upper()
+        patterns = analyzer.compiled_patterns
+        from_match = patterns.get('from_pattern', re.compile('')).search(payload_upper)
+        if from_match:
+            analysis['database'] = from_match.group(1)
+            analysis['table'] = from_match.group(2)
+        cast_match = patterns.get('cast_pattern', re.compile('')).search(payload_upper)
+        if cast_match:
+            analysis['column'] = cast_match.group(1)
+        limit_match = patterns.get('limit_pattern', re.compile('')).search(payload_upper)
+        if limit_match:
+            analysis['limit_offset'] = int(limit_match.group(1))
+            analysis['record_id'] = analysis['limit_offset']
+        position_match = patterns.get('position_pattern', re.compile('')).search(payload_upper)
+        if position_match:
+            analysis['position'] = int(position_match.group(1))
+        comparison_match = patterns.get('comparison_pattern', re.compile('')).search(payload_upper)
+        if comparison_match:
+            analysis['comparison_operator'] = comparison_match.group(1)
+            analysis['ascii_value'] = int(comparison_match.group(2))
+    return analysis
+
+# ---- 计时 ----
+
+def measure(func, items, repeat):
+    """返回每秒处理条数（取多次运行中最快的一次）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(items) / best if best else float('inf')
+
+def print_row(name, before, after):
+    print(f"{name:<12} {before:>14,.0f} {after:>14,.0f} {after / before:>8.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description='解析器微基准测试')
+    parser.add_argument('-i', '--input', required=True, help='日志文件路径')
+    parser.add_argument('-p', '--param', required=True, help='关键参数名')
+    parser.add_argument('--config', required=True, help='分析器配置文件路径')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测试的重复次数 (默认: 5)')
+    args = parser.parse_args()
+
+    log_parser = load_stage_module(STAGE_MODULES['parse'])
+    extractor = load_stage_module(STAGE_MODULES['extract'])
+    url_decoder = load_stage_module(STAGE_MODULES['url'])
+    base64_decoder = load_stage_module(STAGE_MODULES['base64'])
+    analyzer_module = load_stage_module(STAGE_MODULES['analyze'])
+    # 只比较预编译正则的效果，关闭配置中的模板缓存（缓存的收益见pipeline_bench.py）
+    config = analyzer_module.load_config(args.config)
+    config.cache_size = 0
+    analyzer = analyzer_module.SQLMapBlindAnalyzer(config)
+
+    with open(args.input, 'r') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    log_records = list(log_parser.parse_lines(lines))
+    requests = list(extractor.extract_records(log_records, args.param))
+    payloads = []
+    for req in requests:
+        payload = url_decoder.decode(req['payload'])
+        payloads.append((base64_decoder.decode(payload) or payload, req['response_size']))
+
+    print(f"{'阶段':<10} {'改动前(行/秒)':>11} {'改动后(行/秒)':>11} {'加速比':>6}")
+    print_row('parse',
+              measure(legacy_parse_log_line, lines, args.repeat),
+              measure(log_parser.parse_log_line, lines, args.repeat))
+    print_row('extract',
+              measure(lambda data: legacy_extract_parameter(data, args.param), log_records, args.repeat),
+              measure(lambda data: extractor.extract_parameter(data, args.param), log_records, args.repeat))
+    print_row('analyze',
+              measure(lambda item: legacy_analyze_payload(analyzer, *item), payloads, args.repeat),
+              measure(lambda item: analyzer.analyze_payload(*item), payloads, args.repeat))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+file: pipeline_bench.py
+端到端基准测试 - 在合成日志上分别计时各阶段脚本和完整流水线，并对照真实数据计算重构准确率
+输入: log_generator.py 生成参数，或已有的合成日志文件及其清单文件（--log/--manifest）
+输出: 各阶段和完整流水线的耗时、每秒处理行数、峰值内存和重构准确率，保存为JSON结果文件
+
+各阶段以独立子进程运行，阶段之间通过临时文件传递数据，
+峰值内存取自子进程退出时的资源使用统计（ru_maxrss，不含其再派生的工作进程）。
+Linux下子进程会继承父进程的内存峰值，因此日志在独立进程中生成，真实数据在全部计时结束后才加载，
+保持本进程的内存占用接近空解释器。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, BENCH_DIR)
+import log_generator
+
+# 各阶段脚本: (阶段名, 脚本路径, 参数构造函数)
+STAGES = [
+    ('parse', '1_log_parser/1_web_log_parser.py',
+     lambda manifest: ['--log-format', manifest['log_format'] or 'combined']),
+    ('extract', '1_log_parser/2_param_extractor.py',
+     lambda manifest: ['-p', manifest['param']]),
+    ('decode', '2_payload_decoder/chain_decoder.py',
+     lambda manifest: ['-c', 'url']),
+    ('analyze', '3_payload_analyzer/sqlmap_analyzer.py',
+     lambda manifest: ['--config', manifest['config']]),
+    ('reconstruct', '4_data_reconstructor/default_data_reconstructor.py',
+     lambda manifest: []),
+]
+
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+def run_measured(command, stdin_path=None, stdout_path=None):
+    """
+    运行子进程并等待其结束
+    返回 (耗时秒数, 峰值内存MB)，平台不支持wait4时峰值内存为None
+    """
+    stdin = open(stdin_path, 'rb') if stdin_path else subprocess.DEVNULL
+    stdout = open(stdout_path, 'wb') if stdout_path else subprocess.DEVNULL
+    try:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdin=stdin, stdout=stdout, stderr=subprocess.DEVNULL)
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # Linux下ru_maxrss的单位为KB
+            peak = round(usage.ru_maxrss / 1024, 1)
+        else:
+            process.wait()
+            peak = None
+        elapsed = time.perf_counter() - start
+    finally:
+        for handle in (stdin, stdout):
+            if handle is not subprocess.DEVNULL:
+                handle.close()
+    if process.returncode:
+        raise RuntimeError(f"{' '.join(command[:2])} 退出码 {process.returncode}")
+    return elapsed, peak
+
+def stage_result(name, elapsed, peak, lines):
+    return {
+        'stage': name,
+        'seconds': round(elapsed, 3),
+        'lines_per_second': round(lines / elapsed) if elapsed else None,
+        'peak_rss_mb': peak
+    }
+
+def bench_stages(manifest, work_dir):
+    """逐个阶段计时，上一阶段的输出文件作为下一阶段的输入，返回 (各阶段结果, 重构结果文件)"""
+    results = []
+    current = manifest['log']
+    for name, script, build_args in STAGES:
+        output = os.path.join(work_dir, f"stage_{name}.out")
+        command = [sys.executable, os.path.join(ROOT_DIR, script)] + build_args(manifest)
+        elapsed, peak = run_measured(command, current, output)
+        results.append(stage_result(name, elapsed, peak, manifest['lines']))
+        print(f"[+] {name}: {elapsed:.2f}s", file=sys.stderr)
+        current = output
+    return results, current
+
+def bench_pipeline(manifest, work_dir, workers=1):
+    """计时完整流水线（pipeline.py），返回 (结果, 重构结果文件)"""
+    output = os.path.join(work_dir, f"pipeline_j{workers}.out")
+    command = [sys.executable, os.path.join(ROOT_DIR, 'pipeline.py'), '-i', manifest['log'],
+               '-p', manifest['param'], '--config', manifest['config'],
+               '-s', 'parse,extract,decode,analyze,reconstruct', '--decode-chain', 'url',
+               '--log-format', manifest['log_format'] or 'combined', '-j', str(workers)]
+    elapsed, peak = run_measured(command, stdout_path=output)
+    result = stage_result('pipeline', elapsed, peak, manifest['lines'])
+    result['workers'] = workers
+    print(f"[+] pipeline (-j {workers}): {elapsed:.2f}s", file=sys.stderr)
+    return result, output
+
+def reconstruction_accuracy(truth, reconstructed):
+    """
+    对照真实数据计算重构准确率
+    values: 完全一致的字段值比例; characters: 位置和取值都正确的字符比例
+    """
+    total_values = exact_values = total_chars = correct_chars = 0
+    for table, columns in truth.items():
+        rebuilt_columns = reconstructed.get(table, {})
+        for column, values in columns.items():
+            rebuilt_values = rebuilt_columns.get(column, [])
+            for index, value in enumerate(values):
+                rebuilt = rebuilt_values[index] if index < len(rebuilt_values) else ''
+                total_values += 1
+                exact_values += rebuilt == value
+                total_chars += len(value)
+                correct_chars += sum(a == b for a, b in zip(value, rebuilt))
+    return {
+        'values': total_values,
+        'exact_values': exact_values,
+        'value_accuracy': round(exact_values / total_values, 4) if total_values else None,
+        'character_accuracy': round(correct_chars / total_chars, 4) if total_chars else None
+    }
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def load_reconstruction(path):
+    return load_json(path).get('data', {})
+
+def git_version():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_table(results):
+    print(f"{'阶段':<14}{'耗时(秒)':>10}{'行/秒':>14}{'峰值内存(MB)':>14}")
+    for result in results:
+        name = result['stage'] if result['stage'] != 'pipeline' else f"pipeline -j{result['workers']}"
+        peak = result['peak_rss_mb'] if result['peak_rss_mb'] is not None else '-'
+        print(f"{name:<16}{result['seconds']:>10.2f}{result['lines_per_second'] or 0:>16,}{peak:>14}")
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端基准测试')
+    parser.add_argument('--log', help='已有的合成日志文件（不再重新生成）')
+    parser.add_argument('--manifest', help='清单文件路径 (默认: <日志>.manifest.json)')
+    parser.add_argument('-s', '--size', default='10MB', help='生成日志的大小 (默认: 10MB)')
+    parser.add_argument('-m', '--mode', choices=log_generator.MODES, default=log_generator.BOOLEAN,
+                        help='生成日志的盲注类型 (默认: boolean)')
+    parser.add_argument('-a', '--attackers', type=int, default=1, help='攻击者数量 (默认: 1)')
+    parser.add_argument('-n', '--noise', type=float, default=0.5, help='噪声行比例 (默认: 0.5)')
+    parser.add_argument('--seed', type=int, default=0, help='随机数种子 (默认: 0)')
+    parser.add_argument('-j', '--workers', type=int, action='append',
+                        help='完整流水线的并行进程数，可多次指定 (默认: 1)')
+    parser.add_argument('--no-stages', action='store_true', help='不单独计时各阶段，只测完整流水线')
+    parser.add_argument('-w', '--work-dir', default=os.path.join(DEFAULT_RESULTS_DIR, 'work'),
+                        help='生成日志和中间文件的目录 (默认: benchmarks/results/work)')
+    parser.add_argument('-o', '--output', help='结果JSON文件路径 (默认: benchmarks/results/bench_<时间>.json)')
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    try:
+        if args.log:
+            manifest = load_json(args.manifest or f"{args.log}.manifest.json")
+            manifest['log'] = os.path.abspath(args.log)
+        else:
+            path = os.path.join(args.work_dir, f"synthetic_{args.mode}.log")
+            log_generator.parse_size(args.size)
+            command = [sys.executable, os.path.join(BENCH_DIR, 'log_generator.py'), '-o', path,
+                       '-s', args.size, '-m', args.mode, '-a', str(args.attackers),
+                       '-n', str(args.noise), '--seed', str(args.seed)]
+            elapsed, _ = run_measured(command)
+            manifest = load_json(f"{path}.manifest.json")
+            print(f"[+] 已生成 {path}: {manifest['bytes']:,} 字节, {manifest['lines']:,} 行 "
+                  f"({elapsed:.1f}s)", file=sys.stderr)
+    except (ValueError, OSError, RuntimeError) as e:
+        print(f"Error preparing log: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    results = []
+    # 运行名称 -> 重构结果文件
+    outputs = {}
+    try:
+        if not args.no_stages:
+            stage_results, outputs['stages'] = bench_stages(manifest, args.work_dir)
+            results.extend(stage_results)
+        for workers in args.workers or [1]:
+            result, outputs[f"pipeline_j{workers}"] = bench_pipeline(manifest, args.work_dir, workers)
+            results.append(result)
+        truth = load_json(manifest['truth'])['data']
+        accuracy = {name: reconstruction_accuracy(truth, load_reconstruction(path))
+                    for name, path in outputs.items()}
+    except (RuntimeError, OSError, ValueError) as e:
+        print(f"Error running benchmark: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    report = {
+        'version': git_version(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'log': {key: manifest[key] for key in ('log', 'bytes', 'lines', 'attack_lines', 'mode',
+                                               'attackers', 'noise', 'seed')},
+        'results': results,
+        'accuracy': accuracy
+    }
+
+    output_path = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+    print_table(results)
+    for name, result in accuracy.items():
+        print(f"准确率 {name}: 字段值 {result['exact_values']}/{result['values']} "
+              f"({(result['value_accuracy'] or 0):.2%}), 字符 {(result['character_accuracy'] or 0):.2%}")
+    print(f"[+] 结果已保存到 {output_path}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+file: forensic_store.py
+取证存储 - 将分析结果写入带索引的本地SQLite数据库，供重构器和报告生成器按条件反复查询
+输入: 写入时为sqlmap_analyzer.py输出的分析结果（JSON行或列式批次格式）；读取时为数据库文件和过滤条件
+输出: 写入时可原样转发分析结果；读取时输出符合条件的分析结果，格式与sqlmap_analyzer.py相同
+
+每条分析结果存为analyses表的一行（请求字段和分析字段展开为列），
+在时间戳、来源地址、库.表.列和记录编号上建立索引，
+"10.0.0.5提取了什么"、"所有涉及users.password的请求"等问题不必再从原始日志重新解析。
+默认只保存注入分析结果（type包含inject），--all 时保存全部分析结果。
+"""
+import os
+import sys
+import sqlite3
+import argparse
+from datetime import datetime, timezone
+
+import record_codec
+
+# 数据库结构版本，保存在 PRAGMA user_version 中
+SCHEMA_VERSION = 3
+
+# 旧版本数据库升级到下一版本的语句
+MIGRATIONS = {
+    # 版本2: 多配置分析的technique字段
+    1: ['ALTER TABLE analyses ADD COLUMN technique TEXT'],
+    # 版本3: sqlmap枚举查询（COUNT/LENGTH）的probe字段
+    2: ['ALTER TABLE analyses ADD COLUMN probe TEXT'],
+}
+
+# 请求字段 -> 列名（顺序与参数提取器输出的请求字段一致）
+REQUEST_COLUMNS = {
+    'status_code': 'status_code',
+    'response_size': 'response_size',
+    'timestamp': 'timestamp',
+    'payload': 'payload',
+    'request_time': 'request_time',
+    'remote_host': 'remote_host',
+    'user_agent': 'user_agent',
+    'path': 'path',
+    'param': 'param',
+}
+
+# 分析字段 -> 列名（table/column是SQL关键字，加前缀避免转义）
+ANALYSIS_COLUMNS = {
+    'type': 'type',
+    'database': 'db_name',
+    'table': 'table_name',
+    'column': 'column_name',
+    'position': 'position',
+    'ascii_value': 'ascii_value',
+    'limit_offset': 'limit_offset',
+    'judge': 'judge',
+    'comparison_operator': 'comparison_operator',
+    'record_id': 'record_id',
+    'technique': 'technique',
+    'probe': 'probe',
+}
+
+# 只在部分分析结果中出现的分析字段，为NULL时读取结果中不包含该字段
+OPTIONAL_ANALYSIS_FIELDS = ('technique', 'probe')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT,
+    epoch REAL,
+    remote_host TEXT,
+    user_agent TEXT,
+    path TEXT,
+    param TEXT,
+    status_code INTEGER,
+    response_size INTEGER,
+    -- 不声明类型，整数（%D微秒）和小数（$request_time秒）按原样保存
+    request_time,
+    payload TEXT,
+    type TEXT,
+    db_name TEXT COLLATE NOCASE,
+    table_name TEXT COLLATE NOCASE,
+    column_name TEXT COLLATE NOCASE,
+    position INTEGER,
+    ascii_value INTEGER,
+    limit_offset INTEGER,
+    judge INTEGER,
+    comparison_operator TEXT,
+    record_id INTEGER,
+    technique TEXT,
+    probe TEXT
+)
+"""
+
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_analyses_epoch ON analyses (epoch)',
+    'CREATE INDEX IF NOT EXISTS idx_analyses_host ON analyses (remote_host, epoch)',
+    'CREATE INDEX IF NOT EXISTS idx_analyses_target ON analyses (db_name, table_name, column_name, record_id)',
+    'CREATE INDEX IF NOT EXISTS idx_analyses_table ON analyses (table_name, column_name, record_id)',
+    'CREATE INDEX IF NOT EXISTS idx_analyses_record ON analyses (record_id)',
+]
+
+COLUMNS = ['epoch'] + list(REQUEST_COLUMNS.values()) + list(ANALYSIS_COLUMNS.values())
+
+INSERT = f"INSERT INTO analyses ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+# 每个事务写入的行数
+DEFAULT_BATCH_SIZE = 10000
+
+# 日志时间戳格式
+TIMESTAMP_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+_epoch_cache = {}
+
+def to_epoch(text):
+    """将日志时间戳或ISO格式时间转换为Unix时间，无法解析时返回None"""
+    if not text:
+        return None
+    epoch = _epoch_cache.get(text)
+    if epoch is None and text not in _epoch_cache:
+        try:
+            epoch = datetime.strptime(text, TIMESTAMP_FORMAT).timestamp()
+        except ValueError:
+            try:
+                epoch = datetime.fromisoformat(text).timestamp()
+            except ValueError:
+                epoch = None
+        if len(_epoch_cache) > 65536:
+            _epoch_cache.clear()
+        _epoch_cache[text] = epoch
+    return epoch
+
+def connect(path, readonly=False):
+    """
+    打开取证数据库
+    写入时必要时创建数据库和表；只读打开时数据库不存在或不是取证数据库则抛出ValueError
+    """
+    if readonly:
+        if not os.path.isfile(path):
+            raise ValueError(f"取证数据库不存在: {path}")
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    else:
+        connection = sqlite3.connect(path)
+    try:
+        version = connection.execute('PRAGMA user_version').fetchone()[0]
+        if readonly and version in MIGRATIONS:
+            # 旧版本数据库先以读写方式打开升级
+            connection.close()
+            connect(path).close()
+            return connect(path, readonly=True)
+        if version != SCHEMA_VERSION and (readonly or (version != 0 and version not in MIGRATIONS)):
+            raise ValueError(f"{path} 不是取证数据库或版本不受支持 (版本 {version})")
+        if not readonly:
+            with connection:
+                while version in MIGRATIONS:
+                    for statement in MIGRATIONS[version]:
+                        connection.execute(statement)
+                    version += 1
+                connection.execute(SCHEMA)
+                connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    except (sqlite3.Error, ValueError):
+        connection.close()
+        raise
+    return connection
+
+class StoreWriter:
+    """
+    批量写入分析结果
+    索引在关闭时才创建（已存在时跳过），大批量导入时避免逐行维护索引
+    """
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, keep_all=False):
+        self.connection = connect(path)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.batch_size = batch_size
+        self.keep_all = keep_all
+        self.rows = []
+        self.written = 0
+
+    def add(self, result):
+        """写入一条分析结果（{'request', 'analysis'}）"""
+        analysis = result.get('analysis')
+        if analysis is None or not (self.keep_all or 'inject' in analysis.get('type', '')):
+            return
+        request = result.get('request', {})
+        row = [to_epoch(request.get('timestamp'))]
+        row.extend(request.get(field) for field in REQUEST_COLUMNS)
+        row.extend(analysis.get(field) for field in ANALYSIS_COLUMNS)
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def feed(self, results):
+        """写入分析结果流并原样产出，可作为管道中的旁路阶段"""
+        for result in results:
+            self.add(result)
+            yield result
+
+    def flush(self):
+        if self.rows:
+            with self.connection:
+                self.connection.executemany(INSERT, self.rows)
+            self.written += len(self.rows)
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        with self.connection:
+            for statement in INDEXES:
+                self.connection.execute(statement)
+        self.connection.execute('PRAGMA optimize')
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# ---- 读取 ----
+
+# add_filter_arguments添加的参数名
+FILTER_ARGUMENTS = ('host', 'agent', 'table', 'column', 'record_id', 'technique', 'since', 'until')
+
+def add_filter_arguments(parser):
+    """添加从取证数据库读取时的过滤参数"""
+    parser.add_argument('--host', action='append', help='只读取该来源地址的请求（可重复指定）')
+    parser.add_argument('--agent', help='只读取User-Agent包含该字符串的请求')
+    parser.add_argument('--table', help='只读取该表，格式为 表名 或 库名.表名（不区分大小写）')
+    parser.add_argument('--column', action='append', help='只读取该列（可重复指定，不区分大小写）')
+    parser.add_argument('--record-id', type=int, action='append', help='只读取该记录编号（可重复指定）')
+    parser.add_argument('--technique', action='append',
+                        help='只读取该注入手法（多配置分析时的配置名称）的请求（可重复指定）')
+    parser.add_argument('--since', help='只读取该时间之后的请求（日志时间戳或ISO格式）')
+    parser.add_argument('--until', help='只读取该时间之前的请求（日志时间戳或ISO格式）')
+
+def has_filters(args):
+    """是否指定了任何过滤参数"""
+    return any(getattr(args, name, None) for name in FILTER_ARGUMENTS)
+
+def build_filters(args):
+    """
+    将过滤参数转换为SQL条件
+    返回 (WHERE子句, 参数列表)
+    """
+    conditions = []
+    params = []
+
+    def any_of(column, values):
+        conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+
+    if getattr(args, 'host', None):
+        any_of('remote_host', args.host)
+    if getattr(args, 'agent', None):
+        conditions.append("instr(user_agent, ?) > 0")
+        params.append(args.agent)
+    if getattr(args, 'table', None):
+        if '.' in args.table:
+            database, table = args.table.split('.', 1)
+            conditions.append('db_name = ?')
+            params.append(database)
+        else:
+            table = args.table
+        conditions.append('table_name = ?')
+        params.append(table)
+    if getattr(args, 'column', None):
+        any_of('column_name', args.column)
+    if getattr(args, 'record_id', None):
+        any_of('record_id', args.record_id)
+    if getattr(args, 'technique', None):
+        any_of('technique', args.technique)
+    for name, operator in (('since', '>='), ('until', '<=')):
+        value = getattr(args, name, None)
+        if value:
+            epoch = to_epoch(value)
+            if epoch is None:
+                raise ValueError(f"无法解析的时间: {value}")
+            conditions.append(f'epoch {operator} ?')
+            params.append(epoch)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return where, params
+
+def read_store(path, args=None):
+    """
+    按过滤条件读取分析结果，按写入顺序产出 {'request', 'analysis'}
+    args为None时读取全部；数据库和过滤条件在调用时即检查，读取在迭代时进行
+    """
+    where, params = build_filters(args) if args is not None else ('', [])
+    connection = connect(path, readonly=True)
+    columns = list(REQUEST_COLUMNS.values()) + list(ANALYSIS_COLUMNS.values())
+    try:
+        cursor = connection.execute(f"SELECT {', '.join(columns)} FROM analyses {where} ORDER BY id", params)
+    except sqlite3.Error:
+        connection.close()
+        raise
+    return _iter_results(connection, cursor)
+
+def _iter_results(connection, cursor):
+    request_fields = list(REQUEST_COLUMNS)
+    analysis_fields = list(ANALYSIS_COLUMNS)
+    split = len(request_fields)
+    try:
+        for row in cursor:
+            request = {field: value for field, value in zip(request_fields, row[:split]) if value is not None}
+            analysis = dict(zip(analysis_fields, row[split:]))
+            analysis['judge'] = bool(analysis['judge'])
+            for field in OPTIONAL_ANALYSIS_FIELDS:
+                if analysis[field] is None:
+                    del analysis[field]
+            yield {'request': request, 'analysis': analysis}
+    finally:
+        connection.close()
+
+def read_store_analyses(path, args=None):
+    """只产出分析字段，供重构器使用"""
+    return (result['analysis'] for result in read_store(path, args))
+
+def store_summary(path):
+    """数据库中按 来源地址、注入手法、库.表.列 汇总的请求数、记录数和时间范围（Unix时间）"""
+    connection = connect(path, readonly=True)
+    try:
+        return connection.execute(
+            "SELECT remote_host, technique, db_name, table_name, column_name, COUNT(*), "
+            "COUNT(DISTINCT record_id), MIN(epoch), MAX(epoch) FROM analyses "
+            "GROUP BY remote_host, technique, db_name, table_name, column_name ORDER BY MIN(epoch)").fetchall()
+    finally:
+        connection.close()
+
+def format_epoch(epoch):
+    """以UTC的ISO格式显示Unix时间"""
+    if epoch is None:
+        return '-'
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec='seconds')
+
+def main():
+    parser = argparse.ArgumentParser(description='取证存储')
+    parser.add_argument('-d', '--db', required=True, help='SQLite数据库文件路径')
+    parser.add_argument('--read', action='store_true',
+                        help='从数据库读取符合过滤条件的分析结果（默认从标准输入写入数据库）')
+    parser.add_argument('--summary', action='store_true', help='按来源地址、注入手法和库.表.列汇总数据库内容（时间为UTC）')
+    parser.add_argument('--tee', action='store_true', help='写入数据库的同时将输入原样输出，便于继续接重构器')
+    parser.add_argument('--all', action='store_true', help='保存全部分析结果（默认只保存注入分析结果）')
+    add_filter_arguments(parser)
+    record_codec.add_format_argument(parser)
+    args = parser.parse_args()
+    if has_filters(args) and not args.read:
+        parser.error('过滤参数需要配合 --read 使用')
+
+    try:
+        if args.summary:
+            for host, technique, database, table, column, count, records, first, last in store_summary(args.db):
+                print(f"{host or '-'}\t{technique or '-'}\t{database}.{table}.{column}\t{count} 条请求\t"
+                      f"{records} 条记录\t{format_epoch(first)} ~ {format_epoch(last)}")
+        elif args.read:
+            with record_codec.RecordWriter(args.format) as writer:
+                writer.write_all(read_store(args.db, args))
+        else:
+            results = record_codec.read_records(
+                on_error=lambda e: print(f"Error processing line: {e}", file=sys.stderr))
+            with StoreWriter(args.db, keep_all=args.all) as store:
+                if args.tee:
+                    with record_codec.RecordWriter(args.format) as writer:
+                        writer.write_all(store.feed(results))
+                else:
+                    for result in results:
+                        store.add(result)
+            print(f"[+] 取证存储: 写入 {store.written} 条分析结果到 {args.db}", file=sys.stderr)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error accessing forensic store: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,953 @@
+#!/usr/bin/env python3
+"""
+file: pipeline.py
+单进程管道运行器 - 在同一进程内串联全部处理阶段
+输入: 日志文件（或标准输入）
+输出: 最后一个阶段的结果（报告文件或JSON行格式数据）
+
+各阶段之间直接传递Python对象，不再经过JSON序列化和多次解释器启动
+"""
+import os
+import sys
+import json
+import time
+import signal
+import sqlite3
+import argparse
+import importlib.util
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import record_codec
+import stage_stats
+import forensic_store
+import timeline
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 各阶段脚本路径（相对于项目根目录）
+STAGE_MODULES = {
+    'prefilter': '1_log_parser/line_prefilter.py',
+    'parse': '1_log_parser/1_web_log_parser.py',
+    'extract': '1_log_parser/2_param_extractor.py',
+    'url': '2_payload_decoder/url_decoder.py',
+    'base64': '2_payload_decoder/base64_decoder.py',
+    'decode': '2_payload_decoder/chain_decoder.py',
+    'dedup': '2_payload_decoder/request_dedup.py',
+    'analyze': '3_payload_analyzer/sqlmap_analyzer.py',
+    'calibrate': '3_payload_analyzer/judge_calibrator.py',
+    'reconstruct': '4_data_reconstructor/default_data_reconstructor.py',
+    'report': '5_report_generator/default_report_generator.py',
+}
+
+# 默认阶段顺序，与readme中的管道命令一致
+DEFAULT_STAGES = ['parse', 'extract', 'url', 'base64', 'analyze', 'reconstruct', 'report']
+
+# 可选的重构器实现
+RECONSTRUCTOR_MODULES = {
+    'default': '4_data_reconstructor/default_data_reconstructor.py',
+    'streaming': '4_data_reconstructor/streaming_data_reconstructor.py',
+    'bisection': '4_data_reconstructor/bisection_data_reconstructor.py',
+}
+
+# 会话划分重构器，--sessions时按会话划分后调用上述重构器
+SESSION_RECONSTRUCTOR_MODULE = '4_data_reconstructor/session_reconstructor.py'
+
+# 内存映射日志读取器，--mmap模式下替代parse阶段
+MMAP_READER_MODULE = '1_log_parser/mmap_log_reader.py'
+
+# 自定义日志格式编译器，--log-format时供parse阶段和内存映射读取器使用
+LOG_FORMAT_MODULE = '1_log_parser/log_format.py'
+
+# 日志跟踪读取器，--follow模式下替代文件读取
+FOLLOWER_MODULE = '1_log_parser/log_follower.py'
+
+# 归档日志读取器，-i 为通配符或压缩文件时读取轮转的日志文件
+ARCHIVE_READER_MODULE = '1_log_parser/archive_reader.py'
+
+# 检查点文件格式版本
+CHECKPOINT_VERSION = 1
+
+# 逐条处理记录的阶段，可在并行模式下分片到多个工作进程执行
+RECORD_STAGES = {'prefilter', 'parse', 'extract', 'url', 'base64', 'decode', 'dedup', 'analyze'}
+
+# 需要extract阶段附带会话字段（remote_host、user_agent、path）的阶段
+SESSION_FIELD_STAGES = ('store', 'dedup')
+
+# 并行模式下工作进程返回给重构器的精简分析字段
+COMPACT_ANALYSIS_FIELDS = ('type', 'database', 'table', 'column', 'position',
+                           'ascii_value', 'judge', 'comparison_operator', 'record_id', 'probe')
+
+_loaded_modules = {}
+
+def load_stage_module(relative_path):
+    """
+    按文件路径加载阶段脚本模块
+    阶段脚本文件名以数字开头，无法直接import
+    """
+    if relative_path in _loaded_modules:
+        return _loaded_modules[relative_path]
+
+    path = os.path.join(BASE_DIR, relative_path)
+    module_dir = os.path.dirname(path)
+    if module_dir not in sys.path:
+        sys.path.insert(0, module_dir)
+
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+
+    _loaded_modules[relative_path] = module
+    return module
+
+def build_prefilter(args):
+    module = load_stage_module(STAGE_MODULES['prefilter'])
+    trigger_patterns = module.load_trigger_patterns(args.config) if args.config else None
+    prefilter = module.LinePrefilter(args.param, trigger_patterns)
+
+    def prefilter_stage(lines):
+        return prefilter.filter_lines(lines)
+
+    # 供运行结束时输出统计信息
+    prefilter_stage.prefilter = prefilter
+    return prefilter_stage
+
+def load_log_format(args):
+    """编译 --log-format 指定的日志格式，未指定时返回None"""
+    if not args.log_format:
+        return None
+    return load_stage_module(LOG_FORMAT_MODULE).LogFormat(args.log_format)
+
+def build_parse(args):
+    module = load_stage_module(STAGE_MODULES['parse'])
+    log_format = load_log_format(args)
+    if log_format is None:
+        return module.parse_lines
+    return lambda lines: module.parse_lines(lines, log_format)
+
+def build_extract(args):
+    if not args.param:
+        raise ValueError("extract阶段需要提供 -p/--param 参数")
+    module = load_stage_module(STAGE_MODULES['extract'])
+    return lambda records: module.extract_records(records, args.param, args.session_fields)
+
+def build_url(args):
+    return load_stage_module(STAGE_MODULES['url']).decode_records
+
+def build_base64(args):
+    return load_stage_module(STAGE_MODULES['base64']).decode_records
+
+def build_decode(args):
+    module = load_stage_module(STAGE_MODULES['decode'])
+    decode_chain = module.DecodeChain(module.parse_chain(args.decode_chain))
+    # 跟踪模式逐条处理，避免为凑满批次延迟记录并导致检查点偏移量超前
+    batch_size = 1 if args.follow else module.DEFAULT_BATCH_SIZE
+
+    def decode_stage(records):
+        return decode_chain.decode_records(records, batch_size)
+
+    # 暴露解码链，便于运行结束后汇总缓存命中统计
+    decode_stage.decode_chain = decode_chain
+    return decode_stage
+
+def build_dedup(args):
+    module = load_stage_module(STAGE_MODULES['dedup'])
+    deduplicator = create_deduplicator(module, args)
+
+    def dedup_stage(records):
+        return deduplicator.dedup_records(records)
+
+    # 供运行结束时输出统计信息
+    dedup_stage.deduplicator = deduplicator
+    return dedup_stage
+
+def create_deduplicator(module, args):
+    return module.RequestDeduplicator(args.dedup_mode, args.dedup_window,
+                                      error_rate=args.dedup_error_rate,
+                                      signature=module.parse_signature(args.dedup_signature))
+
+def build_analyze(args):
+    if not args.config:
+        raise ValueError("analyze阶段需要提供 --config 参数")
+    module = load_stage_module(STAGE_MODULES['analyze'])
+    analyzer = module.load_analyzer(args.config)
+    if 'request_time' in analyzer.judge_metrics:
+        log_format = load_log_format(args)
+        if log_format is None or not log_format.has_request_time:
+            raise ValueError("基于耗时的判断函数需要 --log-format 包含 %D/%T 或 $request_time")
+
+    def analyze_stage(records):
+        return analyzer.analyze_records(records)
+
+    # 暴露模板缓存、判断函数和分析器，便于运行结束后汇总命中统计、自动分簇结果和错误数
+    analyze_stage.analyzer = analyzer
+    analyze_stage.template_cache = analyzer.template_cache
+    analyze_stage.judge_functions = module.judge_functions(analyzer)
+    return analyze_stage
+
+def build_calibrate(args):
+    if not args.config:
+        raise ValueError("calibrate阶段需要提供 --config 参数")
+    module = load_stage_module(STAGE_MODULES['calibrate'])
+    try:
+        with open(args.config, 'r') as f:
+            config_data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"无法读取配置文件 {args.config}: {e}")
+
+    def calibrate_stage(records):
+        # 读完全部请求后选择judge_function，满足一致率要求时写回 --config
+        calibrator = module.JudgeCalibrator(config_data)
+        calibrator.feed(records)
+        judge, _ = module.apply_calibration(calibrator, config_data, path=args.config)
+        if judge is not None:
+            yield {'judge_function': judge}
+
+    return calibrate_stage
+
+def build_reconstruct(args):
+    module = load_stage_module(RECONSTRUCTOR_MODULES[args.reconstructor])
+
+    if args.sessions:
+        session_module = load_stage_module(SESSION_RECONSTRUCTOR_MODULE)
+        keys = session_module.parse_session_keys(args.session_keys)
+
+        def reconstruct_sessions(results):
+            # 按会话划分需要请求数据中的会话字段，各会话由进程池并行重构
+            data = session_module.reconstruct_sessions(results, keys, args.session_gap,
+                                                       args.reconstructor, args.workers)
+            print(session_module.session_summary(data), file=sys.stderr)
+            yield data
+
+        return reconstruct_sessions
+
+    # --timeline时统计攻击时间线，并行模式下由工作进程按分片收集后合并到这里
+    collector = timeline.Timeline() if args.timeline else None
+
+    def reconstruct(results):
+        if collector is not None:
+            results = collector.feed(results)
+        # 上游产出 {'request', 'analysis'}，重构器只需要analysis部分
+        analyses = (result['analysis'] for result in results)
+        if args.reconstructor == 'streaming':
+            reconstructor = module.StreamingReconstructor()
+            for _ in reconstructor.fold(analyses):
+                pass
+            data = reconstructor.flush()
+        else:
+            data = module.reconstruct_data(analyses)
+        if collector is not None:
+            data['timeline'] = collector.summary()
+        yield data
+
+    reconstruct.timeline = collector
+    return reconstruct
+
+def build_store(args):
+    if not args.store:
+        raise ValueError("store阶段需要提供 --store 参数")
+
+    def store_stage(results):
+        # 分析结果写入取证数据库的同时原样传给下一阶段
+        with forensic_store.StoreWriter(args.store) as store:
+            yield from store.feed(results)
+        print(f"[+] 取证存储: 写入 {store.written} 条分析结果到 {args.store}", file=sys.stderr)
+
+    return store_stage
+
+def build_load(args):
+    if not args.store:
+        raise ValueError("load阶段需要提供 --store 参数")
+    try:
+        results = forensic_store.read_store(args.store, args)
+    except sqlite3.Error as e:
+        raise ValueError(f"无法读取取证数据库 {args.store}: {e}")
+
+    def load_stage(_):
+        # 从取证数据库按过滤参数读取分析结果，忽略上游输入
+        return results
+
+    return load_stage
+
+def build_report(args):
+    module = load_stage_module(STAGE_MODULES['report'])
+    module.parse_output_formats(args.output)
+
+    def report(items):
+        for data in items:
+            module.generate_report(data, args.output, console_rows=args.console_rows)
+        return iter(())
+
+    return report
+
+# 阶段名称到构建函数的映射，构建函数返回 "可迭代对象 -> 可迭代对象" 的阶段函数
+STAGE_BUILDERS = {
+    'prefilter': build_prefilter,
+    'parse': build_parse,
+    'extract': build_extract,
+    'url': build_url,
+    'base64': build_base64,
+    'decode': build_decode,
+    'dedup': build_dedup,
+    'analyze': build_analyze,
+    'calibrate': build_calibrate,
+    'store': build_store,
+    'load': build_load,
+    'reconstruct': build_reconstruct,
+    'report': build_report,
+}
+
+def build_pipeline(stage_names, args):
+    """根据声明式阶段列表构建阶段函数列表"""
+    unknown = [name for name in stage_names if name not in STAGE_BUILDERS]
+    if unknown:
+        raise ValueError(f"未知的阶段: {', '.join(unknown)}")
+    if 'load' in stage_names[1:]:
+        raise ValueError("load阶段从取证数据库读取数据，只能作为第一个阶段")
+    return [STAGE_BUILDERS[name](args) for name in stage_names]
+
+def find_prefilter(stages):
+    """返回阶段列表中的预过滤器，不存在时返回None"""
+    for stage in stages:
+        prefilter = getattr(stage, 'prefilter', None)
+        if prefilter is not None:
+            return prefilter
+    return None
+
+def report_prefilter(prefilter):
+    """在标准错误流输出预过滤统计信息"""
+    if prefilter is not None:
+        print(prefilter.summary(), file=sys.stderr)
+
+def find_deduplicator(stages):
+    """返回阶段列表中的请求去重器，不存在时返回None"""
+    for stage in stages:
+        deduplicator = getattr(stage, 'deduplicator', None)
+        if deduplicator is not None:
+            return deduplicator
+    return None
+
+def report_deduplicator(deduplicator):
+    """在标准错误流输出去重统计信息"""
+    if deduplicator is not None:
+        print(deduplicator.summary(), file=sys.stderr)
+
+def find_timeline(stages):
+    """返回阶段列表中重构阶段的时间线，未启用时返回None"""
+    for stage in stages:
+        collector = getattr(stage, 'timeline', None)
+        if collector is not None:
+            return collector
+    return None
+
+def find_template_cache(stages):
+    """返回阶段列表中分析器的模板缓存，未启用时返回None"""
+    for stage in stages:
+        template_cache = getattr(stage, 'template_cache', None)
+        if template_cache is not None:
+            return template_cache
+    return None
+
+def report_template_cache(template_cache, args):
+    """指定 --stats 时在标准错误流输出模板缓存统计信息"""
+    if template_cache is not None and args.stats:
+        print(template_cache.summary(), file=sys.stderr)
+
+def report_judge(stages):
+    """在标准错误流输出自动分簇判断函数的分簇结果（单进程模式）"""
+    for stage in stages:
+        for judge_function in getattr(stage, 'judge_functions', ()):
+            if hasattr(judge_function, 'summary'):
+                print(judge_function.summary(), file=sys.stderr)
+
+def take_missing_metric(stages, stats=None):
+    """
+    取出分析器中缺少判断依据字段的请求数并清零，计入analyze阶段的错误数
+    stats: 与stages对应的阶段统计列表
+    """
+    total = 0
+    for index, stage in enumerate(stages):
+        analyzer = getattr(stage, 'analyzer', None)
+        if analyzer is not None and analyzer.missing_metric:
+            if stats is not None:
+                stats[index].errors += analyzer.missing_metric
+            total += analyzer.missing_metric
+            analyzer.missing_metric = 0
+    return total
+
+def report_missing_metric(count):
+    """在标准错误流输出缺少判断依据字段的请求数"""
+    if count:
+        print(load_stage_module(STAGE_MODULES['analyze']).missing_metric_summary(count), file=sys.stderr)
+
+def find_decode_chain(stages):
+    """返回阶段列表中的解码链，不存在时返回None"""
+    for stage in stages:
+        decode_chain = getattr(stage, 'decode_chain', None)
+        if decode_chain is not None:
+            return decode_chain
+    return None
+
+def report_decode_chain(decode_chain, counts=None):
+    """在标准错误流输出解码缓存统计信息"""
+    if decode_chain is not None and decode_chain.cache_size > 0:
+        print(decode_chain.summary(counts), file=sys.stderr)
+
+def build_stats(stage_names, args):
+    """为各阶段创建统计（未指定 --stats/--stats-file 时不计数），逐条处理阶段以外的阶段按汇总阶段统计"""
+    return [stage_stats.from_args(args, name, aggregate=name not in RECORD_STAGES) for name in stage_names]
+
+def run_pipeline(stages, lines, stats=None):
+    """
+    将各阶段串联为生成器链，返回最后一个阶段的输出
+    stats: 与stages对应的阶段统计列表，每个阶段的输入和输出分别计数计时
+    """
+    stream = lines
+    for index, stage in enumerate(stages):
+        if stats is None:
+            stream = stage(stream)
+        else:
+            stream = stats[index].count_out(stage(stats[index].count_in(stream)))
+    return stream
+
+def pipeline_gauges(started, prefilter=None, template_cache=None, deduplicator=None):
+    """--stats-file 指标文件中的流水线级指标"""
+    gauges = {'pipeline_duration_seconds': round(time.perf_counter() - started, 6)}
+    if prefilter is not None:
+        gauges['prefilter_kept_lines'] = prefilter.kept
+        gauges['prefilter_dropped_lines'] = prefilter.dropped
+    if deduplicator is not None:
+        gauges['dedup_kept_requests'] = deduplicator.kept
+        gauges['dedup_dropped_requests'] = deduplicator.dropped
+        gauges['dedup_conflicting_requests'] = deduplicator.conflicts
+    if template_cache is not None:
+        gauges['template_cache_hits'] = template_cache.hits
+        gauges['template_cache_misses'] = template_cache.misses
+        gauges['template_cache_evictions'] = template_cache.evictions
+    return gauges
+
+def compute_chunks(path, chunk_size):
+    """
+    将日志文件按字节范围切分为多个分片
+    每个分片的边界都对齐到换行符之后，保证不会截断日志行
+    """
+    file_size = os.path.getsize(path)
+    chunks = []
+    start = 0
+    with open(path, 'rb') as f:
+        while start < file_size:
+            end = min(start + chunk_size, file_size)
+            if end < file_size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+def resolve_archives(args):
+    """
+    -i 为通配符或压缩文件时，返回按第一条时间戳排序的日志文件列表
+    未指定 -i 或为普通的单个日志文件时返回None
+    """
+    if not args.input:
+        return None
+    reader = load_stage_module(ARCHIVE_READER_MODULE)
+    if not reader.has_glob(args.input):
+        if not os.path.isfile(args.input) or reader.detect_compression(args.input) is None:
+            return None
+    return reader.sort_chronologically(reader.expand_inputs([args.input]))
+
+def archive_tasks(paths, chunk_size):
+    """并行模式的任务：未压缩的文件按字节范围分片，压缩文件整体由一个工作进程解压处理"""
+    reader = load_stage_module(ARCHIVE_READER_MODULE)
+    tasks = []
+    for path in paths:
+        if reader.detect_compression(path) is None:
+            tasks.extend((path, start, end) for start, end in compute_chunks(path, chunk_size))
+        else:
+            tasks.append((path, 0, None))
+    return tasks
+
+def read_chunk(path, start, end):
+    """读取指定字节范围内的日志行"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = data.decode('utf-8', errors='replace').split('\n')
+    # 分片以换行符结尾时，split会多出一个空字符串
+    if lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+def compact_analyses(results):
+    """将分析结果压缩为字段元组，只保留重构器需要的注入分析（数据字符和COUNT/LENGTH枚举查询）"""
+    compact = []
+    for result in results:
+        analysis = result['analysis']
+        if "inject" in analysis['type'] and analysis['table'] and (analysis['column'] or analysis.get('probe')):
+            compact.append(tuple(analysis.get(field, '') for field in COMPACT_ANALYSIS_FIELDS))
+    return compact
+
+def expand_analyses(compact_results):
+    """将精简字段元组还原为重构器使用的结构"""
+    for chunk in compact_results:
+        for values in chunk:
+            yield {'analysis': dict(zip(COMPACT_ANALYSIS_FIELDS, values))}
+
+def mmap_literals(stage_names, args):
+    """
+    内存映射模式的预过滤字面量
+    后续存在extract阶段时，不包含 "参数名=" 的行不可能产出结果
+    """
+    if args.param and 'extract' in stage_names:
+        return [f'{args.param}='.encode('utf-8')]
+    return None
+
+def read_mmap_records(stage_names, args, start=0, end=None):
+    """通过内存映射读取器产出结构化日志，替代parse阶段"""
+    reader = load_stage_module(MMAP_READER_MODULE)
+    return reader.read_log_records(args.input, mmap_literals(stage_names, args), start, end,
+                                   load_log_format(args))
+
+_worker_state = {}
+
+def _init_worker(stage_names, args, compact):
+    """工作进程初始化：每个进程只构建一次阶段函数"""
+    if args.mmap:
+        _worker_state['stages'] = build_pipeline(stage_names[1:], args)
+        _worker_state['stats'] = build_stats(stage_names[1:], args)
+    else:
+        _worker_state['stages'] = build_pipeline(stage_names, args)
+        _worker_state['stats'] = build_stats(stage_names, args)
+    _worker_state['stage_names'] = stage_names
+    _worker_state['args'] = args
+    _worker_state['compact'] = compact
+
+def _process_chunk(task):
+    """在工作进程中对一个分片执行逐条处理阶段"""
+    path, start, end = task
+    if _worker_state['args'].mmap:
+        source = read_mmap_records(_worker_state['stage_names'], _worker_state['args'], start, end)
+    elif end is None:
+        source = load_stage_module(ARCHIVE_READER_MODULE).read_lines([path])
+    else:
+        source = read_chunk(path, start, end)
+    stats = _worker_state['stats'] if stage_stats.enabled(_worker_state['args']) else None
+    results = run_pipeline(_worker_state['stages'], source, stats)
+    # 精简分析字段不含时间戳，时间线在工作进程中按分片收集
+    collector = None
+    if _worker_state['compact'] and _worker_state['args'].timeline:
+        collector = timeline.Timeline()
+        results = collector.feed(results)
+    if _worker_state['compact']:
+        payload = compact_analyses(results)
+    else:
+        payload = list(results)
+
+    # 回传本分片的预过滤、模板缓存和解码缓存计数并清零，由主进程汇总
+    counts = {}
+    prefilter = find_prefilter(_worker_state['stages'])
+    if prefilter is not None:
+        counts['prefilter'] = (prefilter.kept, prefilter.dropped)
+        prefilter.kept = prefilter.dropped = 0
+    template_cache = find_template_cache(_worker_state['stages'])
+    if template_cache is not None:
+        counts['template_cache'] = (template_cache.hits, template_cache.misses, template_cache.evictions)
+        template_cache.hits = template_cache.misses = template_cache.evictions = 0
+    deduplicator = find_deduplicator(_worker_state['stages'])
+    if deduplicator is not None:
+        counts['dedup'] = deduplicator.take_counts()
+    decode_chain = find_decode_chain(_worker_state['stages'])
+    if decode_chain is not None and decode_chain.cache_size > 0:
+        counts['decode_cache'] = decode_chain.take_counts()
+    if collector is not None:
+        counts['timeline'] = collector
+    counts['missing_metric'] = take_missing_metric(_worker_state['stages'], stats)
+    if stats is not None:
+        # 精简时丢弃的非注入分析结果不会回传，由主进程计入下一阶段的输入记录数
+        if _worker_state['compact']:
+            counts['compacted'] = stats[-1].records_out - len(payload)
+        counts['stats'] = [stage.snapshot() for stage in stats]
+        for stage in stats:
+            stage.reset()
+    return payload, counts
+
+def ordered_parallel_map(executor, func, tasks, max_pending):
+    """
+    按提交顺序产出并行处理结果
+    同时在途的任务数不超过max_pending，避免结果堆积占用内存
+    """
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(func, task))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def split_record_stages(stage_names):
+    """返回阶段列表开头连续的逐条处理阶段的数量"""
+    split = 0
+    while split < len(stage_names) and stage_names[split] in RECORD_STAGES:
+        split += 1
+    return split
+
+def run_parallel(stage_names, args):
+    """
+    并行模式：日志文件按字节范围分片，由进程池中的工作进程
+    执行 parse → extract → decode → analyze，主进程按原始日志顺序合并结果
+    """
+    split = split_record_stages(stage_names)
+    record_stages = stage_names[:split]
+    if not record_stages or record_stages[0] not in ('prefilter', 'parse'):
+        raise ValueError("并行模式的阶段列表必须以prefilter或parse开头")
+
+    # 后续接重构阶段时，只需要回传精简的分析字段；按会话划分或写入取证数据库时还需要请求字段
+    compact = (split < len(stage_names) and record_stages[-1] == 'analyze'
+               and not args.sessions and 'store' not in stage_names)
+    rest_stages = build_pipeline(stage_names[split:], args)
+    started = time.perf_counter()
+    # 逐条处理阶段的统计由工作进程回传后汇总，其余阶段在主进程中统计
+    record_stats = build_stats(record_stages[1:] if args.mmap else record_stages, args)
+    rest_stats = build_stats(stage_names[split:], args)
+
+    if args.archives is not None:
+        tasks = archive_tasks(args.archives, args.chunk_size * 1024 * 1024)
+    else:
+        chunks = compute_chunks(args.input, args.chunk_size * 1024 * 1024)
+        tasks = [(args.input, start, end) for start, end in chunks]
+
+    with ProcessPoolExecutor(max_workers=args.workers,
+                             initializer=_init_worker,
+                             initargs=(record_stages, args, compact)) as executor:
+        prefilter = None
+        if 'prefilter' in record_stages:
+            prefilter = load_stage_module(STAGE_MODULES['prefilter']).LinePrefilter()
+        # 各工作进程的缓存相互独立，主进程只汇总计数
+        template_cache = None
+        if 'analyze' in record_stages:
+            analyzer_module = load_stage_module(STAGE_MODULES['analyze'])
+            worker_cache = analyzer_module.load_analyzer(args.config).template_cache
+            if worker_cache is not None:
+                template_cache = analyzer_module.TemplateCache(worker_cache.max_size)
+        # 各工作进程分别去重（只在分片内去重），主进程只汇总计数
+        deduplicator = None
+        if 'dedup' in record_stages:
+            deduplicator = create_deduplicator(load_stage_module(STAGE_MODULES['dedup']), args)
+        collector = find_timeline(rest_stages)
+        decode_chain = None
+        decode_counts = [0, 0]
+        missing_metric = [0]
+        compacted = [0]
+        if 'decode' in record_stages:
+            decode_module = load_stage_module(STAGE_MODULES['decode'])
+            decode_chain = decode_module.DecodeChain(decode_module.parse_chain(args.decode_chain))
+
+        def merged():
+            for payload, counts in ordered_parallel_map(executor, _process_chunk, tasks,
+                                                        args.workers * 2):
+                if 'prefilter' in counts:
+                    prefilter.kept += counts['prefilter'][0]
+                    prefilter.dropped += counts['prefilter'][1]
+                if 'template_cache' in counts:
+                    hits, misses, evictions = counts['template_cache']
+                    template_cache.hits += hits
+                    template_cache.misses += misses
+                    template_cache.evictions += evictions
+                if 'dedup' in counts:
+                    deduplicator.add_counts(counts['dedup'])
+                if 'timeline' in counts:
+                    collector.merge(counts['timeline'])
+                missing_metric[0] += counts.get('missing_metric', 0)
+                compacted[0] += counts.get('compacted', 0)
+                if 'decode_cache' in counts:
+                    decode_counts[0] += counts['decode_cache'][0]
+                    decode_counts[1] += counts['decode_cache'][1]
+                for stats, snapshot in zip(record_stats, counts.get('stats', ())):
+                    stats.merge(snapshot)
+                yield payload
+
+        with stage_stats.profiled(args.profile):
+            if compact:
+                stream = expand_analyses(merged())
+            else:
+                stream = (item for chunk in merged() for item in chunk)
+            emit(run_pipeline(rest_stages, stream, rest_stats), args.format)
+        # 与串行模式一致，下一阶段的输入记录数包含精简时丢弃的分析结果
+        # （只有后面接重构阶段时才会精简，阶段列表以analyze等逐条处理阶段结尾时没有下一阶段）
+        if compacted[0]:
+            rest_stats[0].records_in += compacted[0]
+        report_prefilter(prefilter)
+        report_deduplicator(deduplicator)
+        report_decode_chain(decode_chain, tuple(decode_counts))
+        report_template_cache(template_cache, args)
+        report_missing_metric(missing_metric[0])
+        stage_stats.report(args, record_stats + rest_stats,
+                           pipeline_gauges(started, prefilter, template_cache, deduplicator))
+
+def load_checkpoint(path):
+    """读取检查点，文件不存在时返回None"""
+    try:
+        with open(path, 'r') as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"不支持的检查点版本: {checkpoint.get('version')}")
+    return checkpoint
+
+def save_checkpoint(path, follower, reconstructor):
+    """原子地写入检查点：日志文件的inode、已处理的字节偏移量和重构器状态"""
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'log': {
+            'path': os.path.abspath(follower.path),
+            'inode': follower.inode,
+            'offset': follower.offset
+        },
+        'reconstructor': reconstructor.to_checkpoint() if reconstructor is not None else None
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def run_follow(stage_names, args):
+    """
+    跟踪模式：持续读取不断增长的日志文件（支持logrotate轮转），
+    新增的行逐条经过各阶段，由流式重构器增量更新状态，字符定稿后立即输出事件。
+    定期将字节偏移量和重构器状态写入检查点，重启后从断点继续处理。
+    收到SIGINT/SIGTERM时在当前行处理完后写入检查点并输出结果。
+    """
+    split = split_record_stages(stage_names)
+    rest_names = stage_names[split:]
+    if split == 0 or rest_names not in ([], ['reconstruct']):
+        raise ValueError("跟踪模式的阶段列表必须由逐条处理阶段组成，最后可接reconstruct阶段")
+    stages = build_pipeline(stage_names[:split], args)
+
+    streaming_module = None
+    if rest_names:
+        streaming_module = load_stage_module(RECONSTRUCTOR_MODULES['streaming'])
+
+    offset, inode, reconstructor = 0, None, None
+    checkpoint = load_checkpoint(args.checkpoint) if args.checkpoint else None
+    if checkpoint is not None:
+        if checkpoint['log']['path'] != os.path.abspath(args.input):
+            raise ValueError(f"检查点对应的日志文件为 {checkpoint['log']['path']}")
+        offset = checkpoint['log']['offset']
+        inode = checkpoint['log']['inode']
+        if streaming_module is not None and checkpoint['reconstructor'] is not None:
+            reconstructor = streaming_module.StreamingReconstructor.from_checkpoint(checkpoint['reconstructor'])
+        print(f"[+] 从检查点恢复: 偏移量 {offset}", file=sys.stderr)
+    if streaming_module is not None and reconstructor is None:
+        reconstructor = streaming_module.StreamingReconstructor()
+
+    follower = load_stage_module(FOLLOWER_MODULE).LogFollower(args.input, offset, inode, args.poll_interval)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: follower.stop())
+
+    started = time.perf_counter()
+    stats = build_stats(stage_names[:split], args)
+    last_checkpoint = [time.monotonic()]
+    last_metrics = [time.monotonic()]
+    missing_metric = [0]
+
+    def maybe_checkpoint():
+        if args.checkpoint and time.monotonic() - last_checkpoint[0] >= args.checkpoint_interval:
+            save_checkpoint(args.checkpoint, follower, reconstructor)
+            last_checkpoint[0] = time.monotonic()
+        # 指标文件按检查点间隔刷新，供监控系统持续抓取
+        if args.stats_file is not None and time.monotonic() - last_metrics[0] >= args.checkpoint_interval:
+            missing_metric[0] += take_missing_metric(stages, stats)
+            stage_stats.write_metrics(args.stats_file, stats,
+                                      pipeline_gauges(started, find_prefilter(stages),
+                                                      deduplicator=find_deduplicator(stages)))
+            last_metrics[0] = time.monotonic()
+
+    def on_idle():
+        sys.stdout.flush()
+        maybe_checkpoint()
+
+    for item in run_pipeline(stages, follower.follow(on_idle), stats):
+        if reconstructor is None:
+            print(json.dumps(item))
+        else:
+            for event in reconstructor.feed(item['analysis']):
+                print(json.dumps({'event': 'char', **event}), flush=True)
+        maybe_checkpoint()
+
+    if args.checkpoint:
+        save_checkpoint(args.checkpoint, follower, reconstructor)
+    if reconstructor is not None:
+        print(json.dumps({'event': 'result', 'result': reconstructor.flush()}))
+    missing_metric[0] += take_missing_metric(stages, stats)
+    report_prefilter(find_prefilter(stages))
+    report_deduplicator(find_deduplicator(stages))
+    stage_stats.report(args, stats, pipeline_gauges(started, find_prefilter(stages),
+                                                          deduplicator=find_deduplicator(stages)))
+    report_decode_chain(find_decode_chain(stages))
+    report_template_cache(find_template_cache(stages), args)
+    report_missing_metric(missing_metric[0])
+    report_judge(stages)
+
+def emit(items, fmt=record_codec.JSONL):
+    """输出管道末端剩余的数据，逐条记录按指定的中间格式输出"""
+    writer = None
+    for item in items:
+        if isinstance(item, dict) and ('data' in item and 'tables' in item or 'sessions' in item):
+            print(json.dumps(item, indent=2))
+        else:
+            if writer is None:
+                writer = record_codec.RecordWriter(fmt)
+            writer.write(item)
+    if writer is not None:
+        writer.close()
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='SQL盲注分析管道运行器（单进程）')
+    parser.add_argument('-i', '--input',
+                        help='日志文件路径（默认读取标准输入）；也可为通配符或gzip/bzip2/xz/zstd压缩文件，'
+                             '如 "/var/log/nginx/access.log*"，按第一条时间戳排序后依次读取')
+    parser.add_argument('-s', '--stages', default=','.join(DEFAULT_STAGES),
+                        help=f"逗号分隔的阶段列表 (默认: {','.join(DEFAULT_STAGES)})")
+    parser.add_argument('-p', '--param', help='关键参数名（extract阶段）')
+    parser.add_argument('--config', help='分析器配置文件路径（analyze阶段），为目录时加载其中全部配置一次分派')
+    parser.add_argument('-o', '--output', default='json',
+                        help='逗号分隔的报告输出格式（report阶段），可选 json/csv/txt/jsonl/parquet/arrow，'
+                             'all 等于 json,csv,txt (默认: json)')
+    parser.add_argument('--console-rows', type=int, default=20,
+                        help='report阶段控制台报告中每列最多显示的记录数，0表示全部显示 (默认: 20)')
+    parser.add_argument('-r', '--reconstructor', choices=sorted(RECONSTRUCTOR_MODULES),
+                        default='default', help='重构器实现（reconstruct阶段，默认: default）')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='并行工作进程数（大于1时启用分片并行模式，需要 -i 指定日志文件）')
+    parser.add_argument('--chunk-size', type=int, default=32,
+                        help='并行模式下每个分片的大小，单位MB (默认: 32)')
+    parser.add_argument('--mmap', action='store_true',
+                        help='使用内存映射读取器替代parse阶段（需要 -i 指定日志文件）')
+    parser.add_argument('--log-format',
+                        help='Apache LogFormat或nginx log_format格式字符串，或预设名称 (common/combined/nginx)；'
+                             '包含 %%D/%%T 或 $request_time 时可使用基于耗时的判断函数')
+    parser.add_argument('--decode-chain', default='url,base64',
+                        help='decode阶段的解码链，逗号分隔，可选 url/double-url/base64/hex (默认: url,base64)')
+    parser.add_argument('--dedup-mode', choices=['window', 'bloom'], default='window',
+                        help='dedup阶段的去重结构：window为时间窗口内的哈希集合，bloom为布隆过滤器 (默认: window)')
+    parser.add_argument('--dedup-window', type=float, default=60.0,
+                        help='dedup阶段window模式的时间窗口，单位秒 (默认: 60)')
+    parser.add_argument('--dedup-error-rate', type=float, default=0.001,
+                        help='dedup阶段bloom模式的误判率 (默认: 0.001)')
+    parser.add_argument('--dedup-signature', default='status_code,response_size,request_time',
+                        help='dedup阶段逗号分隔的响应特征字段，应包含判断函数读取的字段 '
+                             '(默认: status_code,response_size,request_time)')
+    parser.add_argument('--sessions', action='store_true',
+                        help='按会话（来源地址、User-Agent、请求路径、时间窗口）划分分析结果，各会话独立重构并分别生成报告')
+    parser.add_argument('--session-keys', default='host,agent,path',
+                        help='逗号分隔的会话键，可选 host/agent/path (默认: host,agent,path)')
+    parser.add_argument('--session-gap', type=float, default=1800,
+                        help='同一会话键的请求间隔超过该值（秒）时开始新会话，0表示不按时间划分 (默认: 1800)')
+    parser.add_argument('--timeline', action='store_true',
+                        help='统计攻击时间线（请求和提取速率、攻击起止时间、每条数据的提取完成时间），写入重构结果和报告')
+    parser.add_argument('--store', metavar='DB',
+                        help='取证数据库文件路径：store阶段将分析结果写入其中，load阶段按过滤参数从中读取')
+    forensic_store.add_filter_arguments(parser)
+    record_codec.add_format_argument(parser)
+    stage_stats.add_stats_arguments(parser)
+    parser.add_argument('--follow', action='store_true',
+                        help='持续跟踪不断增长的日志文件（需要 -i 指定日志文件，支持logrotate轮转）')
+    parser.add_argument('--checkpoint', help='跟踪模式的检查点文件，存在时从中恢复')
+    parser.add_argument('--checkpoint-interval', type=float, default=30,
+                        help='跟踪模式写入检查点的最短间隔，单位秒 (默认: 30)')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='跟踪模式没有新数据时的轮询间隔，单位秒 (默认: 1.0)')
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    stage_names = [name.strip() for name in args.stages.split(',') if name.strip()]
+    # 会话划分、取证存储和请求去重都需要来源地址、User-Agent和请求路径，由extract阶段附带
+    args.session_fields = args.sessions or any(name in SESSION_FIELD_STAGES for name in stage_names)
+
+    try:
+        load_log_format(args)
+        args.archives = resolve_archives(args)
+    except (OSError, ValueError) as e:
+        print(f"Error building pipeline: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if forensic_store.has_filters(args) and 'load' not in stage_names:
+        print("Error building pipeline: 过滤参数只用于load阶段", file=sys.stderr)
+        sys.exit(1)
+
+    if args.archives is not None and (args.mmap or args.follow):
+        print("Error building pipeline: 通配符或压缩日志不能与 --mmap 或 --follow 同时使用", file=sys.stderr)
+        sys.exit(1)
+
+    if args.mmap and (not args.input or not stage_names or stage_names[0] != 'parse'):
+        print("Error building pipeline: 内存映射模式需要 -i 指定日志文件且阶段列表以parse开头",
+              file=sys.stderr)
+        sys.exit(1)
+
+    if args.timeline and ('reconstruct' not in stage_names or args.sessions):
+        print("Error building pipeline: --timeline 需要reconstruct阶段，且不能与 --sessions 同时使用", file=sys.stderr)
+        sys.exit(1)
+
+    if args.follow:
+        if not args.input or args.mmap or args.workers > 1 or args.sessions or args.timeline:
+            print("Error building pipeline: 跟踪模式需要 -i 指定日志文件，且不能与 --mmap、-j、--sessions 或 --timeline 同时使用",
+                  file=sys.stderr)
+            sys.exit(1)
+        try:
+            run_follow(stage_names, args)
+        except ValueError as e:
+            print(f"Error building pipeline: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.workers > 1:
+        if not args.input:
+            print("Error building pipeline: 并行模式需要通过 -i 指定日志文件", file=sys.stderr)
+            sys.exit(1)
+        try:
+            run_parallel(stage_names, args)
+        except ValueError as e:
+            print(f"Error building pipeline: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    built_names = stage_names[1:] if args.mmap else stage_names
+    try:
+        stages = build_pipeline(built_names, args)
+    except ValueError as e:
+        print(f"Error building pipeline: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    stats = build_stats(built_names, args) if stage_stats.enabled(args) else None
+    with stage_stats.profiled(args.profile):
+        if args.mmap:
+            emit(run_pipeline(stages, read_mmap_records(stage_names, args), stats), args.format)
+        elif args.archives is not None:
+            lines = load_stage_module(ARCHIVE_READER_MODULE).read_lines(args.archives)
+            emit(run_pipeline(stages, lines, stats), args.format)
+        elif args.input:
+            with open(args.input, 'r') as f:
+                emit(run_pipeline(stages, f, stats), args.format)
+        else:
+            emit(run_pipeline(stages, sys.stdin, stats), args.format)
+    report_prefilter(find_prefilter(stages))
+    report_deduplicator(find_deduplicator(stages))
+    report_decode_chain(find_decode_chain(stages))
+    report_template_cache(find_template_cache(stages), args)
+    report_missing_metric(take_missing_metric(stages, stats))
+    report_judge(stages)
+    if stats is not None:
+        stage_stats.report(args, stats,
+                           pipeline_gauges(started, find_prefilter(stages), find_template_cache(stages),
+                                           find_deduplicator(stages)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+file: record_codec.py
+中间格式编解码器 - 各阶段脚本之间传递记录的共享编解码模块
+输入: JSON行或列式批次格式的记录流
+输出: 指定格式的记录流
+
+支持两种格式：
+  - jsonl:    每行一个JSON对象（默认，与原有脚本兼容）
+  - columnar: 列式批次二进制格式。记录按批次存储，每批中字段结构相同的记录共用一个表头，
+              字符串列按批次字典编码（表名、列名、时间戳等重复值只存一次），
+              整数和布尔列以类型化数组存储，解码时由C层面批量完成
+读取时根据流开头的魔数自动识别格式，写入格式由各阶段脚本的 --format 参数指定。
+
+列式批次格式布局（整数均为小端序）：
+  流     := MAGIC 批次*
+  批次   := 表头长度(u32) 表头JSON 列数据*
+  表头   := {"count": 记录数, "columns": [[字段路径, 列类型], ...]}，空字典记录的批次没有列，按记录数还原
+  列类型 := "i" int64数组 | "b" 每条记录1字节 | "s" 字典编码的字符串 | "j" 字典编码的JSON文本
+  字典列 := 下标类型码(1字节) 字典大小(u32) 各项字节长度(u32数组) 字典数据长度(u32) 字典数据 下标数组
+"""
+import io
+import sys
+import json
+import struct
+import argparse
+from array import array
+
+# 中间格式名称
+JSONL = 'jsonl'
+COLUMNAR = 'columnar'
+FORMATS = (JSONL, COLUMNAR)
+
+# 列式批次格式的魔数
+MAGIC = b'BSQLCOL1'
+
+# 每个批次的默认记录数
+DEFAULT_BATCH_SIZE = 4096
+
+# int64的取值范围，超出时按JSON文本列存储
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+_U32 = struct.Struct('<I')
+
+def add_format_argument(parser):
+    """为阶段脚本添加 --format 参数"""
+    parser.add_argument('--format', choices=FORMATS, default=JSONL,
+                        help='输出的中间格式 (默认: jsonl)，输入格式自动识别')
+
+# ---- 类型化数组（统一为小端序） ----
+
+def _array_bytes(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+def _array_from(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+def _index_typecode(size):
+    """按字典大小选择最小的下标类型"""
+    if size <= 0xFF:
+        return 'B'
+    if size <= 0xFFFF:
+        return 'H'
+    return 'I'
+
+# ---- 写入 ----
+
+def _flatten_paths(record, prefix=()):
+    """将嵌套字典展开为字段路径列表，空字典作为普通值保存"""
+    paths = []
+    for key, value in record.items():
+        path = prefix + (key,)
+        if type(value) is dict and value:
+            paths.extend(_flatten_paths(value, path))
+        else:
+            paths.append(path)
+    return paths
+
+def _signature(record):
+    """记录的字段结构，只在嵌套字典处递归"""
+    signature = list(record)
+    for value in record.values():
+        if type(value) is dict and value:
+            signature.append(_signature(value))
+    return signature
+
+def _column_values(records, path):
+    """按字段路径逐层取出一列的值"""
+    values = records
+    for key in path:
+        values = [value[key] for value in values]
+    return values
+
+def _column_kind(values):
+    """推断一列值的存储类型"""
+    kinds = {type(value) for value in values}
+    if kinds == {bool}:
+        return 'b'
+    if kinds == {int} and all(INT64_MIN <= value <= INT64_MAX for value in values):
+        return 'i'
+    if kinds == {str}:
+        return 's'
+    return 'j'
+
+def _encode_dictionary(texts):
+    """字典编码一列字符串，返回编码后的字节串"""
+    lookup = {}
+    indices = [lookup.setdefault(text, len(lookup)) for text in texts]
+    encoded = [text.encode('utf-8', 'surrogatepass') for text in lookup]
+    typecode = _index_typecode(len(encoded))
+    blob = b''.join(encoded)
+    return b''.join((
+        typecode.encode('ascii'),
+        _U32.pack(len(encoded)),
+        _array_bytes(array('I', [len(item) for item in encoded])),
+        _U32.pack(len(blob)),
+        blob,
+        _array_bytes(array(typecode, indices))
+    ))
+
+def encode_batch(records):
+    """将字段结构相同的一批记录编码为列式批次"""
+    paths = _flatten_paths(records[0])
+    columns = [_column_values(records, path) for path in paths]
+    kinds = [_column_kind(values) for values in columns]
+    parts = []
+    for kind, values in zip(kinds, columns):
+        if kind == 'i':
+            data = _array_bytes(array('q', values))
+            parts.append(_U32.pack(len(data)))
+            parts.append(data)
+        elif kind == 'b':
+            parts.append(bytes(values))
+        elif kind == 's':
+            parts.append(_encode_dictionary(values))
+        else:
+            parts.append(_encode_dictionary([json.dumps(value) for value in values]))
+
+    header = json.dumps({
+        'count': len(records),
+        'columns': [[list(path), kind] for path, kind in zip(paths, kinds)]
+    }).encode('utf-8')
+    return _U32.pack(len(header)) + header + b''.join(parts)
+
+class RecordWriter:
+    """按指定格式写出记录流"""
+    def __init__(self, fmt=JSONL, stream=None, batch_size=DEFAULT_BATCH_SIZE):
+        if fmt not in FORMATS:
+            raise ValueError(f"未知的中间格式: {fmt}")
+        self.format = fmt
+        self.batch_size = batch_size
+        if fmt == JSONL:
+            self.stream = stream if stream is not None else sys.stdout
+        else:
+            if stream is None:
+                sys.stdout.flush()
+                stream = sys.stdout.buffer
+            self.stream = stream
+            self.stream.write(MAGIC)
+        self.signature = None
+        self.records = []
+        # 已写入的记录数
+        self.count = 0
+
+    def write(self, record):
+        """写入一条记录（列式格式下记录在批次写出前被缓存，写入后不应再修改）"""
+        self.count += 1
+        if self.format == JSONL:
+            self.stream.write(json.dumps(record) + '\n')
+            return
+
+        # 字段结构变化或批次已满时写出当前批次
+        signature = _signature(record)
+        if signature != self.signature or len(self.records) >= self.batch_size:
+            self.flush_batch()
+            self.signature = signature
+        self.records.append(record)
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush_batch(self):
+        """写出缓冲中的批次"""
+        if self.records:
+            self.stream.write(encode_batch(self.records))
+            self.records = []
+
+    def close(self):
+        """写出剩余记录并刷新输出流"""
+        if self.format == COLUMNAR:
+            self.flush_batch()
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# ---- 读取 ----
+
+class _PrefixedRaw(io.RawIOBase):
+    """先返回已读取的前缀，再继续读取原始流"""
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.prefix:
+            size = min(len(buffer), len(self.prefix))
+            buffer[:size] = self.prefix[:size]
+            self.prefix = self.prefix[size:]
+            return size
+        data = self.stream.read1(len(buffer)) if hasattr(self.stream, 'read1') else self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError("列式批次数据不完整")
+    return data
+
+def _decode_dictionary(stream, count):
+    """读取字典编码的一列，返回 (字典项列表, 下标数组)"""
+    typecode = _read_exact(stream, 1).decode('ascii')
+    size = _U32.unpack(_read_exact(stream, 4))[0]
+    lengths = _array_from('I', _read_exact(stream, 4 * size))
+    blob_size = _U32.unpack(_read_exact(stream, 4))[0]
+    blob = _read_exact(stream, blob_size)
+    indices = _array_from(typecode, _read_exact(stream, array(typecode).itemsize * count))
+
+    texts = []
+    pos = 0
+    for length in lengths:
+        texts.append(blob[pos:pos + length].decode('utf-8', 'surrogatepass'))
+        pos += length
+    return texts, indices
+
+def _decode_column(stream, kind, count):
+    """读取一列，返回值列表"""
+    if kind == 'i':
+        size = _U32.unpack(_read_exact(stream, 4))[0]
+        return _array_from('q', _read_exact(stream, size)).tolist()
+    if kind == 'b':
+        return [value == 1 for value in _read_exact(stream, count)]
+
+    texts, indices = _decode_dictionary(stream, count)
+    if kind == 's':
+        return list(map(texts.__getitem__, indices))
+
+    values = [json.loads(text) for text in texts]
+    if any(isinstance(value, (list, dict)) for value in values):
+        # 可变对象不能在记录之间共享
+        return [json.loads(texts[index]) for index in indices]
+    return list(map(values.__getitem__, indices))
+
+def _skip_column(stream, kind, count):
+    """按长度前缀跳过一列，不解码"""
+    if kind == 'i':
+        _read_exact(stream, _U32.unpack(_read_exact(stream, 4))[0])
+    elif kind == 'b':
+        _read_exact(stream, count)
+    else:
+        typecode = _read_exact(stream, 1).decode('ascii')
+        size = _U32.unpack(_read_exact(stream, 4))[0]
+        _read_exact(stream, 4 * size)
+        blob_size = _U32.unpack(_read_exact(stream, 4))[0]
+        _read_exact(stream, blob_size + array(typecode).itemsize * count)
+
+def _build_tree(paths):
+    """将字段路径列表还原为树：[(键, 列下标或子树)]"""
+    tree = []
+    for index, path in enumerate(paths):
+        nodes = tree
+        for key in path[:-1]:
+            if not nodes or nodes[-1][0] != key or isinstance(nodes[-1][1], int):
+                nodes.append((key, []))
+            nodes = nodes[-1][1]
+        nodes.append((path[-1], index))
+    return tree
+
+def _assemble(tree, columns, count):
+    """
+    按列组装count条记录，每一层字典由zip批量构建
+    没有任何列的批次（空字典记录）按表头中的记录数还原
+    """
+    if not tree:
+        return [{} for _ in range(count)]
+    keys = [key for key, _ in tree]
+    value_lists = [columns[node] if isinstance(node, int) else _assemble(node, columns, count)
+                   for _, node in tree]
+    return [dict(zip(keys, values)) for values in zip(*value_lists)]
+
+class RecordReader:
+    """读取记录流，根据开头的魔数自动识别格式"""
+    def __init__(self, stream=None):
+        if stream is None:
+            stream = sys.stdin.buffer
+        prefix = stream.read(len(MAGIC))
+        if prefix == MAGIC:
+            self.format = COLUMNAR
+            self.stream = stream
+        else:
+            self.format = JSONL
+            self.stream = io.BufferedReader(_PrefixedRaw(prefix, stream))
+
+    def lines(self):
+        """JSON行格式输入的文本行"""
+        if self.format != JSONL:
+            raise ValueError("列式批次格式的输入没有文本行")
+        return io.TextIOWrapper(self.stream, encoding='utf-8', errors='replace')
+
+    def records(self, select=None, on_error=None):
+        """
+        产出记录字典
+        select: 只产出记录中该顶层字段的值（列式格式下只解码该字段对应的列）
+        on_error: JSON行格式中无法解析的行的回调，参数为异常对象
+        """
+        if self.format == JSONL:
+            return self._jsonl_records(select, on_error)
+        return self._columnar_records(select)
+
+    def _jsonl_records(self, select, on_error):
+        for line in self.lines():
+            try:
+                record = json.loads(line.strip())
+                yield record[select] if select is not None else record
+            except Exception as e:
+                if on_error is not None:
+                    on_error(e)
+
+    def _columnar_records(self, select):
+        while True:
+            size_bytes = self.stream.read(4)
+            if not size_bytes:
+                return
+            if len(size_bytes) != 4:
+                raise ValueError("列式批次数据不完整")
+            header = json.loads(_read_exact(self.stream, _U32.unpack(size_bytes)[0]))
+            count = header['count']
+            paths = [tuple(path) for path, _ in header['columns']]
+
+            # 指定select时其余字段的列只按长度前缀跳过
+            columns = []
+            for path, kind in header['columns']:
+                if select is None or path[0] == select:
+                    columns.append(_decode_column(self.stream, kind, count))
+                else:
+                    _skip_column(self.stream, kind, count)
+                    columns.append(None)
+
+            tree = _build_tree(paths)
+            if select is None:
+                yield from _assemble(tree, columns, count)
+                continue
+
+            for key, node in tree:
+                if key == select:
+                    if isinstance(node, int):
+                        yield from columns[node]
+                    else:
+                        yield from _assemble(node, columns, count)
+                    break
+
+def read_records(stream=None, select=None, on_error=None):
+    """读取记录流（格式自动识别）"""
+    return RecordReader(stream).records(select, on_error)
+
+def main():
+    parser = argparse.ArgumentParser(description='中间格式转换器')
+    add_format_argument(parser)
+    args = parser.parse_args()
+
+    with RecordWriter(args.format) as writer:
+        writer.write_all(read_records(
+            on_error=lambda e: print(f"Error processing line: {e}", file=sys.stderr)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+file: stage_stats.py
+阶段统计与性能剖析 - 各阶段脚本和pipeline.py共享的计数器、延迟直方图和cProfile钩子
+输入: 阶段的输入/输出记录流
+输出: 标准错误流上的统计摘要，或Prometheus文本格式的指标文件
+
+--stats 在标准错误流输出每个阶段一行的摘要；--stats-file 写入Prometheus文本格式的指标文件
+（可由node_exporter的textfile收集器或其他抓取程序读取），文件先写临时文件再原子替换。
+已存在的文件只有是指标文件（以本模块写入的 # HELP 行开头）或为空时才会被替换，
+避免把日志等其他文件误当作指标文件覆盖。
+每个阶段统计：
+  - records_in / records_out: 输入、输出记录数
+  - dropped: 输入后既未输出也未报错的记录数（被过滤的行、没有目标参数的请求等），汇总阶段不统计
+  - errors: 错误数
+  - 每条记录的处理耗时直方图和吞吐量（输入记录数 / 处理耗时）
+--profile 用cProfile包裹阶段的执行，文件名以 .txt 结尾时写入按累计耗时排序的文本报告，
+否则写入pstats二进制文件（python -m pstats 或 snakeviz 查看）。
+"""
+import os
+import sys
+import time
+import pstats
+import argparse
+import cProfile
+import contextlib
+from bisect import bisect_left
+
+# 指标名前缀
+METRIC_PREFIX = 'blindsql'
+
+# 指标文件的开头，用于识别可以替换的已有文件
+METRICS_HEADER = f"# HELP {METRIC_PREFIX}_".encode('ascii')
+
+# 每条记录处理耗时直方图的桶上界（秒），按4倍递增，1微秒到16秒
+LATENCY_BUCKETS = tuple(1e-6 * 4 ** k for k in range(13))
+
+# 摘要中输出的延迟分位数
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
+
+def is_metrics_file(path):
+    """文件不存在、为空或是本模块写入的指标文件时返回True"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(len(METRICS_HEADER))
+    except FileNotFoundError:
+        return True
+    return head in (b'', METRICS_HEADER)
+
+def metrics_path(path):
+    """--stats-file 参数的类型检查：拒绝替换已存在的非指标文件"""
+    try:
+        if not is_metrics_file(path):
+            raise argparse.ArgumentTypeError(f"{path} 已存在且不是指标文件，拒绝覆盖")
+    except OSError as e:
+        raise argparse.ArgumentTypeError(f"无法读取 {path}: {e}")
+    return path
+
+def add_stats_arguments(parser):
+    """为阶段脚本添加 --stats、--stats-file 和 --profile 参数"""
+    parser.add_argument('--stats', action='store_true',
+                        help='在标准错误流输出阶段统计（输入/输出/丢弃/错误记录数、处理耗时和吞吐量）')
+    parser.add_argument('--stats-file', type=metrics_path, metavar='FILE',
+                        help='将阶段统计写入Prometheus文本格式的指标文件（已存在的非指标文件不会被覆盖）')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='用cProfile剖析本次运行并写入该文件（.txt结尾时写入文本报告）')
+
+def format_seconds(seconds):
+    """以合适的单位显示耗时"""
+    if seconds == float('inf'):
+        return f">{format_seconds(LATENCY_BUCKETS[-1])}"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f}µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
+
+class StageStats:
+    """
+    一个阶段的计数器和处理耗时直方图
+    enabled为False时各方法直接返回原始可迭代对象，不产生额外开销
+    aggregate为True表示汇总阶段（重构、校准等读完全部输入才输出），不统计丢弃数
+    """
+    def __init__(self, stage, enabled=True, aggregate=False):
+        self.stage = stage
+        self.enabled = enabled
+        self.aggregate = aggregate
+        self.records_in = 0
+        self.records_out = 0
+        self.errors = 0
+        # 各桶的计数，最后一个为+Inf桶
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        # 不属于任何一条输出记录的处理耗时（最后一条输出之后被过滤的记录等）
+        self.extra_time = 0.0
+        # 读取输入所花的时间（在输入的next()中）
+        self.input_time = 0.0
+        self._timed_output = False
+        self.started = time.perf_counter()
+        self.wall_time = None
+
+    def observe(self, seconds):
+        """记录一条记录的处理耗时"""
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.latency_sum += seconds
+
+    def count_in(self, records):
+        """
+        统计输入记录数和读取输入的耗时
+        阶段的输出没有经过count_out时，以相邻两次取输入之间的间隔作为上一条记录的处理耗时
+        """
+        if not self.enabled:
+            return records
+        return self._count_in(records)
+
+    def _count_in(self, records):
+        clock = time.perf_counter
+        iterator = iter(records)
+        last = None
+        while True:
+            start = clock()
+            if last is not None and not self._timed_output:
+                self.observe(start - last)
+            try:
+                record = next(iterator)
+            except StopIteration:
+                self.input_time += clock() - start
+                return
+            last = clock()
+            self.input_time += last - start
+            self.records_in += 1
+            yield record
+
+    def count_out(self, records):
+        """
+        统计输出记录数，并以每次产出的耗时减去其间读取输入的耗时作为处理耗时
+        用于流水线中串联的阶段，上一阶段的处理耗时不会重复计入本阶段
+        """
+        if not self.enabled:
+            return records
+        self._timed_output = not self.aggregate
+        return self._count_out(records)
+
+    def _count_out(self, records):
+        clock = time.perf_counter
+        iterator = iter(records)
+        while True:
+            start = clock()
+            input_before = self.input_time
+            try:
+                record = next(iterator)
+            except StopIteration:
+                if self._timed_output:
+                    self.extra_time += clock() - start - (self.input_time - input_before)
+                return
+            if self._timed_output:
+                self.observe(clock() - start - (self.input_time - input_before))
+            self.records_out += 1
+            yield record
+
+    def count_errors(self, report):
+        """包装错误回调，调用前累加错误数"""
+        if not self.enabled:
+            return report
+
+        def counted(e):
+            self.errors += 1
+            report(e)
+
+        return counted
+
+    def finish(self, records_out=None):
+        """阶段结束：记录总耗时，records_out用于不经过count_out的阶段"""
+        if records_out is not None:
+            self.records_out = records_out
+        self.wall_time = time.perf_counter() - self.started
+
+    # ---- 汇总 ----
+
+    @property
+    def processing_time(self):
+        return self.latency_sum + self.extra_time
+
+    @property
+    def dropped(self):
+        if self.aggregate:
+            return None
+        return max(self.records_in - self.records_out - self.errors, 0)
+
+    def throughput(self):
+        """每秒处理的输入记录数"""
+        if not self.processing_time:
+            return None
+        return self.records_in / self.processing_time
+
+    def quantile(self, q):
+        """按直方图估计处理耗时的分位数（返回所在桶的上界）"""
+        total = sum(self.buckets)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        """计数器的可序列化快照，供并行模式的工作进程回传"""
+        return (self.records_in, self.records_out, self.errors, list(self.buckets),
+                self.latency_sum, self.extra_time)
+
+    def reset(self):
+        self.records_in = self.records_out = self.errors = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = self.extra_time = self.input_time = 0.0
+
+    def merge(self, snapshot):
+        """合并另一个进程的计数器快照"""
+        records_in, records_out, errors, buckets, latency_sum, extra_time = snapshot
+        self.records_in += records_in
+        self.records_out += records_out
+        self.errors += errors
+        self.buckets = [a + b for a, b in zip(self.buckets, buckets)]
+        self.latency_sum += latency_sum
+        self.extra_time += extra_time
+
+    def summary(self):
+        """单行统计摘要"""
+        parts = [f"输入 {self.records_in} 条", f"输出 {self.records_out} 条"]
+        if self.dropped is not None:
+            parts.append(f"丢弃 {self.dropped} 条")
+        parts.append(f"错误 {self.errors} 条")
+        throughput = self.throughput()
+        processing = f"处理耗时 {format_seconds(self.processing_time)}"
+        if throughput is not None:
+            processing += f" ({throughput:,.0f} 条/秒)"
+        parts.append(processing)
+        quantiles = [(q, self.quantile(q)) for q in SUMMARY_QUANTILES]
+        if quantiles[0][1] is not None:
+            parts.append('每条 ' + ' '.join(f"p{round(q * 100)}≤{format_seconds(value)}"
+                                            for q, value in quantiles))
+        if self.wall_time is not None:
+            parts.append(f"总耗时 {format_seconds(self.wall_time)}")
+        return f"[+] 阶段统计 {self.stage}: " + ', '.join(parts)
+
+def enabled(args):
+    """是否指定了 --stats 或 --stats-file"""
+    return bool(getattr(args, 'stats', False)) or getattr(args, 'stats_file', None) is not None
+
+def from_args(args, stage, aggregate=False):
+    """按 --stats/--stats-file 参数创建阶段统计，都未指定时返回不计数的实例"""
+    return StageStats(stage, enabled=enabled(args), aggregate=aggregate)
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_text(stats_list, gauges=None):
+    """
+    将各阶段统计转换为Prometheus文本格式
+    gauges: 额外的流水线级指标 {指标名（不含前缀）: 值}
+    """
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        full_name = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{full_name}{labels} {value}")
+
+    def stage_samples(getter):
+        samples = []
+        for stats in stats_list:
+            value = getter(stats)
+            if value is not None:
+                samples.append((f'{{stage="{_label(stats.stage)}"}}', value))
+        return samples
+
+    metric('stage_records_in_total', 'counter', 'Records read by the stage.',
+           stage_samples(lambda s: s.records_in))
+    metric('stage_records_out_total', 'counter', 'Records written by the stage.',
+           stage_samples(lambda s: s.records_out))
+    metric('stage_records_dropped_total', 'counter', 'Records neither written nor failed.',
+           stage_samples(lambda s: s.dropped))
+    metric('stage_errors_total', 'counter', 'Errors reported by the stage.',
+           stage_samples(lambda s: s.errors))
+    metric('stage_processing_seconds_total', 'counter', 'Time spent processing records.',
+           stage_samples(lambda s: round(s.processing_time, 6)))
+    metric('stage_throughput_records_per_second', 'gauge', 'Input records per processing second.',
+           stage_samples(lambda s: round(s.throughput(), 1) if s.throughput() is not None else None))
+
+    histogram = []
+    for stats in stats_list:
+        stage = _label(stats.stage)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), stats.buckets):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else f"{bound:.6g}"
+            histogram.append((f'_bucket{{stage="{stage}",le="{le}"}}', cumulative))
+        histogram.append((f'_sum{{stage="{stage}"}}', round(stats.latency_sum, 6)))
+        histogram.append((f'_count{{stage="{stage}"}}', cumulative))
+    full_name = f"{METRIC_PREFIX}_stage_record_seconds"
+    lines.append(f"# HELP {full_name} Per-record processing time.")
+    lines.append(f"# TYPE {full_name} histogram")
+    lines.extend(f"{full_name}{suffix} {value}" for suffix, value in histogram)
+
+    for name, value in (gauges or {}).items():
+        metric(name, 'gauge', name.replace('_', ' ').capitalize() + '.', [('', value)])
+    return '\n'.join(lines) + '\n'
+
+def write_metrics(path, stats_list, gauges=None):
+    """原子地写入Prometheus文本格式的指标文件，已存在的非指标文件不替换"""
+    if not is_metrics_file(path):
+        raise ValueError(f"{path} 已存在且不是指标文件，拒绝覆盖")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(prometheus_text(stats_list, gauges))
+    os.replace(tmp_path, path)
+
+def report(args, stats_list, gauges=None):
+    """
+    按 --stats 输出摘要到标准错误流，按 --stats-file 写入指标文件
+    两者都未指定时不输出
+    """
+    if not enabled(args):
+        return
+    for stats in stats_list:
+        if stats.wall_time is None:
+            stats.finish()
+    if args.stats:
+        for stats in stats_list:
+            print(stats.summary(), file=sys.stderr)
+    if args.stats_file is None:
+        return
+    try:
+        write_metrics(args.stats_file, stats_list, gauges)
+    except (OSError, ValueError) as e:
+        print(f"Error writing metrics: {e}", file=sys.stderr)
+
+@contextlib.contextmanager
+def profiled(path):
+    """path非空时用cProfile剖析with块内的执行，结束后写入结果"""
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        try:
+            if path.endswith('.txt'):
+                with open(path, 'w') as f:
+                    pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(50)
+            else:
+                profiler.dump_stats(path)
+            print(f"[+] 性能剖析结果已保存到 {path}", file=sys.stderr)
+        except OSError as e:
+            print(f"Error writing profile: {e}", file=sys.stderr)
@@ -0,0 +1,123 @@
+"""
+file: conftest.py
+测试公共设置 - 将项目根目录加入模块搜索路径，提供示例日志的处理结果
+
+阶段脚本文件名以数字开头，统一通过 pipeline.load_stage_module 加载，
+加载时各阶段目录也会加入模块搜索路径（interval_state 等模块可直接import）。
+"""
+import os
+import sys
+import functools
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import pipeline
+
+# 示例日志 -> (日志文件, 关键参数, 分析器配置, 解码阶段)，与readme中的管道命令一致
+EXAMPLES = {
+    'time': ('log_example/time_access.log', 'query',
+             '3_payload_analyzer/config/test_time_config.json', ('url', 'base64')),
+    'bool': ('log_example/bool_access.log', 'username',
+             '3_payload_analyzer/config/test_boolean_config.json', ('url',)),
+}
+
+def stage_module(name):
+    """按 pipeline.STAGE_MODULES 中的阶段名称加载阶段脚本模块"""
+    return pipeline.load_stage_module(pipeline.STAGE_MODULES[name])
+
+def example_path(relative_path):
+    """项目内文件的绝对路径"""
+    return os.path.join(ROOT_DIR, relative_path)
+
+def example_lines(name):
+    """示例日志的全部行"""
+    with open(example_path(EXAMPLES[name][0]), 'r') as f:
+        return f.read().splitlines()
+
+def decode_requests(name, log_records):
+    """对结构化日志执行参数提取和示例对应的解码阶段"""
+    _, param, _, decoders = EXAMPLES[name]
+    records = stage_module('extract').extract_records(log_records, param)
+    for decoder in decoders:
+        records = stage_module(decoder).decode_records(records)
+    return list(records)
+
+@functools.lru_cache(maxsize=None)
+def example_requests(name):
+    """示例日志解析、提取、解码后的请求数据（各测试共用，不应修改）"""
+    return decode_requests(name, stage_module('parse').parse_lines(example_lines(name)))
+
+def load_example_config(name, **overrides):
+    """加载示例的分析器配置，overrides覆盖配置对象的属性（如engine、cache_size）"""
+    config = stage_module('analyze').load_config(example_path(EXAMPLES[name][2]))
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return config
+
+def analyze_requests(config, requests):
+    """用给定配置分析请求数据，返回分析结果列表"""
+    analyzer = stage_module('analyze').SQLMapBlindAnalyzer(config)
+    return [result['analysis'] for result in analyzer.analyze_records(requests)]
+
+@functools.lru_cache(maxsize=None)
+def example_analyses(name):
+    """示例日志按配置文件分析的结果（各测试共用，不应修改）"""
+    return analyze_requests(load_example_config(name), example_requests(name))
+
+def bisection_analyses(value, record_id=0, column='password', table='users', database='app_db',
+                       terminator=True):
+    """
+    按sqlmap的方式在0-127区间内用 '>' 比较二分查找value的每个字符，产出分析结果
+    judge为True表示比较条件为假；terminator为True时追加取值为0的结束位置
+    """
+    base = {'type': 'boolean_injection', 'database': database, 'table': table, 'column': column,
+            'limit_offset': record_id, 'record_id': record_id}
+    codes = [ord(char) for char in value] + ([0] if terminator else [])
+    for position, code in enumerate(codes, 1):
+        low, high = 0, 127
+        while low < high:
+            middle = (low + high) // 2
+            judge = code <= middle
+            yield dict(base, position=position, ascii_value=middle, judge=judge, comparison_operator='>')
+            if judge:
+                high = middle
+            else:
+                low = middle + 1
+
+def length_probe_analyses(length, record_id=0, column='password', table='users', database='app_db'):
+    """sqlmap查询记录长度的LENGTH枚举查询：逐位数字以 != 确认，之后一位的比较全部为假表示数字结束"""
+    base = {'type': 'boolean_injection', 'database': database, 'table': table, 'column': column,
+            'limit_offset': record_id, 'record_id': record_id, 'probe': 'length'}
+    digits = str(length)
+    for position, digit in enumerate(digits, 1):
+        yield dict(base, position=position, ascii_value=ord(digit), judge=True, comparison_operator='!=')
+    yield dict(base, position=len(digits) + 1, ascii_value=ord('0') - 1, judge=True, comparison_operator='>')
+
+def generated_requests(mode, size=100_000, attackers=1, noise=0.3, seed=0, session=False):
+    """
+    用合成日志生成器生成日志并解析、提取、URL解码，返回 (请求数据列表, 生成器)
+    生成器的truth()/sessions()给出真实数据和各攻击者的会话字段
+    """
+    log_generator = pipeline.load_stage_module('benchmarks/log_generator.py')
+    generator = log_generator.LogGenerator(mode, attackers, noise, seed)
+    lines = list(generator.generate(size))
+    log_format = None
+    if mode == log_generator.TIME:
+        log_format = pipeline.load_stage_module(pipeline.LOG_FORMAT_MODULE).LogFormat(log_generator.TIME_LOG_FORMAT)
+    records = stage_module('extract').extract_records(stage_module('parse').parse_lines(lines, log_format),
+                                                      log_generator.PARAM, session)
+    return list(stage_module('url').decode_records(records)), generator
+
+def generated_config(mode):
+    """合成日志对应的分析器配置对象（与生成器写出的配置文件相同）"""
+    analyze = stage_module('analyze')
+    config_data = pipeline.load_stage_module('benchmarks/log_generator.py').analyzer_config(mode)
+    return analyze.BlindAnalysisConfig(
+        injection_type=config_data['injection_type'],
+        trigger_pattern=config_data['trigger_pattern'],
+        judge_function=analyze.create_judge_function(config_data['judge_function']),
+        patterns=config_data['patterns'],
+        cache_size=config_data['cache_size']
+    )
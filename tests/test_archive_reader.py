@@ -0,0 +1,80 @@
+"""
+file: test_archive_reader.py
+归档日志读取器测试 - 轮转后的压缩日志按时间顺序读取，并行解压与逐个读取结果相同
+"""
+import os
+import bz2
+import sys
+import gzip
+import lzma
+import subprocess
+
+import pytest
+
+from conftest import EXAMPLES, example_path
+import pipeline
+
+archive_reader = pipeline.load_stage_module('1_log_parser/archive_reader.py')
+
+# 从新到旧：access.log, access.log.1, access.log.2.gz ...
+ROTATED = [('access.log', open), ('access.log.1', open), ('access.log.2.gz', gzip.open),
+           ('access.log.3.bz2', bz2.open), ('access.log.4.xz', lzma.open)]
+
+@pytest.fixture
+def rotated_logs(tmp_path):
+    """将时间盲注示例日志按时间切成5份，模拟logrotate轮转（序号越大越旧）"""
+    with open(example_path(EXAMPLES['time'][0]), 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    size = len(lines) // len(ROTATED) + 1
+    parts = [lines[index:index + size] for index in range(0, len(lines), size)]
+    for (name, opener), part in zip(ROTATED, reversed(parts)):
+        with opener(str(tmp_path / name), 'wb') as f:
+            f.write(b''.join(part))
+    return tmp_path, [line.decode('utf-8', 'replace') for line in lines]
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_rotated_logs_in_order(rotated_logs, workers):
+    """按第一条时间戳从旧到新读取，内容与原日志逐行相同"""
+    directory, lines = rotated_logs
+    assert list(archive_reader.read_inputs([str(directory / 'access.log*')], workers)) == lines
+
+def test_compression_detected_by_magic(tmp_path):
+    """按魔数识别压缩格式，与扩展名无关"""
+    path = str(tmp_path / 'access.log')
+    with gzip.open(path, 'wb') as f:
+        f.write(b'line\n')
+    assert archive_reader.detect_compression(path) == 'gzip'
+    with archive_reader.open_log(path) as f:
+        assert f.read() == 'line\n'
+
+def test_without_timestamps_by_rotation_number(tmp_path):
+    """没有时间戳的文件按轮转序号从旧到新排列"""
+    for name in ('app.log', 'app.log.1', 'app.log.2.gz'):
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(str(tmp_path / name), 'wb') as f:
+            f.write(name.encode('ascii') + b'\n')
+    paths = archive_reader.sort_chronologically(archive_reader.expand_inputs([str(tmp_path / 'app.log*')]))
+    assert [os.path.basename(path) for path in paths] == ['app.log.2.gz', 'app.log.1', 'app.log']
+
+def test_block_lines_split_on_newline_only():
+    """并行解压的数据块只按换行符切分，与逐行读取一致"""
+    assert archive_reader._block_lines(b'a\x0bb\xe2\x80\xa8c\nd\n') == ['a\x0bb\u2028c\n', 'd\n']
+
+def test_missing_input_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        archive_reader.expand_inputs([str(tmp_path / 'none*.log')])
+
+def test_pipeline_reads_archives(rotated_logs):
+    """流水线读取轮转后的压缩日志（含 -j 2），重构结果与读取原日志相同"""
+    directory, _ = rotated_logs
+    log, param, config, decoders = EXAMPLES['time']
+    stages = ','.join(('parse', 'extract') + decoders + ('analyze', 'reconstruct'))
+
+    def run(input_path, workers):
+        command = [sys.executable, example_path('pipeline.py'), '-i', input_path, '-p', param,
+                   '--config', example_path(config), '-s', stages, '-j', str(workers)]
+        return subprocess.run(command, capture_output=True, check=True).stdout
+
+    expected = run(example_path(log), 1)
+    assert run(str(directory / 'access.log*'), 1) == expected
+    assert run(str(directory / 'access.log*'), 2) == expected
@@ -0,0 +1,79 @@
+"""
+file: test_bisection_data_reconstructor.py
+二分查找感知重构器测试 - 与默认重构器的等价性、缺口和矛盾位置的报告
+"""
+from collections import Counter
+
+import pytest
+
+from conftest import EXAMPLES, bisection_analyses, example_analyses
+import pipeline
+
+default_reconstructor = pipeline.load_stage_module(pipeline.RECONSTRUCTOR_MODULES['default'])
+bisection = pipeline.load_stage_module(pipeline.RECONSTRUCTOR_MODULES['bisection'])
+
+def empty_results():
+    return {'database': '', 'tables': [], 'columns': {}, 'data': {}}
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_determined_records_match_default(name):
+    """全部位置都已确定的记录，拼接结果与默认重构器的区间状态相同"""
+    analyses = example_analyses(name)
+    defaults = default_reconstructor.fold_analyses(
+        analyses, empty_results(), lambda: default_reconstructor.IntervalStore(bisection.MIN_ASCII, bisection.MAX_ASCII))
+    stores = bisection.fold_analyses(analyses, empty_results(), bisection.BisectionStore)
+
+    compared = 0
+    for table_key, columns in stores.items():
+        for column, store in columns.items():
+            for record_id, state in store.records.items():
+                value, entries = bisection.assemble_record(state, record_id, bisection.MIN_ASCII,
+                                                           bisection.MAX_ASCII, '?', Counter())
+                if not entries:
+                    compared += 1
+                    assert value == defaults[table_key][column].records[record_id].to_string()
+    assert compared > 0
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_metadata_matches_default(name):
+    """database/tables/columns/completeness与默认重构器相同"""
+    default = default_reconstructor.reconstruct_data(example_analyses(name))
+    result = bisection.reconstruct_data(example_analyses(name))
+    for key in ('database', 'tables', 'columns', 'completeness'):
+        assert result.get(key) == default.get(key)
+
+def test_clean_bisection_has_no_gaps():
+    analyses = list(bisection_analyses('secret', 0)) + list(bisection_analyses('hunter2', 1))
+    result = bisection.reconstruct_data(analyses)
+    assert result['data'] == {'app_db.users': {'password': ['secret', 'hunter2']}}
+    assert result['positions'] == {}
+    assert result['summary'] == {'resolved': 13, 'terminator': 2, 'redundant_probes': 0}
+
+def test_gap_reported_not_truncated():
+    """丢失一个位置的全部比较时以占位符代替并继续拼接，默认重构器在缺口处截断"""
+    analyses = [analysis for analysis in bisection_analyses('secret') if analysis['position'] != 3]
+    result = bisection.reconstruct_data(analyses)
+    assert result['data']['app_db.users']['password'] == ['se?ret']
+    assert result['positions']['app_db.users']['password'] == [
+        {'record_id': 0, 'position': 3, 'status': 'missing'}]
+    assert default_reconstructor.reconstruct_data(analyses)['data']['app_db.users']['password'] == ['se']
+
+def test_partial_bisection_lists_candidates():
+    """丢失二分查找的最后几步时报告剩余的候选值"""
+    analyses = list(bisection_analyses('ab'))
+    last_first_position = max(index for index, analysis in enumerate(analyses) if analysis['position'] == 1)
+    del analyses[last_first_position]
+    result = bisection.reconstruct_data(analyses)
+    entry, = result['positions']['app_db.users']['password']
+    assert entry['status'] == 'candidates'
+    assert ord('a') in entry['candidates'] and len(entry['candidates']) == 2
+    assert result['data']['app_db.users']['password'] == ['?b']
+
+def test_conflicting_confirmations_contradictory():
+    """同一位置收到不同的确认值时标记为矛盾"""
+    analyses = list(bisection_analyses('ab'))
+    base = dict(analyses[0], position=1, comparison_operator='!=', judge=True)
+    analyses += [dict(base, ascii_value=ord('a')), dict(base, ascii_value=ord('c'))]
+    result = bisection.reconstruct_data(analyses)
+    assert result['positions']['app_db.users']['password'][0]['status'] == 'contradictory'
+    assert result['summary']['contradictory'] == 1
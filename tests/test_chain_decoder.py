@@ -0,0 +1,77 @@
+"""
+file: test_chain_decoder.py
+解码链测试 - 各编码的廉价检测，以及与串联解码器的等价性
+"""
+import base64
+import urllib.parse
+
+import pytest
+
+from conftest import (EXAMPLES, analyze_requests, example_analyses, example_lines, example_requests,
+                      load_example_config, stage_module)
+
+chain_decoder = stage_module('decode')
+
+PAYLOAD = "1' AND ORD(MID((SELECT 1),1,1))>64-- -"
+
+@pytest.mark.parametrize('function, text', [
+    (chain_decoder.decode_url, 'plain text'),
+    (chain_decoder.decode_url, '100%'),
+    (chain_decoder.decode_base64, 'abc'),
+    (chain_decoder.decode_base64, 'ab=c'),
+    (chain_decoder.decode_base64, 'a==='),
+    (chain_decoder.decode_base64, '1234'),
+    (chain_decoder.decode_base64, base64.b64encode(b'\x01\x02\x03').decode('ascii')),
+    (chain_decoder.decode_base64, 'ümla'),
+    (chain_decoder.decode_hex, 'abc'),
+    (chain_decoder.decode_hex, '0xZZ'),
+    (chain_decoder.decode_hex, '00ff'),
+    (chain_decoder.decode_double_url, 'no escapes'),
+])
+def test_rejects_other_encodings(function, text):
+    """不是该编码（或解码结果不是文本）时返回None，不抛出异常"""
+    assert function(text) is None
+
+def test_decode_url():
+    assert chain_decoder.decode_url(urllib.parse.quote(PAYLOAD)) == PAYLOAD
+
+def test_decode_double_url():
+    assert chain_decoder.decode_double_url(urllib.parse.quote(urllib.parse.quote(PAYLOAD))) == PAYLOAD
+    # 只编码了一次时等同于一次URL解码
+    assert chain_decoder.decode_double_url(urllib.parse.quote(PAYLOAD)) == PAYLOAD
+
+@pytest.mark.parametrize('text', [PAYLOAD, PAYLOAD + 'x', PAYLOAD + 'xy', '中文载荷'])
+def test_decode_base64(text):
+    """各种填充长度和UTF-8文本"""
+    assert chain_decoder.decode_base64(base64.b64encode(text.encode('utf-8')).decode('ascii')) == text
+
+@pytest.mark.parametrize('prefix', ['', '0x', '0X'])
+def test_decode_hex(prefix):
+    assert chain_decoder.decode_hex(prefix + PAYLOAD.encode('ascii').hex()) == PAYLOAD
+
+def test_chain_steps_skip_non_matching():
+    """url,base64,hex链对每种编码只执行匹配的步骤"""
+    chain = chain_decoder.DecodeChain(chain_decoder.parse_chain('url,base64,hex'))
+    encoded_base64 = base64.b64encode(PAYLOAD.encode('ascii')).decode('ascii')
+    assert chain.decode(PAYLOAD) == PAYLOAD
+    assert chain.decode(urllib.parse.quote(encoded_base64)) == PAYLOAD
+    assert chain.decode(PAYLOAD.encode('ascii').hex()) == PAYLOAD
+    assert chain.decode(None) is None
+
+def test_parse_chain_rejects_unknown_steps():
+    with pytest.raises(ValueError):
+        chain_decoder.parse_chain('url,rot13')
+    with pytest.raises(ValueError):
+        chain_decoder.parse_chain(' , ')
+
+@pytest.mark.parametrize('cache_size', [0, 4])
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_matches_separate_decoders(name, cache_size):
+    """按示例的解码阶段组成解码链，逐批解码后的分析结果与串联的url/base64解码器相同"""
+    _, param, _, decoders = EXAMPLES[name]
+    records = stage_module('extract').extract_records(stage_module('parse').parse_lines(example_lines(name)), param)
+    chain = chain_decoder.DecodeChain(decoders, cache_size)
+    requests = list(chain.decode_records(records, batch_size=100))
+
+    assert len(requests) == len(example_requests(name))
+    assert analyze_requests(load_example_config(name), requests) == example_analyses(name)
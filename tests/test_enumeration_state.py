@@ -0,0 +1,99 @@
+"""
+file: test_enumeration_state.py
+枚举查询状态测试 - COUNT/LENGTH数字的解码和按记录长度计算的提取完整度
+"""
+import json
+
+import pytest
+
+from conftest import bisection_analyses, length_probe_analyses, load_example_config, stage_module
+import pipeline
+
+default_reconstructor = pipeline.load_stage_module(pipeline.RECONSTRUCTOR_MODULES['default'])
+import enumeration_state
+from interval_state import BYTE_MIN, BYTE_MAX, RecordIntervals
+
+def count_probe_analyses(rows, table='users', database='app_db'):
+    """sqlmap查询表行数的COUNT枚举查询，按 '>' 二分查找逐位提取数字"""
+    for analysis in bisection_analyses(str(rows), 0, '', table, database):
+        yield dict(analysis, probe='count')
+
+def fold_all(analyses):
+    probe = enumeration_state.ProbeValue()
+    numbers = [probe.fold(analysis['position'], analysis['ascii_value'], analysis['judge'],
+                          analysis['comparison_operator']) for analysis in analyses]
+    return [number for number in numbers if number is not None]
+
+@pytest.mark.parametrize('number', [0, 7, 42, 1024])
+def test_decode_number(number):
+    """逐位数字确定后，比较全部为假的结束位置使数字解码完成"""
+    assert fold_all(length_probe_analyses(number)) == [number]
+    assert fold_all(count_probe_analyses(number)) == [number]
+
+def test_incomplete_number():
+    """缺少结束位置或某一位未确定时返回None"""
+    assert fold_all(list(length_probe_analyses(42))[:-1]) == []
+    state = RecordIntervals(BYTE_MIN, BYTE_MAX)
+    state.fold(1, ord('4'), True, '!=')
+    state.fold(3, ord('0') - 1, True, '>')
+    assert enumeration_state.decode_number(state) is None
+
+def test_repeated_query_restarts():
+    """数字解码完成后，从第1位重新开始的 '>' 比较属于新的一次查询，迟到的 '!=' 确认被忽略"""
+    analyses = list(length_probe_analyses(12))
+    assert fold_all(analyses + analyses[:1] + list(count_probe_analyses(345))) == [12, 345]
+
+def reconstructed_completeness(analyses):
+    return default_reconstructor.reconstruct_data(analyses)['completeness']['app_db.users']
+
+def test_complete_extraction():
+    analyses = (list(count_probe_analyses(2)) + list(length_probe_analyses(6, 0)) + list(length_probe_analyses(7, 1))
+                + list(bisection_analyses('secret', 0)) + list(bisection_analyses('hunter2', 1)))
+    report = reconstructed_completeness(analyses)
+    assert report['rows'] == 2 and report['percent'] == 100.0
+    assert report['columns']['password'] == {'expected': 2, 'complete': 2, 'unknown': 0, 'percent': 100.0}
+
+def test_partial_and_missing_records():
+    """只确定了部分字符的记录按比例计入，行数已知时未提取的记录计为0"""
+    partial = [analysis for analysis in bisection_analyses('secret', 0) if analysis['position'] <= 3]
+    analyses = list(count_probe_analyses(2)) + list(length_probe_analyses(6, 0)) + partial
+    column = reconstructed_completeness(analyses)['columns']['password']
+    assert column == {'expected': 2, 'complete': 0, 'unknown': 0, 'percent': 25.0}
+
+def test_unknown_length_not_complete():
+    """长度未知的记录计入unknown，不会因为重构出了字符串就计为完整"""
+    analyses = (list(count_probe_analyses(2)) + list(length_probe_analyses(6, 0))
+                + list(bisection_analyses('secret', 0)) + list(bisection_analyses('hunter2', 1)))
+    column = reconstructed_completeness(analyses)['columns']['password']
+    assert column == {'expected': 2, 'complete': 1, 'unknown': 1, 'percent': 100.0}
+
+    analyses = list(count_probe_analyses(2)) + list(bisection_analyses('secret', 0))
+    report = reconstructed_completeness(analyses)
+    assert report['columns']['password'] == {'expected': 2, 'complete': 0, 'unknown': 1, 'percent': 0.0}
+
+    analyses = list(length_probe_analyses(6, 5)) + list(bisection_analyses('hunter2', 1))
+    report = reconstructed_completeness(analyses)
+    assert report['columns']['password'] == {'expected': 1, 'complete': 0, 'unknown': 1, 'percent': None}
+    assert report['percent'] is None
+
+def test_checkpoint_round_trip():
+    state = enumeration_state.EnumerationState()
+    analyses = list(count_probe_analyses(12)) + list(length_probe_analyses(6, 0))
+    for analysis in analyses[:-1]:
+        state.fold(analysis)
+    restored = enumeration_state.EnumerationState.from_dict(json.loads(json.dumps(state.to_dict())))
+    assert restored.counts == {'app_db.users': 12}
+    assert restored.fold(analyses[-1]) == ('length', ('app_db.users', 'password', 0), 6)
+
+@pytest.mark.parametrize('payload, probe', [
+    ("admin' AND ORD(MID((SELECT IFNULL(CAST(COUNT(*) AS NCHAR),0x20) FROM app_db.users),1,1))>51", 'count'),
+    ("admin' AND ORD(MID((SELECT IFNULL(CAST(CHAR_LENGTH(password) AS NCHAR),0x20) "
+     "FROM app_db.users LIMIT 3,1),1,1))>51", 'length'),
+    ("admin' AND ORD(MID((SELECT IFNULL(CAST(password AS NCHAR),0x20) FROM app_db.users LIMIT 3,1),1,1))>51", None),
+])
+def test_analyzer_probe(payload, probe):
+    """分析器识别COUNT/LENGTH枚举查询，普通数据查询没有probe字段"""
+    analyzer = stage_module('analyze').SQLMapBlindAnalyzer(load_example_config('bool', cache_size=0))
+    analysis = analyzer.analyze_payload(payload, 15)
+    assert analysis.get('probe') == probe
+    assert analysis['column'] == {'count': '', 'length': 'PASSWORD', None: 'PASSWORD'}[probe]
@@ -0,0 +1,91 @@
+"""
+file: test_forensic_store.py
+取证存储测试 - 写入后读回的分析结果不变，过滤条件和旧版本数据库升级
+"""
+import sqlite3
+import argparse
+
+import pytest
+
+from conftest import example_analyses, example_requests
+import forensic_store
+import pipeline
+
+default_reconstructor = pipeline.load_stage_module(pipeline.RECONSTRUCTOR_MODULES['default'])
+
+def example_results(name):
+    return [{'request': request, 'analysis': analysis}
+            for request, analysis in zip(example_requests(name), example_analyses(name))]
+
+@pytest.fixture(scope='module')
+def bool_store(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('store') / 'forensic.db')
+    with forensic_store.StoreWriter(path, batch_size=1000) as writer:
+        forwarded = list(writer.feed(example_results('bool')))
+    assert forwarded == example_results('bool')
+    return path
+
+def filters(**values):
+    """构造与命令行参数相同的过滤参数"""
+    parser = argparse.ArgumentParser()
+    forensic_store.add_filter_arguments(parser)
+    args = parser.parse_args([])
+    for key, value in values.items():
+        setattr(args, key, value)
+    return args
+
+def test_round_trip(bool_store):
+    """默认只保存注入分析结果，读回的请求和分析字段与写入时相同"""
+    injections = [result for result in example_results('bool') if 'inject' in result['analysis']['type']]
+    assert list(forensic_store.read_store(bool_store)) == injections
+
+def test_reconstruct_from_store(bool_store):
+    expected = default_reconstructor.reconstruct_data(example_analyses('bool'))
+    assert default_reconstructor.reconstruct_data(forensic_store.read_store_analyses(bool_store)) == expected
+
+def test_filters(bool_store):
+    """表名和列名不区分大小写，多个条件同时满足"""
+    analyses = list(forensic_store.read_store_analyses(bool_store, filters(table='test_sql.users', column=['password'],
+                                                                           record_id=[1])))
+    assert analyses
+    assert {(analysis['database'], analysis['table'], analysis['column'], analysis['record_id'])
+            for analysis in analyses} == {('TEST_SQL', 'USERS', 'PASSWORD', 1)}
+
+    results = list(forensic_store.read_store(bool_store))
+    middle = results[len(results) // 2]['request']['timestamp']
+    since = list(forensic_store.read_store(bool_store, filters(since=middle)))
+    assert 0 < len(since) < len(results)
+    assert all(forensic_store.to_epoch(result['request']['timestamp']) >= forensic_store.to_epoch(middle)
+               for result in since)
+
+def test_invalid_time_filter(bool_store):
+    with pytest.raises(ValueError):
+        forensic_store.read_store(bool_store, filters(since='yesterday'))
+
+def test_not_a_store(tmp_path):
+    """只读打开非取证数据库或不存在的文件时报错"""
+    path = str(tmp_path / 'other.db')
+    with pytest.raises(ValueError):
+        forensic_store.connect(path, readonly=True)
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA user_version = 42')
+    connection.close()
+    with pytest.raises(ValueError):
+        forensic_store.connect(path)
+
+def test_upgrade_version_1(tmp_path):
+    """版本1的数据库（没有technique和probe列）在读取时自动升级"""
+    path = str(tmp_path / 'old.db')
+    connection = sqlite3.connect(path)
+    schema = forensic_store.SCHEMA.replace(',\n    technique TEXT,\n    probe TEXT', '')
+    assert 'technique' not in schema
+    connection.execute(schema)
+    connection.execute("INSERT INTO analyses (type, table_name, column_name, judge) "
+                       "VALUES ('boolean_injection', 'USERS', 'NAME', 1)")
+    connection.execute('PRAGMA user_version = 1')
+    connection.commit()
+    connection.close()
+
+    result, = forensic_store.read_store(path)
+    assert result['analysis']['table'] == 'USERS' and result['analysis']['judge'] is True
+    assert 'technique' not in result['analysis'] and 'probe' not in result['analysis']
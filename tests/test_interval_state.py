@@ -0,0 +1,102 @@
+"""
+file: test_interval_state.py
+区间状态测试 - 比较结果的折叠规则、字符串拼接和检查点导出
+"""
+import pytest
+
+from conftest import bisection_analyses
+import pipeline
+
+# 加载重构器时4_data_reconstructor加入模块搜索路径
+pipeline.load_stage_module(pipeline.RECONSTRUCTOR_MODULES['default'])
+from interval_state import BYTE_MAX, BYTE_MIN, NO_VALUE, IntervalStore, RecordIntervals, fold_interval
+
+def fold_value(value, min_val=32, max_val=126):
+    """按sqlmap的二分查找将value折叠进一条记录的区间状态"""
+    state = RecordIntervals(min_val, max_val)
+    for analysis in bisection_analyses(value):
+        state.fold(analysis['position'], analysis['ascii_value'], analysis['judge'],
+                   analysis['comparison_operator'])
+    return state
+
+@pytest.mark.parametrize('value', ['admin', 'P@ss w0rd!', '~', ' '])
+def test_bisection_converges(value):
+    """二分查找的每个位置收敛为原字符，值为0的结束位置截断字符串"""
+    state = fold_value(value)
+    assert [state.value(position) for position in range(1, len(value) + 1)] == [ord(char) for char in value]
+    assert state.to_string() == value
+
+def test_greater_than_polarity():
+    """judge为True表示比较条件为假：'>' 判断为真时收紧上界，为假时收紧下界"""
+    state = RecordIntervals()
+    state.fold(1, 100, True, '>')
+    assert state.bounds(1) == (BYTE_MIN, 100)
+    state.fold(1, 50, False, '>')
+    assert state.bounds(1) == (51, 100)
+
+def test_less_than_polarity():
+    state = RecordIntervals()
+    state.fold(1, 100, True, '<')
+    assert state.bounds(1) == (100, BYTE_MAX)
+    state.fold(1, 120, False, '<')
+    assert state.bounds(1) == (100, 119)
+
+def test_confirmation_takes_smallest_value():
+    """多个判断为真的 != 确认取最小值，判断为假的确认被忽略，确认值优先于区间"""
+    state = RecordIntervals(32, 126)
+    state.fold(1, 70, True, '>')
+    state.fold(1, 80, True, '!=')
+    state.fold(1, 65, True, '!=')
+    state.fold(1, 60, False, '!=')
+    assert state.is_confirmed(1)
+    assert state.value(1) == 65
+
+def test_unresolved_positions_are_skipped():
+    """未收敛的位置被跳过，缺失的位置结束字符串"""
+    state = RecordIntervals(32, 126)
+    state.confirm(1, ord('a'))
+    state.fold(2, 100, True, '>')
+    state.confirm(3, ord('c'))
+    state.confirm(5, ord('e'))
+    assert not state.has(4)
+    assert state.value(2) is None
+    assert state.to_string() == 'ac'
+
+def test_out_of_range_values_clamped():
+    """越界的比较值被限制在字节范围两侧，表现为区间矛盾而非溢出"""
+    state = RecordIntervals()
+    state.fold(1, 1000, False, '>')
+    low, high = state.bounds(1)
+    assert low == BYTE_MAX + 2 and high == BYTE_MAX
+    assert state.value(1) is None
+
+def test_reserve_preallocates_unseen_positions():
+    state = RecordIntervals()
+    state.reserve(4)
+    assert len(state) == 4
+    assert not any(state.has(position) for position in range(1, 5))
+    state.fold(2, 10, True, '>')
+    assert state.has(2) and not state.has(1)
+
+def test_fold_interval_matches_record_intervals():
+    """fold_interval对单个位置的 [low, high, confirmed] 列表使用相同的规则"""
+    comparisons = [(100, True, '>'), (50, False, '>'), (60, False, '<'), (90, True, '<'),
+                   (70, True, '!='), (66, True, '!='), (40, False, '!=')]
+    state = RecordIntervals()
+    interval = [BYTE_MIN, BYTE_MAX, NO_VALUE]
+    for ascii_val, judge, operator in comparisons:
+        state.fold(1, ascii_val, judge, operator)
+        fold_interval(interval, ascii_val, judge, operator)
+        assert tuple(interval[:2]) == state.bounds(1)
+    assert interval[2] == state.value(1) == 66
+
+def test_store_dict_round_trip():
+    """IntervalStore的导出结果经过字符串键的JSON形式后恢复为相同状态"""
+    store = IntervalStore(32, 126)
+    for record_id, value in enumerate(['alice', 'bob', '']):
+        for analysis in bisection_analyses(value, record_id):
+            store.fold(record_id, analysis['position'], analysis['ascii_value'], analysis['judge'],
+                       analysis['comparison_operator'])
+    restored = IntervalStore.from_dict(store.to_dict())
+    assert list(restored.values()) == list(store.values()) == [(0, 'alice'), (1, 'bob'), (2, '')]
+    assert restored.to_dict() == store.to_dict()
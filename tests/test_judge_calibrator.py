@@ -0,0 +1,81 @@
+"""
+file: test_judge_calibrator.py
+判断函数校准器测试 - 由二分查找序列推出judge并选择分界
+"""
+import json
+
+import pytest
+
+from conftest import EXAMPLES, example_path, example_requests, generated_requests, stage_module
+import pipeline
+
+judge_calibrator = stage_module('calibrate')
+log_generator = pipeline.load_stage_module('benchmarks/log_generator.py')
+
+def calibrate(config_data, requests, metric='auto', **kwargs):
+    calibrator = judge_calibrator.JudgeCalibrator(config_data, **kwargs)
+    calibrator.feed(requests)
+    return calibrator.calibrate(metric)
+
+def test_boolean_generated_log():
+    """布尔盲注：比较为假的页面大小固定，校准为size_equal且与推出的judge完全一致"""
+    requests, _ = generated_requests(log_generator.BOOLEAN)
+    metric, judge, split = calibrate(log_generator.analyzer_config(log_generator.BOOLEAN), requests)
+    assert metric == 'response_size'
+    assert judge == {'type': 'size_equal', 'value': log_generator.FALSE_PAGE_SIZE}
+    assert judge_calibrator.accuracy(split) == 1.0
+
+def test_time_generated_log():
+    """时间盲注：响应大小无法区分，自动选择请求耗时，快请求（比较为假）一侧为True"""
+    requests, _ = generated_requests(log_generator.TIME)
+    metric, judge, split = calibrate(log_generator.analyzer_config(log_generator.TIME), requests)
+    assert metric == 'request_time'
+    assert judge['type'] == 'time_less'
+    assert log_generator.FAST_LATENCY[1] < judge['value'] < log_generator.SLEEP_SECONDS
+    assert judge_calibrator.accuracy(split) == 1.0
+
+def test_time_without_labels_uses_slow_judge():
+    """缺少二分查找序列时按两簇划分，慢请求一侧为slow_judge"""
+    requests, _ = generated_requests(log_generator.TIME)
+    # 去掉 '!=' 确认请求，且不跟踪字符位置，推不出任何judge
+    requests = [request for request in requests if '!=' not in request['payload']]
+    config_data = log_generator.analyzer_config(log_generator.TIME)
+    calibrator = judge_calibrator.JudgeCalibrator(config_data, max_keys=0)
+    calibrator.feed(requests)
+    judge, split = calibrator.judge_for('request_time')
+    assert split['lower_true'] is None and judge['type'] == 'time_less'
+
+    config_data['judge_function'] = {'type': 'time_auto', 'slow_judge': True}
+    calibrator = judge_calibrator.JudgeCalibrator(config_data, max_keys=0)
+    calibrator.feed(requests)
+    assert calibrator.judge_for('request_time')[0]['type'] == 'time_greater'
+
+def test_example_bool_matches_config():
+    with open(example_path(EXAMPLES['bool'][2]), 'r') as f:
+        config_data = json.load(f)
+    _, judge, _ = calibrate(config_data, example_requests('bool'))
+    assert judge == config_data['judge_function']
+
+def test_histogram_bounded():
+    """箱数超过上限时合并，计数不丢失"""
+    histogram = judge_calibrator.MetricHistogram('response_size', max_bins=8)
+    for value in range(1000):
+        histogram.add(value)
+    assert len(histogram.bins) <= 8
+    assert histogram.total() == 1000
+
+def test_low_accuracy_not_written(tmp_path):
+    """一致率不足时不写入配置，force时写入且保留其他字段"""
+    with open(example_path(EXAMPLES['time'][2]), 'r') as f:
+        config_data = json.load(f)
+    calibrator = judge_calibrator.JudgeCalibrator(config_data)
+    calibrator.feed(example_requests('time'))
+    path = str(tmp_path / 'config.json')
+
+    judge, written = judge_calibrator.apply_calibration(calibrator, config_data, path=path)
+    assert judge is not None and not written
+
+    judge, written = judge_calibrator.apply_calibration(calibrator, config_data, path=path, force=True)
+    assert written
+    with open(path, 'r') as f:
+        assert json.load(f) == dict(config_data, judge_function=judge)
@@ -0,0 +1,47 @@
+"""
+file: test_line_prefilter.py
+预过滤器测试 - 只丢弃不可能产出注入分析结果的日志行
+"""
+import base64
+import urllib.parse
+
+import pytest
+
+from conftest import (EXAMPLES, analyze_requests, decode_requests, example_analyses, example_lines,
+                      example_path, load_example_config, stage_module)
+
+line_prefilter = stage_module('prefilter')
+
+def injections(analyses):
+    return [analysis for analysis in analyses if analysis['type'] != 'unknown']
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_keeps_every_injection(name):
+    """预过滤后的日志行产出的注入分析结果与不过滤时完全相同"""
+    _, param, config_path, _ = EXAMPLES[name]
+    prefilter = line_prefilter.LinePrefilter(param, line_prefilter.load_trigger_patterns(example_path(config_path)))
+    lines = list(prefilter.filter_lines(example_lines(name)))
+    requests = decode_requests(name, stage_module('parse').parse_lines(lines))
+
+    assert injections(analyze_requests(load_example_config(name), requests)) == injections(example_analyses(name))
+    assert prefilter.dropped > 0
+    assert prefilter.kept + prefilter.dropped == len(example_lines(name))
+
+@pytest.mark.parametrize('encode', [
+    lambda text: text,
+    lambda text: text.lower(),
+    lambda text: urllib.parse.quote(text, safe=''),
+    lambda text: urllib.parse.quote_plus(text),
+    lambda text: base64.b64encode(text.encode('ascii')).decode('ascii'),
+    lambda text: urllib.parse.quote(base64.b64encode(('x' + text).encode('ascii')).decode('ascii'), safe=''),
+])
+def test_trigger_encodings(encode):
+    """trigger_pattern的原文、小写、URL编码和Base64编码（任意偏移）形式都能通过"""
+    payload = "1 AND ORD(MID((SELECT 1),1,1))>64"
+    prefilter = line_prefilter.LinePrefilter('id', ['ORD(MID('])
+    assert prefilter.accepts(f'"GET /item.php?id={encode(payload)} HTTP/1.1" 200 512')
+
+def test_rejects_unrelated_lines():
+    prefilter = line_prefilter.LinePrefilter('id', ['ORD(MID('])
+    assert not prefilter.accepts('"GET /item.php?page=ORD(MID( HTTP/1.1" 200 512')
+    assert not prefilter.accepts('"GET /item.php?id=42 HTTP/1.1" 200 512')
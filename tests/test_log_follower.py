@@ -0,0 +1,83 @@
+"""
+file: test_log_follower.py
+日志跟踪读取器测试 - 只产出完整行、检查点续读和logrotate轮转
+"""
+import os
+
+import pipeline
+
+log_follower = pipeline.load_stage_module(pipeline.FOLLOWER_MODULE)
+
+def follow_all(follower, actions):
+    """跟踪读取，每次读到文件末尾时执行actions中的下一个操作，全部执行完后停止"""
+    actions = list(actions)
+
+    def on_idle():
+        if actions:
+            actions.pop(0)()
+        else:
+            follower.stop()
+
+    return list(follower.follow(on_idle))
+
+def append(path, text):
+    def action():
+        with open(path, 'a') as f:
+            f.write(text)
+    return action
+
+def test_partial_line_waits_for_newline(tmp_path):
+    """未以换行符结尾的行在补全后才产出，offset指向下一个未处理行"""
+    path = str(tmp_path / 'access.log')
+    append(path, 'a\nb')()
+    follower = log_follower.LogFollower(path, poll_interval=0)
+    assert follow_all(follower, [append(path, 'c\nd\n')]) == ['a\n', 'bc\n', 'd\n']
+    assert follower.offset == os.path.getsize(path)
+
+def test_resume_from_checkpoint(tmp_path):
+    path = str(tmp_path / 'access.log')
+    append(path, 'a\nb\n')()
+    first = log_follower.LogFollower(path, poll_interval=0)
+    assert follow_all(first, []) == ['a\n', 'b\n']
+
+    append(path, 'c\n')()
+    resumed = log_follower.LogFollower(path, first.offset, first.inode, poll_interval=0)
+    assert follow_all(resumed, []) == ['c\n']
+
+def test_rename_rotation(tmp_path):
+    """重命名后新建：读完旧文件剩余内容（包括没有换行符的最后一行）后切换到新文件"""
+    path = str(tmp_path / 'access.log')
+    append(path, 'a\n')()
+
+    def rotate():
+        append(path, 'b')()
+        os.rename(path, path + '.1')
+        append(path, 'c\n')()
+
+    follower = log_follower.LogFollower(path, poll_interval=0)
+    assert follow_all(follower, [rotate]) == ['a\n', 'b\n', 'c\n']
+    assert follower.rotations == 1
+
+def test_rotation_while_stopped(tmp_path):
+    """停止期间发生轮转：从 <文件名>.1 中的检查点位置继续，再读新文件"""
+    path = str(tmp_path / 'access.log')
+    append(path, 'a\n')()
+    first = log_follower.LogFollower(path, poll_interval=0)
+    follow_all(first, [])
+
+    append(path, 'b\n')()
+    os.rename(path, path + '.1')
+    append(path, 'c\n')()
+    resumed = log_follower.LogFollower(path, first.offset, first.inode, poll_interval=0)
+    assert follow_all(resumed, []) == ['b\n', 'c\n']
+
+def test_copytruncate(tmp_path):
+    path = str(tmp_path / 'access.log')
+    append(path, 'a\nb\n')()
+
+    def truncate():
+        with open(path, 'w') as f:
+            f.write('c\n')
+
+    follower = log_follower.LogFollower(path, poll_interval=0)
+    assert follow_all(follower, [truncate]) == ['a\n', 'b\n', 'c\n']
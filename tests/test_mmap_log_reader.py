@@ -0,0 +1,52 @@
+"""
+file: test_mmap_log_reader.py
+内存映射读取器测试 - 与逐行解析器的结果一致
+"""
+import pytest
+
+from conftest import EXAMPLES, decode_requests, example_lines, example_path, example_requests, stage_module
+import pipeline
+
+mmap_reader = pipeline.load_stage_module(pipeline.MMAP_READER_MODULE)
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_matches_line_parser(name):
+    """不带预过滤时产出与parse_lines完全相同的结构化日志"""
+    path = example_path(EXAMPLES[name][0])
+    expected = list(stage_module('parse').parse_lines(example_lines(name)))
+    assert list(mmap_reader.read_log_records(path)) == expected
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_literal_prefilter_keeps_requests(name):
+    """按 "参数名=" 预过滤后，参数提取得到的请求不变"""
+    path, param = EXAMPLES[name][:2]
+    records = mmap_reader.read_log_records(example_path(path), [f'{param}='.encode('utf-8')])
+    assert decode_requests(name, records) == example_requests(name)
+
+def test_byte_ranges_cover_file():
+    """按行首切分的字节范围依次读取，结果与整个文件相同"""
+    path = example_path(EXAMPLES['time'][0])
+    with open(path, 'rb') as f:
+        data = f.read()
+    middle = data.index(b'\n', len(data) // 2) + 1
+    parts = (list(mmap_reader.read_log_records(path, None, 0, middle))
+             + list(mmap_reader.read_log_records(path, None, middle, len(data))))
+    assert parts == list(mmap_reader.read_log_records(path))
+
+def test_whitespace_and_missing_newline(tmp_path):
+    """行首空白、空行和末尾没有换行的行与parse_lines的处理一致"""
+    lines = [
+        '  10.0.0.1 - - [17/Sep/2025:13:37:50 +0800] "GET /?id=1 HTTP/1.1" 200 512',
+        '',
+        '10.0.0.2 - - [17/Sep/2025:13:37:51 +0800] "GET /?id=2 HTTP/1.1" 404 - "-" "curl/8.0"',
+    ]
+    path = tmp_path / 'access.log'
+    path.write_text('\n'.join(lines))
+    expected = list(stage_module('parse').parse_lines(lines))
+    assert len(expected) == 2
+    assert list(mmap_reader.read_log_records(str(path))) == expected
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'empty.log'
+    path.write_bytes(b'')
+    assert list(mmap_reader.read_log_records(str(path))) == []
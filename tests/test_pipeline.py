@@ -0,0 +1,96 @@
+"""
+file: test_pipeline.py
+管道运行器测试 - 单进程串联各阶段的输出与逐个运行阶段脚本的管道命令相同
+"""
+import io
+import sys
+import subprocess
+
+import pytest
+
+from conftest import EXAMPLES, example_path
+import pipeline
+import record_codec
+
+def stage_names(name, last='reconstruct'):
+    """示例对应的阶段列表，截止到last阶段"""
+    names = ['parse', 'extract'] + list(EXAMPLES[name][3]) + ['analyze', 'reconstruct']
+    return names[:names.index(last) + 1]
+
+def stage_arguments(name, stage):
+    _, param, config, _ = EXAMPLES[name]
+    if stage == 'extract':
+        return ['-p', param]
+    if stage == 'analyze':
+        return ['--config', example_path(config)]
+    return []
+
+def run_scripts(name, last='reconstruct'):
+    """按readme中的管道命令逐个运行阶段脚本，返回最后一个阶段的标准输出"""
+    with open(example_path(EXAMPLES[name][0]), 'rb') as f:
+        data = f.read()
+    for stage in stage_names(name, last):
+        command = [sys.executable, example_path(pipeline.STAGE_MODULES[stage])] + stage_arguments(name, stage)
+        data = subprocess.run(command, input=data, capture_output=True, check=True).stdout
+    return data
+
+def run_stages(name, stages, *options):
+    """用pipeline.py运行示例的指定阶段，返回标准输出"""
+    log, param, config, _ = EXAMPLES[name]
+    command = [sys.executable, example_path('pipeline.py'), '-i', example_path(log), '-p', param,
+               '--config', example_path(config), '-s', ','.join(stages)] + list(options)
+    return subprocess.run(command, capture_output=True, check=True).stdout
+
+def run_pipeline(name, last='reconstruct', *options):
+    return run_stages(name, stage_names(name, last), *options)
+
+@pytest.mark.parametrize('last', ['analyze', 'reconstruct'])
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_matches_stage_scripts(name, last):
+    """分析结果和重构结果都与逐个运行阶段脚本的输出逐字节相同"""
+    expected = run_scripts(name, last)
+    assert expected
+    assert run_pipeline(name, last) == expected
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_columnar_output(name):
+    """--format columnar 输出的记录与JSON行输出相同"""
+    jsonl = list(record_codec.read_records(io.BytesIO(run_pipeline(name, 'analyze'))))
+    columnar = list(record_codec.read_records(io.BytesIO(run_pipeline(name, 'analyze', '--format', 'columnar'))))
+    assert columnar == jsonl
+
+def test_unknown_stage_rejected():
+    command = [sys.executable, example_path('pipeline.py'), '-s', 'parse,unknown']
+    result = subprocess.run(command, input=b'', capture_output=True)
+    assert result.returncode == 1
+    assert 'unknown' in result.stderr.decode('utf-8')
+
+@pytest.mark.parametrize('chunk_size', [100, 4096, 1 << 30])
+def test_chunks_cover_file_on_line_boundaries(chunk_size):
+    """分片首尾相接覆盖整个文件，每个分片都在换行符之后结束"""
+    path = example_path(EXAMPLES['bool'][0])
+    chunks = pipeline.compute_chunks(path, chunk_size)
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(data)
+    assert all(previous[1] == current[0] for previous, current in zip(chunks, chunks[1:]))
+    assert all(data[end - 1:end] == b'\n' for _, end in chunks)
+    lines = [line for start, end in chunks for line in pipeline.read_chunk(path, start, end)]
+    assert lines == data.decode('utf-8', 'replace').splitlines()
+
+@pytest.mark.parametrize('options', [[], ['--mmap']])
+@pytest.mark.parametrize('last', ['analyze', 'reconstruct'])
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_parallel_matches_single_process(name, last, options):
+    """-j 3 分片并行（1MB分片）按原始日志顺序合并，输出与单进程运行逐字节相同"""
+    expected = run_pipeline(name, last)
+    assert run_pipeline(name, last, '-j', '3', '--chunk-size', '1', *options) == expected
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_parallel_with_prefilter(name):
+    """预过滤器在工作进程中执行：分析结果与单进程相同，重构结果与不过滤时相同"""
+    for last in ('analyze', 'reconstruct'):
+        stages = ['prefilter'] + stage_names(name, last)
+        expected = run_stages(name, stages)
+        assert run_stages(name, stages, '-j', '3', '--chunk-size', '1') == expected
+    assert expected == run_pipeline(name)
@@ -0,0 +1,45 @@
+"""
+file: test_pipeline_bench.py
+合成日志生成器和端到端基准测试 - 生成结果可复现，各阶段脚本与流水线都能完整重构真实数据
+"""
+import pytest
+
+from conftest import generated_requests
+import pipeline
+
+log_generator = pipeline.load_stage_module('benchmarks/log_generator.py')
+pipeline_bench = pipeline.load_stage_module('benchmarks/pipeline_bench.py')
+
+def test_same_seed_same_log():
+    lines = list(log_generator.LogGenerator(seed=7).generate(20_000))
+    assert list(log_generator.LogGenerator(seed=7).generate(20_000)) == lines
+    assert list(log_generator.LogGenerator(seed=8).generate(20_000)) != lines
+
+def test_time_latency_clusters():
+    """时间盲注的比较请求耗时分为两簇：延迟SLEEP秒以上的慢请求和正常耗时的快请求（快慢与比较结果的对应由重构准确率检验）"""
+    requests, _ = generated_requests(log_generator.TIME)
+    for request in requests:
+        if '>' not in request['payload']:
+            continue
+        slow = request['request_time'] >= log_generator.SLEEP_SECONDS
+        assert slow or request['request_time'] <= log_generator.FAST_LATENCY[1]
+
+@pytest.mark.parametrize('mode', log_generator.MODES)
+def test_stages_and_pipeline_reconstruct_truth(mode, tmp_path):
+    """分阶段运行和完整流水线（含 -j 2）都能完整重构生成器记录的真实数据"""
+    manifest = log_generator.generate_log(str(tmp_path / 'access.log'), 60_000, mode, attackers=2, seed=1)
+    truth = pipeline_bench.load_json(manifest['truth'])['data']
+
+    _, stages_output = pipeline_bench.bench_stages(manifest, str(tmp_path))
+    accuracy = pipeline_bench.reconstruction_accuracy(truth, pipeline_bench.load_reconstruction(stages_output))
+    assert accuracy['values'] > 0 and accuracy['value_accuracy'] == 1.0
+
+    for workers in (1, 2):
+        _, pipeline_output = pipeline_bench.bench_pipeline(manifest, str(tmp_path), workers)
+        assert pipeline_bench.load_reconstruction(pipeline_output) == pipeline_bench.load_reconstruction(stages_output)
+
+def test_reconstruction_accuracy():
+    truth = {'DB.T': {'NAME': ['alice', 'bob']}}
+    result = pipeline_bench.reconstruction_accuracy(truth, {'DB.T': {'NAME': ['alice', 'bib']}})
+    assert result['exact_values'] == 1 and result['value_accuracy'] == 0.5
+    assert result['character_accuracy'] == 0.875
@@ -0,0 +1,90 @@
+"""
+file: test_record_codec.py
+中间格式编解码器测试 - JSON行和列式批次格式的往返转换
+"""
+import io
+import json
+
+import pytest
+
+from conftest import example_analyses, example_requests
+import record_codec
+
+def round_trip(records, fmt=record_codec.COLUMNAR, batch_size=record_codec.DEFAULT_BATCH_SIZE, select=None):
+    """按指定格式写出再读回"""
+    if fmt == record_codec.JSONL:
+        stream = io.StringIO()
+        with record_codec.RecordWriter(fmt, stream) as writer:
+            writer.write_all(records)
+        data = stream.getvalue().encode('utf-8')
+    else:
+        stream = io.BytesIO()
+        with record_codec.RecordWriter(fmt, stream, batch_size) as writer:
+            writer.write_all(records)
+        data = stream.getvalue()
+    assert writer.count == len(records)
+    return list(record_codec.read_records(io.BytesIO(data), select))
+
+MIXED_RECORDS = [
+    {'a': 1, 'b': 'x'},
+    {},
+    {},
+    {'a': 2, 'b': 'y'},
+    {'nested': {'empty': {}, 'list': [1, 2], 'flag': True}},
+    {},
+]
+
+@pytest.mark.parametrize('fmt', record_codec.FORMATS)
+@pytest.mark.parametrize('batch_size', [1, 2, 4096])
+def test_empty_records_preserved(fmt, batch_size):
+    """空字典记录不会在往返中丢失（6条输入，6条输出）"""
+    assert round_trip(MIXED_RECORDS, fmt, batch_size) == MIXED_RECORDS
+
+def test_column_types():
+    """整数、布尔、字符串、超出int64的整数、None、浮点数和混合类型的列"""
+    records = [
+        {'int': 1, 'bool': True, 'str': 'ümlaut', 'big': 1 << 70, 'none': None, 'float': 0.5, 'mixed': 1},
+        {'int': -(1 << 63), 'bool': False, 'str': '', 'big': 3, 'none': None, 'float': 2.0, 'mixed': 'one'},
+    ]
+    decoded = round_trip(records)
+    assert decoded == records
+    assert type(decoded[0]['bool']) is bool and type(decoded[1]['float']) is float
+
+def test_mutable_values_not_shared():
+    """字典编码的列表/字典值在记录之间不共享"""
+    decoded = round_trip([{'tags': ['a']}, {'tags': ['a']}])
+    decoded[0]['tags'].append('b')
+    assert decoded[1]['tags'] == ['a']
+
+def test_select_decodes_one_field():
+    records = [{'request': {'id': index}, 'analysis': {'judge': index % 2 == 0}} for index in range(5)]
+    assert round_trip(records, select='analysis') == [record['analysis'] for record in records]
+
+@pytest.mark.parametrize('name', ['time', 'bool'])
+def test_example_pipeline_records(name):
+    """示例日志的请求数据和分析结果经过列式格式往返后不变"""
+    requests = example_requests(name)
+    assert round_trip(requests) == requests
+    results = [{'request': request, 'analysis': analysis}
+               for request, analysis in zip(requests, example_analyses(name))]
+    assert round_trip(results, batch_size=256) == results
+
+def test_jsonl_input_detected():
+    lines = b'{"a": 1}\nnot json\n{"b": 2}\n'
+    errors = []
+    records = list(record_codec.read_records(io.BytesIO(lines), on_error=errors.append))
+    assert records == [{'a': 1}, {'b': 2}]
+    assert len(errors) == 1
+
+def test_truncated_stream_rejected():
+    stream = io.BytesIO()
+    with record_codec.RecordWriter(record_codec.COLUMNAR, stream) as writer:
+        writer.write_all([{'a': index} for index in range(10)])
+    with pytest.raises(ValueError):
+        list(record_codec.read_records(io.BytesIO(stream.getvalue()[:-3])))
+
+def test_jsonl_output_unchanged():
+    stream = io.StringIO()
+    with record_codec.RecordWriter(record_codec.JSONL, stream) as writer:
+        writer.write_all(MIXED_RECORDS)
+    assert stream.getvalue() == ''.join(json.dumps(record) + '\n' for record in MIXED_RECORDS)
@@ -0,0 +1,105 @@
+"""
+file: test_report_generator.py
+报告生成器测试 - 增量写入的报告与一次性生成的内容相同，JSON行取值流与JSON文档输入的报告相同
+"""
+import io
+import os
+import csv
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+from conftest import example_analyses
+import pipeline
+
+report_generator = pipeline.load_stage_module(pipeline.STAGE_MODULES['report'])
+default_reconstructor = pipeline.load_stage_module(pipeline.RECONSTRUCTOR_MODULES['default'])
+
+FORMATS = 'json,csv,txt,jsonl'
+
+class FixedDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 9, 17, 13, 0, 0)
+
+@pytest.fixture
+def result_dir(tmp_path, monkeypatch):
+    """报告写入当前目录下的 ./result，固定生成时间使不同输入的报告可以逐字节比较"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(report_generator, 'datetime', FixedDatetime)
+    return tmp_path / 'result'
+
+def sample_data():
+    """两个数据库中的同名表在报告中合并为一张表"""
+    data = default_reconstructor.reconstruct_data(example_analyses('bool'))
+    data['data']['OTHER_DB.USERS'] = {'PASSWORD': ['x'], 'NOTE': ['a', 'b']}
+    return data
+
+def read_report(path):
+    """读取报告内容：CSV报告目录返回 文件名 -> 内容，JSONL报告为gzip压缩文件"""
+    if os.path.isdir(path):
+        return {name: read_report(os.path.join(path, name)) for name in sorted(os.listdir(path))}
+    with (gzip.open(path, 'rt') if path.endswith('.gz') else open(path, 'r')) as f:
+        return f.read()
+
+def generate(data, suffix, tables=None):
+    """生成各格式的报告，返回 格式 -> 报告内容"""
+    files = report_generator.generate_report(data, FORMATS, suffix=suffix, tables=tables)
+    return dict(zip(FORMATS.split(','), map(read_report, files)))
+
+def test_json_report_matches_json_dump(result_dir):
+    """增量写入的JSON报告与 json.dump(报告结构) 相同，同名表的取值按顺序拼接"""
+    data = sample_data()
+    report = json.loads(generate(data, '_doc')['json'])
+    expected = report_generator.create_report_structure(data)
+    expected['stolen_data'] = {table: {column: list(values) for column, values in columns.items()}
+                               for table, columns in expected['stolen_data'].items()}
+    assert report == expected
+    assert report['stolen_data']['USERS']['PASSWORD'][-1] == 'x'
+
+def test_csv_report_tables(result_dir):
+    """CSV报告每张表一个文件，每条记录一行，较短的列以空值补齐"""
+    tables = generate(sample_data(), '_csv')['csv']
+    rows = list(csv.DictReader(io.StringIO(tables['USERS.csv'])))
+    assert len(rows) == 11
+    assert rows[-1]['PASSWORD'] == 'x' and rows[-1]['NOTE'] == ''
+
+def test_value_rows_match_document(result_dir, capsys):
+    """重构器 --rows 输出的JSON行取值流生成的报告与JSON文档输入相同"""
+    data = sample_data()
+    document = generate(data, '_doc')
+
+    capsys.readouterr()
+    default_reconstructor.print_results(data, rows=True)
+    stream = io.StringIO(capsys.readouterr().out)
+    head, tables = report_generator.read_input(stream)
+    assert tables is not None
+    assert generate(head, '_rows', tables) == document
+
+def test_document_input(result_dir):
+    data = sample_data()
+    head, tables = report_generator.read_input(io.StringIO(json.dumps(data, indent=2)))
+    assert head == data and tables is None
+
+def test_non_adjacent_rows_rejected():
+    rows = [{'table': 'A.T1', 'column': 'C', 'value': '1'}, {'table': 'A.T2', 'column': 'C', 'value': '2'},
+            {'table': 'B.T1', 'column': 'C', 'value': '3'}]
+    with pytest.raises(ValueError):
+        list(report_generator.group_value_rows(rows))
+
+def test_partial_reports_removed(result_dir):
+    """写入过程中出错时删除已创建的报告文件"""
+    def failing_tables():
+        yield 'USERS', {'NAME': ['alice']}
+        raise ValueError('broken input')
+
+    with pytest.raises(ValueError):
+        report_generator.generate_report({'data': {}}, FORMATS, tables=failing_tables())
+    assert os.listdir(result_dir) == []
+
+def test_columnar_report(result_dir):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    files = report_generator.generate_report(sample_data(), 'parquet')
+    assert parquet.read_table(files[0]).num_rows > 0
@@ -0,0 +1,88 @@
+"""
+file: test_request_dedup.py
+请求去重器测试 - 布隆过滤器、时间窗口集合，以及重复请求去除后分析结果不变
+"""
+import pytest
+
+from conftest import (EXAMPLES, analyze_requests, example_analyses, example_requests, load_example_config,
+                      stage_module)
+import pipeline
+
+request_dedup = stage_module('dedup')
+default_reconstructor = pipeline.load_stage_module(pipeline.RECONSTRUCTOR_MODULES['default'])
+
+def keys(prefix, count):
+    return [request_dedup.digest(f"{prefix}{index}".encode('ascii')) for index in range(count)]
+
+def test_bloom_filter_add():
+    bloom = request_dedup.BloomFilter(capacity=100, error_rate=0.01)
+    key = request_dedup.digest(b'payload')
+    assert bloom.add(key) is False
+    assert bloom.add(key) is True
+
+def test_bloom_filter_error_rate():
+    """写满容量后，不存在的键被误判为存在的比例接近设定的误判率"""
+    bloom = request_dedup.BloomFilter(capacity=5000, error_rate=0.01)
+    for key in keys('in', 5000):
+        bloom.add(key)
+    false_positives = sum(bloom.add(key) for key in keys('out', 5000))
+    assert false_positives < 5000 * 0.03
+
+def test_bloom_filter_generations():
+    """写满容量后换新的一代，上一代中的键仍能查到；内存最多为两代"""
+    bloom = request_dedup.BloomFilter(capacity=2, error_rate=0.001)
+    first, second, third = keys('k', 3)
+    bloom.add(first)
+    bloom.add(second)
+    single = bloom.memory
+    assert bloom.add(third) is False
+    assert bloom.memory == 2 * single
+    assert bloom.add(first) is True
+
+@pytest.mark.parametrize('capacity, error_rate', [(0, 0.01), (100, 0), (100, 1)])
+def test_bloom_filter_invalid(capacity, error_rate):
+    with pytest.raises(ValueError):
+        request_dedup.BloomFilter(capacity, error_rate)
+
+def test_windowed_seen_states():
+    seen = request_dedup.WindowedSeen(window=60)
+    assert seen.check(b'a', b'200', 0.0) == request_dedup.NEW
+    assert seen.check(b'a', b'200', 1.0) == request_dedup.DUPLICATE
+    assert seen.check(b'a', b'500', 2.0) == request_dedup.CONFLICT
+    assert seen.check(b'a', b'500', 3.0) == request_dedup.DUPLICATE
+
+def test_windowed_seen_eviction():
+    """超出时间窗口或条目数上限时淘汰最早的条目"""
+    seen = request_dedup.WindowedSeen(window=60, max_entries=2)
+    seen.check(b'a', b'200', 0.0)
+    assert seen.check(b'a', b'200', 61.0) == request_dedup.NEW
+    assert seen.evicted == 1
+
+    seen.check(b'b', b'200', 62.0)
+    seen.check(b'c', b'200', 63.0)
+    assert len(seen.entries) == 2
+    assert seen.check(b'a', b'200', 64.0) == request_dedup.NEW
+
+@pytest.mark.parametrize('mode', request_dedup.MODES)
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_duplicates_removed(name, mode):
+    """每条请求重复记录一次（同一秒内），去重结果与原日志去重相同，重构结果与不去重时相同"""
+    requests = example_requests(name)
+    once = list(request_dedup.RequestDeduplicator(mode).dedup_records(dict(request) for request in requests))
+    deduplicator = request_dedup.RequestDeduplicator(mode)
+    twice = list(deduplicator.dedup_records(dict(request) for request in requests for _ in range(2)))
+    assert twice == once
+    assert deduplicator.kept == len(once) and deduplicator.dropped == 2 * len(requests) - len(once)
+    expected = default_reconstructor.reconstruct_data(example_analyses(name))
+    assert default_reconstructor.reconstruct_data(analyze_requests(load_example_config(name), twice)) == expected
+
+@pytest.mark.parametrize('mode', request_dedup.MODES)
+def test_conflict_kept_and_marked(mode):
+    """来源地址和payload相同但响应特征（包括请求耗时）不同的请求保留并标记"""
+    request = {'remote_host': '10.0.0.1', 'payload': "1' AND 1=1", 'status_code': 200,
+               'response_size': 15, 'request_time': 0.01, 'timestamp': '17/Sep/2025:13:00:00 +0800'}
+    retried = dict(request, request_time=1.02)
+    deduplicator = request_dedup.RequestDeduplicator(mode)
+    output = list(deduplicator.dedup_records([dict(request), dict(retried), dict(retried)]))
+    assert output == [request, dict(retried, duplicate_conflict=True)]
+    assert (deduplicator.kept, deduplicator.dropped, deduplicator.conflicts) == (2, 1, 1)
@@ -0,0 +1,70 @@
+"""
+file: test_session_reconstructor.py
+会话划分重构器测试 - 多个攻击者交错攻击时按会话分别重构
+"""
+import pytest
+
+from conftest import bisection_analyses, example_analyses, example_requests, generated_config, generated_requests
+import pipeline
+
+session_reconstructor = pipeline.load_stage_module(pipeline.SESSION_RECONSTRUCTOR_MODULE)
+default_reconstructor = pipeline.load_stage_module(pipeline.RECONSTRUCTOR_MODULES['default'])
+
+def generated_results(mode, attackers=3):
+    """多攻击者合成日志的分析结果 {'request', 'analysis'} 列表和生成器"""
+    requests, generator = generated_requests(mode, size=300_000, attackers=attackers, session=True)
+    analyzer = pipeline.load_stage_module(pipeline.STAGE_MODULES['analyze']).SQLMapBlindAnalyzer(
+        generated_config(mode))
+    return list(analyzer.analyze_records(requests)), generator
+
+@pytest.mark.parametrize('reconstructor', ['default', 'streaming', 'bisection'])
+@pytest.mark.parametrize('mode', ['boolean', 'time'])
+def test_sessions_match_attackers(mode, reconstructor):
+    """每个攻击者一个会话，各会话重构出该攻击者完整提取的数据"""
+    results, generator = generated_results(mode)
+    data = session_reconstructor.reconstruct_sessions(results, reconstructor=reconstructor)
+    truth = generator.truth()
+    assert len(data['sessions']) == len(generator.attackers)
+    for session, attacker in zip(sorted(data['sessions'], key=lambda session: session['remote_host']),
+                                 sorted(generator.sessions(), key=lambda session: session['remote_host'])):
+        assert session['user_agent'] == attacker['user_agent']
+        table_key = f"BENCH_DB.{attacker['table']}".upper()
+        reconstructed = session['result']['data'][table_key]
+        assert truth[table_key]['USERNAME']
+        for column, values in truth[table_key].items():
+            assert reconstructed.get(column, [])[:len(values)] == values
+
+def test_same_table_not_mixed():
+    """两个攻击者交错提取同一张表的同一条记录，按会话分别重构，不会互相干扰"""
+    results = []
+    for first, second in zip(bisection_analyses('secret'), bisection_analyses('hunter')):
+        results.append({'request': {'remote_host': '10.0.0.1'}, 'analysis': first})
+        results.append({'request': {'remote_host': '10.0.0.2'}, 'analysis': second})
+    data = session_reconstructor.reconstruct_sessions(results, keys=['host'])
+    assert [session['result']['data'] for session in data['sessions']] == [
+        {'app_db.users': {'password': ['secret']}}, {'app_db.users': {'password': ['hunter']}}]
+    mixed = default_reconstructor.reconstruct_data(result['analysis'] for result in results)
+    assert mixed['data']['app_db.users']['password'] not in (['secret'], ['hunter'])
+
+def test_parallel_matches_serial():
+    results, _ = generated_results('boolean')
+    serial = session_reconstructor.reconstruct_sessions(results)
+    assert session_reconstructor.reconstruct_sessions(results, workers=2) == serial
+
+def test_session_gap_splits_sessions():
+    """同一会话键的请求间隔超过gap时开始新会话"""
+    partitioner = session_reconstructor.SessionPartitioner(['host'], gap=60)
+    request = {'remote_host': '10.0.0.1'}
+    indexes = [partitioner.session_of(dict(request, timestamp=timestamp)) for timestamp in (
+        '17/Sep/2025:13:00:00 +0800', '17/Sep/2025:13:00:59 +0800', '17/Sep/2025:13:02:00 +0800')]
+    assert indexes == [0, 0, 1]
+    assert partitioner.session_of({'remote_host': '10.0.0.2', 'timestamp': '17/Sep/2025:13:02:00 +0800'}) == 2
+
+def test_without_session_fields_single_session():
+    """请求数据没有会话字段时全部视为同一会话，结果与默认重构器相同"""
+    results = [{'request': request, 'analysis': analysis}
+               for request, analysis in zip(example_requests('bool'), example_analyses('bool'))]
+    data = session_reconstructor.reconstruct_sessions(results)
+    assert len(data['sessions']) == 1
+    expected = default_reconstructor.reconstruct_data(example_analyses('bool'))
+    assert data['sessions'][0]['result']['data'] == expected['data']
@@ -0,0 +1,142 @@
+"""
+file: test_sqlmap_analyzer.py
+分析器测试 - 融合正则、模板缓存与逐模式搜索的等价性，判断函数
+"""
+import sys
+import subprocess
+
+import pytest
+
+from conftest import (EXAMPLES, analyze_requests, example_analyses, example_path, example_requests,
+                      load_example_config, stage_module)
+
+sqlmap_analyzer = stage_module('analyze')
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_fused_engine_matches_patterns(name):
+    """融合正则一次扫描的结果与逐个模式搜索相同"""
+    patterns = analyze_requests(load_example_config(name, engine='patterns', cache_size=0), example_requests(name))
+    fused = analyze_requests(load_example_config(name, engine='fused', cache_size=0), example_requests(name))
+    assert fused == patterns
+    assert any(analysis['type'] != 'unknown' for analysis in fused)
+
+def test_fused_engine_falls_back():
+    """载荷缺少字符位置时融合正则不适用，由逐模式搜索提取其余字段"""
+    config = load_example_config('bool', engine='fused', cache_size=0)
+    analyzer = sqlmap_analyzer.SQLMapBlindAnalyzer(config)
+    payload = "admin' AND ORD(MID((SELECT IFNULL(CAST(password AS NCHAR),0x20) FROM app.users LIMIT 2,1)))"
+    analysis = analyzer.analyze_payload(payload, 0)
+    assert analysis['type'] == 'boolean_injection'
+    assert (analysis['database'], analysis['table'], analysis['column']) == ('APP', 'USERS', 'PASSWORD')
+    assert analysis['record_id'] == 2
+    assert analysis['position'] == 0
+
+@pytest.mark.parametrize('engine', ['patterns', 'fused'])
+@pytest.mark.parametrize('cache_size', [4096, 8])
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_template_cache_matches_uncached(name, engine, cache_size):
+    """模板缓存（包括频繁淘汰的小容量缓存）的结果与不使用缓存时相同"""
+    uncached = analyze_requests(load_example_config(name, engine=engine, cache_size=0), example_requests(name))
+    config = load_example_config(name, engine=engine, cache_size=cache_size)
+    analyzer = sqlmap_analyzer.SQLMapBlindAnalyzer(config)
+    cached = [result['analysis'] for result in analyzer.analyze_records(example_requests(name))]
+    assert cached == uncached
+    assert analyzer.template_cache.hits > 0
+    assert len(analyzer.template_cache.templates) <= cache_size
+
+def test_template_cache_literal_digits():
+    """数值字段以外的数字（如表名中的数字）不同的载荷骨架相同，但不能命中同一模板"""
+    config = load_example_config('bool', cache_size=16)
+    analyzer = sqlmap_analyzer.SQLMapBlindAnalyzer(config)
+    template = "admin' AND ORD(MID((SELECT IFNULL(CAST(name AS NCHAR),0x20) FROM app.users{} LIMIT {},1),{},1))>{}"
+    first = analyzer.analyze_payload(template.format(1, 0, 3, 64), 15)
+    second = analyzer.analyze_payload(template.format(2, 5, 4, 96), 15)
+    assert (first['table'], first['record_id'], first['position'], first['ascii_value']) == ('USERS1', 0, 3, 64)
+    assert (second['table'], second['record_id'], second['position'], second['ascii_value']) == ('USERS2', 5, 4, 96)
+    assert analyzer.template_cache.hits == 0
+
+    third = analyzer.analyze_payload(template.format(2, 7, 9, 32), 0)
+    assert (third['table'], third['record_id'], third['position'], third['ascii_value']) == ('USERS2', 7, 9, 32)
+    assert analyzer.template_cache.hits == 1
+
+@pytest.mark.parametrize('stats', [False, True])
+def test_template_cache_summary_only_with_stats(stats):
+    """命令行只在指定 --stats 时输出模板缓存统计"""
+    command = [sys.executable, example_path('3_payload_analyzer/sqlmap_analyzer.py'),
+               '--config', example_path(EXAMPLES['bool'][2])] + (['--stats'] if stats else [])
+    result = subprocess.run(command, input=b'', capture_output=True, check=True)
+    assert ('模板缓存' in result.stderr.decode('utf-8')) == stats
+
+def test_latency_judge_polarity():
+    """慢请求（SLEEP生效，比较条件为真）的判断结果为False，快请求为True"""
+    judge = sqlmap_analyzer.create_judge_function({'type': 'time_auto'})
+    assert judge.metric == 'request_time'
+    assert [judge(latency) for latency in (0.01, 0.02, 5.01, 0.03, 4.98)] == [True, True, False, True, False]
+    assert 0.02 < judge.threshold() < 4.98
+
+    inverted = sqlmap_analyzer.create_judge_function({'type': 'time_auto', 'slow_judge': True})
+    assert [inverted(latency) for latency in (0.01, 5.01)] == [False, True]
+
+def test_latency_judge_slow_first():
+    """最先出现慢请求时，出现快请求后将已有样本移入慢簇，后续请求按两簇归类"""
+    judge = sqlmap_analyzer.LatencySplitJudge(min_gap=0.5)
+    assert judge(5.0) is True
+    assert judge(0.01) is True
+    assert (judge.fast_count, judge.slow_count) == (1, 1)
+    assert judge(4.9) is False
+    assert judge(0.02) is True
+
+def test_latency_judge_small_gap_stays_fast():
+    """差距不足min_gap的耗时波动不会形成慢簇"""
+    judge = sqlmap_analyzer.LatencySplitJudge(min_gap=0.5)
+    assert all(judge(latency) for latency in (0.10, 0.30, 0.20, 0.45))
+    assert judge.threshold() is None
+
+def test_missing_judge_metric_is_unknown():
+    """缺少耗时字段的注入请求作为未识别请求输出并计数，不中断分析"""
+    config = load_example_config('time')
+    config.judge_function = sqlmap_analyzer.create_judge_function({'type': 'time_auto'})
+    analyzer = sqlmap_analyzer.SQLMapBlindAnalyzer(config)
+    results = list(analyzer.analyze_records(example_requests('time')))
+    assert {result['analysis']['type'] for result in results} == {'unknown'}
+    assert analyzer.missing_metric == sum(config.trigger_pattern in (request['payload'] or '').upper()
+                                          for request in example_requests('time'))
+    assert analyzer.missing_metric > 0
+
+def multi_config_analyses(name, configs):
+    analyzer = sqlmap_analyzer.MultiConfigAnalyzer(configs)
+    return [result['analysis'] for result in analyzer.analyze_records(example_requests(name))]
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_multi_config_matches_single(name):
+    """
+    多个配置一次分派，分派给示例对应配置的请求与只用该配置分析的结果相同，technique为配置名称；
+    分派给其他配置的请求（如时间盲注日志中sqlmap先尝试的布尔盲注）单配置分析时无法识别
+    """
+    configs = [load_example_config(example) for example in sorted(EXAMPLES)]
+    expected = load_example_config(name).name
+    dispatched = 0
+    for analysis, single in zip(multi_config_analyses(name, configs), example_analyses(name)):
+        technique = analysis.pop('technique')
+        if technique == expected:
+            dispatched += 1
+            assert analysis == single
+        else:
+            assert single['type'] == 'unknown'
+    assert dispatched > 0
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_lower_case_trigger(name):
+    """小写的trigger_pattern与大写时的结果相同（单配置和多配置）"""
+    config = load_example_config(name)
+    lower = sqlmap_analyzer.BlindAnalysisConfig(config.injection_type, config.trigger_pattern.lower(),
+                                                config.judge_function, config.patterns,
+                                                cache_size=config.cache_size, name=config.name)
+    assert lower.trigger_pattern == config.trigger_pattern
+    assert analyze_requests(lower, example_requests(name)) == example_analyses(name)
+    assert multi_config_analyses(name, [lower]) == multi_config_analyses(name, [config])
+
+def test_duplicate_trigger_skipped():
+    configs = [load_example_config('bool'), load_example_config('bool')]
+    analyzer = sqlmap_analyzer.MultiConfigAnalyzer(configs)
+    assert len(analyzer.analyzers) == 1
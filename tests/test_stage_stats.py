@@ -0,0 +1,96 @@
+"""
+file: test_stage_stats.py
+阶段统计测试 - 计数器、快照合并、指标文件，以及并行模式与单进程的计数一致
+"""
+import re
+import sys
+import argparse
+import subprocess
+
+import pytest
+
+from conftest import EXAMPLES, example_path
+import stage_stats
+
+def test_counts_and_dropped():
+    stats = stage_stats.StageStats('filter')
+    output = list(stats.count_out(record for record in stats.count_in(range(10)) if record % 2 == 0))
+    stats.finish()
+    assert output == [0, 2, 4, 6, 8]
+    assert (stats.records_in, stats.records_out, stats.dropped) == (10, 5, 5)
+    assert sum(stats.buckets) == 5
+    assert stats.summary().startswith('[+] 阶段统计 filter: 输入 10 条, 输出 5 条, 丢弃 5 条, 错误 0 条')
+
+def test_disabled_passthrough():
+    """未启用时不包装输入输出"""
+    stats = stage_stats.StageStats('parse', enabled=False)
+    records = iter([1, 2])
+    assert stats.count_in(records) is records
+    assert stats.count_out(records) is records
+
+def test_aggregate_has_no_dropped():
+    stats = stage_stats.StageStats('reconstruct', aggregate=True)
+    list(stats.count_in(range(3)))
+    stats.finish(1)
+    assert stats.dropped is None
+    assert '丢弃' not in stats.summary()
+
+def test_merge_snapshot():
+    """并行模式下工作进程的计数快照合并到主进程"""
+    worker = stage_stats.StageStats('analyze')
+    list(worker.count_out(worker.count_in(range(4))))
+    main = stage_stats.StageStats('analyze')
+    main.merge(worker.snapshot())
+    main.merge(worker.snapshot())
+    assert (main.records_in, main.records_out, sum(main.buckets)) == (8, 8, 8)
+
+def test_prometheus_text():
+    stats = stage_stats.StageStats('parse "raw"')
+    list(stats.count_out(stats.count_in(range(3))))
+    text = stage_stats.prometheus_text([stats], {'pipeline_duration_seconds': 1.5})
+    assert text.startswith('# HELP blindsql_stage_records_in_total')
+    assert 'blindsql_stage_records_in_total{stage="parse \\"raw\\""} 3' in text
+    assert 'blindsql_stage_record_seconds_count{stage="parse \\"raw\\""} 3' in text
+    assert 'blindsql_stage_record_seconds_bucket{stage="parse \\"raw\\"",le="+Inf"} 3' in text
+    assert 'blindsql_pipeline_duration_seconds 1.5' in text
+
+def test_metrics_file_not_overwritten(tmp_path):
+    """已存在的非指标文件拒绝覆盖，空文件和指标文件可以替换"""
+    stats = stage_stats.StageStats('parse')
+    other = tmp_path / 'access.log'
+    other.write_text('127.0.0.1 - - ...\n')
+    with pytest.raises(ValueError):
+        stage_stats.write_metrics(str(other), [stats])
+    with pytest.raises(argparse.ArgumentTypeError):
+        stage_stats.metrics_path(str(other))
+    assert other.read_text() == '127.0.0.1 - - ...\n'
+
+    metrics = tmp_path / 'metrics.prom'
+    metrics.write_text('')
+    stage_stats.write_metrics(str(metrics), [stats])
+    stage_stats.write_metrics(str(metrics), [stats])
+    assert metrics.read_text() == stage_stats.prometheus_text([stats])
+
+def record_counters(path):
+    """指标文件中各阶段的输入/输出记录数"""
+    counters = {}
+    with open(path, 'r') as f:
+        for line in f:
+            match = re.match(r'blindsql_stage_records_(in|out)_total\{stage="([^"]+)"\} (\d+)', line)
+            if match:
+                counters[(match.group(2), match.group(1))] = int(match.group(3))
+    return counters
+
+def test_parallel_counts_match_single_process(tmp_path):
+    """-j 2 并行模式合并工作进程的计数后，各阶段的记录数与单进程运行相同"""
+    log, param, config, decoders = EXAMPLES['time']
+    stages = ','.join(('parse', 'extract') + decoders + ('analyze', 'reconstruct'))
+    counters = []
+    for workers in (1, 2):
+        path = str(tmp_path / f'metrics_j{workers}.prom')
+        command = [sys.executable, example_path('pipeline.py'), '-i', example_path(log), '-p', param,
+                   '--config', example_path(config), '-s', stages, '-j', str(workers), '--chunk-size', '1', '--stats-file', path]
+        subprocess.run(command, capture_output=True, check=True)
+        counters.append(record_counters(path))
+    assert counters[0] == counters[1]
+    assert counters[0][('reconstruct', 'in')] == counters[0][('analyze', 'out')] > 0
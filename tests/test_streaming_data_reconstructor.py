@@ -0,0 +1,94 @@
+"""
+file: test_streaming_data_reconstructor.py
+流式重构器测试 - 与默认重构器的等价性、定稿后释放状态、检查点恢复
+"""
+import json
+import random
+
+import pytest
+
+from conftest import EXAMPLES, bisection_analyses, example_analyses, length_probe_analyses
+import pipeline
+
+default_reconstructor = pipeline.load_stage_module(pipeline.RECONSTRUCTOR_MODULES['default'])
+streaming = pipeline.load_stage_module(pipeline.RECONSTRUCTOR_MODULES['streaming'])
+
+def run(analyses, **kwargs):
+    reconstructor = streaming.StreamingReconstructor(**kwargs)
+    events = list(reconstructor.fold(analyses))
+    return reconstructor, events
+
+def length_known_analyses(count=20, seed=3):
+    """count条已知长度的记录：偶数记录先收到LENGTH查询，奇数记录在字符提取完之后才收到"""
+    rnd = random.Random(seed)
+    values = []
+    analyses = []
+    for record_id in range(count):
+        value = ''.join(chr(rnd.randint(ord('a'), ord('z'))) for _ in range(rnd.randint(3, 12)))
+        values.append(value)
+        probe = list(length_probe_analyses(len(value), record_id))
+        chars = list(bisection_analyses(value, record_id))
+        analyses.extend(probe + chars if record_id % 2 == 0 else chars + probe)
+    return values, analyses
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_exact_matches_default(name):
+    """--exact（不提前定稿）的结果与默认重构器完全相同"""
+    reconstructor, events = run(example_analyses(name), early_finalize=False)
+    assert events == []
+    assert reconstructor.flush() == default_reconstructor.reconstruct_data(example_analyses(name))
+
+def test_early_finalize_ignores_later_comparisons():
+    """定稿后重新提取的比较被忽略：模块文档中记录的与默认重构器的差异"""
+    reconstructor, _ = run(example_analyses('time'))
+    streamed = reconstructor.flush()['data']['INFORMATION_SCHEMA.COLUMNS']['COLUMN_NAME']
+    default = default_reconstructor.reconstruct_data(example_analyses('time'))
+    assert 'eiployee_id' in streamed
+    assert 'eipleyee_id' in default['data']['INFORMATION_SCHEMA.COLUMNS']['COLUMN_NAME']
+
+def test_length_known_records_release_state():
+    """已知长度的记录全部定稿后输出record事件并释放区间状态，结果与默认重构器相同"""
+    values, analyses = length_known_analyses()
+    reconstructor, events = run(analyses)
+
+    records = {event['record_id']: event['value'] for event in events if event.get('event') == 'record'}
+    assert records == dict(enumerate(values))
+    store = reconstructor.records['app_db.users']['password']
+    assert all(record.finished and record.pending is None for record in store.records.values())
+    assert reconstructor.pending_count == 0
+
+    flushed = reconstructor.flush()
+    default = default_reconstructor.reconstruct_data(analyses)
+    assert flushed['data'] == default['data'] == {'app_db.users': {'password': values}}
+    assert flushed['completeness'] == default['completeness']
+
+def peak_pending(analyses, early_finalize):
+    """折叠过程中同时保存区间状态的最大位置数"""
+    reconstructor = streaming.StreamingReconstructor(early_finalize=early_finalize)
+    peak = 0
+    for analysis in analyses:
+        reconstructor.feed(analysis)
+        peak = max(peak, reconstructor.pending_count)
+    return peak
+
+def test_pending_state_bounded_by_unresolved_positions():
+    """二分查找转向下一位置时上一位置定稿，逐条提取的记录同一时刻只有一个位置保存区间"""
+    _, analyses = length_known_analyses(count=10)
+    assert peak_pending(analyses, True) == 1
+    assert peak_pending(analyses, False) > 10
+
+@pytest.mark.parametrize('early_finalize', [True, False])
+def test_checkpoint_round_trip(early_finalize):
+    """中途导出检查点（经过JSON序列化）并恢复后继续折叠，结果与不中断时相同"""
+    analyses = example_analyses('time')
+    middle = len(analyses) // 2
+
+    first, _ = run(analyses[:middle], early_finalize=early_finalize)
+    state = json.loads(json.dumps(first.to_checkpoint()))
+    resumed = streaming.StreamingReconstructor.from_checkpoint(state)
+    for _ in resumed.fold(analyses[middle:]):
+        pass
+
+    uninterrupted, _ = run(analyses, early_finalize=early_finalize)
+    assert resumed.flush() == uninterrupted.flush()
+    assert resumed.pending_count == uninterrupted.pending_count
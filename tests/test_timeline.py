@@ -0,0 +1,75 @@
+"""
+file: test_timeline.py
+攻击时间线测试 - 缓存分钟的时间戳解析与strptime一致，分片合并与整体统计一致
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import EXAMPLES, example_analyses, example_requests
+import timeline
+
+def strptime_epoch(text):
+    return int(datetime.strptime(text, timeline.TIMESTAMP_FORMAT).timestamp())
+
+def test_matches_strptime_across_boundaries():
+    """跨分钟、小时、日、月、年以及时区切换时与strptime相同"""
+    parser = timeline.TimestampParser()
+    zones = [timezone(timedelta(hours=8)), timezone.utc, timezone(timedelta(hours=-5, minutes=-30))]
+    moment = datetime(2025, 12, 31, 23, 57, 0, tzinfo=zones[0])
+    for step in range(600):
+        moment += timedelta(seconds=7)
+        # 时区每隔一段时间切换一次，来回切换检查分钟缓存是否随时区失效
+        text = moment.astimezone(zones[step // 50 % len(zones)]).strftime(timeline.TIMESTAMP_FORMAT)
+        assert parser(text) == strptime_epoch(text) == int(moment.timestamp())
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_matches_strptime_on_examples(name):
+    parser = timeline.TimestampParser()
+    timestamps = [request['timestamp'] for request in example_requests(name)]
+    assert [parser(text) for text in timestamps] == [strptime_epoch(text) for text in timestamps]
+
+@pytest.mark.parametrize('text, expected', [
+    ('2025-09-17T13:37:50+08:00', 1758087470),
+    ('2025-09-17T05:37:50Z', 1758087470),
+    ('2025-09-17T05:37:50.250+00:00', 1758087470),
+])
+def test_iso_fallback(text, expected):
+    assert timeline.TimestampParser()(text) == expected
+
+@pytest.mark.parametrize('text', [None, '', 'not a timestamp', '17/Sep/2025:13:37:5x +0800',
+                                  '17/Foo/2025:13:37:50 +0800', '2025-13-40T00:00:00'])
+def test_invalid_timestamp(text):
+    parser = timeline.TimestampParser()
+    parser('17/Sep/2025:13:37:50 +0800')
+    assert parser(text) is None
+
+def example_results(name):
+    return [{'request': request, 'analysis': analysis}
+            for request, analysis in zip(example_requests(name), example_analyses(name))]
+
+@pytest.mark.parametrize('name', sorted(EXAMPLES))
+def test_merge_matches_single_pass(name):
+    """按分片分别收集再合并（并行模式），与一次收集的时间线相同"""
+    results = example_results(name)
+    expected = timeline.build_timeline(results).summary()
+    merged = timeline.Timeline()
+    for start in range(0, len(results), 1000):
+        merged.merge(timeline.build_timeline(results[start:start + 1000]))
+    assert merged.summary() == expected
+    assert expected['extractions'] > 0 and expected['secrets']
+
+def test_rates_and_secrets():
+    """速率按时间桶统计，没有请求的时间桶计入平均值；数据的提取完成时间为最后一次请求的时间"""
+    analysis = {'type': 'boolean_injection', 'database': 'APP', 'table': 'USERS', 'column': 'NAME', 'record_id': 0}
+    results = [{'request': {'timestamp': f'17/Sep/2025:13:00:{second:02d} +0000'}, 'analysis': analysis}
+               for second in (0, 0, 0, 2)]
+    results.append({'request': {'timestamp': '17/Sep/2025:13:01:00 +0000'}, 'analysis': {'type': 'unknown'}})
+    summary = timeline.build_timeline(results).summary()
+    assert (summary['start'], summary['end'], summary['duration']) == (
+        '2025-09-17T13:00:00+00:00', '2025-09-17T13:00:02+00:00', 2)
+    assert summary['rates']['per_second']['extractions'] == {
+        'peak': 3, 'peak_at': '2025-09-17T13:00:00+00:00', 'mean': 1.33}
+    assert summary['minutes'] == [['2025-09-17T13:00:00+00:00', 4, 4], ['2025-09-17T13:01:00+00:00', 1, 0]]
+    secret, = summary['secrets']
+    assert (secret['extracted_at'], secret['requests']) == ('2025-09-17T13:00:02+00:00', 4)
@@ -0,0 +1,34 @@
+"""
+file: test_web_log_parser.py
+日志解析器测试 - 通用/组合日志格式一次匹配
+"""
+from conftest import stage_module
+
+log_parser = stage_module('parse')
+
+COMMON = '10.0.0.1 - frank [17/Sep/2025:13:37:50 +0800] "GET /?id=1 HTTP/1.1" 200 -'
+
+def test_common_log_format():
+    assert log_parser.parse_log_line(COMMON) == {
+        'remote_host': '10.0.0.1',
+        'remote_logname': '-',
+        'remote_user': 'frank',
+        'timestamp': '17/Sep/2025:13:37:50 +0800',
+        'request_line': 'GET /?id=1 HTTP/1.1',
+        'status_code': '200',
+        'response_size': '-'
+    }
+
+def test_combined_log_format():
+    """组合日志格式多出referer和user_agent，只有referer时不产出user_agent"""
+    combined = log_parser.parse_log_line(COMMON + ' "http://example.com/" "sqlmap/1.9"')
+    assert combined['referer'] == 'http://example.com/'
+    assert combined['user_agent'] == 'sqlmap/1.9'
+
+    referer_only = log_parser.parse_log_line(COMMON + ' "-"')
+    assert referer_only['referer'] == '-'
+    assert 'user_agent' not in referer_only
+
+def test_unparsable_lines_skipped():
+    assert log_parser.parse_log_line('not a log line') is None
+    assert list(log_parser.parse_lines(['', '  ', 'garbage', COMMON])) == [log_parser.parse_log_line(COMMON)]
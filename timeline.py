@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+file: timeline.py
+攻击时间线 - 将日志时间戳解析为Unix时间，统计请求速率、攻击起止时间和每条数据的提取完成时间
+输入: 任意阶段输出的记录（JSON行或列式批次格式），通常为sqlmap_analyzer.py的分析结果
+输出: 时间线JSON，可用报告生成器的 --timeline 参数写入报告
+
+时间戳在各阶段中以日志原文（17/Sep/2025:13:37:50 +0800）传递。相邻日志行的时间戳
+通常只有秒数不同：解析器缓存上一行所在的分钟，同一分钟内只解析秒数，
+新的分钟由按日期和时区缓存的当天零点加上时、分得到，不再逐行调用strptime。
+解析出的时间以 array('q') 保存，速率统计先用Counter按秒计数，再由秒合并为分钟。
+"""
+import sys
+import json
+import argparse
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+
+import record_codec
+
+# 日志时间戳格式
+TIMESTAMP_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+# 日志时间戳的长度，如 17/Sep/2025:13:37:50 +0800
+CLF_LENGTH = 26
+
+# 速率统计的时间桶宽度（秒）
+RATE_WIDTHS = {'per_second': 1, 'per_minute': 60}
+
+class TimestampParser:
+    """
+    日志时间戳解析器，返回整数Unix时间，无法解析时返回None
+    ISO格式（如nginx的$time_iso8601）回退到datetime.fromisoformat
+    """
+    __slots__ = ('prefix', 'zone', 'base', 'days')
+
+    def __init__(self):
+        # 上一个时间戳的分钟前缀（17/Sep/2025:13:37）、时区和该分钟的起始时间
+        self.prefix = None
+        self.zone = None
+        self.base = 0
+        # 日期+时区 -> 当天零点的Unix时间
+        self.days = {}
+
+    def __call__(self, text):
+        if not text:
+            return None
+        if len(text) != CLF_LENGTH or text[11] != ':':
+            return self._parse_iso(text)
+        prefix = text[:17]
+        zone = text[20:]
+        try:
+            if prefix != self.prefix or zone != self.zone:
+                self.base = self._minute_start(text, zone)
+                self.prefix = prefix
+                self.zone = zone
+            return self.base + int(text[18:20])
+        except ValueError:
+            return None
+
+    def _minute_start(self, text, zone):
+        """时间戳所在分钟的起始时间"""
+        key = text[:11] + zone
+        midnight = self.days.get(key)
+        if midnight is None:
+            midnight = int(datetime.strptime(f"{text[:11]}:00:00:00{zone}", TIMESTAMP_FORMAT).timestamp())
+            self.days[key] = midnight
+        return midnight + int(text[12:14]) * 3600 + int(text[15:17]) * 60
+
+    @staticmethod
+    def _parse_iso(text):
+        try:
+            return int(datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp())
+        except ValueError:
+            return None
+
+def format_epoch(epoch):
+    """以UTC的ISO格式显示Unix时间"""
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec='seconds')
+
+def coarsen(counts, width):
+    """将按秒计数合并为宽度为width秒的时间桶，只遍历出现过的秒"""
+    if width == 1:
+        return counts
+    buckets = Counter()
+    for second, count in counts.items():
+        buckets[second - second % width] += count
+    return buckets
+
+def rate_stats(counts, width):
+    """
+    时间桶计数的峰值、峰值时间和平均值
+    平均值按首末时间桶之间的全部时间桶计算，没有请求的时间桶计为0
+    """
+    if not counts:
+        return {'peak': 0, 'peak_at': None, 'mean': 0.0}
+    peak_at, peak = max(counts.items(), key=lambda item: (item[1], -item[0]))
+    span = (max(counts) - min(counts)) // width + 1
+    return {'peak': peak, 'peak_at': format_epoch(peak_at), 'mean': round(sum(counts.values()) / span, 2)}
+
+class Timeline:
+    """
+    收集攻击时间线
+    requests: 全部请求的时间；extractions: 盲注提取请求（数据字符和COUNT/LENGTH枚举查询）的时间；
+    secrets: (库, 表, 列, 记录编号) -> [首次请求时间, 最后一次请求时间, 请求数]
+    """
+    def __init__(self):
+        self.parse = TimestampParser()
+        self.requests = array('q')
+        self.extractions = array('q')
+        self.secrets = {}
+
+    def add(self, result):
+        """加入一条记录，没有时间戳的记录（如并行模式回传的精简分析字段）被忽略"""
+        request = result.get('request', result)
+        epoch = self.parse(request.get('timestamp'))
+        if epoch is None:
+            return
+        self.requests.append(epoch)
+
+        analysis = result.get('analysis')
+        if analysis is None or "inject" not in analysis.get('type', '') or not analysis.get('table'):
+            return
+        self.extractions.append(epoch)
+        if not analysis.get('column') or analysis.get('probe'):
+            return
+        key = (analysis['database'], analysis['table'], analysis['column'], analysis['record_id'])
+        secret = self.secrets.get(key)
+        if secret is None:
+            self.secrets[key] = [epoch, epoch, 1]
+        else:
+            if epoch < secret[0]:
+                secret[0] = epoch
+            if epoch > secret[1]:
+                secret[1] = epoch
+            secret[2] += 1
+
+    def feed(self, results):
+        """加入每条记录并原样产出，便于接在管道中间"""
+        for result in results:
+            self.add(result)
+            yield result
+
+    def merge(self, other):
+        """合并另一个时间线（并行模式下各工作进程按分片收集）"""
+        self.requests.extend(other.requests)
+        self.extractions.extend(other.extractions)
+        for key, (first, last, count) in other.secrets.items():
+            secret = self.secrets.get(key)
+            if secret is None:
+                self.secrets[key] = [first, last, count]
+            else:
+                secret[0] = min(secret[0], first)
+                secret[1] = max(secret[1], last)
+                secret[2] += count
+
+    def summary(self):
+        """
+        导出为可JSON序列化的时间线（时间为UTC）
+        攻击起止时间取盲注提取请求，没有提取请求时取全部请求；
+        每条数据的提取完成时间为该记录最后一次比较请求的时间
+        """
+        if not self.requests:
+            return {}
+        campaign = self.extractions or self.requests
+        start = min(campaign)
+        end = max(campaign)
+
+        per_second = {'requests': Counter(self.requests), 'extractions': Counter(self.extractions)}
+        buckets = {name: {kind: coarsen(counts, width) for kind, counts in per_second.items()}
+                   for name, width in RATE_WIDTHS.items()}
+        rates = {name: {kind: rate_stats(counts, RATE_WIDTHS[name]) for kind, counts in kinds.items()}
+                 for name, kinds in buckets.items()}
+
+        minutes = buckets['per_minute']
+        secrets = sorted(self.secrets.items(), key=lambda item: (item[1][1], item[0]))
+        return {
+            'start': format_epoch(start),
+            'end': format_epoch(end),
+            'duration': end - start,
+            'requests': len(self.requests),
+            'extractions': len(self.extractions),
+            'first_request': format_epoch(min(self.requests)),
+            'last_request': format_epoch(max(self.requests)),
+            'rates': rates,
+            'minutes': [[format_epoch(minute), minutes['requests'][minute], minutes['extractions'][minute]]
+                        for minute in sorted(minutes['requests'])],
+            'secrets': [{
+                'table': f"{database}.{table}",
+                'column': column,
+                'record_id': record_id,
+                'started': format_epoch(first),
+                'extracted_at': format_epoch(last),
+                'duration': last - first,
+                'requests': count
+            } for (database, table, column, record_id), (first, last, count) in secrets]
+        }
+
+def build_timeline(results):
+    """从记录流构建时间线"""
+    timeline = Timeline()
+    for result in results:
+        timeline.add(result)
+    return timeline
+
+def main():
+    parser = argparse.ArgumentParser(description='攻击时间线')
+    parser.parse_args()
+
+    try:
+        results = record_codec.read_records(
+            on_error=lambda e: print(f"Error processing line: {e}", file=sys.stderr))
+        summary = build_timeline(results).summary()
+    except ValueError as e:
+        print(f"Error building timeline: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+    if summary:
+        print(f"[+] 攻击时间线: {summary['start']} ~ {summary['end']}, {summary['extractions']} 次提取请求, "
+              f"{len(summary['secrets'])} 条数据", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()